@@ -0,0 +1,77 @@
+"""
+AST memory benchmark.
+
+Parses a state block of inline literal records and reports traced bytes per
+AST node, with and without the shared-leaf pool, and the traced bytes of the
+same block read as a DataNode.
+
+    python benchmarks/bench_ast_memory.py --records 100000
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from siml.token_buffer import TokenBuffer
+from siml.tokenizer import Tokenizer
+from siml.parser import Parser
+
+RECORD = '''      - id: {n}
+        amount: {amount}
+        priority: {priority}
+        status: "pending"
+        approved: false
+        assigned_to: null
+        tags: [1, 2, 3]
+'''
+
+
+def generate_state_source(records: int) -> str:
+    parts = ["state:\n  - invoices:\n"]
+    for n in range(records):
+        parts.append(RECORD.format(n=n, amount=(n * 37) % 9000, priority=n % 3))
+    return "".join(parts)
+
+
+def count_nodes(node) -> int:
+    count = 0
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        count += 1
+        stack.extend(current.get_children())
+    return count
+
+
+def measure(tokens, **parser_options) -> tuple[int, int]:
+    gc.collect()
+    tracemalloc.start()
+    ast = Parser(tokens, **parser_options).parse()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return used, count_nodes(ast)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20000)
+    args = parser.parse_args()
+
+    tokens = TokenBuffer.from_tokenizer(Tokenizer(generate_state_source(args.records)))
+
+    modes = {"default": {"literal_state": False}}
+    if "shared_leaves" in Parser.__init__.__code__.co_varnames:
+        modes["shared leaves"] = {"shared_leaves": True, "literal_state": False}
+    modes["literal state"] = {}
+
+    for label, options in modes.items():
+        used, nodes = measure(tokens, **options)
+        print(f"{label:<14} {nodes:>10} nodes  {used / 1e6:8.1f} MB  {used / nodes:9.1f} bytes/node  "
+              f"{used / args.records:7.1f} bytes/record")
+
+
+if __name__ == "__main__":
+    main()
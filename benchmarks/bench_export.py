@@ -0,0 +1,108 @@
+"""
+Trace export overhead benchmark.
+
+Runs the agent benchmark program against the stub provider with and without
+a TraceExporter for each format, and reports ms/tick, the export overhead,
+events written and the peak memory of the exporting run. With --latency 0
+every tick is pure CPU, the worst case for export overhead.
+
+The budget applies to the tick path: the CPU time of the simulation thread,
+which is all a tick waits for when the writer thread has a core of its own.
+Wall time is reported next to it; on a single core it also pays for the
+writer. Exits with status 1 when a format adds more than --budget percent of
+tick-path time.
+
+    python benchmarks/bench_export.py --entities 2000 --ticks 10 --latency 0.05
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bench_agents import PROGRAM
+from siml.agents import DecisionCache, StubProvider
+from siml.export import TraceExporter
+from siml.parser import parse_source
+from siml.runtime import Simulation
+
+
+def run(tree, ticks: int, latency: float, exporter: TraceExporter | None, traced: bool = False):
+    simulation = Simulation(tree, provider=StubProvider(max_batch_size=64, latency=latency, seed=7),
+                            decision_cache=DecisionCache(bypass=True), exporter=exporter)
+    simulation.start()
+    if traced:
+        tracemalloc.start()
+    start, cpu = time.perf_counter(), time.thread_time()
+    simulation.run(ticks)
+    simulation.close()
+    elapsed, cpu = time.perf_counter() - start, time.thread_time() - cpu
+    peak = 0
+    if traced:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, cpu, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, default=5000)
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per provider request")
+    parser.add_argument("--max-mb", type=float, default=16, help="export file rotation size")
+    parser.add_argument("--repeat", type=int, default=9, help="rounds of runs; ms/tick is the fastest")
+    parser.add_argument("--budget", type=float, default=5, help="allowed tick-path overhead in percent (default: 5)")
+    args = parser.parse_args()
+
+    tree, errors = parse_source(PROGRAM.format(entities=args.entities, ticks=args.ticks))
+    assert not errors, errors
+    directory = tempfile.mkdtemp(prefix="siml-export-")
+    setups = [("none", None, None), ("jsonl", "jsonl", None), ("jsonl+gzip", "jsonl", "gzip"),
+              ("columnar", "columnar", None), ("columnar+zip", "columnar", "gzip")]
+
+    print(f"{args.entities} records x {args.ticks} ticks, {args.latency * 1000:.0f} ms per request")
+    print(f"{'export':>13} {'ms/tick':>9} {'wall':>8} {'tick cpu':>9} {'tick path':>10} {'events':>9} {'files':>6} "
+          f"{'MiB':>7} {'peak MiB':>9}")
+    def make(name: str, format: str | None, compression: str | None) -> TraceExporter | None:
+        if format is None:
+            return None
+        return TraceExporter(os.path.join(directory, name), format, compression, max_bytes=int(args.max_mb * 1024 * 1024))
+
+    # Round robin: each round runs every setup once, and overheads are the median over rounds of the
+    # ratio to that round's run without export, so drift on a busy machine cancels out
+    runs: dict[str, list[tuple[float, float]]] = {name: [] for name, _, _ in setups}
+    exporters = {}
+    for _ in range(args.repeat):
+        for name, format, compression in setups:
+            exporter = exporters[name] = make(name, format, compression)
+            elapsed, cpu, _ = run(tree, args.ticks, args.latency, exporter)
+            runs[name].append((elapsed, cpu))
+
+    baseline = runs["none"]
+    failures = []
+    for name, format, compression in setups:
+        _, _, peak = run(tree, args.ticks, args.latency, make(name, format, compression), traced=True)
+        per_tick = min(elapsed for elapsed, _ in runs[name]) / args.ticks * 1000
+        cpu_per_tick = min(cpu for _, cpu in runs[name]) / args.ticks * 1000
+        wall_overhead = (statistics.median(run[0] / base[0] for run, base in zip(runs[name], baseline)) - 1) * 100
+        overhead = (statistics.median(run[1] / base[1] for run, base in zip(runs[name], baseline)) - 1) * 100
+        exporter = exporters[name]
+        events = exporter.events if exporter else 0
+        files = len(exporter.paths) if exporter else 0
+        size = exporter.bytes / 2**20 if exporter else 0
+        print(f"{name:>13} {per_tick:>9.2f} {wall_overhead:>7.1f}% {cpu_per_tick:>9.2f} {overhead:>9.1f}% {events:>9,} "
+              f"{files:>6} {size:>7.1f} {peak / 2**20:>9.1f}")
+        if overhead > args.budget:
+            failures.append(f"{name} adds {overhead:.1f}% to the tick path (budget {args.budget:.0f}%)")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Snapshot and fork benchmark.
+
+Runs a module to a given tick, then branches it many ways: once by
+deep-copying every module's state and once with copy-on-write forks
+(Simulation.fork). For each it reports the time to create the branches, the
+time for every branch to run one tick, the memory the branches hold after it, and
+checks that all branches agree. It also times saving and loading a snapshot.
+
+    python benchmarks/bench_fork.py --entities 100000 --forks 20
+"""
+import argparse
+import copy
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from siml.agents import plain
+from siml.parser import parse_source
+from siml.runtime import Simulation
+from siml.snapshot import Snapshot
+
+# About 1% of the records change per tick
+PROGRAM = '''simulation:
+  modules:
+    - module:
+        id: accounts
+        state:
+          - accounts: synthesize(account_template, {entities})
+          - flagged: 0
+        templates:
+          - template: account_template
+            examples:
+              - id: 1
+                balance: 0
+                status: "open"
+              - id: 2
+                balance: 10000
+                status: "open"
+        actions:
+          - action: flag
+            with: [account]
+            do:
+              - set: account.status = "review"
+              - set: flagged = flagged + 1
+        rules:
+          - trigger: on tick
+            do:
+              - for each: account in accounts
+                  - if account.balance > 9900 and account.status == "open":
+                      - call: flag with: account
+                  - if account.balance < 100:
+                      - set: account.balance = account.balance + 50
+'''
+
+
+def deep_fork(simulation: Simulation) -> Simulation:
+    fork = copy.copy(simulation)
+    fork.modules = []
+    for module in simulation.modules:
+        clone = copy.copy(module)
+        clone.state = copy.deepcopy(module.state)
+        fork.modules.append(clone)
+    return fork
+
+
+def branch(make, count: int, traced: bool = False):
+    if traced:
+        tracemalloc.start()
+    start = time.perf_counter()
+    forks = [make() for _ in range(count)]
+    created = time.perf_counter() - start
+    start = time.perf_counter()
+    for fork in forks:
+        for module in fork.modules:
+            module.run_rules("on tick")
+    ticked = time.perf_counter() - start
+    memory = 0
+    if traced:
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    return forks, created, ticked, memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, default=100_000)
+    parser.add_argument("--ticks", type=int, default=3, help="ticks run before branching")
+    parser.add_argument("--forks", type=int, default=20)
+    parser.add_argument("--engine", default="compiled")
+    args = parser.parse_args()
+
+    tree, errors = parse_source(PROGRAM.format(entities=args.entities))
+    assert not errors, errors
+    simulation = Simulation(tree, engine=args.engine)
+    simulation.run(args.ticks)
+
+    print(f"{args.entities} records, {args.forks} branches at tick {args.ticks} ({args.engine} engine)")
+    print(f"{'method':>14} {'ms/fork':>9} {'tick ms':>9} {'MiB/fork':>9}")
+    results = {}
+    for name, make in (("deepcopy", lambda: deep_fork(simulation)), ("copy-on-write", lambda: simulation.fork())):
+        forks, created, ticked, _ = branch(make, args.forks)
+        results[name] = plain(forks[-1].modules[0].state)
+        del forks
+        # Memory is measured on a second pass; tracemalloc slows allocation down too much to time it
+        forks, _, _, memory = branch(make, args.forks, traced=True)
+        print(f"{name:>14} {created / args.forks * 1000:>9.2f} {ticked / args.forks * 1000:>9.2f} "
+              f"{memory / args.forks / 2**20:>9.2f}")
+        del forks
+    assert results["deepcopy"] == results["copy-on-write"], "forks diverged"
+
+    path = os.path.join(tempfile.mkdtemp(prefix="siml-snapshot-"), "tick.snapshot")
+    start = time.perf_counter()
+    simulation.snapshot().save(path)
+    saved = time.perf_counter() - start
+    start = time.perf_counter()
+    Simulation(tree, engine=args.engine, snapshot=Snapshot.load(path))
+    loaded = time.perf_counter() - start
+    print(f"snapshot: saved in {saved * 1000:.1f} ms ({os.path.getsize(path) / 2**20:.1f} MiB), resumed in {loaded * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
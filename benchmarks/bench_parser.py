@@ -0,0 +1,60 @@
+"""
+Parser throughput benchmark.
+
+Reports parser-only time (tokens pre-collected into a TokenBuffer) and
+tokenize+parse time (tokens pulled lazily from the Tokenizer) for growing
+program sizes, so the per-token cost can be checked to stay flat.
+
+    python benchmarks/bench_parser.py --sizes-mb 1 2 4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bench_tokenizer import generate_source
+from siml.tokenizer import Tokenizer
+from siml.token_buffer import TokenBuffer
+from siml.parser import Parser
+
+
+def best_of(repeat: int, run) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[0.5, 1.0, 2.0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'tokens':>10} {'parse':>9} {'tok+parse':>10} {'parse tok/s':>14} {'ns/token':>9}")
+    for size_mb in args.sizes_mb:
+        source = generate_source(int(size_mb * 1_000_000))
+        buffer = TokenBuffer.from_tokenizer(Tokenizer(source))
+
+        def parse_only():
+            result = Parser(buffer).parse()
+            assert result.modules
+
+        def tokenize_and_parse():
+            result = Parser(Tokenizer(source)).parse()
+            assert result.modules
+
+        parse_time = best_of(args.repeat, parse_only)
+        total_time = best_of(args.repeat, tokenize_and_parse)
+        count = len(buffer)
+        print(f"{size_mb:>6.1f}MB {count:>10} {parse_time:>8.3f}s {total_time:>9.3f}s "
+              f"{count / parse_time:>14,.0f} {parse_time / count * 1e9:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+CLI startup benchmark.
+
+Starts `siml --version` and `siml check PROGRAM` (with a warm parse cache) as
+fresh processes, the way sweep jobs do, and reports the best and median wall
+time of each next to a bare `python -c pass`. Exits with status 1 when a
+command's best time over the bare interpreter exceeds its budget, or when it
+imports one of the modules startup must not pay for (the runtime, the agent
+runner, colorama, numpy, and the tokenizer when every tree is cached).
+
+    python benchmarks/bench_startup.py --runs 30 --version-budget 40 --check-budget 80
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Modules neither command may import
+HEAVY = ("colorama", "numpy", "asyncio", "siml.runtime", "siml.agents", "siml.compiler", "siml.tokenizer")
+
+
+def wall_times(command: list[str], runs: int) -> list[float]:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def imported_modules(command: list[str]) -> set[str]:
+    result = subprocess.run([command[0], "-X", "importtime", *command[1:]], cwd=ROOT, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True, check=True)
+    # "import time: self [us] | cumulative | imported package", the name indented by its depth
+    return {line.rsplit("|", 1)[1].strip() for line in result.stderr.splitlines() if line.startswith("import time:")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--program", default=os.path.join("examples", "invoice_simulation.siml"))
+    parser.add_argument("--runs", type=int, default=20, help="processes started per command; the best is kept")
+    parser.add_argument("--version-budget", type=float, default=40, help="ms over a bare interpreter (default: 40)")
+    parser.add_argument("--check-budget", type=float, default=80, help="ms over a bare interpreter (default: 80)")
+    args = parser.parse_args()
+
+    python = sys.executable
+    commands = {
+        "siml --version": ([python, "-m", "cli.main", "--version"], args.version_budget),
+        "siml check": ([python, "-m", "cli.main", "check", args.program], args.check_budget),
+    }
+    # Fill the parse cache, so `check` measures the path repeated jobs take
+    subprocess.run(commands["siml check"][0], cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+
+    bare = wall_times([python, "-c", "pass"], args.runs)
+    print(f"{'command':<16} {'best ms':>9} {'median ms':>10} {'over bare':>10} {'budget':>8}")
+    print(f"{'python -c pass':<16} {min(bare) * 1000:>9.1f} {statistics.median(bare) * 1000:>10.1f}")
+    failures = []
+    for name, (command, budget) in commands.items():
+        times = wall_times(command, args.runs)
+        over = (min(times) - min(bare)) * 1000
+        print(f"{name:<16} {min(times) * 1000:>9.1f} {statistics.median(times) * 1000:>10.1f} {over:>10.1f} {budget:>8.0f}")
+        if over > budget:
+            failures.append(f"{name} takes {over:.1f} ms over a bare interpreter (budget {budget:.0f} ms)")
+        heavy = sorted(module for module in imported_modules(command) if module.split(".")[0] in HEAVY or module in HEAVY)
+        if heavy:
+            failures.append(f"{name} imports {', '.join(heavy)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
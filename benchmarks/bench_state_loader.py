@@ -0,0 +1,85 @@
+"""
+Inline state loading benchmark.
+
+Loads a program whose state is one large inline list of records, once with the
+block parsed into literal nodes (literal_state=False) and once read straight
+into a DataNode, and reports for each:
+- parse: tokenize + parse, best of --repeat
+- state: building the initial state from the tree (Simulation start-up)
+- retained / peak: traced bytes the tree keeps, and the peak while parsing
+- cache: size of the pickled tree and the time to load it back, which is what
+  a run with a warm parse cache pays instead of parsing
+
+    python benchmarks/bench_state_loader.py --records 1000000 --repeat 1
+"""
+import argparse
+import gc
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bench_ast_memory import generate_state_source
+from bench_parser import best_of
+from siml.tokenizer import Tokenizer
+from siml.parser import Parser
+from siml.runtime import Simulation
+
+MODES = {"literal nodes": False, "data node": True}
+
+
+def parse(source: str, literal_state: bool):
+    return Parser(Tokenizer(source), literal_state=literal_state).parse()
+
+
+def traced(source: str, literal_state: bool) -> tuple[int, int]:
+    gc.collect()
+    tracemalloc.start()
+    tree = parse(source, literal_state)
+    gc.collect() # the parser's own reference cycles
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del tree
+    return retained, peak
+
+
+def measure(source: str, literal_state: bool, repeat: int) -> dict[str, float]:
+    gc.collect()
+    tree = parse(source, literal_state)
+    parsed = best_of(repeat, lambda: parse(source, literal_state))
+    state = best_of(repeat, lambda: Simulation(tree))
+    cached = pickle.dumps(tree, protocol=pickle.HIGHEST_PROTOCOL)
+    del tree
+    gc.collect()
+    load = best_of(repeat, lambda: pickle.loads(cached))
+    retained, peak = traced(source, literal_state)
+    return {"parse": parsed, "state": state, "retained": retained, "peak": peak, "cache": len(cached), "load": load}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    source = generate_state_source(args.records)
+    results = {label: measure(source, literal_state, args.repeat) for label, literal_state in MODES.items()}
+
+    print(f"{args.records} records, {len(source) / 1e6:.1f} MB of source")
+    print(f"{'mode':<14} {'parse s':>8} {'state s':>8} {'retained MB':>12} {'peak MB':>8} {'cache MB':>9} {'cache load s':>13}")
+    for label, result in results.items():
+        print(f"{label:<14} {result['parse']:>8.3f} {result['state']:>8.3f} {result['retained'] / 1e6:>12.1f} "
+              f"{result['peak'] / 1e6:>8.1f} {result['cache'] / 1e6:>9.1f} {result['load']:>13.3f}")
+
+    before, after = results["literal nodes"], results["data node"]
+    cold = (before["parse"] + before["state"]) / (after["parse"] + after["state"])
+    warm = (before["load"] + before["state"]) / (after["load"] + after["state"])
+    print(f"load {cold:.1f}x faster from source, {warm:.1f}x from the cache; "
+          f"tree {before['retained'] / after['retained']:.0f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Seed sweep benchmark.
+
+Sweeps the agent benchmark program over many seeds with the stub provider,
+first re-parsing the program for every run (what a shell loop over
+`siml run` does, minus interpreter startup), then through run_sweep with a
+growing number of worker processes. Checks every configuration produces
+the same results and reports runs/sec and scaling.
+
+    python benchmarks/bench_sweep.py --runs 64 --entities 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bench_agents import PROGRAM
+from siml.parser import parse_source
+from siml.parallel import available_cpus
+from siml.sweep import SweepSettings, make_jobs, run_job, init_worker, run_sweep
+
+
+def comparable(results) -> list:
+    return [(result.seed, result.summary, result.applied, result.error) for result in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=64)
+    parser.add_argument("--entities", type=int, default=2000)
+    parser.add_argument("--ticks", type=int, default=2)
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="worker counts to try (default: 1, 2, 4, ... up to the available CPUs)")
+    args = parser.parse_args()
+
+    source = PROGRAM.format(entities=args.entities, ticks=args.ticks)
+    jobs = make_jobs(list(range(args.runs)))
+    settings = SweepSettings(ticks=args.ticks, provider="stub")
+    cpus = available_cpus()
+    worker_counts = args.workers or sorted({1, *[2 ** i for i in range(1, cpus.bit_length()) if 2 ** i <= cpus], cpus})
+
+    print(f"{args.runs} runs x {args.ticks} ticks, {args.entities} records, {cpus} CPU(s)")
+    print(f"{'mode':>20} {'time':>9} {'runs/s':>9} {'scaling':>8}")
+
+    start = time.perf_counter()
+    baseline = []
+    for job in jobs:
+        tree, errors = parse_source(source)
+        assert not errors, errors
+        init_worker(tree)
+        baseline.append(run_job(job, settings))
+    elapsed = time.perf_counter() - start
+    print(f"{'parse every run':>20} {elapsed:>8.2f}s {args.runs / elapsed:>9.1f} {'':>8}")
+
+    tree, errors = parse_source(source)
+    single = None
+    for workers in worker_counts:
+        start = time.perf_counter()
+        results = list(run_sweep(tree, jobs, settings, workers))
+        elapsed = time.perf_counter() - start
+        single = single or elapsed
+        assert comparable(results) == comparable(baseline), f"{workers} worker(s) changed the results"
+        print(f"{f'sweep, {workers} worker(s)':>20} {elapsed:>8.2f}s {args.runs / elapsed:>9.1f} {single / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Tokenizer throughput benchmark.
+
+Generates a multi-MB SIML program and reports tokens/sec for the in-memory,
+streamed and memory-mapped tokenizer modes.
+
+    python benchmarks/bench_tokenizer.py --size-mb 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from siml.tokenizer import Tokenizer
+
+MODULE_TEMPLATE = '''    - module:
+        id: invoices_{n}
+        state:
+          - tick: 0
+          - invoices: synthesize(invoice_template, 100)
+          - settings:
+              threshold: 5000 # approve below this
+              label: "batch #{n}"
+              ratio: 0.25
+        actions:
+          - action: approve_invoice
+            with: [invoice]
+            do:
+              - if invoice.amount < 5000 and invoice.status != "approved":
+                  - set: invoice.status = "approved"
+                  - set: agent_reward = 1
+        rules:
+          - trigger: on tick
+            do:
+              - for each: invoice in invoices
+                  - if invoice.amount <= settings.threshold or invoice.priority >= 2:
+                      - call: approve_invoice with: invoice
+              - set: tick = tick + 1
+'''
+
+
+def generate_source(size_bytes: int) -> str:
+    parts = ["simulation:\n  config:\n    max_ticks: 10\n    tick_unit: \"days\"\n  modules:\n"]
+    total = len(parts[0])
+    n = 0
+    while total < size_bytes:
+        chunk = MODULE_TEMPLATE.format(n=n)
+        parts.append(chunk)
+        total += len(chunk)
+        n += 1
+    return "".join(parts)
+
+
+def measure(label: str, make_tokenizer, size_bytes: int, repeat: int):
+    best = None
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = sum(1 for _ in make_tokenizer())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    print(f"{label:<10} {count:>10} tokens  {best:8.3f}s  "
+          f"{count / best:>12,.0f} tokens/s  {size_bytes / best / 1e6:6.2f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=4.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    source = generate_source(int(args.size_mb * 1_000_000))
+    size_bytes = len(source)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".siml", delete=False) as f:
+        f.write(source)
+        path = f.name
+
+    try:
+        measure("string", lambda: Tokenizer(source), size_bytes, args.repeat)
+        if hasattr(Tokenizer, "from_path"):
+            measure("path", lambda: Tokenizer.from_path(path), size_bytes, args.repeat)
+            measure("mmap", lambda: Tokenizer.from_path(path, use_mmap=True), size_bytes, args.repeat)
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
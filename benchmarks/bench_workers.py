@@ -0,0 +1,74 @@
+"""
+Multi-process tick benchmark.
+
+Ticks the vectorized engine over one large synthesized collection in a single
+process and with each --workers count (see siml.parallel.WorkerPool), checks
+every run ends with the same columns byte for byte, and reports milliseconds
+per tick and the speedup over one process. Worker counts are limited to the
+available CPUs, which are printed with the results; speedups need as many idle
+cores as workers.
+
+    python benchmarks/bench_workers.py --entities 1000000 4000000 --workers 2 4 8
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bench_columnar import PROGRAM
+from siml.columnar import ColumnTable
+from siml.parallel import available_cpus
+from siml.parser import parse_source
+from siml.runtime import Simulation
+
+
+def final_state(simulation: Simulation) -> dict:
+    state = {}
+    for name, value in simulation.modules[0].state.items():
+        if type(value) is ColumnTable:
+            state[name] = ({column: (array.dtype.str, array.tobytes()) for column, array in value.columns.items()},
+                           value.kinds, value.to_records() if "object" in value.kinds.values() else None)
+        else:
+            state[name] = value
+    return state
+
+
+def measure(tree, workers: int, ticks: int) -> tuple[float, dict, str]:
+    simulation = Simulation(tree, engine="vectorized", workers=workers)
+    # The first tick forks the workers and moves the columns into shared memory
+    simulation.step()
+    start = time.perf_counter()
+    simulation.run(ticks)
+    per_tick = (time.perf_counter() - start) / ticks
+    pool = simulation.workers
+    splits = f"{pool.count} process(es), {pool.splits} split, {pool.fallbacks} cancelled" if pool is not None else ""
+    simulation.close()
+    return per_tick, final_state(simulation), splits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--ticks", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{available_cpus()} available CPU(s)")
+    print(f"{'entities':>9} {'workers':>8} {'ms/tick':>9} {'updates/s':>14} {'speedup':>8}  loop runs")
+    for entities in args.entities:
+        tree, errors = parse_source(PROGRAM.format(entities=entities))
+        assert not errors, errors
+
+        baseline, expected, _ = measure(tree, 1, args.ticks)
+        print(f"{entities:>9} {1:>8} {baseline * 1000:>9.2f} {entities / baseline:>14,.0f} {1:>7.1f}x")
+        for workers in args.workers:
+            per_tick, state, splits = measure(tree, workers, args.ticks)
+            assert state == expected, f"{workers} workers end in a different state than one process"
+            print(f"{entities:>9} {workers:>8} {per_tick * 1000:>9.2f} {entities / per_tick:>14,.0f} "
+                  f"{baseline / per_tick:>7.1f}x  {splits}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Synthetic SIML program generator.
+
+Builds a runnable program of configurable size: `modules` modules, each with
+`rows` inline state records, `rules` tick rules nested `depth` blocks deep and
+a couple of actions. The same options and seed always give the same program.
+Used by suite.py; also writes programs for manual runs.
+
+    python benchmarks/generator.py --modules 50 --depth 4 --rows 1000 -o big.siml
+"""
+import argparse
+import random
+import sys
+from dataclasses import dataclass
+
+STATUSES = ("pending", "approved", "rejected", "escalated")
+
+
+@dataclass(slots=True)
+class ProgramShape:
+    modules: int = 20
+    rows: int = 100     # inline records in each module's state
+    rules: int = 3      # `on tick` rules per module
+    depth: int = 3      # nesting of for/if blocks in a rule body
+    ticks: int = 10
+    seed: int = 0
+
+
+def record(rng: random.Random, index: int, indent: str) -> str:
+    return (f"{indent}- id: {index}\n"
+            f"{indent}  amount: {rng.randrange(100, 10_000)}\n"
+            f"{indent}  priority: {rng.randrange(3)}\n"
+            f"{indent}  status: \"{rng.choice(STATUSES)}\"\n"
+            f"{indent}  score: 0\n"
+            f"{indent}  flagged: false\n"
+            f"{indent}  owner: null\n")
+
+
+def block(rng: random.Random, depth: int, indent: str, var: str) -> list[str]:
+    """
+    Statements for one level of a rule body inside `for each: var in items`: a field update, then an
+    `if` holding the next level and an `else` calling an action. The innermost level only updates.
+    """
+    lines = [f"{indent}- set: {var}.score = {var}.score + {rng.randrange(1, 5)}"]
+    if depth <= 1:
+        lines.append(f"{indent}- set: {var}.flagged = {var}.amount > {rng.randrange(1_000, 9_000)}")
+        return lines
+
+    match rng.randrange(3):
+        case 0:
+            condition = f"{var}.amount > {rng.randrange(100, 9_000)} and {var}.priority != {rng.randrange(3)}"
+        case 1:
+            condition = f"{var}.status == \"{rng.choice(STATUSES)}\" or {var}.score % {rng.randrange(2, 7)} == 0"
+        case _:
+            condition = f"not {var}.flagged"
+    lines.append(f"{indent}- if {condition}:")
+    lines.extend(block(rng, depth - 1, indent + "    ", var))
+    lines.append(f"{indent}- else:")
+    lines.append(f"{indent}    - call: review with: {var}")
+    return lines
+
+
+def module_source(shape: ProgramShape, rng: random.Random, index: int) -> str:
+    lines = [
+        "    - module:",
+        f"        id: module_{index}",
+        "        state:",
+        "          - ticks: 0",
+        "          - reviewed: 0",
+        "          - settings:",
+        f"              threshold: {rng.randrange(1_000, 9_000)}",
+        f"              label: \"module {index}\"",
+        "          - items:",
+    ]
+    source = "\n".join(lines) + "\n"
+    source += "".join(record(rng, row, "              ") for row in range(shape.rows))
+    lines = [
+        "        actions:",
+        "          - action: review",
+        "            with: [item]",
+        "            do:",
+        "              - set: reviewed = reviewed + 1",
+        "              - if item.amount < settings.threshold:",
+        "                  - set: item.status = \"approved\"",
+        "              - else:",
+        "                  - set: item.status = \"escalated\"",
+        "          - action: reset",
+        "            with: [item]",
+        "            do:",
+        "              - set: item.score = 0",
+        "        rules:",
+    ]
+    for _ in range(shape.rules):
+        lines += [
+            "          - trigger: on tick",
+            "            do:",
+            "              - for each: item in items",
+        ]
+        lines += block(rng, max(shape.depth - 1, 1), "                  ", "item")
+        lines.append("              - set: ticks = ticks + 1")
+    lines += [
+        "          - trigger: on tick",
+        "            do:",
+        "              - for each: item in items",
+        "                  - if item.score > 1000:",
+        "                      - call: reset with: item",
+    ]
+    return source + "\n".join(lines) + "\n"
+
+
+def generate_program(shape: ProgramShape) -> str:
+    rng = random.Random(shape.seed)
+    header = f"simulation:\n  config:\n    max_ticks: {shape.ticks}\n    seed: {shape.seed}\n  modules:\n"
+    return header + "".join(module_source(shape, rng, index) for index in range(shape.modules))
+
+
+def add_shape_arguments(parser: argparse.ArgumentParser):
+    defaults = ProgramShape()
+    parser.add_argument("--modules", type=int, default=defaults.modules, help="modules in the program")
+    parser.add_argument("--rows", type=int, default=defaults.rows, help="inline state records per module")
+    parser.add_argument("--rules", type=int, default=defaults.rules, help="tick rules per module")
+    parser.add_argument("--depth", type=int, default=defaults.depth, help="nesting depth of rule bodies")
+    parser.add_argument("--ticks", type=int, default=defaults.ticks, help="config.max_ticks")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def shape_from(args) -> ProgramShape:
+    return ProgramShape(args.modules, args.rows, args.rules, args.depth, args.ticks, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_shape_arguments(parser)
+    parser.add_argument("-o", "--output", default=None, help="output file (default: stdout)")
+    args = parser.parse_args()
+
+    source = generate_program(shape_from(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(source)
+    else:
+        sys.stdout.write(source)
+
+
+if __name__ == "__main__":
+    main()
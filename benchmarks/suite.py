@@ -0,0 +1,185 @@
+"""
+Benchmark suite.
+
+Generates one synthetic program (see generator.py) and measures tokenizer
+throughput, parse time, AST memory and tick throughput on each engine. Writes
+the results as JSON, tagged with the git commit, so runs on two commits can be
+compared; `--compare` exits with status 1 when a metric regressed by more than
+`--threshold`. The suite re-runs itself with PYTHONHASHSEED pinned (0 unless
+`--hash-seed` says otherwise): tokenizer throughput alone moves by over 50%
+between hash seeds, more than any threshold worth setting.
+
+    python benchmarks/suite.py --modules 50 --rows 500 -o before.json
+    python benchmarks/suite.py --modules 50 --rows 500 --compare before.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bench_ast_memory import count_nodes
+from bench_parser import best_of
+from generator import add_shape_arguments, generate_program, shape_from
+from siml.tokenizer import Tokenizer
+from siml.token_buffer import TokenBuffer
+from siml.parser import Parser
+from siml.runtime import Simulation, ENGINES
+
+FORMAT = 1
+
+
+def metric(value: float, unit: str, better: str) -> dict:
+    return {"value": value, "unit": unit, "better": better}
+
+
+def git_commit() -> str | None:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def measure_tokenizer(source: str, repeat: int, metrics: dict) -> TokenBuffer:
+    tokens = TokenBuffer.from_tokenizer(Tokenizer(source))
+    elapsed = best_of(repeat, lambda: sum(1 for _ in Tokenizer(source)))
+    metrics["tokenizer.tokens_per_s"] = metric(len(tokens) / elapsed, "tokens/s", "higher")
+    metrics["tokenizer.mb_per_s"] = metric(len(source.encode()) / elapsed / 1e6, "MB/s", "higher")
+    return tokens
+
+
+def measure_parser(source: str, tokens: TokenBuffer, repeat: int, metrics: dict):
+    metrics["parse.parser_s"] = metric(best_of(repeat, lambda: Parser(tokens).parse()), "s", "lower")
+    metrics["parse.tokenize_and_parse_s"] = metric(best_of(repeat, lambda: Parser(Tokenizer(source)).parse()),
+                                                   "s", "lower")
+
+
+def measure_memory(tokens: TokenBuffer, metrics: dict):
+    gc.collect()
+    tracemalloc.start()
+    ast = Parser(tokens).parse()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    nodes = count_nodes(ast)
+    metrics["ast.bytes"] = metric(used, "bytes", "lower")
+    metrics["ast.nodes"] = metric(nodes, "nodes", "info")
+    # Informational only: inline state is one DataNode however many values it holds
+    metrics["ast.bytes_per_node"] = metric(used / nodes, "bytes/node", "info")
+
+
+def measure_ticks(source: str, shape, engines: list[str], repeat: int, metrics: dict):
+    parser = Parser(Tokenizer(source))
+    tree = parser.parse()
+    assert not parser.errors, parser.errors
+    # Every rule visits every record of its module once per tick
+    visits = shape.modules * shape.rows * (shape.rules + 1) * shape.ticks
+    states = {}
+    for engine in engines:
+        best = None
+        for _ in range(repeat):
+            simulation = Simulation(tree, engine=engine)
+            simulation.start()
+            gc.collect()
+            start = time.perf_counter()
+            simulation.run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        states[engine] = [module.state for module in simulation.modules]
+        metrics[f"ticks.{engine}.ticks_per_s"] = metric(shape.ticks / best, "ticks/s", "higher")
+        metrics[f"ticks.{engine}.visits_per_s"] = metric(visits / best, "records/s", "higher")
+    reference = states[engines[0]]
+    for engine in engines[1:]:
+        assert states[engine] == reference, f"{engine} engine ended in a different state than {engines[0]}"
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Print each metric next to the baseline's and return the names of those that got worse by more
+    than `threshold` (a fraction).
+    """
+    for key, what in (("shape", "program shape"), ("hash_seed", "hash seed"), ("python", "Python version")):
+        if baseline.get("meta", {}).get(key) != results["meta"][key]:
+            print(f"warning: the baseline was measured with a different {what}", file=sys.stderr)
+    regressions = []
+    print(f"{'metric':<34} {'baseline':>14} {'current':>14} {'change':>8}")
+    for name, current in results["metrics"].items():
+        before = baseline.get("metrics", {}).get(name)
+        if before is None or not before["value"]:
+            print(f"{name:<34} {'-':>14} {current['value']:>14,.2f}")
+            continue
+        change = current["value"] / before["value"] - 1
+        worse = {"higher": -change, "lower": change}.get(current["better"], 0)
+        flag = ""
+        if worse > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<34} {before['value']:>14,.2f} {current['value']:>14,.2f} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_shape_arguments(parser)
+    parser.add_argument("--engine", choices=list(ENGINES), nargs="+", default=list(ENGINES))
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the best is kept")
+    parser.add_argument("-o", "--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", default=None, help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative change counted as a regression (default: 0.10)")
+    parser.add_argument("--hash-seed", default="0", help="PYTHONHASHSEED to measure under (default: 0)")
+    args = parser.parse_args()
+
+    if os.environ.get("PYTHONHASHSEED") != args.hash_seed:
+        os.execve(sys.executable, [sys.executable, *sys.argv], {**os.environ, "PYTHONHASHSEED": args.hash_seed})
+
+    shape = shape_from(args)
+    source = generate_program(shape)
+    metrics = {}
+    tokens = measure_tokenizer(source, args.repeat, metrics)
+    measure_parser(source, tokens, args.repeat, metrics)
+    measure_memory(tokens, metrics)
+    measure_ticks(source, shape, args.engine, args.repeat, metrics)
+
+    results = {
+        "format": FORMAT,
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "hash_seed": args.hash_seed,
+            "shape": {name: getattr(shape, name) for name in shape.__slots__},
+            "source_bytes": len(source.encode()),
+            "tokens": len(tokens),
+            "repeat": args.repeat,
+        },
+        "metrics": metrics,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+    elif not args.output:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
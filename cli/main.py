@@ -1,93 +1,542 @@
+import argparse
+import json
 import sys
 import os
+import time
+from typing import TYPE_CHECKING
 
-# Add the root directory to sys.path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-
-from siml.tracer import Tracer
-from siml.tokenizer import Tokenizer
-
-from siml.ast_nodes import (
-    SimulationNode, ModuleNode, StateVarNode, NumberNode
-)
-
-
-def main():
-    Tracer.enabled = True
-
-    source = '''
-state:
-config:
-  max_ticks: 10
-  tick_unit: "days"
-
-state:
-  - invoices: generate(invoice_template, 100)
-  - tick: 0
-
-templates:
-  - template: invoice_template
-    examples:
-      - id: 1
-        amount: 4200
-        status: "pending"
-
-actions:
-  - action: approve_invoice
-    with: [invoice]
-    do:
-      - if invoice.amount < 5000:
-          - set: invoice.status = "approved"
-          - set: agent_reward = 1
-
-rules:
-  - trigger: on tick
-    do:
-      - for each: invoice in invoices
-          - prompt agent: billing_agent with: invoice
-      - set: tick = tick + 1
-
-agents:
-  - agent: "billing_agent"
-    for each: invoice in invoices
-    llm:
-      provider: "openai"
-      model: "gpt-4o"
-      function_calling: true
-    context:
-      invoice: invoice
-    can_call:
-      - approve_invoice
-'''
-    tokenizer = Tokenizer(source)
-
-    tokens = list(tokenizer)
-
-    # Build a small fake AST manually
-    fake_ast = SimulationNode(
-        line=1,
-        indent=0,
-        modules=[
-            ModuleNode(
-                line=2,
-                indent=2,
-                name="core",
-                state=[
-                    StateVarNode(
-                        line=3,
-                        indent=4,
-                        name="tick",
-                        value=NumberNode(line=3, indent=6, value=0)
-                    )
-                ]
-            )
-        ]
-    )
+from siml import __version__
+
+# Everything else is imported by the commands that use it, so that `siml --version` and
+# `siml check` start without loading the runtime, the agent runner or the tokenizer's tables
+if TYPE_CHECKING:
+    from siml.incremental import IncrementalDocument, UpdateResult
+
+
+def read_source(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def parse_command(args) -> int:
+    from siml.parser import Parser
+    from siml.tracer import Tracer
+
+    Tracer.enabled = args.trace
+    parser = Parser.from_path(args.program)
+    ast = parser.parse()
+    Tracer.dump()
+
+    for error in parser.errors:
+        print(f"{args.program}:{error.line}: {error.message}")
 
     tracer = Tracer("AST")
     tracer.enabled = True
-    tracer.debug_ast(fake_ast)
+    tracer.debug_ast(ast)
+    return 1 if parser.errors else 0
+
+
+def json_value(value):
+    # Columnar collections serialize as their records
+    if hasattr(value, "to_records"):
+        return value.to_records()
+    return str(value)
+
+
+def run_command(args) -> int:
+    from siml.interpreter import SimulationError
+    from siml.runtime import Simulation
+    from siml.snapshot import Snapshot
+    from siml.tracer import Tracer
+
+    Tracer.enabled = args.trace
+    loaded = load_or_report(args.program, use_cache=not args.no_cache, jobs=args.jobs, timings=args.timings)
+    if loaded is None:
+        return 1
+
+    exporter = None
+    try:
+        start = time.perf_counter()
+        if args.export:
+            from siml.export import TraceExporter
+            exporter = TraceExporter(args.export, args.export_format, args.export_compression,
+                                     max_bytes=int(args.export_max_mb * 1024 * 1024))
+        decision_cache = None
+        if args.provider is not None:
+            from siml.agents import DecisionCache
+            decision_cache = DecisionCache(path=args.agent_cache, bypass=args.no_agent_cache)
+        snapshot = Snapshot.load(args.resume) if args.resume else None
+        simulation = Simulation(loaded.tree, engine=args.engine, seed=args.seed, provider=args.provider,
+                                concurrency=args.concurrency, rate_limit=args.rate_limit, decision_cache=decision_cache,
+                                exporter=exporter, snapshot=snapshot, skip_unchanged=not args.no_skip_unchanged,
+                                indexes=not args.no_indexes, optimize=not args.no_optimize, workers=args.workers)
+        first_tick = simulation.tick
+        built = time.perf_counter()
+        simulation.run(args.ticks)
+        finished = time.perf_counter()
+        simulation.close()
+        if args.save_snapshot:
+            simulation.snapshot().save(args.save_snapshot)
+    except SimulationError as e:
+        if exporter is not None:
+            exporter.close()
+        Tracer.dump()
+        print(f"{args.program}: {e}", file=sys.stderr)
+        return 1
+    Tracer.dump()
+
+    elapsed = finished - built
+    ticks = simulation.tick - first_tick
+    rate = f", {ticks / elapsed:,.0f} ticks/s" if elapsed else ""
+    resumed = f" from tick {first_tick}" if snapshot is not None else ""
+    print(f"Ran {ticks} tick(s){resumed} in {elapsed * 1000:.1f} ms{rate} "
+          f"(setup {(built - start) * 1000:.1f} ms, {args.engine} engine, {simulation.prompt_count} agent prompt(s))")
+    if simulation.skip_unchanged:
+        evaluated, skipped = simulation.rule_evaluations, simulation.rules_skipped
+        share = f" ({skipped / (evaluated + skipped):.0%})" if skipped else ""
+        print(f"Rules: {evaluated} evaluation(s), {skipped} skipped with unchanged inputs{share}")
+    workers = simulation.workers
+    if workers is not None:
+        print(f"Workers: {workers.count} process(es), {workers.splits} loop run(s) split across them, "
+              f"{workers.fallbacks} cancelled and run in-process")
+    runner = simulation.agent_runner
+    if runner is not None:
+        scheduler = runner.scheduler
+        print(f"Agents: {runner.decisions} decision(s) in {scheduler.requests} request(s), {runner.applied} action(s) applied, "
+              f"{runner.rejected} rejected, {scheduler.wait_time * 1000:.1f} ms waiting on the provider")
+        cache = scheduler.cache
+        if not cache.bypass:
+            print(f"Decision cache: {cache.hits} hit(s) ({cache.disk_hits} from disk), {cache.misses} miss(es), "
+                  f"{cache.hit_rate:.0%} hit rate")
+    if exporter is not None:
+        print(f"Exported {exporter.events} event(s) to {len(exporter.paths)} file(s) ({exporter.bytes / 1024:,.0f} KiB)")
+    if args.state:
+        print(json.dumps({module.name: module.state for module in simulation.modules}, indent=2, default=json_value))
+    return 0
+
+
+def load_or_report(program: str, use_cache: bool = True, jobs: int = 1, timings: bool = False):
+    from siml.loader import LoadError, program_loader
+
+    loader = program_loader(program, use_cache=use_cache, workers=jobs)
+    try:
+        loaded = loader.load(program)
+    except LoadError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return None
+    if timings:
+        print(loader.format_timings(), file=sys.stderr)
+    for diagnostic in loaded.diagnostics:
+        print(f"{diagnostic.path}:{diagnostic.line}: {diagnostic.message}", file=sys.stderr)
+    return None if loaded.diagnostics else loaded
+
+
+def check_command(args) -> int:
+    """
+    Load a program with every module and import it references, and report parse and load errors
+    without building any state. Trees come from the parse cache when they can, in which case
+    nothing is tokenized.
+    """
+    loaded = load_or_report(args.program, use_cache=not args.no_cache, jobs=args.jobs, timings=args.timings)
+    if loaded is None:
+        return 1
+    tree = loaded.tree
+    print(f"{args.program}: ok ({len(tree.modules)} module(s), {len(tree.agents)} agent(s))")
+    return 0
+
+
+def synthesize_command(args) -> int:
+    from siml.interpreter import Interpreter, SimulationError
+    from siml.synthesis import Synthesizer, SyntheticCollection
+
+    loaded = load_or_report(args.program)
+    if loaded is None:
+        return 1
+
+    tree = loaded.tree
+    candidates = [(module, template) for module in tree.modules for template in module.templates
+                  if template.name == args.template and args.module in (None, module.name)]
+    if not candidates:
+        print(f"error: no template '{args.template}'" + (f" in module '{args.module}'" if args.module else ""), file=sys.stderr)
+        return 1
+    module, template = candidates[0]
+
+    seed = args.seed
+    if seed is None:
+        config = Interpreter(None).evaluate(tree.config, {}, {}) if tree.config is not None else {}
+        seed = config.get("seed", 0)
+
+    try:
+        # Same stream as the module's first synthesize() of this template at run time
+        synthesizer = Synthesizer(template.name, Interpreter(None).evaluate(template.scema, {}, {}), seed, module.name, 0, template.line)
+    except SimulationError as e:
+        print(f"{args.program}: {e}", file=sys.stderr)
+        return 1
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    start = time.perf_counter()
+    try:
+        for chunk in SyntheticCollection(synthesizer, args.count).chunks(args.chunk_size, args.workers):
+            output.write("".join(json.dumps(record) + "\n" for record in chunk))
+    finally:
+        if args.output:
+            output.close()
+    elapsed = time.perf_counter() - start
+
+    rate = f" ({args.count / elapsed:,.0f} records/s)" if elapsed else ""
+    print(f"Synthesized {args.count:,} '{template.name}' records in {elapsed:.2f}s{rate}", file=sys.stderr)
+    return 0
+
+
+def parse_seeds(text: str) -> list[int]:
+    """
+    "0-99", "1,5,9" or a mix of both.
+    """
+    seeds = []
+    for part in text.split(","):
+        first, _, last = part.strip().partition("-")
+        seeds.extend(range(int(first), int(last) + 1) if last else [int(first)])
+    return seeds
+
+
+def parse_variation(text: str) -> tuple[str, list]:
+    name, _, values = text.partition("=")
+    if not name or not values:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE[,VALUE...], got '{text}'")
+    parsed = []
+    for value in values.split(","):
+        try:
+            parsed.append(json.loads(value))
+        except json.JSONDecodeError:
+            parsed.append(value)
+    return name, parsed
+
+
+def explain_command(args) -> int:
+    """
+    Print how each module would run, without building any state: every rule's read and write sets
+    (and whether it can be skipped when they are unchanged), and every loop's plan (index or full scan).
+    """
+    from siml.dependencies import DependencyAnalysis
+    from siml.indexes import plan_loops
+    from siml.runtime import ON_TICK, agent_actions, module_state_names
+
+    loaded = load_or_report(args.program, use_cache=not args.no_cache)
+    if loaded is None:
+        return 1
+
+    callable_by_agents = agent_actions(loaded.tree)
+    for module in loaded.tree.modules:
+        analysis = DependencyAnalysis(module, module_state_names(module), callable_by_agents)
+        print(f"module {module.name}")
+        for rule in module.rules:
+            effects = analysis.rule(rule)
+            if effects.pure and rule.trigger == ON_TICK:
+                when = "skipped while its inputs are unchanged"
+            else:
+                when = "always runs" if rule.trigger == ON_TICK else "runs once"
+            print(f"  rule '{rule.trigger}' (line {rule.line}): reads {', '.join(sorted(effects.reads)) or 'nothing'}; "
+                  f"writes {', '.join(sorted(effects.writes)) or 'nothing'}; {when}")
+        for plan in sorted(plan_loops(module, analysis).values(), key=lambda plan: plan.line):
+            print(f"  loop (line {plan.line}): for each {plan.var} in {plan.collection}: {plan.describe()}")
+    return 0
+
+
+def profile_command(args) -> int:
+    """
+    Run a simulation with a Profiler and print time, calls, loop visits and allocations per rule,
+    action, template and agent; --collapsed writes the call stacks for a flame graph.
+    """
+    from siml.interpreter import SimulationError
+    from siml.profiler import Profiler
+    from siml.runtime import Simulation
+    from siml.tracer import Tracer
+
+    Tracer.enabled = args.trace
+    loaded = load_or_report(args.program, use_cache=not args.no_cache)
+    if loaded is None:
+        return 1
+
+    profiler = Profiler(allocations=args.allocations)
+    profiler.start()
+    try:
+        start = time.perf_counter()
+        simulation = Simulation(loaded.tree, engine=args.engine, seed=args.seed, provider=args.provider,
+                                skip_unchanged=not args.no_skip_unchanged, indexes=not args.no_indexes,
+                                optimize=not args.no_optimize, profiler=profiler)
+        built = time.perf_counter()
+        simulation.run(args.ticks)
+        finished = time.perf_counter()
+        simulation.close()
+    except SimulationError as e:
+        Tracer.dump()
+        print(f"{args.program}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        profiler.stop()
+    Tracer.dump()
+
+    print(f"Profiled {simulation.tick} tick(s) in {(finished - built) * 1000:.1f} ms "
+          f"(setup {(built - start) * 1000:.1f} ms, {args.engine} engine)")
+    entries = profiler.report(args.sort)
+    if args.limit is not None:
+        entries = entries[:args.limit]
+    allocated = f" {'alloc KiB':>10}" if args.allocations else ""
+    print(f"{'kind':<10} {'name':<24} {'where':<20} {'calls':>9} {'total ms':>10} {'own ms':>10} {'visits':>11}{allocated}")
+    for entry in entries:
+        where = f"{entry.module}:{entry.line}" if entry.module else (f"line {entry.line}" if entry.line else "")
+        allocated = f" {entry.allocated / 1024:>10,.1f}" if args.allocations else ""
+        print(f"{entry.kind:<10} {entry.name:<24} {where:<20} {entry.calls:>9,} {entry.total * 1000:>10.2f} "
+              f"{entry.own * 1000:>10.2f} {entry.visits:>11,}{allocated}")
+
+    if args.collapsed:
+        with open(args.collapsed, "w", encoding="utf-8") as f:
+            for line in profiler.collapsed():
+                f.write(line + "\n")
+        print(f"Wrote {len(profiler.stacks)} stack(s) to {args.collapsed}")
+    return 0
 
-if __name__ == "__main__":
-    main()
 
+def sweep_command(args) -> int:
+    from siml.sweep import SweepSettings, make_jobs, pool_size, run_sweep
+
+    loaded = load_or_report(args.program, use_cache=not args.no_cache)
+    if loaded is None:
+        return 1
+    try:
+        seeds = parse_seeds(args.seeds) if args.seeds else list(range(args.runs))
+    except ValueError:
+        print(f"error: bad --seeds '{args.seeds}'", file=sys.stderr)
+        return 1
+
+    jobs = make_jobs(seeds, dict(args.vary or []))
+    settings = SweepSettings(args.engine, args.ticks, args.provider, args.concurrency, args.state)
+    workers = pool_size(args.workers or None)
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    totals: dict[str, list[float]] = {}
+    failures = 0
+    start = time.perf_counter()
+    try:
+        for result in run_sweep(loaded.tree, jobs, settings, workers, args.batch):
+            record = {name: getattr(result, name) for name in result.__slots__ if name != "state" or result.state is not None}
+            output.write(json.dumps(record, default=json_value) + "\n")
+            output.flush()
+            if result.error is not None:
+                failures += 1
+                continue
+            for module, values in result.summary.items():
+                for name, value in values.items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        totals.setdefault(f"{module}.{name}", []).append(value)
+    finally:
+        if args.output:
+            output.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"Swept {len(jobs)} run(s) in {elapsed:.2f}s ({len(jobs) / elapsed:,.1f} runs/s, {workers} worker(s)), "
+          f"{failures} failed", file=sys.stderr)
+    for name, values in totals.items():
+        print(f"  {name}: mean {sum(values) / len(values):,.4g}, min {min(values):,.4g}, max {max(values):,.4g}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def report(path: str, document: "IncrementalDocument", result: "UpdateResult | None", elapsed: float):
+    how = "full parse"
+    if result is not None and result.incremental:
+        how = f"re-parsed {result.kind}, {result.lines_lexed} lines"
+    status = f"{len(document.errors)} error(s)" if document.errors else "ok"
+    print(f"[{time.strftime('%H:%M:%S')}] {path}: {status} ({how}, {elapsed * 1000:.1f} ms)")
+    for error in document.errors:
+        print(f"  {path}:{error.line}: {error.message}")
+
+
+def watch_command(args) -> int:
+    from siml.incremental import IncrementalDocument
+
+    path = args.program
+    module_name = os.path.splitext(os.path.basename(path))[0]
+
+    start = time.perf_counter()
+    document = IncrementalDocument(read_source(path), module_name=module_name)
+    report(path, document, None, time.perf_counter() - start)
+    last_mtime = os.stat(path).st_mtime_ns
+
+    try:
+        while True:
+            time.sleep(args.interval)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            if mtime == last_mtime:
+                continue
+            last_mtime = mtime
+
+            result = document.set_source(read_source(path))
+            if result is not None:
+                report(path, document, result, result.elapsed)
+    except KeyboardInterrupt:
+        return 0
+
+
+def add_parse_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("program")
+    parser.add_argument("--trace", action="store_true", help="dump the tokenizer/parser trace")
+
+
+def add_load_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="processes parsing the program's files, at most one per available CPU")
+    parser.add_argument("--timings", action="store_true", help="print per-file parse times and load phases")
+
+
+def add_check_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("program")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the parse cache")
+    add_load_arguments(parser)
+
+
+def add_run_arguments(parser: argparse.ArgumentParser):
+    from siml.agents import PROVIDERS
+    from siml.export import COMPRESSORS, FORMATS
+    from siml.runtime import ENGINES
+
+    parser.add_argument("program")
+    parser.add_argument("--ticks", type=int, default=None, help="ticks to run (default: config.max_ticks)")
+    parser.add_argument("--engine", choices=list(ENGINES), default="compiled")
+    parser.add_argument("--seed", type=int, default=None, help="random seed (default: config.seed)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes sharing each large vectorized loop (vectorized engine only)")
+    parser.add_argument("--provider", choices=list(PROVIDERS), default=None,
+                        help="run agents with this provider (default: only count prompts)")
+    parser.add_argument("--concurrency", type=int, default=8, help="agent requests in flight at once")
+    parser.add_argument("--rate-limit", type=float, default=None, help="agent requests per second")
+    parser.add_argument("--agent-cache", default=None, metavar="DIR",
+                        help="also keep agent decisions on disk in DIR, reused across runs")
+    parser.add_argument("--no-agent-cache", action="store_true", help="ask the provider for every decision")
+    parser.add_argument("--export", default=None, metavar="PREFIX",
+                        help="stream tick and agent events to PREFIX-00000.jsonl, PREFIX-00001.jsonl, ...")
+    parser.add_argument("--export-format", choices=list(FORMATS), default="jsonl")
+    parser.add_argument("--export-compression", choices=list(COMPRESSORS), default=None)
+    parser.add_argument("--export-max-mb", type=float, default=64, help="start a new export file after this many MB")
+    parser.add_argument("--resume", default=None, metavar="SNAPSHOT", help="continue from a snapshot saved by --save-snapshot")
+    parser.add_argument("--save-snapshot", default=None, metavar="PATH", help="save the final state as a snapshot")
+    parser.add_argument("--no-skip-unchanged", action="store_true",
+                        help="run every `on tick` rule every tick, even when nothing it reads or writes changed")
+    parser.add_argument("--no-indexes", action="store_true", help="scan every loop instead of using secondary indexes")
+    parser.add_argument("--no-optimize", action="store_true",
+                        help="run rules as written, without folding constant state or hoisting loop invariants")
+    parser.add_argument("--state", action="store_true", help="print the final state as JSON")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the parse cache")
+    add_load_arguments(parser)
+    parser.add_argument("--trace", action="store_true", help="dump the runtime trace")
+
+
+def add_synthesize_arguments(parser: argparse.ArgumentParser):
+    from siml.synthesis import DEFAULT_CHUNK_SIZE
+
+    parser.add_argument("program")
+    parser.add_argument("template")
+    parser.add_argument("count", type=int)
+    parser.add_argument("--module", default=None, help="module defining the template (default: the first one)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed (default: config.seed)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="records generated per batch")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes generating batches in parallel, at most one per available CPU")
+    parser.add_argument("-o", "--output", default=None, help="output file (default: stdout)")
+
+
+def add_sweep_arguments(parser: argparse.ArgumentParser):
+    from siml.agents import PROVIDERS
+    from siml.runtime import ENGINES
+
+    parser.add_argument("program")
+    parser.add_argument("--seeds", default=None, help="seeds to run, e.g. 0-99 or 1,5,9 (default: 0 to --runs - 1)")
+    parser.add_argument("--runs", type=int, default=8, help="number of seeds when --seeds is not given")
+    parser.add_argument("--vary", type=parse_variation, action="append", metavar="OPTION=V1,V2",
+                        help="also run every value of a provider option (e.g. idle_rate=0.1,0.5); repeatable")
+    parser.add_argument("--ticks", type=int, default=None, help="ticks per run (default: config.max_ticks)")
+    parser.add_argument("--engine", choices=list(ENGINES), default="compiled")
+    parser.add_argument("--provider", choices=list(PROVIDERS), default=None)
+    parser.add_argument("--concurrency", type=int, default=8, help="agent requests in flight at once, per run")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes, at most one per available CPU (default: one per CPU)")
+    parser.add_argument("--batch", type=int, default=1, help="runs sent to a worker at a time")
+    parser.add_argument("--state", action="store_true", help="include each run's final state")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the parse cache")
+    parser.add_argument("-o", "--output", default=None, help="output file (default: stdout)")
+
+
+def add_explain_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("program")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the parse cache")
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    from siml.agents import PROVIDERS
+    from siml.profiler import SORT_KEYS
+    from siml.runtime import ENGINES
+
+    parser.add_argument("program")
+    parser.add_argument("--ticks", type=int, default=None, help="ticks to run (default: config.max_ticks)")
+    parser.add_argument("--engine", choices=list(ENGINES), default="compiled")
+    parser.add_argument("--seed", type=int, default=None, help="random seed (default: config.seed)")
+    parser.add_argument("--provider", choices=list(PROVIDERS), default=None,
+                        help="run agents with this provider (default: only count prompts)")
+    parser.add_argument("--allocations", action="store_true",
+                        help="also trace allocations (much slower; compare times from a run without it)")
+    parser.add_argument("--collapsed", default=None, metavar="PATH",
+                        help="write own time per call stack in the collapsed format flame graph tools read")
+    parser.add_argument("--sort", choices=SORT_KEYS, default="own", help="column to sort by (default: own)")
+    parser.add_argument("--limit", type=int, default=None, help="only print this many entries")
+    parser.add_argument("--no-skip-unchanged", action="store_true", help="run every `on tick` rule every tick")
+    parser.add_argument("--no-indexes", action="store_true", help="scan every loop instead of using secondary indexes")
+    parser.add_argument("--no-optimize", action="store_true", help="run rules as written, without the AST optimizer")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the parse cache")
+    parser.add_argument("--trace", action="store_true", help="dump the runtime trace")
+
+
+def add_watch_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("program")
+    parser.add_argument("--interval", type=float, default=0.1, help="seconds between file checks")
+
+
+# Command -> (help, function adding its arguments, handler)
+COMMANDS = {
+    "parse": ("parse a program and print its AST", add_parse_arguments, parse_command),
+    "check": ("load a program and its modules and report errors, without running it", add_check_arguments, check_command),
+    "run": ("run a simulation", add_run_arguments, run_command),
+    "synthesize": ("stream records generated from a template as JSON lines", add_synthesize_arguments, synthesize_command),
+    "sweep": ("run a program with many seeds in parallel, one JSON line per run", add_sweep_arguments, sweep_command),
+    "explain": ("show which rules can be skipped and which loops use indexes", add_explain_arguments, explain_command),
+    "profile": ("run a simulation and report where its time goes, per rule and action", add_profile_arguments, profile_command),
+    "watch": ("re-validate a program every time it is saved", add_watch_arguments, watch_command),
+}
+
+
+def build_arg_parser(command: str | None = None) -> argparse.ArgumentParser:
+    """
+    The `siml` argument parser. Given the command being run, only that command's arguments are
+    added: their choices come from the modules that implement them (engines from siml.runtime,
+    providers from siml.agents, ...), which `siml --version` or `siml check` never need to import.
+    """
+    arg_parser = argparse.ArgumentParser(prog="siml", description="SIML simulation tools")
+    arg_parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    for name, (summary, add_arguments, handler) in COMMANDS.items():
+        parser = commands.add_parser(name, help=summary)
+        if command is None or command == name:
+            add_arguments(parser)
+        parser.set_defaults(handler=handler)
+    return arg_parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    if argv is None:
+        argv = sys.argv[1:]
+    args = build_arg_parser(argv[0] if argv else "").parse_args(argv)
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
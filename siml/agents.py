@@ -0,0 +1,448 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Callable, Optional
+
+from siml.ast_nodes import AgentNode, IdentifierNode
+from siml.cache import ModuleCache, content_key
+from siml.compiler import Compiler, Scope
+from siml.interpreter import Interpreter, SimulationError
+from siml.tracer import Tracer, Level
+
+
+# State variable an action sets to reward the agent that chose it; exported with the decision
+AGENT_REWARD = "agent_reward"
+NO_REWARD = object()
+
+
+@dataclass(slots=True)
+class AgentPrompt:
+    """
+    One agent decision to be made this tick.
+    - sequence: issue order within the tick; decisions are applied in this order
+    - context: the agent's `context:` block evaluated for this prompt, as plain JSON values
+    - llm: the agent's `llm:` block (provider, model, ...)
+    - args / kwargs: what a chosen action is called with unless the decision supplies its own
+    """
+    sequence: int
+    agent: str
+    module: str
+    tick: int
+    context: dict
+    can_call: list[str]
+    llm: dict = field(default_factory=dict)
+    args: list = field(default_factory=list)
+    kwargs: dict = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class AgentDecision:
+    """
+    A provider's answer to one prompt: the action to call (None for no action) and,
+    optionally, explicit keyword arguments for it.
+    """
+    action: Optional[str] = None
+    kwargs: Optional[dict] = None
+
+
+def plain(value: Any) -> Any:
+    """
+    Convert state values (dicts, row views, columnar tables) into plain JSON-compatible values.
+    """
+    if isinstance(value, Mapping):
+        return {key: plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [plain(item) for item in value]
+    if hasattr(value, "to_records"):
+        return value.to_records()
+    return value
+
+
+def context_key(agent: str, context: dict) -> str:
+    return agent + "\0" + json.dumps(context, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class StubProvider:
+    """
+    Local, deterministic stand-in for an LLM provider, for offline tests and benchmarks.
+    Each decision is a pure function of (seed, agent, context): a hash picks one of the
+    prompt's `can_call` actions or, with probability `idle_rate`, no action.
+    - latency: simulated seconds per request, so scheduling and batching can be measured
+    - max_batch_size: prompts the "model" accepts per request
+    """
+
+    def __init__(self, max_batch_size: int = 16, latency: float = 0.0, idle_rate: float = 0.25, seed: int = 0):
+        self.max_batch_size = max_batch_size
+        self.latency = latency
+        self.idle_rate = idle_rate
+        self.seed = seed
+        self.identity = f"stub:{seed}:{idle_rate}" # everything a decision depends on besides the prompt
+        self.requests = 0
+
+    def decide(self, prompt: AgentPrompt) -> AgentDecision:
+        digest = hashlib.blake2b(context_key(prompt.agent, prompt.context).encode("utf-8"), digest_size=8,
+                                 key=self.seed.to_bytes(8, "little")).digest()
+        roll = int.from_bytes(digest, "little")
+        if not prompt.can_call or (roll % 10_000) / 10_000 < self.idle_rate:
+            return AgentDecision()
+        return AgentDecision(prompt.can_call[(roll >> 16) % len(prompt.can_call)])
+
+    async def complete(self, prompts: list[AgentPrompt]) -> list[AgentDecision]:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self.decide(prompt) for prompt in prompts]
+
+
+# llm.provider -> provider class; providers that need network access are not bundled
+PROVIDERS: dict[str, Callable[..., Any]] = {
+    "stub": StubProvider,
+}
+
+
+class RateLimiter:
+    """
+    Spaces provider requests at most `rate` per second (with up to `burst` sent back to back).
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.interval = 1.0 / rate
+        self.burst = max(1, burst)
+        self.next_time = 0.0
+
+    async def acquire(self):
+        now = time.monotonic()
+        # Allow a backlog of `burst` requests' worth of credit, never more
+        self.next_time = max(self.next_time, now - self.interval * (self.burst - 1))
+        wait = self.next_time - now
+        self.next_time += self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class DecisionCache:
+    """
+    Memoizes agent decisions by a stable hash of the provider, the agent's `llm:` block, the
+    evaluated `context:` and the `can_call` set, so an unchanged prompt is never sent twice.
+    - An in-memory LRU tier holds up to `max_entries` decisions.
+    - With `path`, decisions are also kept in an on-disk ModuleCache there and reused across runs.
+    - bypass=True makes the scheduler skip the cache entirely and ask the provider for every
+      prompt (for evaluation runs).
+    """
+
+    def __init__(self, max_entries: int = 4096, path: str | os.PathLike | None = None, bypass: bool = False):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, AgentDecision] = OrderedDict()
+        self.disk = ModuleCache(path) if path is not None else None
+        self.bypass = bypass
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def key(self, namespace: str, prompt: AgentPrompt) -> str:
+        return content_key(
+            namespace,
+            json.dumps(prompt.llm, sort_keys=True, separators=(",", ":"), default=str),
+            context_key(prompt.agent, prompt.context),
+            "\0".join(sorted(set(prompt.can_call))),
+        )
+
+    def get(self, key: str) -> AgentDecision | None:
+        decision = self.entries.get(key)
+        if decision is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return decision
+        if self.disk is not None:
+            decision = self.disk.get("decision", key)
+            if isinstance(decision, AgentDecision):
+                self.remember(key, decision)
+                self.hits += 1
+                self.disk_hits += 1
+                return decision
+        self.misses += 1
+        return None
+
+    def put(self, key: str, decision: AgentDecision):
+        self.remember(key, decision)
+        if self.disk is not None:
+            self.disk.put("decision", key, decision)
+
+    def remember(self, key: str, decision: AgentDecision):
+        self.entries[key] = decision
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+class AgentScheduler:
+    """
+    Fans one tick's prompts out to a provider with asyncio.
+    - Prompts for the same agent are batched up to the provider's `max_batch_size`.
+    - At most `concurrency` requests are in flight; `rate_limit` caps requests per second.
+    - With a DecisionCache, cached prompts are answered without a request and identical
+      prompts within a tick are sent once.
+    Decisions come back in prompt order whatever order the requests finish in.
+    """
+
+    def __init__(self, provider, concurrency: int = 8, rate_limit: float | None = None,
+                 cache: DecisionCache | None = None):
+        if concurrency <= 0:
+            raise ValueError("concurrency must be positive")
+        self.provider = provider
+        self.namespace = getattr(provider, "identity", None) or type(provider).__qualname__
+        self.cache = cache
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(rate_limit, burst=concurrency) if rate_limit else None
+        self.loop = asyncio.new_event_loop()
+        self.requests = 0
+        self.prompts = 0
+        self.wait_time = 0.0
+
+    def batches(self, prompts: list[AgentPrompt]) -> list[list[AgentPrompt]]:
+        size = max(1, getattr(self.provider, "max_batch_size", 1))
+        by_agent: dict[str, list[AgentPrompt]] = {}
+        for prompt in prompts:
+            by_agent.setdefault(prompt.agent, []).append(prompt)
+        return [group[start:start + size] for group in by_agent.values() for start in range(0, len(group), size)]
+
+    async def gather(self, prompts: list[AgentPrompt]) -> list[AgentDecision]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        decisions: list[AgentDecision | None] = [None] * len(prompts)
+        position = {prompt.sequence: index for index, prompt in enumerate(prompts)}
+
+        async def request(batch: list[AgentPrompt]):
+            async with semaphore:
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire()
+                results = await self.provider.complete(batch)
+            if len(results) != len(batch):
+                raise SimulationError(f"Provider returned {len(results)} decision(s) for {len(batch)} prompt(s)")
+            for prompt, decision in zip(batch, results):
+                decisions[position[prompt.sequence]] = decision
+
+        batches = self.batches(prompts)
+        await asyncio.gather(*(request(batch) for batch in batches))
+        self.requests += len(batches)
+        return decisions
+
+    def decide(self, prompts: list[AgentPrompt]) -> list[AgentDecision]:
+        if not prompts:
+            return []
+        start = time.perf_counter()
+        cache = self.cache
+        if cache is None or cache.bypass:
+            decisions = self.loop.run_until_complete(self.gather(prompts))
+        else:
+            decisions = self.cached(cache, prompts)
+        self.wait_time += time.perf_counter() - start
+        self.prompts += len(prompts)
+        return decisions
+
+    def cached(self, cache: DecisionCache, prompts: list[AgentPrompt]) -> list[AgentDecision]:
+        decisions: list[AgentDecision | None] = [None] * len(prompts)
+        keys = [cache.key(self.namespace, prompt) for prompt in prompts]
+        pending: dict[str, AgentPrompt] = {}
+        for index, key in enumerate(keys):
+            if key in pending:
+                continue
+            decision = cache.get(key)
+            if decision is None:
+                pending[key] = prompts[index]
+            else:
+                decisions[index] = decision
+
+        if pending:
+            answers = dict(zip(pending, self.loop.run_until_complete(self.gather(list(pending.values())))))
+            for key, decision in answers.items():
+                cache.put(key, decision)
+            for index, key in enumerate(keys):
+                if decisions[index] is None:
+                    decisions[index] = answers[key]
+        return decisions
+
+    def close(self):
+        self.loop.close()
+
+
+class AgentRunner:
+    """
+    Turns a tick's agent activity into prompts, has the scheduler decide them and applies the results.
+    - Every `prompt agent:` request becomes a prompt. Its first argument is bound to the agent's
+      `for each` variable (named arguments by name) when the `context:` block is evaluated.
+    - Agents that no rule prompts explicitly are prompted once per record of their `for each`
+      collection, in every module whose state has it.
+    - Chosen actions must be in the agent's `can_call` list and are applied after all decisions are in,
+      in prompt order, so the outcome never depends on request timing. Anything else is counted in
+      `rejected` and traced.
+    - When the simulation exports events, each decision is recorded with the `agent_reward` its
+      action assigned (if any).
+    - When the simulation is profiled, each prompt counts as a call of its agent's entry, which also
+      gets the time spent evaluating its context and applying its action; the provider's time is
+      the `agents decide` entry.
+    """
+
+    def __init__(self, simulation, scheduler: AgentScheduler):
+        self.simulation = simulation
+        self.scheduler = scheduler
+        self.tracer = Tracer("Agents")
+        self.decisions = 0
+        self.applied = 0
+        self.rejected = 0
+
+        prompted = set()
+        for module in simulation.modules:
+            prompted |= module.prompted_agents
+        self.automatic = [agent for agent in simulation.agents.values() if agent.iterable and agent.name not in prompted]
+
+        # agent -> evaluated `llm:` block
+        self.llm_configs = {
+            agent.name: Interpreter(None).evaluate(agent.llm_config, {}, {}) if agent.llm_config is not None else {}
+            for agent in simulation.agents.values()
+        }
+
+        # (agent, module) -> compiled context and collection readers
+        self.contexts: dict[tuple[str, str], Callable] = {}
+        self.collections: dict[tuple[str, str], Callable] = {}
+
+    def context(self, agent: AgentNode, module) -> Callable:
+        key = (agent.name, module.name)
+        code = self.contexts.get(key)
+        if code is None:
+            names = [agent.iterator_var] if agent.iterator_var else []
+            scope = Scope(names)
+            if agent.context is not None:
+                context = Compiler(module).expression(agent.context, scope)
+            else:
+                variable = agent.iterator_var
+                context = (lambda frame: {variable: frame[1]}) if variable else (lambda frame: {})
+            code = self.contexts[key] = context
+        return code
+
+    def collection(self, agent: AgentNode, module) -> Callable | None:
+        key = (agent.name, module.name)
+        if key not in self.collections:
+            root = agent.iterable.split(".", 1)[0]
+            node = IdentifierNode(line=agent.line, indent=agent.indent, name=agent.iterable)
+            self.collections[key] = Compiler(module).expression(node, Scope()) if root in module.state_names else None
+        return self.collections[key]
+
+    def prompts(self, requests: list, automatic: bool = True) -> list[tuple[AgentPrompt, Any, int | None]]:
+        """
+        (prompt, module, index) for every prompt this phase; `index` is the record's position in
+        the agent's `for each` collection for automatic prompts and None otherwise.
+        """
+        simulation = self.simulation
+        profiler = simulation.profiler
+        prompts = []
+
+        def add(agent: AgentNode, module, subject: Any, args: list, kwargs: dict, index: int | None = None):
+            frame = [module.state, subject] if agent.iterator_var else [module.state]
+            if profiler is not None:
+                context = profiler.call(profiler.entry("agent", agent.name, agent.line),
+                                        lambda: plain(self.context(agent, module)(frame)))
+            else:
+                context = plain(self.context(agent, module)(frame))
+            prompt = AgentPrompt(len(prompts), agent.name, module.name, simulation.tick, context, list(agent.can_call),
+                                 self.llm_configs[agent.name], args, kwargs)
+            prompts.append((prompt, module, index))
+
+        for request in requests:
+            agent = simulation.agents[request.agent]
+            module = simulation.module(request.module)
+            subject = request.args[0] if request.args else request.kwargs.get(agent.iterator_var)
+            add(agent, module, subject, request.args, request.kwargs)
+
+        for agent in self.automatic if automatic else ():
+            for module in simulation.modules:
+                collection = self.collection(agent, module)
+                if collection is None:
+                    continue
+                for index, record in enumerate(collection([module.state]) or ()):
+                    add(agent, module, record, [record], {}, index)
+        return prompts
+
+    def run(self, requests: list, automatic: bool = True):
+        prompts = self.prompts(requests, automatic)
+        if not prompts:
+            return
+        profiler = self.simulation.profiler
+        if profiler is not None:
+            decisions = profiler.call(profiler.entry("agents", "decide"), self.scheduler.decide,
+                                      [prompt for prompt, _, _ in prompts])
+        else:
+            decisions = self.scheduler.decide([prompt for prompt, _, _ in prompts])
+        self.decisions += len(decisions)
+
+        tracing = self.tracer.is_enabled_for(Level.WARN)
+        events = self.simulation.events if self.simulation.exporter is not None else None
+        for (prompt, module, index), decision in zip(prompts, decisions):
+            action = decision.action if decision is not None else None
+            applied, reward = False, NO_REWARD
+            if action is None:
+                pass
+            elif action not in prompt.can_call or action not in module.action_nodes:
+                self.rejected += 1
+                if tracing:
+                    self.tracer.warn("Agent '%s' chose '%s', which it cannot call in module '%s'",
+                                     prompt.agent, action, module.name)
+            else:
+                reward = self.apply(prompt, module, index, decision, events is not None)
+                applied = True
+                self.applied += 1
+            if events is not None:
+                # A tuple laid out as export.LAYOUTS["prompt"]; the writer thread builds the record
+                event = ("prompt", prompt.tick, prompt.module, prompt.agent, prompt.context, action, applied)
+                events.append(event if reward is NO_REWARD else (*event, reward))
+
+    def apply(self, prompt: AgentPrompt, module, index: int | None, decision, rewarded: bool) -> Any:
+        """
+        Run the chosen action; with `rewarded`, return the `agent_reward` it assigned (NO_REWARD if none).
+        """
+        action = decision.action
+        args, kwargs = ([], decision.kwargs) if decision.kwargs is not None else (prompt.args, prompt.kwargs)
+        call_action = module.call_action
+        profiler = self.simulation.profiler
+        if profiler is not None:
+            entry = profiler.entry("agent", prompt.agent, self.simulation.agents[prompt.agent].line)
+            call_action = partial(profiler.call, entry, module.call_action, count=False)
+        if index is not None and module.cow is not None:
+            # The record may still be shared with a snapshot; the action must get its own copy
+            cow = module.cow
+            items = cow.path(module.state, self.simulation.agents[prompt.agent].iterable.split("."))
+            args = [cow.item(items, index)] if type(items) is list else args
+        if not rewarded or AGENT_REWARD not in module.state_names:
+            call_action(action, args, kwargs)
+            return NO_REWARD
+
+        # Only a value assigned by this action counts as its reward
+        state = module.state
+        previous = state.pop(AGENT_REWARD, NO_REWARD)
+        call_action(action, args, kwargs)
+        if AGENT_REWARD in state:
+            return state[AGENT_REWARD]
+        if previous is not NO_REWARD:
+            state[AGENT_REWARD] = previous
+        return NO_REWARD
+
+
+def create_provider(name: str, **options):
+    factory = PROVIDERS.get(name)
+    if factory is None:
+        raise SimulationError(f"Unknown agent provider '{name}' (available: {', '.join(PROVIDERS)})")
+    return factory(**options)
@@ -1,16 +1,37 @@
+import marshal
+from array import array
 from dataclasses import dataclass, field
 from typing import Optional, Any, List, Union, Sequence
 
-@dataclass
+@dataclass(slots=True)
 class DictEntry:
     key: str
     value: "ASTNode" # Use forward reference
 
-@dataclass
+@dataclass(slots=True)
 class ASTNode:
     line: int 
     indent: int 
-    meta: Optional[dict] = field(default_factory=dict, init=False)
+    _meta: Optional[dict] = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def meta(self) -> dict:
+        # Allocated on first use; most nodes never carry annotations
+        if self._meta is None:
+            self._meta = {}
+        return self._meta
+
+    @meta.setter
+    def meta(self, value: Optional[dict]):
+        self._meta = value
+
+    def get_meta(self, key: str, default: Any = None) -> Any:
+        """
+        Read an annotation without allocating the meta dict.
+        """
+        if self._meta is None:
+            return default
+        return self._meta.get(key, default)
 
     def __repr__(self):
         return f"{self.__class__.__name__}(line={self.line}, indent={self.indent})"
@@ -23,7 +44,7 @@ class ASTNode:
 
     
 # Primitive Nodes
-@dataclass
+@dataclass(slots=True)
 class StringNode(ASTNode):
     value: str = ""
 
@@ -31,7 +52,7 @@ class StringNode(ASTNode):
         return f'StringNode("{self.value}")'
 
 
-@dataclass
+@dataclass(slots=True)
 class NumberNode(ASTNode):
     value: Union[int, float] = 0
 
@@ -39,27 +60,54 @@ class NumberNode(ASTNode):
      return f"NumberNode({self.value})"
 
 
-@dataclass
+@dataclass(slots=True)
 class BooleanNode(ASTNode):
     value: bool = False
 
-@dataclass
+@dataclass(slots=True)
 class DictLiteralNode(ASTNode):
     entries: List[DictEntry] = field(default_factory=list)
 
     def get_children(self):
         return [entry.value for entry in self.entries]
 
-@dataclass
+@dataclass(slots=True)
 class ListLiteralNode(ASTNode):
     elements: List[ASTNode] = field(default_factory=list)
     
     def get_children(self):
         return self.elements
 
+@dataclass(slots=True)
+class DataNode(ASTNode):
+    """
+    An indented `state:` block read straight into Python values (see Parser.parse_state_value).
+    - data: the marshalled lists, records and scalars; `load()` builds a fresh copy
+    - rows: line of each top-level list item or record key, as an offset from `line`
+    - holes: (path, expression) for values that are not literals, left as null in `data`
+    """
+    data: bytes = b""
+    rows: array = field(default_factory=lambda: array("I"))
+    holes: List[tuple] = field(default_factory=list)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(rows={len(self.rows)}, line={self.line})"
+
+    def load(self) -> Any:
+        return marshal.loads(self.data)
+
+    def row_line(self, index: int) -> int:
+        return self.line + self.rows[index]
+
+    def summary(self):
+        return f"DataNode({len(self.rows)} rows, {len(self.holes)} expressions)"
+
+    def get_children(self):
+        return [node for _, node in self.holes]
+
 
 # Conditional
-@dataclass
+@dataclass(slots=True)
 class IfNode(ASTNode):
     condition: ASTNode
     then_body: List[ASTNode] = field(default_factory=list)
@@ -69,7 +117,7 @@ class IfNode(ASTNode):
         return [self.condition] + self.then_body + self.else_body
 
 # Looping constructs
-@dataclass
+@dataclass(slots=True)
 class ForNode(ASTNode):
     var: str
     iterable: ASTNode
@@ -79,7 +127,7 @@ class ForNode(ASTNode):
         return [self.iterable] + self.body
 
 
-@dataclass
+@dataclass(slots=True)
 class NotNode(ASTNode):
     operand: ASTNode    
 
@@ -88,7 +136,7 @@ class NotNode(ASTNode):
  
 
 # Simulation root 
-@dataclass
+@dataclass(slots=True)
 class SimulationNode(ASTNode):
     config: Optional[DictLiteralNode] = None
     agents: List["AgentNode"] = field(default_factory=list)
@@ -102,18 +150,23 @@ class SimulationNode(ASTNode):
         return children + self.agents + self.modules
 
 # Module definition
-@dataclass
+@dataclass(slots=True)
 class ModuleNode(ASTNode):
     name: str
     state: List["StateVarNode"]
     actions: List["ActionNode"] = field(default_factory=list)
     rules: List["RuleNode"] = field(default_factory=list)
     templates: List["TemplateNode"] = field(default_factory=list)
+    imports: List[str] = field(default_factory=list) # from `import:`
+    path: Optional[str] = None # set for `- ./modules/x.siml` references until they are loaded
+
+    def summary(self):
+        return f"ModuleNode({self.name})"
 
     def get_children(self):
         return self.state + self.actions + self.rules + self.templates
 
-@dataclass
+@dataclass(slots=True)
 class StateVarNode(ASTNode):
     name: str
     value: ASTNode # can be StringNode, NumberNode, DictLiteraNode, etc.
@@ -128,24 +181,30 @@ class StateVarNode(ASTNode):
     def get_children(self):
         return [self.value]
 
-@dataclass 
+@dataclass(slots=True)
 class ActionNode(ASTNode):
     name:str 
     params: list[str] = field(default_factory=list)
     body: List[ASTNode] = field(default_factory=list)
 
+    def summary(self):
+        return f"ActionNode({self.name})"
+
     def get_children(self):
         return self.body
 
-@dataclass
+@dataclass(slots=True)
 class RuleNode(ASTNode):
     trigger: str
     body: List[ASTNode] = field(default_factory=list) # e.g CallNode
 
+    def summary(self):
+        return f"RuleNode({self.trigger})"
+
     def get_children(self):
         return self.body
 
-@dataclass 
+@dataclass(slots=True)
 class GenerateNode(ASTNode):
     template: str
     multiplier: Optional[ASTNode] = None # e.g NumberNode
@@ -153,7 +212,7 @@ class GenerateNode(ASTNode):
     def get_children(self):
         return [self.multiplier] if self.multiplier else []
 
-@dataclass
+@dataclass(slots=True)
 class AssignmentNode(ASTNode):
     target: str
     value: ASTNode
@@ -168,12 +227,12 @@ class AssignmentNode(ASTNode):
     def get_children(self):
         return [self.value]
 
-@dataclass
+@dataclass(slots=True)
 class CallArg:
     name: Optional[str]
     value: ASTNode 
 
-@dataclass
+@dataclass(slots=True)
 class CallNode(ASTNode):
     function: str
     args: List[CallArg] = field(default_factory=list)
@@ -186,7 +245,7 @@ class CallNode(ASTNode):
         return [arg.value for arg in self.args]
 
 
-@dataclass
+@dataclass(slots=True)
 class BinaryExprNode(ASTNode):
     left: ASTNode
     operator: str
@@ -195,14 +254,14 @@ class BinaryExprNode(ASTNode):
     def get_children(self):
         return [self.left, self.right]
 
-@dataclass
+@dataclass(slots=True)
 class NullNode(ASTNode):
     def __repr__(self):
         return f"NullNode()"
 
 
 
-@dataclass
+@dataclass(slots=True)
 class IdentifierNode(ASTNode):
     name: str 
 
@@ -213,7 +272,7 @@ class IdentifierNode(ASTNode):
         return f"IdentifierNode({self.name})"
 
 
-@dataclass
+@dataclass(slots=True)
 class AgentNode(ASTNode):
     name: str                      # from `agent: ...`
     iterator_var: Optional[str]    # from `for each: var in iterable`
@@ -233,10 +292,47 @@ class AgentNode(ASTNode):
     def summary(self):
         return f"AgentNode({self.name})"
 
-@dataclass
+@dataclass(slots=True)
 class TemplateNode(ASTNode):
     name: str
     scema: ASTNode # e.g DictLiteralNode  or similar
 
+    def summary(self):
+        return f"TemplateNode({self.name})"
+
     def get_children(self):
-        return [self.scema]
\ No newline at end of file
+        return [self.scema]
+
+
+class LeafPool:
+    """
+    Flyweight pool for immutable leaf nodes.
+    NullNode, BooleanNode and small integer NumberNode values are shared
+    instances positioned at line 0; the parser uses it when built with
+    `shared_leaves=True`. Shared leaves must never be mutated (including meta).
+    """
+
+    def __init__(self, small_int_min: int = -16, small_int_max: int = 256):
+        self.small_int_min = small_int_min
+        self.small_int_max = small_int_max
+        self.null_node = NullNode(line=0, indent=0)
+        self.boolean_nodes = {
+            True: BooleanNode(line=0, indent=0, value=True),
+            False: BooleanNode(line=0, indent=0, value=False),
+        }
+        self.number_nodes: dict[int, NumberNode] = {}
+
+    def null(self, line: int, indent: int) -> NullNode:
+        return self.null_node
+
+    def boolean(self, value: bool, line: int, indent: int) -> BooleanNode:
+        return self.boolean_nodes[value]
+
+    def number(self, value: Union[int, float], line: int, indent: int) -> NumberNode:
+        if type(value) is not int or not self.small_int_min <= value <= self.small_int_max:
+            return NumberNode(line=line, indent=indent, value=value)
+
+        node = self.number_nodes.get(value)
+        if node is None:
+            node = self.number_nodes[value] = NumberNode(line=0, indent=0, value=value)
+        return node
@@ -0,0 +1,144 @@
+import hashlib
+import os
+import pickle
+from typing import Any
+
+from siml import __version__
+from siml.tracer import Tracer
+
+CACHE_DIR_NAME = "__simlcache__"
+CACHE_FORMAT = 2 # bump when the layout of cached entries changes
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def content_key(*parts: bytes | str) -> str:
+    """
+    Stable hex digest over the tool version, the cache format and `parts`.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"siml-{__version__}-{CACHE_FORMAT}".encode())
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode()
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class ModuleCache:
+    """
+    Content-addressed on-disk cache for parsed and linked SIML trees.
+    - Entries live in `root/<key[:2]>/<key>.<kind>` and are pickled with the highest protocol.
+    - Writes are atomic (temp file + rename), so concurrent runs never see partial entries.
+    - Reading an entry refreshes its mtime; when the cache grows past `max_bytes` the
+      least recently used entries are evicted.
+    Corrupt or unreadable entries are treated as misses and removed.
+    """
+
+    def __init__(self, root: str | os.PathLike = CACHE_DIR_NAME, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = os.fspath(root)
+        self.max_bytes = max_bytes
+        self.tracer = Tracer("Cache")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.known_size: int | None = None # scanned lazily, then tracked across puts
+
+    def entry_path(self, kind: str, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.{kind}")
+
+    def get(self, kind: str, key: str) -> Any | None:
+        path = self.entry_path(kind, key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            self.tracer.warn("Dropping unreadable cache entry %s: %s", path, e)
+            self.discard(path)
+            self.misses += 1
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    def put(self, kind: str, key: str, value: Any):
+        """
+        Store `value`; a cache that can't be written (read-only directory, full disk) is skipped.
+        """
+        path = self.entry_path(kind, key)
+        directory = os.path.dirname(path)
+        import tempfile # only needed on a miss, and slow to import next to the rest of a cache hit
+        tmp_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except OSError as e:
+            if tmp_path is not None:
+                self.discard(tmp_path)
+            self.tracer.warn("Not caching %s: %s", path, e)
+            return
+        except BaseException:
+            if tmp_path is not None:
+                self.discard(tmp_path)
+            raise
+
+        if self.known_size is None:
+            self.known_size = self.size()
+        else:
+            self.known_size += os.path.getsize(path) - replaced
+        if self.known_size > self.max_bytes:
+            self.evict()
+
+    def discard(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def entries(self) -> list[os.DirEntry]:
+        if not os.path.isdir(self.root):
+            return []
+        found = []
+        for shard in os.scandir(self.root):
+            if shard.is_dir():
+                found.extend(entry for entry in os.scandir(shard.path) if entry.is_file() and not entry.name.endswith(".tmp"))
+        return found
+
+    def size(self) -> int:
+        return sum(entry.stat().st_size for entry in self.entries())
+
+    def evict(self):
+        entries = [(entry.stat(), entry.path) for entry in self.entries()]
+        total = sum(stat.st_size for stat, _ in entries)
+        self.known_size = total
+        if total <= self.max_bytes:
+            return
+
+        entries.sort(key=lambda item: item[0].st_mtime)
+        for stat, path in entries:
+            if total <= self.max_bytes:
+                break
+            self.discard(path)
+            total -= stat.st_size
+            self.evictions += 1
+            self.tracer.debug("Evicted %s", path)
+        self.known_size = total
+
+    def clear(self):
+        for entry in self.entries():
+            self.discard(entry.path)
+        self.known_size = 0
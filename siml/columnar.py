@@ -0,0 +1,725 @@
+import copy
+from collections.abc import MutableMapping
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for the vectorized engine
+    np = None
+
+from siml.ast_nodes import (
+    ASTNode, StringNode, NumberNode, BooleanNode, NullNode,
+    IdentifierNode, BinaryExprNode, NotNode, CallNode,
+    IfNode, ForNode, AssignmentNode,
+)
+from siml.compiler import Compiler, Scope, STATE_SLOT
+from siml.interpreter import SimulationError, OPERATORS
+from siml.synthesis import SyntheticCollection
+from siml.tracer import Tracer, Level
+
+# Column kinds and the dtype each is stored as; "str" columns hold codes into the table's string pool
+KIND_DTYPES = {
+    "bool": "bool",
+    "int": "int64",
+    "float": "float64",
+    "str": "int32",
+    "object": "object",
+}
+
+# Operators applied elementwise by the vectorized engine. `**` is left to the row-by-row path
+# since int64 powers do not follow Python's rules for negative exponents and overflow.
+VECTOR_OPERATORS = {op: function for op, function in OPERATORS.items() if op != "**"}
+
+ARITHMETIC = ("+", "-", "*", "/", "%")
+INT64_LIMIT = 2**63
+# Beyond this, int64 operands of `/` are rounded to float64 before dividing; Python divides exactly
+EXACT_FLOAT_INT = 2**53
+
+
+def value_kind(value: Any) -> str:
+    # bool before int: bool is a subclass of int
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int" if -2**63 <= value < 2**63 else "object"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, str):
+        return "str"
+    return "object"
+
+
+def merge_kinds(a: str, b: str) -> str:
+    # Even int and float merge to object: a float64 column would read 10 back as 10.0
+    return a if a == b else "object"
+
+
+class Codes:
+    """
+    String column values in flight: int32 codes into a table's shared string pool.
+    Equality against a string or another code array stays on the codes; anything else decodes.
+    """
+    __slots__ = ("codes", "table")
+
+    def __init__(self, codes, table: "ColumnTable"):
+        self.codes = codes
+        self.table = table
+
+    def decode(self):
+        return self.table.pool_array()[self.codes]
+
+
+class ColumnTable:
+    """
+    Columnar storage for a collection of flat, homogeneous records, e.g. `synthesize(invoice_template, N)`.
+    - Each field is one NumPy array; the kind of a field (bool, int, float, str or object) is inferred
+      from the records, which for synthesized collections come straight from the template examples.
+    - Strings are dictionary-encoded into a table-wide pool, so `status == "approved"` compares int32 codes.
+    - A write that does not fit a column's kind replaces the column when it reaches every row, and
+      otherwise widens it to object instead of failing; values read back are exactly the ones written
+      (an int stays an int next to floats).
+    Iterating the table yields ColumnRow views, so code that is not vectorized still sees dict-like records.
+    `fork()` makes a table sharing these arrays; a shared column (or the string pool) is copied by
+    whichever table writes to it first.
+    """
+
+    def __init__(self, length: int):
+        self.length = length
+        self.columns: dict[str, Any] = {}
+        self.kinds: dict[str, str] = {}
+        self.pool: list[str] = []
+        self.pool_index: dict[str, int] = {}
+        self.pool_cache = None
+        # Fields first set by a write that only reached some rows: name -> mask of rows that have the field
+        self.present: dict[str, Any] = {}
+        # Columns (and their present masks) whose arrays another table may also hold
+        self.shared: set[str] = set()
+        self.shared_pool = False
+
+    @classmethod
+    def from_records(cls, records: list) -> "ColumnTable | None":
+        """
+        Build a table from a list of dicts sharing one set of keys, or return None if the list does not qualify.
+        """
+        if np is None or not records or type(records[0]) is not dict:
+            return None
+        fields = list(records[0])
+        field_set = set(fields)
+        for record in records:
+            if type(record) is not dict or record.keys() != field_set:
+                return None
+
+        table = cls(len(records))
+        for name in fields:
+            values = [record[name] for record in records]
+            kind = value_kind(values[0])
+            for value in values:
+                if value_kind(value) != kind:
+                    kind = merge_kinds(kind, value_kind(value))
+                    if kind == "object":
+                        break
+            table.add_column(name, kind, values)
+        return table
+
+    @classmethod
+    def from_synthetic(cls, collection, chunk_size: int) -> "ColumnTable":
+        """
+        Fill a table straight from a SyntheticCollection's generated columns, chunk by chunk,
+        without building record dicts.
+        """
+        table = cls(collection.count)
+        decoders = {}
+        for plan in collection.synthesizer.plans:
+            if plan.kind in ("sequence", "integers"):
+                kind = "int"
+            elif plan.kind == "uniform":
+                kind = "float"
+            else:
+                kind = value_kind(plan.values[0])
+                for value in plan.values:
+                    kind = merge_kinds(kind, value_kind(value))
+                if kind == "str":
+                    decoders[plan.name] = np.array([table.intern(value) for value in plan.values], dtype="int32")
+                elif kind != "object":
+                    decoders[plan.name] = np.array(plan.values, dtype=KIND_DTYPES[kind])
+                else:
+                    decoders[plan.name] = plan
+            table.columns[plan.name] = np.empty(collection.count, dtype=KIND_DTYPES[kind])
+            table.kinds[plan.name] = kind
+
+        for start, columns in collection.column_chunks(chunk_size):
+            for name, values in columns.items():
+                decoder = decoders.get(name)
+                target = table.columns[name][start:start + len(values)]
+                if decoder is None:
+                    target[:] = values
+                elif hasattr(decoder, "dtype"):
+                    target[:] = decoder[values]
+                else:
+                    choices = decoder.values
+                    target[:] = [copy.deepcopy(choices[i]) if decoder.copied else choices[i] for i in values.tolist()]
+        return table
+
+    def fork(self) -> "ColumnTable":
+        table = ColumnTable(self.length)
+        table.columns = dict(self.columns)
+        table.kinds = dict(self.kinds)
+        table.pool = self.pool
+        table.pool_index = self.pool_index
+        table.pool_cache = self.pool_cache
+        table.present = dict(self.present)
+        table.shared = set(self.columns)
+        table.shared_pool = True
+        self.shared = set(self.columns)
+        self.shared_pool = True
+        return table
+
+    def unshare(self, name: str):
+        self.shared.discard(name)
+        self.columns[name] = self.columns[name].copy()
+        if name in self.present:
+            self.present[name] = self.present[name].copy()
+
+    def add_column(self, name: str, kind: str, values: list):
+        if kind == "str":
+            intern = self.intern
+            column = np.fromiter((intern(value) for value in values), dtype="int32", count=len(values))
+        elif kind == "object":
+            column = np.empty(len(values), dtype=object)
+            column[:] = values
+        else:
+            column = np.array(values, dtype=KIND_DTYPES[kind])
+        self.columns[name] = column
+        self.kinds[name] = kind
+
+    def intern(self, value: str) -> int:
+        code = self.pool_index.get(value)
+        if code is None:
+            if self.shared_pool:
+                self.pool = list(self.pool)
+                self.pool_index = dict(self.pool_index)
+                self.shared_pool = False
+            code = self.pool_index[value] = len(self.pool)
+            self.pool.append(value)
+            self.pool_cache = None
+        return code
+
+    def pool_array(self):
+        if self.pool_cache is None:
+            self.pool_cache = np.empty(len(self.pool), dtype=object)
+            self.pool_cache[:] = self.pool
+        return self.pool_cache
+
+    # Record-style access
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self) -> Iterator["ColumnRow"]:
+        for index in range(self.length):
+            yield ColumnRow(self, index)
+
+    def __getitem__(self, index: int) -> "ColumnRow":
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("ColumnTable index out of range")
+        return ColumnRow(self, index)
+
+    def get_value(self, name: str, index: int) -> Any:
+        column = self.columns.get(name)
+        if column is None:
+            return None
+        if self.kinds[name] == "str":
+            return self.pool[column[index]]
+        value = column[index]
+        return value if self.kinds[name] == "object" else value.item()
+
+    def set_value(self, name: str, index: int, value: Any):
+        self.write(name, np.array([index]), value)
+
+    def has_field(self, name: str, index: int) -> bool:
+        present = self.present.get(name)
+        return name in self.columns and (present is None or bool(present[index]))
+
+    def to_records(self) -> list[dict]:
+        columns = {}
+        for name, column in self.columns.items():
+            if self.kinds[name] == "str":
+                columns[name] = [self.pool[code] for code in column.tolist()]
+            else:
+                columns[name] = column.tolist()
+        names = list(columns)
+        records = [dict(zip(names, values)) for values in zip(*columns.values())] if names else [{} for _ in range(self.length)]
+        for name, present in self.present.items():
+            for index in np.flatnonzero(~present).tolist():
+                del records[index][name]
+        return records
+
+    def __eq__(self, other):
+        if isinstance(other, ColumnTable):
+            return self.to_records() == other.to_records()
+        if isinstance(other, list):
+            return self.to_records() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"ColumnTable(rows={self.length}, columns={self.kinds})"
+
+    # Vectorized access; `rows` is None for every row or an index array
+
+    def read(self, name: str, rows) -> Any:
+        column = self.columns.get(name)
+        if column is None:
+            return None
+        data = column if rows is None else column[rows]
+        if self.kinds[name] == "str":
+            return Codes(data, self)
+        return data
+
+    def write(self, name: str, rows, value: Any):
+        if name not in self.columns:
+            if rows is None and not isinstance(value, Codes) and not hasattr(value, "dtype"):
+                self.add_column(name, value_kind(value), [value] * self.length)
+                return
+            self.add_column(name, "object", [None] * self.length)
+            self.present[name] = np.zeros(self.length, dtype=bool)
+        elif name in self.shared:
+            self.unshare(name)
+
+        kind = self.kinds[name]
+        target = slice(None) if rows is None else rows
+        present = self.present.get(name)
+        if present is not None:
+            present[target] = True
+            if present.all():
+                del self.present[name]
+
+        if isinstance(value, Codes):
+            if kind == "str" and value.table is self:
+                self.columns[name][target] = value.codes
+                return
+            value = value.decode()
+
+        if hasattr(value, "dtype"):
+            incoming = {"b": "bool", "i": "int", "u": "int", "f": "float"}.get(value.dtype.kind, "object")
+            if incoming == "object" and kind == "str" and all(type(item) is str for item in value):
+                intern = self.intern
+                self.columns[name][target] = np.fromiter((intern(item) for item in value), dtype="int32", count=len(value))
+                return
+        else:
+            incoming = value_kind(value)
+            if incoming == "str" and kind == "str":
+                self.columns[name][target] = self.intern(value)
+                return
+
+        if incoming != kind and rows is None and incoming in ("bool", "int", "float"):
+            # Every row takes the new value, so the column can take its kind
+            self.columns[name] = np.full(self.length, value, dtype=KIND_DTYPES[incoming]) if np.ndim(value) == 0 \
+                else np.array(value, dtype=KIND_DTYPES[incoming])
+            self.kinds[name] = incoming
+            return
+        widened = merge_kinds(kind, incoming)
+        if widened != kind:
+            self.widen(name, widened)
+        self.columns[name][target] = value
+
+    def widen(self, name: str, kind: str):
+        column = self.columns[name]
+        if self.kinds[name] == "str":
+            column = self.pool_array()[column]
+        self.columns[name] = column.astype(KIND_DTYPES[kind])
+        self.kinds[name] = kind
+
+
+class ColumnRow(MutableMapping):
+    """
+    Dict-like view of one table row, used wherever a loop runs row by row.
+    """
+    __slots__ = ("table", "index")
+
+    def __init__(self, table: ColumnTable, index: int):
+        self.table = table
+        self.index = index
+
+    def get(self, name: str, default: Any = None) -> Any:
+        if not self.table.has_field(name, self.index):
+            return default
+        return self.table.get_value(name, self.index)
+
+    def __getitem__(self, name: str) -> Any:
+        if not self.table.has_field(name, self.index):
+            raise KeyError(name)
+        return self.table.get_value(name, self.index)
+
+    def __setitem__(self, name: str, value: Any):
+        self.table.set_value(name, self.index, value)
+
+    def __delitem__(self, name: str):
+        raise TypeError("fields cannot be removed from a columnar record")
+
+    def __iter__(self):
+        return (name for name in self.table.columns if self.table.has_field(name, self.index))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __eq__(self, other):
+        if isinstance(other, (dict, ColumnRow)):
+            return dict(self) == dict(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class NotVectorizable(Exception):
+    pass
+
+
+# Vector code runs against (table, rows, frame): rows is None for every row or an index array
+VectorCode = Callable[[ColumnTable, Any, list], Any]
+
+
+@dataclass(slots=True)
+class VectorLoop:
+    """
+    A vectorized `for each:` as compiled, with everything its kernel touches besides the table:
+    - fields / writes: the record fields it reads or writes, and the ones it writes
+    - state / slots: module state names and enclosing frame slots it reads as loop invariants
+    """
+    collection: str
+    line: int
+    fields: set[str]
+    writes: set[str]
+    state: set[str]
+    slots: set[int]
+    kernel: VectorCode | None = None
+
+
+def truthy(value: Any):
+    if isinstance(value, Codes):
+        empty = value.table.pool_index.get("")
+        return value.codes != empty if empty is not None else np.ones(len(value.codes), dtype=bool)
+    if np.ndim(value) == 0:
+        return bool(value)
+    return value if value.dtype.kind == "b" else value.astype(bool)
+
+
+def apply_operator(op: str, function: Callable, left: Any, right: Any):
+    if isinstance(left, Codes) or isinstance(right, Codes):
+        if op in ("==", "!=") and isinstance(left, Codes) and isinstance(right, (Codes, str)):
+            table = left.table
+            if isinstance(right, Codes) and right.table is table:
+                return function(left.codes, right.codes)
+            if isinstance(right, str):
+                code = table.pool_index.get(right)
+                if code is None:
+                    return np.full(len(left.codes), op == "!=")
+                return function(left.codes, code)
+        if op in ("==", "!=") and isinstance(right, Codes) and isinstance(left, str):
+            return apply_operator(op, function, right, left)
+        left = left.decode() if isinstance(left, Codes) else left
+        right = right.decode() if isinstance(right, Codes) else right
+
+    if op in ARITHMETIC:
+        left, right = as_number(left), as_number(right)
+    if op in ("/", "%"):
+        zero = right == 0
+        if np.any(zero):
+            raise ZeroDivisionError("division by zero" if op == "/" else "modulo by zero")
+    if op in ARITHMETIC and not fits_int64(op, left, right):
+        # Python ints: exact where int64 would wrap or round
+        left = left.astype(object) if hasattr(left, "dtype") else left
+        right = right.astype(object) if hasattr(right, "dtype") else right
+    result = function(left, right)
+    if hasattr(result, "dtype") and result.dtype.kind == "O" and op in ("==", "!=", "<", "<=", ">", ">="):
+        result = result.astype(bool)
+    return result
+
+
+def as_number(value: Any):
+    # NumPy adds bools as logical or; Python adds them as ints
+    return value.astype("int64") if hasattr(value, "dtype") and value.dtype.kind == "b" else value
+
+
+def magnitude(value: Any) -> int | None:
+    """
+    The largest absolute value of an int operand (array or scalar), or None for anything else.
+    """
+    if hasattr(value, "dtype"):
+        if value.dtype.kind != "i" or not len(value):
+            return None
+        return max(int(value.max()), -int(value.min()))
+    if type(value) is int:
+        return abs(value)
+    return None
+
+
+def fits_int64(op: str, left: Any, right: Any) -> bool:
+    """
+    Whether `left op right` gives Python's result in NumPy: always unless both sides are ints,
+    whose sum, difference or product could leave int64, or whose quotient would be rounded.
+    """
+    a, b = magnitude(left), magnitude(right)
+    if a is None or b is None:
+        return True
+    if op in ("+", "-"):
+        return a + b < INT64_LIMIT
+    if op == "*":
+        return a * b < INT64_LIMIT
+    if op == "/":
+        return max(a, b) <= EXACT_FLOAT_INT
+    return a < INT64_LIMIT and b < INT64_LIMIT
+
+
+class VectorCompiler(Compiler):
+    """
+    Compiled engine with columnar collections.
+    - prepare_state() turns state lists of flat, homogeneous records into ColumnTables, unless some
+      loop over that collection could not be vectorized. Synthesized state is generated straight
+      into the columns.
+    - A `for each:` over such a table whose body only reads and writes the loop record's own fields
+      (plus reads of module state and enclosing locals) runs as masked NumPy operations: `if` splits
+      the active row indices, `set:` scatters into the column. Calls to actions that take just the
+      loop record are inlined when their bodies qualify too.
+    - Any other loop keeps the compiled row-by-row path; it also takes over if the collection is no
+      longer a ColumnTable when the loop runs. The reason a loop was not vectorized is traced at DEBUG.
+    Rows never see each other's writes within one loop, so running statement by statement over all
+    rows gives the same result as running row by row, and so does running disjoint row ranges apart:
+    with `module.workers` (see parallel.WorkerPool) large tables are split across worker processes.
+    """
+
+    def __init__(self, module):
+        if np is None:
+            raise SimulationError("The vectorized engine requires numpy")
+        super().__init__(module)
+        self.tracer = Tracer("Vectorizer")
+        self.inlining: list[str] = []
+        # State collections some loop still walks row by row; these stay lists of dicts,
+        # which the compiled row path handles faster than ColumnRow views
+        self.row_loops: set[str] = set()
+        self.workers = getattr(module, "workers", None)
+        # Every vectorized loop, in compile order; `loop` is the one being compiled
+        self.loops: list[VectorLoop] = []
+        self.loop: VectorLoop | None = None
+
+    def prepare_state(self, state: dict):
+        # Keyed by identity so that state names sharing one list keep sharing one table
+        tables: dict[int, ColumnTable | None] = {}
+        for name, value in state.items():
+            if name in self.row_loops:
+                continue
+            if id(value) not in tables:
+                if type(value) is SyntheticCollection:
+                    tables[id(value)] = ColumnTable.from_synthetic(value, self.module.chunk_size)
+                elif type(value) is list:
+                    tables[id(value)] = ColumnTable.from_records(value)
+                else:
+                    continue
+            if tables[id(value)] is not None:
+                state[name] = tables[id(value)]
+
+    def statement(self, node: ASTNode, scope: Scope):
+        fallback = super().statement(node, scope)
+        if not isinstance(node, ForNode):
+            return fallback
+
+        try:
+            loop = self.vector_loop(node, scope)
+        except NotVectorizable as e:
+            if isinstance(node.iterable, IdentifierNode):
+                self.row_loops.add(node.iterable.name)
+            if self.tracer.is_enabled_for(Level.DEBUG):
+                self.tracer.debug("Loop on line %d runs row by row: %s", node.line, e)
+            return fallback
+
+        collection = node.iterable.name
+        if self.tracer.is_enabled_for(Level.DEBUG):
+            self.tracer.debug("Loop on line %d over '%s' is vectorized", node.line, collection)
+        kernel = loop.kernel
+        if self.workers is not None:
+            kernel = self.workers.split(self.module.name, len(self.loops), loop)
+        self.loops.append(loop)
+
+        profiler = self.profiler
+        if profiler is not None:
+            def run_for_counted(frame):
+                table = frame[STATE_SLOT].get(collection)
+                if type(table) is ColumnTable:
+                    profiler.visits += len(table)
+                    kernel(table, None, frame)
+                else:
+                    fallback(frame)
+            return run_for_counted
+
+        def run_for(frame):
+            table = frame[STATE_SLOT].get(collection)
+            if type(table) is ColumnTable:
+                kernel(table, None, frame)
+            else:
+                fallback(frame)
+        return run_for
+
+    def vector_loop(self, node: ForNode, scope: Scope) -> VectorLoop:
+        iterable = node.iterable
+        if not isinstance(iterable, IdentifierNode) or "." in iterable.name:
+            raise NotVectorizable("the loop is not over a state collection")
+        if iterable.name in scope.slots or iterable.name not in self.module.state_names:
+            raise NotVectorizable(f"'{iterable.name}' is not module state")
+        self.loop = VectorLoop(iterable.name, node.line, set(), set(), set(), set())
+        try:
+            self.loop.kernel = self.vector_block(node.body, {node.var}, scope, iterable.name)
+        finally:
+            loop, self.loop = self.loop, None
+        return loop
+
+    def vector_block(self, body: list[ASTNode], row_names: set[str], scope: Scope, collection: str) -> VectorCode:
+        statements = tuple(self.vector_statement(node, row_names, scope, collection) for node in body)
+
+        def run_block(table, rows, frame):
+            for statement in statements:
+                statement(table, rows, frame)
+        return run_block
+
+    def vector_statement(self, node: ASTNode, row_names: set[str], scope: Scope, collection: str) -> VectorCode:
+        match node:
+            case AssignmentNode():
+                root, *path = node.target.split(".")
+                if root not in row_names or len(path) != 1:
+                    raise NotVectorizable(f"line {node.line} assigns to '{node.target}', not to a field of the loop record")
+                field = path[0]
+                value = self.vector_expression(node.value, row_names, scope, collection)
+                self.loop.fields.add(field)
+                self.loop.writes.add(field)
+                changes = self.changes
+                writes = self.module.dependencies.writes(node) if changes is not None else None
+                if writes:
+                    # Any rows reaching a vectorized write count as a change; old values are not compared
+                    def run_set_tracked(table, rows, frame):
+                        table.write(field, rows, value(table, rows, frame))
+                        if len(table) if rows is None else len(rows):
+                            changes.update(writes)
+                    return run_set_tracked
+
+                def run_set(table, rows, frame):
+                    table.write(field, rows, value(table, rows, frame))
+                return run_set
+
+            case IfNode():
+                condition = self.vector_condition(node.condition, row_names, scope, collection)
+                then_body = self.vector_block(node.then_body, row_names, scope, collection)
+                else_body = self.vector_block(node.else_body, row_names, scope, collection) if node.else_body else None
+
+                def run_if(table, rows, frame):
+                    mask = condition(table, rows, frame)
+                    if np.ndim(mask) == 0:
+                        if mask:
+                            then_body(table, rows, frame)
+                        elif else_body is not None:
+                            else_body(table, rows, frame)
+                        return
+
+                    selected = np.flatnonzero(mask) if rows is None else rows[mask]
+                    if len(selected):
+                        then_body(table, selected, frame)
+                    if else_body is not None:
+                        rest = np.flatnonzero(~mask) if rows is None else rows[~mask]
+                        if len(rest):
+                            else_body(table, rest, frame)
+                return run_if
+
+            case CallNode():
+                action = self.module.action_nodes.get(node.function)
+                if action is None:
+                    raise NotVectorizable(f"line {node.line} calls '{node.function}'")
+                if node.function in self.inlining:
+                    raise NotVectorizable(f"'{node.function}' is recursive")
+                if len(node.args) != len(action.params) or any(
+                        arg.name is not None or not isinstance(arg.value, IdentifierNode) or arg.value.name not in row_names
+                        for arg in node.args):
+                    raise NotVectorizable(f"line {node.line} passes more than the loop record to '{node.function}'")
+
+                # The action body sees its parameters as the loop record and everything else as state
+                self.inlining.append(node.function)
+                try:
+                    return self.vector_block(action.body, set(action.params), Scope(), collection)
+                finally:
+                    self.inlining.pop()
+
+            case _:
+                raise NotVectorizable(f"line {node.line} has a {type(node).__name__} statement")
+
+    def vector_condition(self, node: ASTNode, row_names: set[str], scope: Scope, collection: str) -> VectorCode:
+        """
+        Compile a condition to a boolean mask (or a plain bool when it does not depend on the row).
+        `and`, `or` and `not` are only vectorized here, where just the truth value matters.
+        """
+        match node:
+            case BinaryExprNode(operator="and" | "or"):
+                left = self.vector_condition(node.left, row_names, scope, collection)
+                right = self.vector_condition(node.right, row_names, scope, collection)
+                decided = node.operator == "or"
+
+                def run_logical(table, rows, frame):
+                    # Short-circuits per row: the right side only runs on rows the left side leaves open
+                    mask = left(table, rows, frame)
+                    if np.ndim(mask) == 0:
+                        return bool(mask) if bool(mask) == decided else right(table, rows, frame)
+
+                    open_rows = mask != decided
+                    if not open_rows.any():
+                        return mask
+                    result = np.array(mask, dtype=bool)
+                    result[open_rows] = right(table, np.flatnonzero(open_rows) if rows is None else rows[open_rows], frame)
+                    return result
+                return run_logical
+
+            case NotNode():
+                operand = self.vector_condition(node.operand, row_names, scope, collection)
+                return lambda table, rows, frame: np.logical_not(operand(table, rows, frame))
+
+            case _:
+                value = self.vector_expression(node, row_names, scope, collection)
+                return lambda table, rows, frame: truthy(value(table, rows, frame))
+
+    def vector_expression(self, node: ASTNode, row_names: set[str], scope: Scope, collection: str) -> VectorCode:
+        match node:
+            case NumberNode() | StringNode() | BooleanNode():
+                value = node.value
+                return lambda table, rows, frame: value
+
+            case NullNode():
+                return lambda table, rows, frame: None
+
+            case IdentifierNode():
+                root, *path = node.name.split(".")
+                if root in row_names:
+                    if len(path) != 1:
+                        raise NotVectorizable(f"line {node.line} uses '{node.name}' as a value")
+                    field = path[0]
+                    self.loop.fields.add(field)
+                    return lambda table, rows, frame: table.read(field, rows)
+                if root == collection and root not in scope.slots:
+                    raise NotVectorizable(f"line {node.line} reads the collection being looped over")
+
+                # Loop-invariant: module state and enclosing locals cannot change inside a vectorized loop
+                code = self.path(root, path, scope, node.line)
+                if root in scope.slots:
+                    self.loop.slots.add(scope.slots[root])
+                else:
+                    self.loop.state.add(root)
+                return lambda table, rows, frame: code(frame)
+
+            case BinaryExprNode():
+                function = VECTOR_OPERATORS.get(node.operator)
+                if function is None:
+                    raise NotVectorizable(f"line {node.line} uses '{node.operator}' outside a condition")
+                left = self.vector_expression(node.left, row_names, scope, collection)
+                right = self.vector_expression(node.right, row_names, scope, collection)
+                op = node.operator
+                return lambda table, rows, frame: apply_operator(op, function, left(table, rows, frame), right(table, rows, frame))
+
+            case _:
+                raise NotVectorizable(f"line {node.line} uses a {type(node).__name__}")
@@ -0,0 +1,536 @@
+from collections.abc import Mapping
+from operator import itemgetter
+from typing import Any, Callable
+
+from siml.ast_nodes import (
+    ASTNode, StringNode, NumberNode, BooleanNode, NullNode, DictLiteralNode, ListLiteralNode,
+    IdentifierNode, BinaryExprNode, NotNode, CallNode, GenerateNode,
+    IfNode, ForNode, AssignmentNode, ActionNode, RuleNode,
+)
+from siml.interpreter import SimulationError, OPERATORS, BUILTINS, PROMPT_AGENT, get_field, set_field, bind_arguments, SCALARS
+from siml.indexes import MIN_INDEX_ROWS, LoopPlan
+from siml.snapshot import writes_through
+from siml.tracer import Tracer, Level
+
+# Compiled code runs against a frame: a flat list whose slot 0 holds the module state
+# dict and whose remaining slots hold locals (action parameters and loop variables).
+Frame = list
+Code = Callable[[Frame], Any]
+
+STATE_SLOT = 0
+
+
+class Scope:
+    """
+    Compile-time map from local names to frame slots.
+    Loop variables get a fresh slot for the duration of their loop, so shadowing
+    an outer name never clobbers it.
+    """
+
+    def __init__(self, params: list[str] = ()):
+        self.slots = {name: index for index, name in enumerate(params, start=1)}
+        self.size = len(self.slots) + 1
+        # Copy-on-write loops: loop variable -> slots holding the list it came from and its index
+        self.origins: dict[str, tuple[int, int]] = {}
+
+    def allocate(self) -> int:
+        slot = self.size
+        self.size += 1
+        return slot
+
+    def bind(self, name: str) -> tuple[int, int | None]:
+        previous = self.slots.get(name)
+        slot = self.slots[name] = self.allocate()
+        return slot, previous
+
+    def unbind(self, name: str, previous: int | None):
+        if previous is None:
+            del self.slots[name]
+        else:
+            self.slots[name] = previous
+
+
+def constant(value: Any) -> Code:
+    return lambda frame: value
+
+
+class Compiler:
+    """
+    Lowers rule and action bodies to nested Python closures once, at load time.
+    - Names are resolved at compile time to a frame slot (locals) or a state key, and
+      dotted paths to a fixed chain of field reads.
+    - Operators are bound from BinaryExprNode.operator to their `operator` function,
+      with specialized closures when one side is a literal.
+    - Calls are resolved to an action, an agent prompt or a builtin up front.
+    Unknown names and calls are reported when the module is built instead of mid-run.
+    The result behaves exactly like the Interpreter; only the per-tick dispatch is gone.
+    Once the module shares state with a snapshot (`module.cow`), writes, record loops that may
+    write and action arguments are compiled through its copy-on-write barrier instead.
+    When the module tracks changes (`module.changes`), state assignments compare the old value and
+    report what they changed there; otherwise they compile exactly as before.
+    Loops planned as index scans (`module.loop_plans`, see indexes.plan_loops) visit only the records
+    their `if` can match, looked up in `module.indexes`; assignments to an indexed field keep those
+    indexes current. Copy-on-write modules always scan, since the barrier replaces records.
+    Loop bodies count the records they visit on `module.profiler` only when the module has one.
+    """
+
+    def __init__(self, module):
+        self.module = module
+        self.cow = getattr(module, "cow", None)
+        self.changes = getattr(module, "changes", None)
+        self.indexes = getattr(module, "indexes", None)
+        self.profiler = getattr(module, "profiler", None)
+        self.loop_tracer = Tracer("Indexes")
+
+    def prepare_state(self, state: dict):
+        """
+        Called once the module's state is initialized and its rules compiled, before any rule runs.
+        """
+
+    def rule(self, node: RuleNode) -> Callable[[dict], None]:
+        scope = Scope()
+        body = self.block(node.body, scope)
+        size = scope.size
+
+        if size == 1:
+            def run(state: dict):
+                body([state])
+        else:
+            padding = [None] * (size - 1)
+
+            def run(state: dict):
+                body([state, *padding])
+        return run
+
+    def action(self, node: ActionNode) -> Callable[[dict, list], None]:
+        scope = Scope(node.params)
+        body = self.block(node.body, scope)
+        padding = [None] * (scope.size - 1 - len(node.params))
+
+        def run(state: dict, args: list):
+            body([state, *args, *padding])
+        return run
+
+    # Statements
+
+    def block(self, body: list[ASTNode], scope: Scope) -> Code:
+        statements = tuple(self.statement(node, scope) for node in body)
+        match len(statements):
+            case 0:
+                return lambda frame: None
+            case 1:
+                return statements[0]
+            case 2:
+                first, second = statements
+
+                def run_pair(frame):
+                    first(frame)
+                    second(frame)
+                return run_pair
+            case _:
+                def run_block(frame):
+                    for statement in statements:
+                        statement(frame)
+                return run_block
+
+    def statement(self, node: ASTNode, scope: Scope) -> Code:
+        match node:
+            case AssignmentNode():
+                return self.assignment(node, scope)
+
+            case IfNode():
+                condition = self.expression(node.condition, scope)
+                then_body = self.block(node.then_body, scope)
+                if not node.else_body:
+                    def run_if(frame):
+                        if condition(frame):
+                            then_body(frame)
+                    return run_if
+
+                else_body = self.block(node.else_body, scope)
+
+                def run_if_else(frame):
+                    if condition(frame):
+                        then_body(frame)
+                    else:
+                        else_body(frame)
+                return run_if_else
+
+            case ForNode():
+                if self.cow is not None and isinstance(node.iterable, IdentifierNode) and writes_through(node.body, node.var):
+                    return self.owned_loop(node, scope)
+                plan = self.module.loop_plans.get(id(node)) if self.indexes is not None and self.cow is None else None
+                if plan is not None and plan.kind is not None:
+                    return self.index_loop(node, plan, scope)
+
+                iterable = self.expression(node.iterable, scope)
+                slot, previous = scope.bind(node.var)
+                origin = scope.origins.pop(node.var, None) # an outer loop's variable is shadowed
+                body = self.counted(self.block(node.body, scope))
+                scope.unbind(node.var, previous)
+                if origin is not None:
+                    scope.origins[node.var] = origin
+
+                def run_for(frame):
+                    for item in iterable(frame):
+                        frame[slot] = item
+                        body(frame)
+                return run_for
+
+            case _:
+                return self.expression(node, scope)
+
+    def assignment(self, node: AssignmentNode, scope: Scope) -> Code:
+        value = self.expression(node.value, scope)
+        root, *path = node.target.split(".")
+        changes = self.changes
+        writes = self.module.dependencies.writes(node) if changes is not None else None
+
+        if not path:
+            slot = scope.slots.get(root)
+            if slot is not None and root in scope.origins:
+                items_slot = scope.origins[root][0]
+
+                def set_loop_variable(frame):
+                    frame[slot] = value(frame)
+                    frame[items_slot] = None # no longer the loop's record
+                return set_loop_variable
+            if slot is not None:
+                def set_local(frame):
+                    frame[slot] = value(frame)
+                return set_local
+
+            if writes:
+                def set_state_tracked(frame):
+                    state = frame[STATE_SLOT]
+                    new = value(frame)
+                    if changes >= writes:
+                        state[root] = new
+                        return
+                    old = state.get(root)
+                    state[root] = new
+                    # unchanged(), inlined: this runs for every record a loop writes
+                    if old is not new and (type(old) is not type(new) or type(new) not in SCALARS or old != new):
+                        changes.update(writes)
+                return set_state_tracked
+
+            def set_state(frame):
+                frame[STATE_SLOT][root] = value(frame)
+            return set_state
+
+        if self.cow is not None:
+            container = self.owned(".".join([root, *path[:-1]]), scope, node.line)
+        else:
+            container = self.path(root, path[:-1], scope, node.line)
+        field = path[-1]
+
+        if self.indexes is not None and field in self.indexes.by_field:
+            return self.indexed_assignment(container, field, value, writes)
+
+        if writes:
+            def set_path_tracked(frame):
+                target = container(frame)
+                new = value(frame)
+                if type(target) is dict:
+                    if changes >= writes: # already reported; nothing left to compare
+                        target[field] = new
+                        return
+                    old = target.get(field)
+                    target[field] = new
+                else:
+                    old = target.get(field) if isinstance(target, Mapping) else new
+                    set_field(target, field, new)
+                if old is not new and (type(old) is not type(new) or type(new) not in SCALARS or old != new):
+                    changes.update(writes)
+            return set_path_tracked
+
+        def set_path(frame):
+            target = container(frame)
+            if type(target) is dict:
+                target[field] = value(frame)
+            else:
+                set_field(target, field, value(frame))
+        return set_path
+
+    def indexed_assignment(self, container: Code, field: str, value: Code, writes: frozenset[str] | None) -> Code:
+        """
+        `set: record.field = value` for a field some loop is indexed on: the indexes built on it
+        (if any yet) move the record from its old value to the new one.
+        """
+        indexes = self.indexes.by_field[field]
+        changes = self.changes
+
+        def set_path_indexed(frame):
+            target = container(frame)
+            new = value(frame)
+            if type(target) is dict:
+                old = target.get(field)
+                target[field] = new
+            else:
+                old = target.get(field) if isinstance(target, Mapping) else new
+                set_field(target, field, new)
+            if old is not new and (type(old) is not type(new) or type(new) not in SCALARS or old != new):
+                for index in indexes:
+                    index.update(target, old, new)
+                if writes:
+                    changes.update(writes)
+        return set_path_indexed
+
+    def counted(self, body: Code) -> Code:
+        """
+        A loop body that also counts each record it is run for, when the module is profiled.
+        """
+        profiler = self.profiler
+        if profiler is None:
+            return body
+
+        def run_counted(frame):
+            profiler.visits += 1
+            body(frame)
+        return run_counted
+
+    def index_loop(self, node: ForNode, plan: LoopPlan, scope: Scope) -> Code:
+        """
+        A loop whose body is `if var.field OP value: ...`, run over the records the index says match
+        when the loop starts (in collection order) instead of every record. The `if` still runs for
+        each of them. Falls back to the full loop for short or non-list collections, or whenever
+        the index cannot answer (unhashable or unordered values).
+        """
+        iterable = self.expression(node.iterable, scope)
+        value = self.expression(plan.value, scope)
+        slot, previous = scope.bind(node.var)
+        origin = scope.origins.pop(node.var, None)
+        body = self.counted(self.block(node.body, scope))
+        scope.unbind(node.var, previous)
+        if origin is not None:
+            scope.origins[node.var] = origin
+        select = self.indexes.select
+        collection, field, kind, operator = plan.collection, plan.field, plan.kind, plan.operator
+        if self.loop_tracer.is_enabled_for(Level.DEBUG):
+            self.loop_tracer.debug("Loop on line %d over '%s' uses a %s", node.line, collection, plan.describe())
+
+        def run_for_indexed(frame):
+            items = iterable(frame)
+            selected = None
+            if type(items) is list and len(items) >= MIN_INDEX_ROWS:
+                selected = select(collection, field, kind, items, operator, value(frame))
+            if selected is None:
+                for item in items:
+                    frame[slot] = item
+                    body(frame)
+                return
+            for position in selected:
+                frame[slot] = items[position]
+                body(frame)
+        return run_for_indexed
+
+    # Expressions
+
+    def expression(self, node: ASTNode, scope: Scope) -> Code:
+        match node:
+            case NumberNode() | StringNode() | BooleanNode():
+                return constant(node.value)
+
+            case NullNode():
+                return constant(None)
+
+            case IdentifierNode():
+                root, *path = node.name.split(".")
+                return self.path(root, path, scope, node.line)
+
+            case BinaryExprNode():
+                return self.binary(node, scope)
+
+            case NotNode():
+                operand = self.expression(node.operand, scope)
+                return lambda frame: not operand(frame)
+
+            case ListLiteralNode():
+                elements = tuple(self.expression(element, scope) for element in node.elements)
+                return lambda frame: [element(frame) for element in elements]
+
+            case DictLiteralNode():
+                entries = tuple((entry.key, self.expression(entry.value, scope)) for entry in node.entries)
+                return lambda frame: {key: value(frame) for key, value in entries}
+
+            case GenerateNode():
+                count = self.expression(node.multiplier, scope) if node.multiplier is not None else constant(1)
+                synthesize = self.module.synthesize
+                template, line = node.template, node.line
+                return lambda frame: synthesize(template, count(frame), line)
+
+            case CallNode():
+                return self.call(node, scope)
+
+            case _:
+                raise SimulationError(f"Cannot compile {type(node).__name__}", node.line)
+
+    def path(self, root: str, path: list[str], scope: Scope, line: int) -> Code:
+        """
+        Resolve `root.a.b` to a closure: a slot or state read followed by a fixed chain of field reads.
+        The one- and two-step paths that make up almost every rule get dedicated closures.
+        """
+        slot = scope.slots.get(root)
+        if slot is None and root not in self.module.state_names:
+            raise SimulationError(f"Undefined name '{root}'", line)
+
+        if slot is not None:
+            read_root = itemgetter(slot)
+            if not path:
+                return read_root
+            if len(path) == 1:
+                field = path[0]
+
+                def read_local_field(frame):
+                    value = frame[slot]
+                    if type(value) is dict:
+                        return value.get(field)
+                    return get_field(value, field)
+                return read_local_field
+        else:
+            if not path:
+                return lambda frame: frame[STATE_SLOT].get(root)
+            read_root = lambda frame: frame[STATE_SLOT].get(root)
+
+        fields = tuple(path)
+
+        def read_path(frame):
+            value = read_root(frame)
+            for field in fields:
+                value = get_field(value, field)
+            return value
+        return read_path
+
+    def owned(self, name: str, scope: Scope, line: int) -> Code:
+        """
+        Like `path()`, but every container along the way is made owned by the module's copy-on-write
+        barrier, so what it returns can be written in place.
+        """
+        root, *path = name.split(".")
+        self.path(root, [], scope, line) # resolves (or rejects) the root
+        cow_path = self.cow.path
+        fields = tuple(path)
+        slot = scope.slots.get(root)
+        if slot is None:
+            fields = (root, *fields)
+            return lambda frame: cow_path(frame[STATE_SLOT], fields)
+
+        if root in scope.origins:
+            # A loop record is copied out of its (owned) list the first time it is written
+            items_slot, index_slot = scope.origins[root]
+            owned, item = self.cow.owned, self.cow.item
+
+            def read_local(frame):
+                value = frame[slot]
+                if id(value) not in owned and frame[items_slot] is not None:
+                    value = frame[slot] = item(frame[items_slot], frame[index_slot])
+                return value
+        else:
+            read_local = itemgetter(slot)
+        if not fields:
+            return read_local
+        return lambda frame: cow_path(read_local(frame), fields)
+
+    def owned_loop(self, node: ForNode, scope: Scope) -> Code:
+        """
+        A loop whose body may write into its records, under copy-on-write: the list is made owned
+        up front, each record only when something first writes to it (see `owned()`).
+        """
+        iterable = self.owned(node.iterable.name, scope, node.line)
+        items_slot, index_slot = scope.allocate(), scope.allocate()
+        slot, previous = scope.bind(node.var)
+        previous_origin = scope.origins.get(node.var)
+        scope.origins[node.var] = (items_slot, index_slot)
+        body = self.counted(self.block(node.body, scope))
+        scope.unbind(node.var, previous)
+        if previous_origin is None:
+            del scope.origins[node.var]
+        else:
+            scope.origins[node.var] = previous_origin
+
+        def run_for_owned(frame):
+            items = iterable(frame)
+            if type(items) is not list:
+                frame[items_slot] = None
+                for value in items:
+                    frame[slot] = value
+                    body(frame)
+                return
+            frame[items_slot] = items
+            for index in range(len(items)):
+                frame[index_slot] = index
+                frame[slot] = items[index]
+                body(frame)
+        return run_for_owned
+
+    def argument(self, node: ASTNode, scope: Scope, owned: bool) -> Code:
+        # Actions and agents may write into the records they are given
+        if owned and self.cow is not None and isinstance(node, IdentifierNode):
+            return self.owned(node.name, scope, node.line)
+        return self.expression(node, scope)
+
+    def binary(self, node: BinaryExprNode, scope: Scope) -> Code:
+        left = self.expression(node.left, scope)
+        right = self.expression(node.right, scope)
+
+        if node.operator == "and":
+            return lambda frame: left(frame) and right(frame)
+        if node.operator == "or":
+            return lambda frame: left(frame) or right(frame)
+
+        function = OPERATORS.get(node.operator)
+        if function is None:
+            raise SimulationError(f"Unknown operator '{node.operator}'", node.line)
+
+        # Comparisons against a literal (`invoice.amount < 5000`) are by far the most common shape
+        if isinstance(node.right, (NumberNode, StringNode, BooleanNode, NullNode)):
+            value = getattr(node.right, "value", None)
+            return lambda frame: function(left(frame), value)
+        if isinstance(node.left, (NumberNode, StringNode, BooleanNode, NullNode)):
+            value = getattr(node.left, "value", None)
+            return lambda frame: function(value, right(frame))
+        return lambda frame: function(left(frame), right(frame))
+
+    def call(self, node: CallNode, scope: Scope) -> Code:
+        owned = node.function not in BUILTINS
+        positional = tuple(self.argument(arg.value, scope, owned) for arg in node.args if arg.name is None)
+        named = tuple((arg.name, self.argument(arg.value, scope, owned)) for arg in node.args if arg.name is not None)
+
+        if node.function == PROMPT_AGENT:
+            agent = next(arg.value.value for arg in node.args if arg.name == "agent")
+            self.module.check_agent(agent, node.line)
+            named = tuple(item for item in named if item[0] != "agent")
+            prompt_agent = self.module.prompt_agent
+
+            def run_prompt(frame):
+                return prompt_agent(agent, [arg(frame) for arg in positional], {name: arg(frame) for name, arg in named})
+            return run_prompt
+
+        action = self.module.action_nodes.get(node.function)
+        if action is not None:
+            return self.action_call(node, action, positional, named)
+
+        builtin = BUILTINS.get(node.function)
+        if builtin is not None:
+            if named:
+                return lambda frame: builtin(*[arg(frame) for arg in positional], **{name: arg(frame) for name, arg in named})
+            if len(positional) == 1:
+                arg = positional[0]
+                return lambda frame: builtin(arg(frame))
+            return lambda frame: builtin(*[arg(frame) for arg in positional])
+
+        raise SimulationError(f"Unknown action or function '{node.function}'", node.line)
+
+    def action_call(self, node: CallNode, action: ActionNode, positional: tuple, named: tuple) -> Code:
+        # Validate the call shape now; argument order is fixed from here on
+        names = [None] * len(positional) + [name for name, _ in named]
+        order = bind_arguments(action, list(range(len(positional))), {name: index for index, name in enumerate(names) if name}, node.line)
+        codes = list(positional) + [code for _, code in named]
+        slots = tuple(codes[index] if index is not None else constant(None) for index in order)
+        runners = self.module.runners
+        name = node.function
+
+        if len(slots) == 1:
+            arg = slots[0]
+            return lambda frame: runners[name](frame[STATE_SLOT], [arg(frame)])
+        return lambda frame: runners[name](frame[STATE_SLOT], [arg(frame) for arg in slots])
@@ -0,0 +1,247 @@
+from dataclasses import dataclass, field
+
+from siml.ast_nodes import (
+    ASTNode, ModuleNode, RuleNode, ActionNode, StringNode, NumberNode, BooleanNode, IdentifierNode,
+    BinaryExprNode, NotNode, ListLiteralNode, DictLiteralNode, DataNode, CallNode, GenerateNode, IfNode, ForNode,
+    AssignmentNode,
+)
+from siml.interpreter import BUILTINS
+
+# Operators whose result can hold (or be) one of their operands: list concatenation and
+# repetition, and `and` / `or`, which return an operand. The rest always produce a new scalar.
+ALIASING_OPERATORS = {"+", "*", "and", "or"}
+
+
+def scalar(node: ASTNode) -> bool:
+    """
+    Whether an expression always evaluates to a new number, string or bool (or fails): literals,
+    comparisons and arithmetic, and `+` with a scalar on either side (`tick + 1`).
+    """
+    match node:
+        case NumberNode() | StringNode() | BooleanNode() | NotNode():
+            return True
+        case BinaryExprNode() if node.operator not in ALIASING_OPERATORS:
+            return True
+        case BinaryExprNode(operator="+"):
+            return scalar(node.left) or scalar(node.right)
+        case BinaryExprNode(operator="*"):
+            return scalar(node.left) and scalar(node.right)
+    return False
+
+
+@dataclass(slots=True)
+class Effects:
+    """
+    What running a rule or action may touch, as module state names.
+    - reads: state read through any IdentifierNode, including the collections loop records and
+      action arguments came from
+    - writes: state changed by its AssignmentNodes (or by the actions it calls)
+    - pure: False when running it does more than read and write module state (agent prompts,
+      synthesize()), so it has to run even when its inputs are unchanged
+    """
+    reads: set[str] = field(default_factory=set)
+    writes: set[str] = field(default_factory=set)
+    pure: bool = True
+
+    @property
+    def inputs(self) -> tuple[str, ...]:
+        return tuple(sorted(self.reads | self.writes))
+
+
+class DependencyAnalysis:
+    """
+    Static read and write sets for one module's rules and actions.
+    - A local (loop variable, action parameter) stands for the state it may belong to: a loop
+      record for its collection, a parameter for whatever any call site passes it. Actions agents
+      can call may be given records from anywhere in the module.
+    - Values stored into state (`set: best = customer`) make the two names aliases; a write to one
+      counts as a write to both.
+    - Writes are resolved per AssignmentNode (`writes()`), which is what the engines report as
+      changed when an assignment actually changes a value.
+    Rule and action nodes can be shared between modules by `import:`, so results are keyed by node
+    here instead of stored in their meta.
+    """
+
+    def __init__(self, node: ModuleNode, state_names: set[str], agent_actions: set[str] = frozenset()):
+        self.state_names = state_names
+        self.action_nodes: dict[str, ActionNode] = {action.name: action for action in node.actions}
+        # action -> parameter -> state its argument may belong to
+        self.params: dict[str, dict[str, set[str]]] = {
+            action.name: {param: set() for param in action.params} for action in self.action_nodes.values()
+        }
+        for name in agent_actions:
+            for roots in self.params.get(name, {}).values():
+                roots |= state_names
+        self.aliases: dict[str, set[str]] = {}
+        for var in node.state:
+            self.alias(var.name, self.value_roots(var.value, {}))
+
+        self.actions: dict[str, Effects] = {name: Effects() for name in self.action_nodes}
+        self.rules: dict[int, Effects] = {}
+        self.assignments: dict[int, frozenset[str]] = {}
+        # Action effects and parameter sources feed each other; iterate until neither grows
+        self.changed = True
+        while self.changed:
+            self.changed = False
+            for action in self.action_nodes.values():
+                effects = self.body(action.body, {param: set(roots) for param, roots in self.params[action.name].items()})
+                if effects != self.actions[action.name]:
+                    self.actions[action.name] = effects
+                    self.changed = True
+            for rule in node.rules:
+                self.rules[id(rule)] = self.body(rule.body, {})
+
+        for effects in [*self.actions.values(), *self.rules.values()]:
+            effects.writes = set(self.expand(effects.writes))
+        self.assignments = {key: self.expand(roots) for key, roots in self.assignments.items()}
+
+    def rule(self, node: RuleNode) -> Effects:
+        return self.rules[id(node)]
+
+    def action(self, node: ActionNode) -> Effects:
+        return self.actions[node.name]
+
+    def writes(self, node: AssignmentNode) -> frozenset[str]:
+        """
+        The state names an assignment changes (empty for rebinding a local).
+        """
+        return self.assignments.get(id(node), frozenset())
+
+    # Aliases
+
+    def alias(self, name: str, roots: set[str]):
+        group = self.aliases.setdefault(name, {name})
+        for root in roots:
+            other = self.aliases.get(root, {root})
+            if other is group:
+                continue
+            group |= other
+            for member in other:
+                self.aliases[member] = group
+            self.changed = True
+
+    def expand(self, names: set[str] | frozenset[str]) -> frozenset[str]:
+        expanded = set()
+        for name in names:
+            expanded |= self.aliases.get(name, {name})
+        return frozenset(expanded)
+
+    # Bodies
+
+    def body(self, body: list[ASTNode], scope: dict[str, set[str]]) -> Effects:
+        effects = Effects()
+        self.block(body, scope, effects)
+        return effects
+
+    def block(self, body: list[ASTNode], scope: dict[str, set[str]], effects: Effects):
+        for node in body:
+            self.statement(node, scope, effects)
+
+    def statement(self, node: ASTNode, scope: dict[str, set[str]], effects: Effects):
+        match node:
+            case AssignmentNode():
+                self.expression(node.value, scope, effects)
+                root, *path = node.target.split(".")
+                value_roots = self.value_roots(node.value, scope)
+                if not path and root in scope:
+                    scope[root] |= value_roots # rebinding a local
+                    self.assignments[id(node)] = frozenset()
+                    return
+                roots = self.roots(root, scope)
+                if path:
+                    effects.reads |= roots
+                for name in roots:
+                    self.alias(name, value_roots)
+                self.assignments[id(node)] = frozenset(roots)
+                effects.writes |= roots
+
+            case IfNode():
+                self.expression(node.condition, scope, effects)
+                self.block(node.then_body, scope, effects)
+                self.block(node.else_body, scope, effects)
+
+            case ForNode():
+                self.expression(node.iterable, scope, effects)
+                missing = object()
+                shadowed = scope.get(node.var, missing)
+                scope[node.var] = set(self.value_roots(node.iterable, scope))
+                # Again while the body rebinds locals, so earlier statements see it on the next iteration
+                while True:
+                    sizes = {name: len(roots) for name, roots in scope.items()}
+                    self.block(node.body, scope, effects)
+                    if all(len(scope[name]) == size for name, size in sizes.items()):
+                        break
+                if shadowed is missing:
+                    del scope[node.var]
+                else:
+                    scope[node.var] = shadowed
+
+            case _:
+                self.expression(node, scope, effects)
+
+    def expression(self, node: ASTNode, scope: dict[str, set[str]], effects: Effects):
+        pending = [node]
+        while pending:
+            node = pending.pop()
+            match node:
+                case IdentifierNode():
+                    effects.reads |= self.roots(node.name, scope)
+                case GenerateNode():
+                    effects.pure = False
+                case CallNode():
+                    self.call(node, scope, effects)
+            pending.extend(node.get_children())
+
+    def call(self, node: CallNode, scope: dict[str, set[str]], effects: Effects):
+        if node.function in BUILTINS:
+            return
+        action = self.action_nodes.get(node.function)
+        if action is None:
+            # Agent prompts and anything unresolved
+            effects.pure = False
+            return
+
+        params = self.params[action.name]
+        positional = [arg for arg in node.args if arg.name is None]
+        bound = [(name, arg) for name, arg in zip(action.params, positional)]
+        bound += [(arg.name, arg) for arg in node.args if arg.name is not None]
+        for name, arg in bound:
+            if name not in params:
+                continue
+            roots = self.value_roots(arg.value, scope)
+            if not roots <= params[name]:
+                params[name] |= roots
+                self.changed = True
+
+        called = self.actions[action.name]
+        effects.reads |= called.reads
+        effects.writes |= called.writes
+        effects.pure = effects.pure and called.pure
+
+    # Names
+
+    def roots(self, name: str, scope: dict[str, set[str]]) -> set[str]:
+        root = name.split(".", 1)[0]
+        return scope[root] if root in scope else {root}
+
+    def value_roots(self, node: ASTNode, scope: dict[str, set[str]]) -> set[str]:
+        """
+        The state a value may be (part of): what an identifier names, and whatever a builtin, an
+        operator or a literal could hand back or hold.
+        """
+        match node:
+            case IdentifierNode():
+                return set(self.roots(node.name, scope))
+            case _ if scalar(node):
+                return set()
+            case BinaryExprNode() | ListLiteralNode() | DictLiteralNode() | DataNode():
+                roots = set()
+                for child in node.get_children():
+                    roots |= self.value_roots(child, scope)
+                return roots
+            case CallNode() if node.function in BUILTINS:
+                roots = set()
+                for arg in node.args:
+                    roots |= self.value_roots(arg.value, scope)
+                return roots
+        return set()
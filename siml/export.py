@@ -0,0 +1,255 @@
+import bz2
+import functools
+import gzip
+import json
+import lzma
+import math
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable
+
+try:
+    import numpy as np
+except ImportError:  # only needed for the columnar format
+    np = None
+
+from siml.interpreter import SimulationError
+from siml.tracer import Tracer
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_QUEUE_SIZE = 64 # batches (usually ticks) waiting for the writer
+ROW_GROUP = 1 << 16     # columnar rows buffered before a part is written
+WRITE_SLICE = 256       # events serialized between yields to the simulation thread
+
+# One encoder for every event; json.dumps() with options builds a new one per call
+encode = json.JSONEncoder(separators=(",", ":"), default=str).encode
+
+# --export-compression -> opener for JSONL parts (columnar parts use zip deflate)
+COMPRESSORS: dict[str, tuple[Callable[..., Any], str]] = {
+    "gzip": (functools.partial(gzip.open, compresslevel=6), ".gz"),
+    "bz2": (bz2.open, ".bz2"),
+    "xz": (lzma.open, ".xz"),
+}
+
+# The simulation thread hands events over as tuples, the event name first, which the writer thread
+# turns into records with these keys; a shorter tuple leaves the trailing keys out (e.g. no reward)
+LAYOUTS: dict[str, tuple[str, ...]] = {
+    "tick": ("event", "tick", "prompts", "elapsed_ms"),
+    "prompt": ("event", "tick", "module", "agent", "context", "action", "applied", "reward"),
+}
+
+# Columnar schema: every event is flattened onto these columns, missing values filled in
+COLUMNS: dict[str, str] = {
+    "event": "str",
+    "tick": "int",
+    "module": "str",
+    "agent": "str",
+    "action": "str",
+    "applied": "bool",
+    "reward": "float",
+    "context": "json",
+    "elapsed_ms": "float",
+    "prompts": "int",
+}
+
+
+class JsonlSink:
+    """
+    Writes events as JSON lines to `prefix-00000.jsonl[.gz]`, starting a new part once one holds
+    `max_bytes` of (uncompressed) text.
+    """
+
+    def __init__(self, prefix: str, max_bytes: int, compression: str | None):
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.opener, self.suffix = COMPRESSORS[compression] if compression else (open, "")
+        self.paths: list[str] = []
+        self.file = None
+        self.size = 0
+        self.bytes = 0
+
+    def open_part(self):
+        path = f"{self.prefix}-{len(self.paths):05d}.jsonl{self.suffix}"
+        self.file = self.opener(path, "wt", encoding="utf-8")
+        self.paths.append(path)
+        self.size = 0
+
+    def write(self, events: list[dict]):
+        if self.file is None:
+            self.open_part()
+        text = "\n".join(map(encode, events)) + "\n"
+        self.file.write(text)
+        self.size += len(text)
+        self.bytes += len(text)
+        if self.size >= self.max_bytes:
+            self.file.close()
+            self.file = None
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class ColumnarSink:
+    """
+    Writes events as NumPy `.npz` parts (`prefix-00000.npz`), one array per COLUMNS entry.
+    Rows are buffered until a row group is full or its estimated size reaches `max_bytes`,
+    so each part is bounded and memory never holds more than one part's rows.
+    """
+
+    def __init__(self, prefix: str, max_bytes: int, compression: str | None):
+        if np is None:
+            raise SimulationError("columnar export requires numpy")
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.save = np.savez_compressed if compression else np.savez
+        self.paths: list[str] = []
+        self.rows: dict[str, list] = {name: [] for name in COLUMNS}
+        self.count = 0
+        self.size = 0
+        self.bytes = 0
+
+    def write(self, events: list[dict]):
+        # Split so no part grows past a row group
+        while events:
+            room = ROW_GROUP - self.count
+            self.append(events[:room])
+            events = events[room:]
+
+    def append(self, events: list[dict]):
+        if not events:
+            return
+        rows = self.rows
+        for name, kind in COLUMNS.items():
+            values = [event.get(name) for event in events]
+            match kind:
+                case "str":
+                    values = ["" if value is None else str(value) for value in values]
+                    self.size += sum(map(len, values))
+                case "int":
+                    values = [-1 if value is None else int(value) for value in values]
+                case "bool":
+                    values = [bool(value) for value in values]
+                case "float":
+                    values = [float(value) if isinstance(value, (int, float)) else math.nan for value in values]
+                case _:
+                    values = ["" if value is None else encode(value) for value in values]
+                    self.size += sum(map(len, values))
+            rows[name].extend(values)
+        self.count += len(events)
+        self.size += 32 * len(events)
+        if self.count >= ROW_GROUP or self.size >= self.max_bytes:
+            self.flush()
+
+    def flush(self):
+        if not self.count:
+            return
+        path = f"{self.prefix}-{len(self.paths):05d}.npz"
+        arrays = {}
+        for name, kind in COLUMNS.items():
+            values = self.rows[name]
+            match kind:
+                case "int":
+                    arrays[name] = np.array(values, dtype="int64")
+                case "bool":
+                    arrays[name] = np.array(values, dtype="bool")
+                case "float":
+                    arrays[name] = np.array(values, dtype="float64")
+                case _:
+                    arrays[name] = np.array(values, dtype="str")
+        self.save(path, **arrays)
+        self.paths.append(path)
+        self.bytes += os.path.getsize(path)
+        self.rows = {name: [] for name in COLUMNS}
+        self.count = 0
+        self.size = 0
+
+    def close(self):
+        self.flush()
+
+
+# --export-format -> sink class
+FORMATS = {
+    "jsonl": JsonlSink,
+    "columnar": ColumnarSink,
+}
+
+
+class TraceExporter:
+    """
+    Streams run events (ticks, agent prompts and choices, `agent_reward` values) to disk as they happen.
+    - `emit()` hands a batch of events (usually one tick's) to a background writer thread through a
+      bounded queue, so memory use does not grow with run length; when the writer falls
+      `queue_size` batches behind, `emit()` waits for it.
+    - Events are tuples laid out as in LAYOUTS (or ready-made dicts). Building the records,
+      serialization, compression and rotation all happen on the writer thread.
+    - An error on the writer thread is re-raised by the next `emit()` or `close()`.
+    """
+
+    def __init__(self, prefix: str, format: str = "jsonl", compression: str | None = None,
+                 max_bytes: int = DEFAULT_MAX_BYTES, queue_size: int = DEFAULT_QUEUE_SIZE):
+        if format not in FORMATS:
+            raise SimulationError(f"Unknown export format '{format}' (expected one of: {', '.join(FORMATS)})")
+        if compression is not None and compression not in COMPRESSORS:
+            raise SimulationError(f"Unknown export compression '{compression}' (expected one of: {', '.join(COMPRESSORS)})")
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+
+        directory = os.path.dirname(prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.sink = FORMATS[format](prefix, max_bytes, compression)
+        self.tracer = Tracer("Export")
+        self.events = 0
+        self.error: BaseException | None = None
+        self.queue: queue.Queue[list | None] = queue.Queue(maxsize=queue_size)
+        self.thread = threading.Thread(target=self.write_loop, name="siml-export", daemon=True)
+        self.thread.start()
+
+    @property
+    def paths(self) -> list[str]:
+        return self.sink.paths
+
+    @property
+    def bytes(self) -> int:
+        return self.sink.bytes
+
+    def write_loop(self):
+        while True:
+            events = self.queue.get()
+            if events is None:
+                break
+            if self.error is not None:
+                continue # keep draining so emit() never blocks on a dead writer
+            try:
+                for start in range(0, len(events), WRITE_SLICE):
+                    self.sink.write([event if type(event) is dict else dict(zip(LAYOUTS[event[0]], event))
+                                     for event in events[start:start + WRITE_SLICE]])
+                    time.sleep(0) # hand the GIL back so the simulation thread is not kept waiting
+            except BaseException as e:
+                self.error = e
+        try:
+            self.sink.close()
+        except BaseException as e:
+            self.error = self.error or e
+
+    def check(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise SimulationError(f"Export failed: {error}") from error
+
+    def emit(self, events: list):
+        self.check()
+        if events:
+            self.events += len(events)
+            self.queue.put(events)
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+            self.tracer.info("Exported %d event(s) to %d file(s)", self.events, len(self.paths))
+        self.check()
@@ -0,0 +1,211 @@
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from siml.tracer import Tracer
+from siml.tokenizer import Tokenizer
+from siml.parser import Parser, ParseError
+from siml.ast_nodes import ASTNode, SimulationNode
+
+
+@dataclass
+class Span:
+    """
+    Source extent of a re-parseable list item (module, agent, action, rule or template).
+    """
+    start: int
+    end: int
+    kind: str
+    container: list
+    index: int
+
+    @property
+    def node(self) -> ASTNode:
+        return self.container[self.index]
+
+
+@dataclass
+class UpdateResult:
+    incremental: bool
+    kind: str | None
+    lines_lexed: int
+    elapsed: float
+
+
+def changed_range(old_lines: list[str], new_lines: list[str]) -> tuple[int, int, int] | None:
+    """
+    Diff two versions of a document by common prefix and suffix.
+    Returns (start, old_end, new_end) as 1-based inclusive line numbers, or None if nothing changed.
+    A pure insertion has old_end == start - 1.
+    """
+    if old_lines == new_lines:
+        return None
+    limit = min(len(old_lines), len(new_lines))
+    prefix = 0
+    while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+        suffix += 1
+    return prefix + 1, len(old_lines) - suffix, len(new_lines) - suffix
+
+
+def shift_lines(root: ASTNode, after: int, delta: int):
+    """
+    Move every node below `root` that starts after line `after` by `delta` lines, and every end line
+    from `after` on: the items enclosing the edited one may end on its last line.
+    """
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.line > after:
+            node.line += delta
+        end_line = node.get_meta("end_line")
+        if end_line is not None and end_line >= after:
+            node.meta["end_line"] = end_line + delta
+        stack.extend(node.get_children())
+
+
+class IncrementalDocument:
+    """
+    A parsed document that can be updated in place after an edit.
+    The tokenizer checkpoints its indent stack at every list item, and the parser records
+    where each module, agent, action, rule and template ends. An edit that stays inside one
+    of those items re-lexes and re-parses just that item from its checkpoint and splices the
+    new subtree in; anything else falls back to a full parse.
+    """
+
+    def __init__(self, source: str, module_name: str = "main"):
+        self.module_name = module_name
+        self.tracer = Tracer("Incremental")
+        self.lines: list[str] = source.splitlines()
+        self.tree: SimulationNode | None = None
+        self.errors: list[ParseError] = []
+        self.checkpoints: dict[int, tuple[int, ...]] = {}
+        self.spans: list[Span] = []
+        self.full_parse()
+
+    def full_parse(self):
+        tokenizer = Tokenizer.from_lines(self.lines)
+        tokenizer.checkpoints = {}
+        parser = Parser(tokenizer, module_name=self.module_name)
+        self.tree = parser.parse()
+        self.errors = parser.errors
+        self.checkpoints = tokenizer.checkpoints
+        self.index_spans()
+
+    def index_spans(self):
+        spans = []
+
+        def add(kind: str, container: list):
+            for index, node in enumerate(container):
+                end = node.get_meta("end_line")
+                if end is not None:
+                    spans.append(Span(node.line, end, kind, container, index))
+
+        add("module", self.tree.modules)
+        add("agent", self.tree.agents)
+        for module in self.tree.modules:
+            add("action", module.actions)
+            add("rule", module.rules)
+            add("template", module.templates)
+        self.spans = spans
+
+    def find_span(self, start: int, end: int) -> Span | None:
+        """
+        Innermost item span containing old lines [start, end].
+        """
+        best = None
+        for span in self.spans:
+            if span.start <= start and end <= span.end:
+                if best is None or span.end - span.start < best.end - best.start:
+                    best = span
+        return best
+
+    def set_source(self, source: str) -> UpdateResult | None:
+        new_lines = source.splitlines()
+        changed = changed_range(self.lines, new_lines)
+        if changed is None:
+            return None
+        start, old_end, new_end = changed
+        return self.update(start, old_end, new_lines[start - 1:new_end])
+
+    def update(self, start: int, end: int, new_lines: list[str]) -> UpdateResult:
+        """
+        Replace old lines [start, end] (1-based, inclusive) with new_lines.
+        """
+        began = time.perf_counter()
+        delta = len(new_lines) - (end - start + 1)
+        # A pure insertion (end < start) must land strictly inside an item
+        span = self.find_span(start, end) if end >= start else self.find_span(start - 1, start)
+        if span is not None:
+            first = self.lines[span.start - 1]
+            span_indent = len(first) - len(first.lstrip())
+        self.lines[start - 1:end] = new_lines
+
+        if span is not None and self.reparse_span(span, span_indent, delta):
+            elapsed = time.perf_counter() - began
+            self.tracer.info("Re-parsed %s at lines %d-%d in %.2f ms", span.kind, span.start, span.end + delta, elapsed * 1000)
+            return UpdateResult(True, span.kind, span.end + delta - span.start + 1, elapsed)
+
+        self.full_parse()
+        elapsed = time.perf_counter() - began
+        self.tracer.info("Full re-parse in %.2f ms", elapsed * 1000)
+        return UpdateResult(False, None, len(self.lines), elapsed)
+
+    def reparse_span(self, span: Span, indent: int, delta: int) -> bool:
+        checkpoint = self.checkpoints.get(span.start)
+        new_end = span.end + delta
+        if checkpoint is None or new_end < span.start:
+            return False
+
+        segment = self.lines[span.start - 1:new_end]
+        first = segment[0]
+        stripped = first.lstrip()
+        if not stripped.startswith("-") or len(first) - len(stripped) != indent:
+            return False
+
+        tokenizer = Tokenizer.from_lines(segment, first_line=span.start, indent_stack=checkpoint)
+        tokenizer.checkpoints = {}
+        parser = Parser(tokenizer, module_name=self.module_name)
+        parse_item: Callable[[], ASTNode] = {
+            "module": parser.parse_module_item,
+            "agent": parser.parse_agent,
+            "action": parser.parse_action,
+            "rule": parser.parse_rule,
+            "template": parser.parse_template,
+        }[span.kind]
+
+        try:
+            node = parse_item()
+        except ParseError:
+            return False
+        if parser.tok is not None or node.get_meta("end_line") != new_end:
+            # The edit changed where the item ends; let a full parse sort out the structure
+            return False
+
+        if delta:
+            shift_lines(self.tree, span.end, delta)
+        span.container[span.index] = node
+
+        errors = []
+        for error in self.errors:
+            if error.line < span.start:
+                errors.append(error)
+            elif error.line > span.end:
+                errors.append(ParseError(error.message, error.line + delta))
+        errors.extend(parser.errors)
+        self.errors = errors
+        self.errors.sort(key=lambda e: e.line)
+
+        checkpoints = {}
+        for line, stack in self.checkpoints.items():
+            if line < span.start:
+                checkpoints[line] = stack
+            elif line > span.end:
+                checkpoints[line + delta] = stack
+        checkpoints.update(tokenizer.checkpoints)
+        self.checkpoints = checkpoints
+
+        self.index_spans()
+        return True
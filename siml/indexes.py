@@ -0,0 +1,344 @@
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass
+from operator import itemgetter
+from typing import Any, Optional
+
+from siml.ast_nodes import (
+    ASTNode, ModuleNode, StringNode, NumberNode, BooleanNode, NullNode, IdentifierNode, BinaryExprNode,
+    CallNode, IfNode, ForNode, AssignmentNode,
+)
+from siml.dependencies import DependencyAnalysis
+
+# Predicate operator -> index kind answering it
+INDEX_KINDS = {
+    "==": "hash",
+    "<": "sorted",
+    "<=": "sorted",
+    ">": "sorted",
+    ">=": "sorted",
+}
+
+# `value < record.field` is `record.field > value`
+MIRRORED = {"==": "==", "<": ">", "<=": ">=", ">": "<", ">=": "<="}
+
+MIN_INDEX_ROWS = 64 # smaller collections are always scanned
+MAX_REBUILDS = 3    # indexes rebuilt this many times in a row without a second query are given up on
+MAX_SELECTIVITY = 0.25 # a lookup matching more of the collection than this scans instead
+
+first = itemgetter(0)
+
+
+@dataclass(slots=True)
+class LoopPlan:
+    """
+    How a `for each:` loop is run. With an index `kind` ("hash" or "sorted"), only records whose
+    `field` satisfies `operator value` are visited; `reason` says why a loop is scanned otherwise.
+    """
+    line: int
+    var: str
+    collection: str
+    kind: Optional[str] = None
+    field: Optional[str] = None
+    operator: Optional[str] = None
+    value: Optional[ASTNode] = None
+    reason: str = ""
+
+    def describe(self) -> str:
+        if self.kind is None:
+            return f"scan ({self.reason})"
+        return f"{self.kind} index on {self.var}.{self.field} ({self.operator})"
+
+
+def plan_loops(node: ModuleNode, analysis: DependencyAnalysis) -> dict[int, LoopPlan]:
+    """
+    Plan every loop over a collection in a module's rules and actions, keyed by id(ForNode).
+    A loop becomes an index scan when:
+    - its body is a single `if` without `else`, whose condition is (or starts with an `and` of)
+      `var.field OP value`, OP one of ==, <, <=, >, >= and value a literal or a path into state or
+      an enclosing local;
+    - nothing the loop runs (its body and every action it calls) can change that predicate for a
+      record it has not visited yet: `field` is only assigned through `var` itself (or an action
+      parameter it is passed as), and nothing the value is read from is assigned.
+    Visiting the records that match when the loop starts, in collection order, then runs the body
+    exactly as often as the full scan would.
+    """
+    plans: dict[int, LoopPlan] = {}
+    for action in analysis.action_nodes.values():
+        scope = {param: set(roots) for param, roots in analysis.params[action.name].items()}
+        plan_block(action.body, scope, analysis, plans)
+    for rule in node.rules:
+        plan_block(rule.body, {}, analysis, plans)
+    return plans
+
+
+def plan_block(body: list[ASTNode], scope: dict[str, set[str]], analysis: DependencyAnalysis, plans: dict[int, LoopPlan]):
+    for statement in body:
+        match statement:
+            case IfNode():
+                plan_block(statement.then_body, scope, analysis, plans)
+                plan_block(statement.else_body, scope, analysis, plans)
+            case ForNode():
+                if isinstance(statement.iterable, IdentifierNode):
+                    plans[id(statement)] = plan_loop(statement, scope, analysis)
+                missing = object()
+                shadowed = scope.get(statement.var, missing)
+                scope[statement.var] = analysis.value_roots(statement.iterable, scope)
+                plan_block(statement.body, scope, analysis, plans)
+                if shadowed is missing:
+                    del scope[statement.var]
+                else:
+                    scope[statement.var] = shadowed
+
+
+def plan_loop(node: ForNode, scope: dict[str, set[str]], analysis: DependencyAnalysis) -> LoopPlan:
+    plan = LoopPlan(node.line, node.var, node.iterable.name)
+    if len(node.body) != 1 or not isinstance(node.body[0], IfNode):
+        plan.reason = "body is not a single `if`"
+        return plan
+    branch = node.body[0]
+    if branch.else_body:
+        plan.reason = "the `if` has an `else`"
+        return plan
+
+    condition = branch.condition
+    while isinstance(condition, BinaryExprNode) and condition.operator == "and":
+        condition = condition.left
+    predicate = record_predicate(condition, node.var)
+    if predicate is None:
+        plan.reason = f"condition does not compare a field of '{node.var}' with a literal or a path"
+        return plan
+    field, operator, value = predicate
+
+    reason = predicate_changes(node, field, value, scope, analysis)
+    if reason:
+        plan.reason = reason
+        return plan
+    plan.kind, plan.field, plan.operator, plan.value = INDEX_KINDS[operator], field, operator, value
+    return plan
+
+
+def record_predicate(condition: ASTNode, var: str) -> tuple[str, str, ASTNode] | None:
+    """
+    (field, operator, value) for `var.field OP value` or `value OP var.field`.
+    """
+    if not isinstance(condition, BinaryExprNode) or condition.operator not in INDEX_KINDS:
+        return None
+    for side, other, operator in ((condition.left, condition.right, condition.operator),
+                                  (condition.right, condition.left, MIRRORED[condition.operator])):
+        if not isinstance(side, IdentifierNode):
+            continue
+        root, *path = side.name.split(".")
+        if root != var or len(path) != 1:
+            continue
+        if isinstance(other, (NumberNode, StringNode, BooleanNode, NullNode)):
+            return path[0], operator, other
+        if isinstance(other, IdentifierNode) and other.name.split(".", 1)[0] != var:
+            return path[0], operator, other
+    return None
+
+
+def predicate_changes(node: ForNode, field: str, value: ASTNode, scope: dict[str, set[str]],
+                      analysis: DependencyAnalysis) -> str:
+    """
+    Why the loop could change `var.field OP value` for a record before visiting it ("" if it cannot).
+    """
+    value_root, *value_path = value.name.split(".") if isinstance(value, IdentifierNode) else ("", )
+    value_roots = scope.get(value_root, {value_root}) if value_root else set()
+
+    # Statements still to check, each with the names that hold the loop's current record there:
+    # the loop variable in the body, and the parameters it is passed as inside called actions
+    pending: list[tuple[ASTNode, frozenset[str]]] = [(statement, frozenset({node.var})) for statement in node.body]
+    called: set[tuple[str, frozenset[str]]] = set()
+    while pending:
+        statement, record = pending.pop()
+        match statement:
+            case AssignmentNode():
+                root, *path = statement.target.split(".")
+                if root in record and not path:
+                    return f"the body reassigns '{root}'"
+                if path and path[-1] == field and not (root in record and len(path) == 1):
+                    return f"'{field}' is assigned other than through '{node.var}'"
+                if value_root:
+                    if root == value_root and (not path or path[-1] in value_path):
+                        return f"the body may change '{value.name}'"
+                    writes = analysis.writes(statement)
+                    if writes & value_roots and (not path or path[-1] in value_path):
+                        return f"the body may change '{value.name}'"
+            case ForNode() if statement.var in record:
+                return f"a nested loop shadows '{statement.var}'"
+            case CallNode():
+                action = analysis.action_nodes.get(statement.function)
+                if action is not None:
+                    positional = [arg for arg in statement.args if arg.name is None]
+                    bound = [(name, arg) for name, arg in zip(action.params, positional)]
+                    bound += [(arg.name, arg) for arg in statement.args if arg.name is not None]
+                    params = frozenset(name for name, arg in bound
+                                       if isinstance(arg.value, IdentifierNode) and arg.value.name in record)
+                    if (action.name, params) not in called:
+                        called.add((action.name, params))
+                        pending.extend((child, params) for child in action.body)
+        pending.extend((child, record) for child in statement.get_children())
+    return ""
+
+
+class HashIndex:
+    """
+    Record positions by field value, for `==`. Equal values (1, 1.0 and True included) share a bucket,
+    exactly as `==` would match them.
+    """
+
+    def __init__(self, items: list, field: str):
+        self.items = items
+        self.field = field
+        self.positions: dict[int, int] = {}
+        self.buckets: dict[Any, set[int]] = {}
+        self.valid = True
+        self.queries = 0
+        for position, record in enumerate(items):
+            if type(record) is not dict or id(record) in self.positions:
+                self.valid = False
+                return
+            self.positions[id(record)] = position
+            try:
+                self.buckets.setdefault(record.get(field), set()).add(position)
+            except TypeError: # unhashable value
+                self.valid = False
+                return
+
+    def update(self, record: dict, old: Any, new: Any):
+        position = self.positions.get(id(record))
+        if position is None or not self.valid:
+            return
+        bucket = self.buckets.get(old)
+        if bucket is None or position not in bucket:
+            self.valid = False
+            return
+        bucket.discard(position)
+        try:
+            self.buckets.setdefault(new, set()).add(position)
+        except TypeError:
+            self.valid = False
+
+    def select(self, operator: str, value: Any) -> list[int] | None:
+        try:
+            if value != value: # NaN never compares equal, but would find itself in a dict
+                return None
+            bucket = self.buckets.get(value, ())
+        except TypeError:
+            return None
+        if len(bucket) > len(self.items) * MAX_SELECTIVITY:
+            return None
+        return sorted(bucket)
+
+
+class SortedIndex:
+    """
+    (value, position) pairs sorted by value, for range comparisons. Values that do not order against
+    each other (None among numbers, say) make the index invalid, and the loop scans and fails as before.
+    """
+
+    def __init__(self, items: list, field: str):
+        self.items = items
+        self.field = field
+        self.positions: dict[int, int] = {}
+        self.keys: list[tuple[Any, int]] = []
+        self.valid = True
+        self.queries = 0
+        for position, record in enumerate(items):
+            if type(record) is not dict or id(record) in self.positions:
+                self.valid = False
+                return
+            self.positions[id(record)] = position
+            self.keys.append((record.get(field), position))
+        try:
+            self.keys.sort()
+        except TypeError:
+            self.valid = False
+
+    def update(self, record: dict, old: Any, new: Any):
+        position = self.positions.get(id(record))
+        if position is None or not self.valid:
+            return
+        keys = self.keys
+        try:
+            at = bisect_left(keys, (old, position))
+            if at == len(keys) or keys[at][1] != position:
+                self.valid = False
+                return
+            del keys[at]
+            insort(keys, (new, position))
+        except TypeError:
+            self.valid = False
+
+    def select(self, operator: str, value: Any) -> list[int] | None:
+        keys = self.keys
+        try:
+            match operator:
+                case "<":
+                    selected = keys[:bisect_left(keys, value, key=first)]
+                case "<=":
+                    selected = keys[:bisect_right(keys, value, key=first)]
+                case ">":
+                    selected = keys[bisect_right(keys, value, key=first):]
+                case _:
+                    selected = keys[bisect_left(keys, value, key=first):]
+        except TypeError:
+            return None
+        if len(selected) > len(keys) * MAX_SELECTIVITY:
+            return None
+        return sorted(position for _, position in selected)
+
+
+INDEXES = {
+    "hash": HashIndex,
+    "sorted": SortedIndex,
+}
+
+
+class IndexRegistry:
+    """
+    One module's secondary indexes, built on first use.
+    - `select()` answers a loop's predicate from the index for its collection and field, building
+      it when the collection is new (or was replaced since). None means: scan instead. Lists
+      shorter than MIN_INDEX_ROWS are never indexed.
+    - Compiled assignments to an indexed field call `update()` on `by_field[field]`, so an index
+      follows every record write after it is built.
+    - An index keeps its list alive, so a replaced collection is never mistaken for the new one.
+    """
+
+    def __init__(self, fields: set[str]):
+        self.indexes: dict[tuple[str, str, str], HashIndex | SortedIndex] = {}
+        self.by_field: dict[str, list] = {field: [] for field in fields}
+        self.rebuilds: dict[tuple[str, str, str], int] = {}
+        self.builds = 0
+        self.scans = 0
+        self.lookups = 0
+
+    def select(self, collection: str, field: str, kind: str, items: list, operator: str, value: Any) -> list[int] | None:
+        key = (collection, field, kind)
+        index = self.indexes.get(key)
+        if index is None or index.items is not items:
+            rebuilds = self.rebuilds.get(key, 0)
+            if index is not None and index.queries < 2:
+                rebuilds += 1 # replaced before the index paid for itself
+            if rebuilds >= MAX_REBUILDS:
+                self.scans += 1
+                return None
+            self.rebuilds[key] = rebuilds
+            if index is not None:
+                self.by_field[field].remove(index)
+            index = self.indexes[key] = INDEXES[kind](items, field)
+            self.by_field[field].append(index)
+            self.builds += 1
+        if not index.valid:
+            self.scans += 1
+            return None
+        index.queries += 1
+        if index.queries == 2:
+            self.rebuilds[key] = 0
+        selected = index.select(operator, value)
+        if selected is None: # cannot answer, or would select too much to beat a scan
+            self.scans += 1
+        else:
+            self.lookups += 1
+        return selected
@@ -0,0 +1,300 @@
+import operator
+from collections.abc import Mapping, MutableMapping
+from typing import Any, Callable
+
+from siml.ast_nodes import (
+    ASTNode, StringNode, NumberNode, BooleanNode, NullNode, DictLiteralNode, ListLiteralNode, DataNode,
+    IdentifierNode, BinaryExprNode, NotNode, CallNode, GenerateNode,
+    IfNode, ForNode, AssignmentNode, ActionNode, RuleNode,
+)
+
+
+class SimulationError(Exception):
+    """
+    A program that parsed but cannot run: unknown names, bad calls, type errors in rule bodies.
+    """
+
+    def __init__(self, message: str, line: int = 0):
+        super().__init__(f"{message} on line {line}" if line else message)
+        self.message = message
+        self.line = line
+
+
+# BinaryExprNode.operator -> function; `and` / `or` short-circuit and are handled separately
+OPERATORS: dict[str, Callable[[Any, Any], Any]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "%": operator.mod,
+    "**": operator.pow,
+}
+
+# Functions callable from expressions, e.g. `if len(queue) > 3:`
+BUILTINS: dict[str, Callable[..., Any]] = {
+    "len": len,
+    "min": min,
+    "max": max,
+    "abs": abs,
+    "round": round,
+    "sum": sum,
+}
+
+PROMPT_AGENT = "prompt_agent"
+
+# Values compared by equality when deciding whether a write changed anything; containers by identity
+SCALARS = (int, float, str, bool)
+
+
+def get_field(value: Any, name: str) -> Any:
+    """
+    `record.field` access. Records are dicts (or dict-like row views); a missing field reads as null.
+    """
+    if type(value) is dict or isinstance(value, Mapping):
+        return value.get(name)
+    raise TypeError(f"cannot read '.{name}' from {type(value).__name__}")
+
+
+def set_field(container: Any, name: str, value: Any):
+    if type(container) is dict or isinstance(container, MutableMapping):
+        container[name] = value
+    else:
+        raise TypeError(f"cannot set '.{name}' on {type(container).__name__}")
+
+
+def unchanged(old: Any, new: Any) -> bool:
+    """
+    Whether writing `new` over `old` leaves state as it was: the same object, or an equal scalar.
+    """
+    return old is new or (type(old) is type(new) and type(new) in SCALARS and old == new)
+
+
+def bind_arguments(action: ActionNode, args: list, kwargs: dict, line: int) -> list:
+    """
+    Match call arguments to an action's parameters, returning one value per parameter.
+    """
+    params = action.params
+    if len(args) > len(params):
+        raise SimulationError(f"Action '{action.name}' takes {len(params)} argument(s) but {len(args)} were given", line)
+    values = list(args) + [None] * (len(params) - len(args))
+    for name, value in kwargs.items():
+        if name not in params:
+            raise SimulationError(f"Action '{action.name}' has no parameter '{name}'", line)
+        values[params.index(name)] = value
+    return values
+
+
+class Interpreter:
+    """
+    Reference tree-walking engine.
+    Every statement and expression is dispatched on its node type each time it runs, and
+    names are looked up by splitting their dotted path on every access. It defines the
+    language semantics the Compiler must reproduce, and is used for one-off evaluation
+    such as state initializers.
+    Locals (loop variables and action parameters) live in a `scope` dict; everything
+    else is module state.
+    Once the module shares state with a snapshot (`module.cow`), writes, loops over records and
+    action arguments go through its copy-on-write barrier.
+    When the module tracks changes (`module.changes`), an assignment that changes a value adds the
+    state it writes (see dependencies.DependencyAnalysis) to that set.
+    When the module is profiled (`module.profiler`), loops add the records they visit to its count.
+    """
+
+    def __init__(self, module):
+        self.module = module
+        self.cow = getattr(module, "cow", None)
+        self.changes = getattr(module, "changes", None)
+        self.profiler = getattr(module, "profiler", None)
+
+    def prepare_state(self, state: dict):
+        """
+        Called once the module's state is initialized and its rules compiled, before any rule runs.
+        """
+
+    def rule(self, node: RuleNode) -> Callable[[dict], None]:
+        def run(state: dict):
+            self.execute_block(node.body, {}, state)
+        return run
+
+    def action(self, node: ActionNode) -> Callable[[dict, list], None]:
+        def run(state: dict, args: list):
+            self.execute_block(node.body, dict(zip(node.params, args)), state)
+        return run
+
+    # Statements
+
+    def execute_block(self, body: list[ASTNode], scope: dict, state: dict):
+        for statement in body:
+            self.execute(statement, scope, state)
+
+    def execute(self, node: ASTNode, scope: dict, state: dict):
+        match node:
+            case AssignmentNode():
+                writes = self.module.dependencies.writes(node) if self.changes is not None else None
+                self.assign(node.target, self.evaluate(node.value, scope, state), scope, state, node.line, writes)
+
+            case IfNode():
+                if self.evaluate(node.condition, scope, state):
+                    self.execute_block(node.then_body, scope, state)
+                else:
+                    self.execute_block(node.else_body, scope, state)
+
+            case ForNode():
+                missing = object()
+                shadowed = scope.get(node.var, missing)
+                cow = self.cow
+                if cow is not None and isinstance(node.iterable, IdentifierNode):
+                    items = self.owned(node.iterable.name, scope, state, node.line)
+                    if self.profiler is not None:
+                        self.profiler.visits += len(items)
+                    if type(items) is list:
+                        for index in range(len(items)):
+                            scope[node.var] = cow.item(items, index)
+                            self.execute_block(node.body, scope, state)
+                    else:
+                        for item in items:
+                            scope[node.var] = item
+                            self.execute_block(node.body, scope, state)
+                else:
+                    items = self.evaluate(node.iterable, scope, state)
+                    if self.profiler is not None:
+                        self.profiler.visits += len(items)
+                    for item in items:
+                        scope[node.var] = item
+                        self.execute_block(node.body, scope, state)
+                if shadowed is missing:
+                    scope.pop(node.var, None)
+                else:
+                    scope[node.var] = shadowed
+
+            case _:
+                self.evaluate(node, scope, state)
+
+    def assign(self, target: str, value: Any, scope: dict, state: dict, line: int, writes: frozenset[str] | None = None):
+        root, *path = target.split(".")
+        if not path:
+            if root in scope:
+                scope[root] = value
+            else:
+                if writes and not unchanged(state.get(root), value):
+                    self.changes.update(writes)
+                state[root] = value
+            return
+
+        if self.cow is not None:
+            container = self.owned(".".join([root, *path[:-1]]), scope, state, line)
+        else:
+            container = self.lookup(root, scope, state, line)
+            for name in path[:-1]:
+                container = get_field(container, name)
+        if writes and isinstance(container, Mapping) and not unchanged(container.get(path[-1]), value):
+            self.changes.update(writes)
+        set_field(container, path[-1], value)
+
+    def owned(self, name: str, scope: dict, state: dict, line: int) -> Any:
+        """
+        Read `root.a.b`, making every container on the way owned by the copy-on-write barrier.
+        """
+        root, *path = name.split(".")
+        if root in scope:
+            return self.cow.path(scope[root], path)
+        self.lookup(root, scope, state, line)
+        return self.cow.path(state, [root, *path])
+
+    # Expressions
+
+    def lookup(self, root: str, scope: dict, state: dict, line: int) -> Any:
+        if root in scope:
+            return scope[root]
+        if self.module is not None and root in self.module.state_names:
+            return state.get(root)
+        raise SimulationError(f"Undefined name '{root}'", line)
+
+    def evaluate(self, node: ASTNode, scope: dict, state: dict) -> Any:
+        match node:
+            case NumberNode() | StringNode() | BooleanNode():
+                return node.value
+
+            case NullNode():
+                return None
+
+            case IdentifierNode():
+                root, *path = node.name.split(".")
+                value = self.lookup(root, scope, state, node.line)
+                for name in path:
+                    value = get_field(value, name)
+                return value
+
+            case BinaryExprNode():
+                left = self.evaluate(node.left, scope, state)
+                if node.operator == "and":
+                    return left and self.evaluate(node.right, scope, state)
+                if node.operator == "or":
+                    return left or self.evaluate(node.right, scope, state)
+                function = OPERATORS.get(node.operator)
+                if function is None:
+                    raise SimulationError(f"Unknown operator '{node.operator}'", node.line)
+                return function(left, self.evaluate(node.right, scope, state))
+
+            case NotNode():
+                return not self.evaluate(node.operand, scope, state)
+
+            case ListLiteralNode():
+                return [self.evaluate(element, scope, state) for element in node.elements]
+
+            case DictLiteralNode():
+                return {entry.key: self.evaluate(entry.value, scope, state) for entry in node.entries}
+
+            case DataNode():
+                value = node.load()
+                for path, hole in node.holes:
+                    target = value
+                    for key in path[:-1]:
+                        target = target[key]
+                    target[path[-1]] = self.evaluate(hole, scope, state)
+                return value
+
+            case GenerateNode():
+                count = self.evaluate(node.multiplier, scope, state) if node.multiplier is not None else 1
+                return self.module.synthesize(node.template, count, node.line)
+
+            case CallNode():
+                return self.call(node, scope, state)
+
+            case _:
+                raise SimulationError(f"Cannot evaluate {type(node).__name__}", node.line)
+
+    def call(self, node: CallNode, scope: dict, state: dict) -> Any:
+        args = []
+        kwargs = {}
+        owned = self.cow is not None and node.function not in BUILTINS
+        for arg in node.args:
+            if owned and isinstance(arg.value, IdentifierNode):
+                value = self.owned(arg.value.name, scope, state, node.line)
+            else:
+                value = self.evaluate(arg.value, scope, state)
+            if arg.name is None:
+                args.append(value)
+            else:
+                kwargs[arg.name] = value
+
+        if node.function == PROMPT_AGENT:
+            agent = kwargs.pop("agent")
+            self.module.check_agent(agent, node.line)
+            return self.module.prompt_agent(agent, args, kwargs)
+
+        action = self.module.action_nodes.get(node.function)
+        if action is not None:
+            return self.module.runners[node.function](state, bind_arguments(action, args, kwargs, node.line))
+
+        builtin = BUILTINS.get(node.function)
+        if builtin is not None:
+            return builtin(*args, **kwargs)
+
+        raise SimulationError(f"Unknown action or function '{node.function}'", node.line)
@@ -0,0 +1,322 @@
+import os
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from siml.tracer import Tracer
+from siml.cache import CACHE_DIR_NAME, ModuleCache, content_key
+from siml.ast_nodes import SimulationNode
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+
+class LoadError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class LoadDiagnostic:
+    path: str
+    line: int
+    message: str
+
+    def __str__(self):
+        return f"{self.path}:{self.line}: {self.message}"
+
+
+@dataclass
+class LoadedFile:
+    tree: SimulationNode
+    diagnostics: list[LoadDiagnostic] = field(default_factory=list)
+
+
+def module_dependencies(tree: SimulationNode) -> list[str]:
+    """
+    Files a parsed program refers to: external `- ./x.siml` modules and `import:` entries, in order.
+    """
+    deps = []
+    for module in tree.modules:
+        if module.path is not None:
+            deps.append(module.path)
+        deps.extend(module.imports)
+    return list(dict.fromkeys(deps))
+
+
+def resolve_path(importer: str, path: str) -> str:
+    return os.path.normpath(os.path.join(os.path.dirname(importer), path))
+
+
+def parse_file(path: str, source: bytes) -> LoadedFile:
+    # Imported here: a program whose trees are all cached never builds the tokenizer's tables
+    from siml.parser import Parser
+    from siml.tokenizer import Tokenizer
+
+    module_name = os.path.splitext(os.path.basename(path))[0]
+    parser = Parser(Tokenizer(source.decode("utf-8")), module_name=module_name)
+    tree = parser.parse()
+    return LoadedFile(tree, [LoadDiagnostic(path, e.line, e.message) for e in parser.errors])
+
+
+def link(loaded: LoadedFile, path: str, dependencies: dict[str, LoadedFile]):
+    """
+    Splice loaded dependencies into a parsed file, in place.
+    - `- ./x.siml` module references are replaced by the modules (and agents) defined in that file.
+    - `import:` entries prepend the imported file's actions, rules and templates to the module.
+    """
+    tree = loaded.tree
+    modules = []
+    for module in tree.modules:
+        if module.path is not None:
+            dependency = dependencies.get(resolve_path(path, module.path))
+            if dependency is None:
+                modules.append(module)
+                continue
+            modules.extend(dependency.tree.modules)
+            tree.agents.extend(dependency.tree.agents)
+            continue
+
+        for imported in module.imports:
+            dependency = dependencies.get(resolve_path(path, imported))
+            if dependency is None:
+                continue
+            for source_module in dependency.tree.modules:
+                module.actions = source_module.actions + module.actions
+                module.rules = source_module.rules + module.rules
+                module.templates = source_module.templates + module.templates
+        modules.append(module)
+
+    tree.modules = modules
+    for dependency in dependencies.values():
+        loaded.diagnostics.extend(dependency.diagnostics)
+    loaded.diagnostics = list(dict.fromkeys(loaded.diagnostics))
+
+
+def parse_worker(path: str) -> tuple[LoadedFile, list[str], float]:
+    """
+    Process-pool entry point: read and parse one file, returning the tree, its raw dependencies and the time taken.
+    """
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        loaded = parse_file(path, f.read())
+    return loaded, module_dependencies(loaded.tree), time.perf_counter() - start
+
+
+class ModuleLoader:
+    """
+    Loads a program and every file it references into one linked SimulationNode.
+    Loading runs in phases:
+    1. discover(): walk the import graph breadth-first. Each wave hashes the newly found files,
+       takes their dependencies from the cache's small `deps` entries where possible and parses
+       the rest, in parallel across a process pool when `workers` > 1.
+    2. topological_order(): order files dependencies-first, raising LoadError on import cycles.
+    3. Each file gets a Merkle key over its own content and its dependencies' keys.
+    4. link_all(): fetch the root's linked tree from the cache; on a miss, parse the files whose
+       trees are not cached (again in parallel) and link them in dependency order.
+    Linking follows declaration order only, so the result does not depend on which worker finishes first.
+    """
+
+    def __init__(self, cache: ModuleCache | None = None, workers: int = 1):
+        self.cache = cache
+        self.tracer = Tracer("Loader")
+        self.workers = max(1, workers)
+        if self.workers > 1:
+            # Imported here: a serial load never needs the process machinery
+            from siml.parallel import available_cpus
+            cpus = available_cpus()
+            if self.workers > cpus:
+                self.tracer.warn("Reducing workers from %d to %d, the number of available CPUs", self.workers, cpus)
+                self.workers = cpus
+        self.executor: "ProcessPoolExecutor | None" = None
+        self.own_keys: dict[str, str] = {}
+        self.parsed: dict[str, LoadedFile] = {}
+        self.dependencies: dict[str, list[str]] = {}
+        self.keys: dict[str, str] = {}
+        self.missing: set[str] = set()
+        self.loaded: dict[str, LoadedFile] = {}
+        self.timings: dict[str, float] = {}
+        self.phase_times: dict[str, float] = {}
+
+    def load(self, path: str | os.PathLike) -> LoadedFile:
+        path = os.path.abspath(path)
+        if not os.path.isfile(path):
+            raise LoadError(f"No such file: {path}")
+
+        try:
+            start = time.perf_counter()
+            self.discover(path)
+            order = self.topological_order(path)
+            for file in order:
+                if file in self.missing:
+                    self.keys[file] = content_key("missing", file)
+                else:
+                    self.keys[file] = content_key(self.own_keys[file], *(self.keys[dep] for dep in self.dependencies[file]))
+            self.phase_times["discover"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            loaded = self.link_all(path, order)
+            self.phase_times["link"] = time.perf_counter() - start
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+        self.tracer.info("%s", self.format_timings())
+        return loaded
+
+    def parse_many(self, paths: list[str]):
+        """
+        Parse files, in a process pool when there is more than one file and more than one worker.
+        Results are recorded in path order.
+        """
+        if not paths:
+            return
+
+        start = time.perf_counter()
+        if self.workers > 1 and len(paths) > 1:
+            if self.executor is None:
+                from concurrent.futures import ProcessPoolExecutor
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            results = self.executor.map(parse_worker, paths)
+        else:
+            results = map(parse_worker, paths)
+
+        for path, (loaded, deps, elapsed) in zip(paths, results):
+            self.parsed[path] = loaded
+            self.timings[path] = elapsed
+            if path not in self.dependencies:
+                self.set_dependencies(path, deps)
+                if self.cache is not None:
+                    self.cache.put("deps", self.own_keys[path], deps)
+
+        self.phase_times["parse"] = self.phase_times.get("parse", 0.0) + time.perf_counter() - start
+
+    def set_dependencies(self, path: str, deps: list[str]):
+        self.dependencies[path] = [resolve_path(path, dep) for dep in deps]
+
+    def discover(self, root: str):
+        seen = {root}
+        frontier = [root]
+        while frontier:
+            unparsed = []
+            for path in frontier:
+                try:
+                    with open(path, "rb") as f:
+                        own_key = content_key(f.read())
+                except OSError:
+                    self.missing.add(path)
+                    continue
+
+                self.own_keys[path] = own_key
+                deps = self.cache.get("deps", own_key) if self.cache is not None else None
+                if deps is None:
+                    unparsed.append(path)
+                else:
+                    self.set_dependencies(path, deps)
+
+            self.parse_many(unparsed)
+
+            next_frontier = []
+            for path in frontier:
+                for dep in self.dependencies.get(path, []):
+                    if dep not in seen:
+                        seen.add(dep)
+                        next_frontier.append(dep)
+            frontier = next_frontier
+
+    def topological_order(self, root: str) -> list[str]:
+        """
+        Files reachable from root, dependencies first. Raises LoadError on an import cycle.
+        """
+        order = []
+        state: dict[str, bool] = {} # False while on the DFS stack, True once finished
+        stack = [(root, iter(self.dependencies.get(root, [])))]
+        state[root] = False
+        while stack:
+            path, deps = stack[-1]
+            dep = next(deps, None)
+            if dep is None:
+                stack.pop()
+                state[path] = True
+                order.append(path)
+                continue
+
+            if dep not in state:
+                state[dep] = False
+                stack.append((dep, iter(self.dependencies.get(dep, []))))
+            elif state[dep] is False:
+                chain = [entry[0] for entry in stack]
+                cycle = chain[chain.index(dep):] + [dep]
+                raise LoadError(f"Import cycle: {' -> '.join(cycle)}")
+        return order
+
+    def link_all(self, root: str, order: list[str]) -> LoadedFile:
+        # Find the files whose linked trees are not cached, starting from the root
+        needed = set()
+        pending = [root]
+        while pending:
+            path = pending.pop()
+            if path in needed or path in self.loaded or path in self.missing:
+                continue
+            cached = self.cache.get("tree", self.keys[path]) if self.cache is not None else None
+            if cached is not None:
+                self.tracer.debug("Cache hit for %s", path)
+                self.loaded[path] = cached
+                continue
+            needed.add(path)
+            pending.extend(self.dependencies[path])
+
+        self.parse_many([path for path in order if path in needed and path not in self.parsed])
+
+        for path in order:
+            if path not in needed:
+                continue
+            loaded = self.parsed.pop(path)
+            dependencies = {}
+            for dep in self.dependencies[path]:
+                if dep in self.missing:
+                    loaded.diagnostics.append(LoadDiagnostic(path, 0, f"Cannot read '{dep}'"))
+                    continue
+                dependencies[dep] = self.loaded[dep]
+            link(loaded, path, dependencies)
+
+            if self.cache is not None:
+                self.cache.put("tree", self.keys[path], loaded)
+            self.loaded[path] = loaded
+
+        return self.loaded[root]
+
+    def format_timings(self) -> str:
+        """
+        Per-file parse times and how much the process pool saved over parsing them one after another.
+        """
+        lines = [f"{elapsed * 1000:9.1f} ms  {path}" for path, elapsed in sorted(self.timings.items(), key=lambda item: -item[1])]
+        serial = sum(self.timings.values())
+        parallel = self.phase_times.get("parse", 0.0)
+        lines.append(f"{len(self.timings)} files parsed, {serial * 1000:.1f} ms of parse work in {parallel * 1000:.1f} ms "
+                     f"with {self.workers} worker(s)" + (f" ({serial / parallel:.1f}x)" if parallel else ""))
+        lines.append(f"discover {self.phase_times.get('discover', 0.0) * 1000:.1f} ms, "
+                     f"link {self.phase_times.get('link', 0.0) * 1000:.1f} ms")
+        return "\n".join(lines)
+
+
+def program_loader(path: str | os.PathLike, use_cache: bool = True, cache_dir: str | os.PathLike | None = None,
+                   workers: int = 1) -> ModuleLoader:
+    """
+    A ModuleLoader for the program at `path`, caching in `__simlcache__/` next to it by default.
+    `workers` is limited to the available CPUs.
+    """
+    cache = None
+    if use_cache:
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+        cache = ModuleCache(cache_dir)
+    return ModuleLoader(cache, workers)
+
+
+def load_program(path: str | os.PathLike, use_cache: bool = True, cache_dir: str | os.PathLike | None = None, workers: int = 1) -> LoadedFile:
+    """
+    Load, link and (optionally) cache a program. The cache defaults to `__simlcache__/`
+    next to the program file.
+    """
+    return program_loader(path, use_cache, cache_dir, workers).load(path)
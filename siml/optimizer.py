@@ -0,0 +1,594 @@
+from dataclasses import dataclass, replace
+from typing import Any
+
+from siml.ast_nodes import (
+    ASTNode, ModuleNode, RuleNode, ActionNode, StringNode, NumberNode, BooleanNode, NullNode, IdentifierNode,
+    BinaryExprNode, NotNode, ListLiteralNode, DictLiteralNode, DictEntry, CallNode, CallArg, GenerateNode,
+    IfNode, ForNode, AssignmentNode,
+)
+from siml.dependencies import DependencyAnalysis
+from siml.interpreter import BUILTINS, OPERATORS
+from siml.tracer import Tracer, Level
+
+LITERALS = (NumberNode, StringNode, BooleanNode, NullNode)
+
+# Folded values are limited to what a literal node can hold, and kept small
+MAX_FOLDED_LENGTH = 4096
+MAX_FOLDED_EXPONENT = 64
+
+# `not (a == b)` is `a != b` and back
+NEGATED = {"==": "!=", "!=": "=="}
+
+MISSING = object()
+
+
+@dataclass(slots=True)
+class Optimization:
+    """
+    One change the optimizer made; kind is "constant", "fold", "simplify", "branch" or "hoist".
+    """
+    line: int
+    kind: str
+    description: str
+
+
+def constant_names(node: ModuleNode, state: dict, analysis: DependencyAnalysis) -> set[str]:
+    """
+    Declared state that keeps its initial value for the whole run:
+    - no assignment targets it (or a field of it), by its own name or through a local, and
+    - every read of it (in rules, actions and other state's initial values) is a field path that
+      holds a number, string, bool or null, so its records never end up in another variable or
+      argument that could change them, and
+    - no action that may be handed one of its records (by an agent) writes it.
+    Alias groups are too coarse for this: storing `revenue + invoice.amount * settings.fee` puts
+    `settings` in one group with everything `revenue` is aliased with, though nothing can change
+    it that way.
+    """
+    names = {var.name for var in node.state}
+    for action, params in analysis.params.items():
+        writes = analysis.actions[action].writes
+        for roots in params.values():
+            names -= roots & writes
+
+    reads = [var.value for var in node.state]
+    for item in [*node.actions, *node.rules]:
+        for child in walk(item.body):
+            match child:
+                case AssignmentNode():
+                    names.discard(child.target.split(".", 1)[0])
+                case ForNode():
+                    names.discard(child.var)
+        reads.extend(item.body)
+    for child in walk(reads):
+        if isinstance(child, IdentifierNode):
+            root, *path = child.name.split(".")
+            if root in names and (not path or not scalar(resolve(state, root, path))):
+                names.discard(root)
+    return names
+
+
+def rebound_names(node: ModuleNode, analysis: DependencyAnalysis) -> set[str]:
+    """
+    State some assignment replaces as a whole (`set: total = ...`), rather than a field of.
+    """
+    return {child.target for item in [*node.actions, *node.rules] for child in walk(item.body)
+            if isinstance(child, AssignmentNode) and "." not in child.target and analysis.writes(child)}
+
+
+def immutable(value: Any) -> bool:
+    """
+    Whether no statement can change `value` in place: only record fields can be assigned, so
+    scalars and lists of them (however nested) never change.
+    """
+    if type(value) is list:
+        return all(immutable(item) for item in value)
+    return scalar(value)
+
+
+def resolve(state: dict, root: str, path: list[str]) -> Any:
+    """
+    The value `root.a.b` reads from `state`, or MISSING when it does not go through plain records.
+    """
+    value = state.get(root, MISSING)
+    for field in path:
+        if type(value) is not dict:
+            return MISSING
+        value = value.get(field)
+    return value
+
+
+def scalar(value: Any) -> bool:
+    return value is None or type(value) in (int, float, str, bool)
+
+
+def is_literal(node: ASTNode) -> bool:
+    return isinstance(node, LITERALS)
+
+
+def literal_value(node: ASTNode) -> Any:
+    return None if isinstance(node, NullNode) else node.value
+
+
+def foldable(value: Any) -> bool:
+    if type(value) is str:
+        return len(value) <= MAX_FOLDED_LENGTH
+    return scalar(value)
+
+
+def literal(value: Any, origin: ASTNode, description: str) -> ASTNode:
+    line, indent = origin.line, origin.indent
+    if value is None:
+        node = NullNode(line=line, indent=indent)
+    elif type(value) is bool:
+        node = BooleanNode(line=line, indent=indent, value=value)
+    elif type(value) is str:
+        node = StringNode(line=line, indent=indent, value=value)
+    else:
+        node = NumberNode(line=line, indent=indent, value=value)
+    node.meta["optimized"] = description
+    return node
+
+
+def expression_key(node: ASTNode) -> tuple:
+    """
+    A hashable key equal for structurally identical expressions.
+    """
+    match node:
+        case IdentifierNode():
+            return ("name", node.name)
+        case NullNode():
+            return ("null", )
+        case NumberNode() | StringNode() | BooleanNode():
+            return ("literal", type(node.value).__name__, node.value)
+        case BinaryExprNode():
+            return ("binary", node.operator, expression_key(node.left), expression_key(node.right))
+        case NotNode():
+            return ("not", expression_key(node.operand))
+        case CallNode():
+            return ("call", node.function, tuple((arg.name, expression_key(arg.value)) for arg in node.args))
+        case ListLiteralNode():
+            return ("list", tuple(expression_key(element) for element in node.elements))
+        case DictLiteralNode():
+            return ("dict", tuple((entry.key, expression_key(entry.value)) for entry in node.entries))
+        case GenerateNode():
+            return ("synthesize", node.template, expression_key(node.multiplier) if node.multiplier else None)
+    return ("node", id(node))
+
+
+def operand(node: ASTNode) -> str:
+    return f"({describe(node)})" if isinstance(node, BinaryExprNode) else describe(node)
+
+
+def describe(node: ASTNode) -> str:
+    """
+    Source-like text for an expression, for optimization notes.
+    """
+    match node:
+        case IdentifierNode():
+            return node.name
+        case NullNode():
+            return "null"
+        case BooleanNode():
+            return "true" if node.value else "false"
+        case StringNode():
+            return f'"{node.value}"'
+        case NumberNode():
+            return repr(node.value)
+        case BinaryExprNode():
+            return f"{operand(node.left)} {node.operator} {operand(node.right)}"
+        case NotNode():
+            return f"not {operand(node.operand)}"
+        case CallNode():
+            args = ", ".join(f"{arg.name}: {describe(arg.value)}" if arg.name else describe(arg.value) for arg in node.args)
+            return f"{node.function}({args})"
+        case ListLiteralNode():
+            return f"[{', '.join(describe(element) for element in node.elements)}]"
+    return type(node).__name__
+
+
+class Optimizer:
+    """
+    Rewrites one module's rule and action bodies before they are compiled:
+    - Constant state (see `constant_names`) read as a number, string, bool or null, including
+      fields of nested records (`settings.threshold`), becomes a literal.
+    - Operators, `not` and builtin calls over literals are evaluated (unless that fails, which is
+      left to happen at run time); `and` / `or` with a literal left side reduce to one operand.
+    - Conditions are simplified where only their truth matters (`not not x`, `x and true`), and
+      `not (a == b)` becomes `a != b`.
+    - `if` statements whose condition folded to a literal are replaced by the branch that runs.
+    - Compound expressions a loop evaluates on every iteration, that read nothing the loop writes or
+      rebinds, are evaluated once per loop run instead: the loop is wrapped in `for each: $n in [expr]`,
+      behind an `if collection:` whose `else` runs the original loop, so an empty collection still
+      evaluates nothing.
+    Nodes are never modified: changed ones are copied (rule and action nodes may be shared between
+    modules), new nodes say what they replaced in meta["optimized"], and rewritten rules and
+    actions list every Optimization in meta["optimizations"].
+    """
+
+    def __init__(self, node: ModuleNode, state: dict, analysis: DependencyAnalysis):
+        self.node = node
+        self.state = state
+        self.analysis = analysis
+        self.constants = constant_names(node, state, analysis)
+        self.rebound = rebound_names(node, analysis)
+        # State whose value no statement can change: never rebound, and holding no record
+        self.immutable = {var.name for var in node.state if var.name not in self.rebound and immutable(state.get(var.name))}
+        self.locals: set[str] = set() # locals the current rule or action rebinds
+        self.changes: list[Optimization] = []
+        self.temporaries = 0
+        self.tracer = Tracer("Optimizer")
+
+    def module(self) -> ModuleNode:
+        """
+        The optimized module, or the module itself when nothing changed.
+        """
+        node = self.node
+        actions = [self.action(action) for action in node.actions]
+        rules = [self.rule(rule) for rule in node.rules]
+        if not self.changes:
+            return node
+        if self.tracer.is_enabled_for(Level.DEBUG):
+            for change in self.changes:
+                self.tracer.debug("Module '%s', line %d: %s", node.name, change.line, change.description)
+        return replace(node, actions=actions, rules=rules)
+
+    def action(self, node: ActionNode) -> ActionNode:
+        scope = {param: set(roots) for param, roots in self.analysis.params[node.name].items()}
+        return self.container(node, scope)
+
+    def rule(self, node: RuleNode) -> RuleNode:
+        return self.container(node, {})
+
+    def container(self, node: ActionNode | RuleNode, scope: dict[str, set[str]]):
+        first = len(self.changes)
+        self.locals = {child.target for child in walk(node.body)
+                       if isinstance(child, AssignmentNode) and "." not in child.target and not self.analysis.writes(child)}
+        body = self.block(node.body, scope)
+        if body is node.body:
+            return node
+        optimized = replace(node, body=body)
+        optimized.meta["optimizations"] = self.changes[first:]
+        return optimized
+
+    def record(self, node: ASTNode, kind: str, description: str):
+        self.changes.append(Optimization(node.line, kind, description))
+
+    # Statements
+
+    def block(self, body: list[ASTNode], scope: dict[str, set[str]]) -> list[ASTNode]:
+        """
+        The optimized statements; `body` itself when none of them changed.
+        """
+        result = []
+        changed = False
+        for statement in body:
+            optimized = self.statement(statement, scope)
+            changed = changed or len(optimized) != 1 or optimized[0] is not statement
+            result.extend(optimized)
+        return result if changed else body
+
+    def statement(self, node: ASTNode, scope: dict[str, set[str]]) -> list[ASTNode]:
+        match node:
+            case AssignmentNode():
+                value = self.expression(node.value, scope)
+                root, *path = node.target.split(".")
+                if not path and root in scope:
+                    scope[root] = scope[root] | self.analysis.value_roots(value, scope)
+                return [node if value is node.value else replace(node, value=value)]
+
+            case IfNode():
+                condition = self.condition(node.condition, scope)
+                if is_literal(condition):
+                    taken = node.then_body if literal_value(condition) else node.else_body
+                    self.record(node, "branch", f"`if {describe(node.condition)}` always "
+                                                f"{'runs' if literal_value(condition) else 'skips'} its first branch")
+                    return self.block(taken, scope)
+                then_body = self.block(node.then_body, scope)
+                else_body = self.block(node.else_body, scope)
+                if condition is node.condition and then_body is node.then_body and else_body is node.else_body:
+                    return [node]
+                return [replace(node, condition=condition, then_body=then_body, else_body=else_body)]
+
+            case ForNode():
+                iterable = self.expression(node.iterable, scope)
+                inner = dict(scope)
+                inner[node.var] = set(self.analysis.value_roots(iterable, scope))
+                if any(isinstance(child, IdentifierNode) and child.name.split(".", 1)[0] in self.locals
+                       for child in walk([iterable])):
+                    inner[node.var] = set() # may be rebound later on; its roots are not known here
+                body = self.block(node.body, inner)
+                loop = node if iterable is node.iterable and body is node.body else replace(node, iterable=iterable, body=body)
+                return self.hoist(node, loop, scope)
+
+            case _:
+                return [self.expression(node, scope)]
+
+    # Expressions
+
+    def expression(self, node: ASTNode, scope: dict[str, set[str]]) -> ASTNode:
+        match node:
+            case IdentifierNode():
+                root, *path = node.name.split(".")
+                if root in scope or root not in self.constants:
+                    return node
+                value = resolve(self.state, root, path)
+                if not foldable(value):
+                    return node
+                description = f"`{node.name}` is never assigned: {value!r}"
+                self.record(node, "constant", description)
+                return literal(value, node, description)
+
+            case BinaryExprNode():
+                left = self.expression(node.left, scope)
+                right = self.expression(node.right, scope)
+                if node.operator in ("and", "or") and is_literal(left):
+                    # `and` returns its left side when falsy, `or` when truthy; otherwise the right side
+                    keep_left = bool(literal_value(left)) == (node.operator == "or")
+                    self.record(node, "fold", f"`{describe(node)}` is always its {'left' if keep_left else 'right'} side")
+                    return left if keep_left else right
+                if is_literal(left) and is_literal(right) and node.operator in OPERATORS:
+                    folded = self.fold(node, OPERATORS[node.operator], literal_value(left), literal_value(right))
+                    if folded is not None:
+                        return folded
+                if left is node.left and right is node.right:
+                    return node
+                return replace(node, left=left, right=right)
+
+            case NotNode():
+                operand = self.expression(node.operand, scope)
+                if is_literal(operand):
+                    description = f"`{describe(node)}` is always {not literal_value(operand)}"
+                    self.record(node, "fold", description)
+                    return literal(not literal_value(operand), node, description)
+                if isinstance(operand, BinaryExprNode) and operand.operator in NEGATED:
+                    negated = replace(operand, operator=NEGATED[operand.operator])
+                    description = f"`{describe(node)}` is `{describe(negated)}`"
+                    negated.meta["optimized"] = description
+                    self.record(node, "simplify", description)
+                    return negated
+                return node if operand is node.operand else replace(node, operand=operand)
+
+            case CallNode():
+                args = [CallArg(arg.name, self.expression(arg.value, scope)) for arg in node.args]
+                if all(arg.value is original.value for arg, original in zip(args, node.args)):
+                    args = node.args
+                builtin = BUILTINS.get(node.function)
+                if builtin is not None and all(is_literal(arg.value) for arg in args):
+                    positional = [literal_value(arg.value) for arg in args if arg.name is None]
+                    named = {arg.name: literal_value(arg.value) for arg in args if arg.name is not None}
+                    folded = self.fold(node, lambda *values: builtin(*values, **named), *positional)
+                    if folded is not None:
+                        return folded
+                return node if args is node.args else replace(node, args=args)
+
+            case ListLiteralNode():
+                elements = [self.expression(element, scope) for element in node.elements]
+                if all(new is old for new, old in zip(elements, node.elements)):
+                    return node
+                return replace(node, elements=elements)
+
+            case DictLiteralNode():
+                entries = [DictEntry(entry.key, self.expression(entry.value, scope)) for entry in node.entries]
+                if all(new.value is old.value for new, old in zip(entries, node.entries)):
+                    return node
+                return replace(node, entries=entries)
+
+            case GenerateNode() if node.multiplier is not None:
+                multiplier = self.expression(node.multiplier, scope)
+                return node if multiplier is node.multiplier else replace(node, multiplier=multiplier)
+
+        return node
+
+    def fold(self, node: ASTNode, function, *values) -> ASTNode | None:
+        """
+        The literal `function(*values)` evaluates to, or None to leave `node` for run time.
+        """
+        if isinstance(node, BinaryExprNode) and node.operator == "**":
+            if any(type(value) not in (int, float) for value in values) or abs(values[1]) > MAX_FOLDED_EXPONENT:
+                return None
+        if isinstance(node, BinaryExprNode) and node.operator == "*":
+            if any(type(value) is str for value in values) and any(type(value) is int and value > MAX_FOLDED_LENGTH for value in values):
+                return None
+        try:
+            value = function(*values)
+        except Exception: # the same error is raised (with its location) when the rule runs
+            return None
+        if not foldable(value):
+            return None
+        description = f"`{describe(node)}` is always {value!r}"
+        self.record(node, "fold", description)
+        return literal(value, node, description)
+
+    def condition(self, node: ASTNode, scope: dict[str, set[str]]) -> ASTNode:
+        return self.truth(self.expression(node, scope))
+
+    def truth(self, node: ASTNode) -> ASTNode:
+        """
+        Simplify an expression whose value only matters as true or false.
+        """
+        match node:
+            case NotNode(operand=NotNode()):
+                self.record(node, "simplify", f"`{describe(node)}` is `{describe(node.operand.operand)}` in a condition")
+                return self.truth(node.operand.operand)
+
+            case NotNode():
+                operand = self.truth(node.operand)
+                return node if operand is node.operand else replace(node, operand=operand)
+
+            case BinaryExprNode(operator="and" | "or"):
+                left, right = self.truth(node.left), self.truth(node.right)
+                if is_literal(right) and bool(literal_value(right)) == (node.operator == "and"):
+                    self.record(node, "simplify", f"`{describe(node)}` is `{describe(left)}` in a condition")
+                    return left
+                if left is node.left and right is node.right:
+                    return node
+                return replace(node, left=left, right=right)
+        return node
+
+    # Loop-invariant hoisting
+
+    def hoist(self, original: ForNode, loop: ForNode, scope: dict[str, set[str]]) -> list[ASTNode]:
+        if not isinstance(loop.iterable, IdentifierNode):
+            return [loop]
+
+        # What the loop may change, from the original body (optimizing only ever removes statements):
+        # rebound state and locals, and state whose records may get a field assigned
+        rebound, mutated, bound = set(), set(), {original.var}
+        pending, called = [original.body], set()
+        while pending:
+            for node in walk(pending.pop()):
+                match node:
+                    case AssignmentNode():
+                        writes = self.analysis.writes(node)
+                        root, *path = node.target.split(".")
+                        if path:
+                            mutated |= writes
+                        elif writes:
+                            rebound.add(root)
+                        else:
+                            bound.add(root)
+                    case ForNode():
+                        bound.add(node.var)
+                    case CallNode() if node.function in self.analysis.action_nodes and node.function not in called:
+                        called.add(node.function)
+                        pending.append(self.analysis.action_nodes[node.function].body)
+
+        inner = dict(scope)
+        inner[loop.var] = set()
+        candidates: dict[tuple, ASTNode] = {}
+
+        def invariant(expression: ASTNode) -> bool:
+            for node in walk([expression]):
+                match node:
+                    case IdentifierNode():
+                        root, *path = node.name.split(".")
+                        if root in bound or root in self.locals:
+                            return False
+                        roots = self.analysis.roots(node.name, inner)
+                        if root in inner and not roots:
+                            return False # a local holding records that are not state: their writes are not tracked
+                        if roots & rebound:
+                            return False
+                        if roots & mutated and (path or not roots <= self.immutable):
+                            return False
+                    case CallNode() if node.function not in BUILTINS:
+                        return False
+                    case GenerateNode() | ListLiteralNode() | DictLiteralNode():
+                        return False # a new container each time it runs
+            return True
+
+        def collect(expression: ASTNode):
+            # Sub-expressions evaluated every time `expression` is; the right side of and/or may not be
+            if isinstance(expression, (BinaryExprNode, NotNode, CallNode)) and invariant(expression):
+                candidates.setdefault(expression_key(expression), expression)
+                return
+            match expression:
+                case BinaryExprNode(operator="and" | "or"):
+                    collect(expression.left)
+                case _:
+                    for child in expression.get_children():
+                        collect(child)
+
+        for statement in loop.body:
+            match statement:
+                case AssignmentNode():
+                    collect(statement.value)
+                case IfNode():
+                    collect(statement.condition)
+                case ForNode():
+                    collect(statement.iterable)
+                case _:
+                    collect(statement)
+        if not candidates:
+            return [loop]
+
+        body = loop.body
+        hoisted = []
+        for key, expression in candidates.items():
+            name = f"${self.temporaries}"
+            self.temporaries += 1
+            names = {node.name.split(".", 1)[0] for node in walk([expression]) if isinstance(node, IdentifierNode)}
+            body = substitute(body, key, names, name)
+            hoisted.append((name, expression))
+            self.record(expression, "hoist", f"`{describe(expression)}` is evaluated once per run of the loop "
+                                             f"over {loop.iterable.name} (as {name})")
+
+        line, indent = loop.line, loop.indent
+        wrapped: ASTNode = replace(loop, body=body)
+        for name, expression in reversed(hoisted):
+            wrapped = ForNode(line=line, indent=indent, var=name,
+                              iterable=ListLiteralNode(line=expression.line, indent=expression.indent, elements=[expression]),
+                              body=[wrapped])
+            wrapped.meta["optimized"] = f"`{describe(expression)}` hoisted out of the loop as {name}"
+        guard = IfNode(line=line, indent=indent, condition=loop.iterable, then_body=[wrapped], else_body=[loop])
+        guard.meta["optimized"] = f"loop invariants of the loop over {loop.iterable.name} evaluated before it"
+        return [guard]
+
+
+def walk(body: list[ASTNode]):
+    pending = list(body)
+    while pending:
+        node = pending.pop()
+        yield node
+        pending.extend(node.get_children())
+
+
+def substitute(body: list[ASTNode], key: tuple, names: set[str], name: str) -> list[ASTNode]:
+    """
+    `body` with every expression matching `key` read from the local `name` instead, except where a
+    nested loop rebinds one of the `names` it reads.
+    """
+    def expression(node: ASTNode) -> ASTNode:
+        if expression_key(node) == key:
+            return IdentifierNode(line=node.line, indent=node.indent, name=name)
+        match node:
+            case BinaryExprNode():
+                left, right = expression(node.left), expression(node.right)
+                return node if left is node.left and right is node.right else replace(node, left=left, right=right)
+            case NotNode():
+                operand = expression(node.operand)
+                return node if operand is node.operand else replace(node, operand=operand)
+            case CallNode():
+                args = [CallArg(arg.name, expression(arg.value)) for arg in node.args]
+                if all(new.value is old.value for new, old in zip(args, node.args)):
+                    return node
+                return replace(node, args=args)
+            case ListLiteralNode():
+                elements = [expression(element) for element in node.elements]
+                return node if all(new is old for new, old in zip(elements, node.elements)) else replace(node, elements=elements)
+            case DictLiteralNode():
+                entries = [DictEntry(entry.key, expression(entry.value)) for entry in node.entries]
+                if all(new.value is old.value for new, old in zip(entries, node.entries)):
+                    return node
+                return replace(node, entries=entries)
+        return node
+
+    def statement(node: ASTNode) -> ASTNode:
+        match node:
+            case AssignmentNode():
+                value = expression(node.value)
+                return node if value is node.value else replace(node, value=value)
+            case IfNode():
+                condition = expression(node.condition)
+                then_body, else_body = block(node.then_body), block(node.else_body)
+                if condition is node.condition and then_body is node.then_body and else_body is node.else_body:
+                    return node
+                return replace(node, condition=condition, then_body=then_body, else_body=else_body)
+            case ForNode():
+                iterable = expression(node.iterable)
+                body = node.body if node.var in names else block(node.body)
+                return node if iterable is node.iterable and body is node.body else replace(node, iterable=iterable, body=body)
+        return expression(node)
+
+    def block(statements: list[ASTNode]) -> list[ASTNode]:
+        result = [statement(node) for node in statements]
+        return statements if all(new is old for new, old in zip(result, statements)) else result
+
+    return block(body)
+
+
+def optimize_module(node: ModuleNode, state: dict, analysis: DependencyAnalysis) -> ModuleNode:
+    """
+    `node` with its rules and actions optimized against the module's initial `state` (see Optimizer).
+    """
+    return Optimizer(node, state, analysis).module()
@@ -0,0 +1,340 @@
+import gc
+import multiprocessing
+import os
+import weakref
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import TYPE_CHECKING, Any
+
+from siml.columnar import ColumnTable, VectorLoop, VectorCode, np
+from siml.compiler import STATE_SLOT
+from siml.interpreter import SimulationError
+from siml.tracer import Tracer, Level
+
+if TYPE_CHECKING:
+    from siml.runtime import Simulation
+
+MIN_PARALLEL_ROWS = 100_000 # smaller tables run in-process; a split costs two round trips per worker
+
+# Loop invariants sent to the workers as they are; anything else keeps the loop in-process
+PLAIN_TYPES = (type(None), bool, int, float, str)
+
+
+def plain_value(value: Any) -> bool:
+    if isinstance(value, PLAIN_TYPES):
+        return True
+    if type(value) is dict:
+        return all(type(key) is str and plain_value(item) for key, item in value.items())
+    if type(value) is list:
+        return all(plain_value(item) for item in value)
+    return False
+
+
+def available_cpus() -> int:
+    """
+    CPUs this process may run on: its affinity mask where the platform has one, else every CPU.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def release_segment(segment: shared_memory.SharedMemory, owner: int, segments: dict[int, str], key: int, released: list[str]):
+    # Runs as the column array is freed; forked workers inherit this finalizer but not the segment
+    if os.getpid() == owner:
+        segments.pop(key, None)
+        segment.close()
+        segment.unlink()
+        released.append(segment.name)
+
+
+def forget_table(tables: dict[int, list], key: int, token: int, forgotten: list[int]):
+    entry = tables.get(key)
+    if entry is not None and entry[1] == token:
+        del tables[key]
+    forgotten.append(token)
+
+
+@dataclass(slots=True)
+class Task:
+    """
+    One worker's share of a loop: rows [start, stop) of the table's columns, by segment name.
+    - columns: (field, segment, kind, dtype) for every field the loop touches that the table has
+    - table / strings: the table's token and the strings appended to its pool since the last task
+    - state / slots / size: the loop invariants and the length of the frame they go in
+    - released / forgotten: segments freed and tables dropped since the last task
+    """
+    module: str
+    loop: int
+    start: int
+    stop: int
+    length: int
+    columns: list[tuple[str, str, str, str]]
+    table: int
+    strings: list[str]
+    state: dict[str, Any]
+    slots: dict[int, Any]
+    size: int
+    released: list[str]
+    forgotten: list[int]
+
+
+class WorkerPool:
+    """
+    Runs large vectorized loops (see columnar.VectorCompiler) across forked worker processes.
+    - The columns a loop touches move into multiprocessing.shared_memory segments the first time;
+      writes in place keep them there, and a column replaced by a write (widened, or copied away from
+      a snapshot) moves again. A segment is freed with the last array over it.
+    - Each worker runs the loop's kernel, which it inherited when it was forked, over one contiguous
+      row range. Its writes go to private copies of its slices.
+    - Once every worker is done the writes are merged: each worker copies its slices into the shared
+      columns. The ranges are disjoint and rows never see each other's writes, so the result is the
+      one the whole loop would have produced in-process, bit for bit.
+    - A worker that would change the table's layout (add or widen a column, add to the string pool)
+      or that raises cancels the split; nothing has been written yet, and the loop runs in-process.
+    Workers start with the first split and are forked again when a module recompiles. `count` is
+    limited to the available CPUs; with only one, loops are never split.
+    """
+
+    def __init__(self, simulation: "Simulation", count: int):
+        if "fork" not in multiprocessing.get_all_start_methods():
+            raise SimulationError("workers > 1 needs the 'fork' start method, which this platform lacks")
+        self.simulation = simulation
+        self.tracer = Tracer("Workers")
+        cpus = available_cpus()
+        if count > cpus:
+            self.tracer.warn("Reducing workers from %d to %d, the number of available CPUs", count, cpus)
+        self.count = min(count, cpus)
+        self.processes: list = []
+        self.connections: list = []
+        # Module name -> the engine the workers were forked with
+        self.engines: dict[str, Any] = {}
+        # id(array) -> segment name, for every column array living in shared memory
+        self.segments: dict[int, str] = {}
+        # id(table) -> [weak reference, token, pool strings sent]
+        self.tables: dict[int, list] = {}
+        self.tokens = 0
+        self.released: list[str] = []
+        self.forgotten: list[int] = []
+        self.splits = 0
+        self.fallbacks = 0
+
+    def split(self, module: str, index: int, loop: VectorLoop) -> VectorCode:
+        kernel = loop.kernel
+        if self.count <= 1:
+            return kernel
+
+        def run_split(table, rows, frame):
+            if rows is not None or len(table) < MIN_PARALLEL_ROWS or not self.run(module, index, loop, table, frame):
+                kernel(table, rows, frame)
+        return run_split
+
+    def run(self, module: str, index: int, loop: VectorLoop, table: ColumnTable, frame: list) -> bool:
+        """
+        Run the loop across the workers; False when it has to run in-process instead.
+        """
+        kinds = table.kinds
+        if any(kinds.get(name) == "object" for name in loop.fields):
+            return False
+        state = frame[STATE_SLOT]
+        invariants = {name: state.get(name) for name in loop.state}
+        slots = {slot: frame[slot] for slot in loop.slots}
+        if not all(plain_value(value) for value in invariants.values()) or not all(plain_value(value) for value in slots.values()):
+            return False
+
+        runtime = self.simulation.module(module)
+        if self.processes and self.engines.get(module, runtime.engine) is not runtime.engine:
+            self.stop()
+        if not self.processes:
+            self.start()
+
+        columns = [(name, self.share(table, name, name in loop.writes), kinds[name], table.columns[name].dtype.str)
+                   for name in sorted(loop.fields) if name in table.columns]
+        token, strings = self.sync_pool(table)
+        # The finalizers hold these lists, so they are emptied rather than replaced
+        released, forgotten = self.released[:], self.forgotten[:]
+        del self.released[:], self.forgotten[:]
+        length = len(table)
+        bounds = [length * worker // self.count for worker in range(self.count + 1)]
+        for worker, connection in enumerate(self.connections):
+            connection.send(Task(module, index, bounds[worker], bounds[worker + 1], length, columns, token, strings,
+                                 invariants, slots, len(frame), released, forgotten))
+        replies = self.receive()
+
+        problem = next((detail for status, detail in replies if status != "done"), None)
+        if problem is not None:
+            for connection in self.connections:
+                connection.send("discard")
+            self.fallbacks += 1
+            if self.tracer.is_enabled_for(Level.DEBUG):
+                self.tracer.debug("Loop on line %d runs in-process: %s", loop.line, problem)
+            return False
+
+        for connection in self.connections:
+            connection.send("commit")
+        self.receive()
+        self.splits += 1
+        if runtime.changes is not None:
+            for _, changed in replies:
+                runtime.changes.update(changed)
+        return True
+
+    def share(self, table: ColumnTable, name: str, written: bool) -> str:
+        """
+        The segment holding the column, moving it into a new one when it is not in shared memory yet
+        or when the loop writes to it while another table holds the same array.
+        """
+        column = table.columns[name]
+        segment = self.segments.get(id(column))
+        if segment is not None and not (written and name in table.shared):
+            return segment
+
+        memory = shared_memory.SharedMemory(create=True, size=max(column.nbytes, 1))
+        array = np.ndarray(column.shape, dtype=column.dtype, buffer=memory.buf)
+        array[:] = column
+        table.columns[name] = array
+        table.shared.discard(name)
+        self.segments[id(array)] = memory.name
+        weakref.finalize(array, release_segment, memory, os.getpid(), self.segments, id(array), self.released)
+        return memory.name
+
+    def sync_pool(self, table: ColumnTable) -> tuple[int, list[str]]:
+        entry = self.tables.get(id(table))
+        if entry is None or entry[0]() is not table:
+            self.tokens += 1
+            entry = self.tables[id(table)] = [weakref.ref(table), self.tokens, 0]
+            weakref.finalize(table, forget_table, self.tables, id(table), self.tokens, self.forgotten)
+        strings = table.pool[entry[2]:]
+        entry[2] = len(table.pool)
+        return entry[1], strings
+
+    def receive(self) -> list:
+        try:
+            return [connection.recv() for connection in self.connections]
+        except (EOFError, OSError) as e:
+            self.stop()
+            raise SimulationError(f"A worker process exited: {e!r}") from e
+
+    def start(self):
+        context = multiprocessing.get_context("fork")
+        # Workers share this process's tracker; one of their own would unlink the segments when they exit
+        resource_tracker.ensure_running()
+        # Keep the heap out of the collector's way so the workers don't copy its pages on write
+        gc.freeze()
+        try:
+            for _ in range(self.count):
+                connection, child = context.Pipe()
+                process = context.Process(target=serve, args=(child, self.simulation, [*self.connections, connection]),
+                                          daemon=True)
+                process.start()
+                child.close()
+                self.processes.append(process)
+                self.connections.append(connection)
+        finally:
+            gc.unfreeze()
+        self.engines = {module.name: module.engine for module in self.simulation.modules}
+        # The workers have a fresh view of every table
+        self.tables.clear()
+        del self.released[:], self.forgotten[:]
+        if self.tracer.is_enabled_for(Level.INFO):
+            self.tracer.info("Started %d worker processes", self.count)
+
+    def stop(self):
+        for connection in self.connections:
+            try:
+                connection.send(None)
+                connection.close()
+            except OSError:
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        self.connections = []
+
+    def close(self):
+        self.stop()
+
+
+def serve(connection, simulation: "Simulation", inherited: list):
+    """
+    A worker's loop: run Tasks against the shared columns, then commit or discard what each wrote.
+    `inherited` are the parent's ends of the pipes, which the fork copied.
+    """
+    for other in inherited:
+        other.close()
+    segments: dict[str, shared_memory.SharedMemory] = {}
+    arrays: dict[str, Any] = {}
+    pools: dict[int, list] = {}
+    pending: list = []
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        if message == "commit":
+            for column, start, stop, values in pending:
+                column[start:stop] = values
+            pending = []
+            connection.send(None)
+            continue
+        if message == "discard":
+            pending = []
+            continue
+
+        task = message
+        for name in task.released:
+            arrays.pop(name, None)
+            segment = segments.pop(name, None)
+            if segment is not None:
+                segment.close()
+        for token in task.forgotten:
+            pools.pop(token, None)
+
+        window = ColumnTable(task.stop - task.start)
+        columns = {}
+        for name, segment, kind, dtype in task.columns:
+            array = arrays.get(segment)
+            if array is None:
+                segments[segment] = shared_memory.SharedMemory(name=segment)
+                array = arrays[segment] = np.ndarray(task.length, dtype=dtype, buffer=segments[segment].buf)
+            columns[name] = array
+            window.columns[name] = array[task.start:task.stop]
+            window.kinds[name] = kind
+        pool = pools.get(task.table)
+        if pool is None:
+            pool = pools[task.table] = [[], {}, None]
+        if task.strings:
+            for string in task.strings:
+                pool[1][string] = len(pool[0])
+                pool[0].append(string)
+            pool[2] = None
+        window.pool, window.pool_index, window.pool_cache = pool
+        window.shared = set(window.columns)
+        window.shared_pool = True
+        connection.send(run_task(simulation, task, window, columns, pool, pending))
+
+
+def run_task(simulation: "Simulation", task: Task, window: ColumnTable, columns: dict, pool: list, pending: list) -> tuple:
+    module = simulation.module(task.module)
+    loop = module.engine.loops[task.loop]
+    frame = [None] * task.size
+    frame[STATE_SLOT] = task.state
+    for slot, value in task.slots.items():
+        frame[slot] = value
+    kinds = dict(window.kinds)
+    changes = module.changes
+    if changes is not None:
+        changes.clear()
+
+    try:
+        loop.kernel(window, None, frame)
+    except Exception as e:
+        return "failed", f"rows {task.start}-{task.stop} raised {type(e).__name__}: {e}"
+    if window.kinds != kinds or window.present or not window.shared_pool:
+        return "changed", f"rows {task.start}-{task.stop} change the table's layout"
+
+    pool[2] = window.pool_cache
+    pending.extend((columns[name], task.start, task.stop, window.columns[name])
+                   for name in window.columns if name not in window.shared)
+    return "done", set(changes) if changes is not None else set()
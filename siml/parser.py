@@ -0,0 +1,1100 @@
+import marshal
+import os
+from array import array
+from collections import deque
+from typing import Any, Callable, Iterable, Iterator
+
+from siml.tracer import Tracer
+from siml.token import Token
+from siml.token_buffer import TokenBuffer, TokenSlice
+from siml.token_types import TokenType
+from siml.tokenizer import Tokenizer
+from siml.ast_nodes import (
+    ASTNode, DictEntry, StringNode, NumberNode, BooleanNode, NullNode,
+    DictLiteralNode, ListLiteralNode, DataNode, IdentifierNode, BinaryExprNode, NotNode,
+    CallArg, CallNode, GenerateNode, IfNode, ForNode, AssignmentNode,
+    SimulationNode, ModuleNode, StateVarNode, ActionNode, RuleNode,
+    TemplateNode, AgentNode, LeafPool,
+)
+
+WORD_TYPES = (TokenType.IDENTIFIER, TokenType.KEYWORD)
+LITERAL_TYPES = (TokenType.NUMBER, TokenType.STRING, TokenType.BOOLEAN, TokenType.NULL)
+MAX_KEY_WORDS = 3 # longest key is e.g. `export action:`; bounds the lookahead for keys
+
+NOT_PRECEDENCE = 3
+ADDITIVE_PRECEDENCE = 5
+BINARY_PRECEDENCE = {
+    TokenType.OR: 1,
+    TokenType.AND: 2,
+    TokenType.EQUAL_EQUAL: 4,
+    TokenType.NOT_EQUAL: 4,
+    TokenType.LESS_THAN: 4,
+    TokenType.LESS_EQUAL: 4,
+    TokenType.GREATER_THAN: 4,
+    TokenType.GREATER_EQUAL: 4,
+    TokenType.PLUS: ADDITIVE_PRECEDENCE,
+    TokenType.MINUS: ADDITIVE_PRECEDENCE,
+    TokenType.MULTIPLY: 6,
+    TokenType.DIVIDE: 6,
+    TokenType.MODULO: 6,
+    TokenType.POWER: 7,
+}
+
+GENERATOR_FUNCTIONS = {"synthesize", "generate"}
+NOT_LITERAL = object() # literal_value() of an expression
+MODULE_KEYS = {"id", "name", "import", "state", "actions", "rules", "templates"}
+
+
+class ParseError(SyntaxError):
+    def __init__(self, message: str, line: int):
+        super().__init__(f"{message} on line {line}")
+        self.message = message
+        self.line = line
+
+
+def describe(token: Token | None) -> str:
+    if token is None:
+        return "end of file"
+    if token.type in (TokenType.INDENT, TokenType.DEDENT):
+        return token.type.name
+    return repr(token.value)
+
+
+class Parser:
+    """
+    Recursive-descent parser from a token stream to the ast_nodes tree.
+    - Tokens are pulled lazily from any iterable (Tokenizer, list, TokenCursor), with no
+      backtracking, so parsing is linear in the number of tokens. Lookahead is at most
+      MAX_KEY_WORDS + 1 tokens, except that an inline list in a data block (`ids: [1, 2, 3]`)
+      is read ahead to the end of its line to tell a flat literal list from an expression.
+      A TokenBuffer or TokenSlice is read through a TokenCursor, which builds each Token only
+      as it is pulled.
+    - Errors are collected in `errors`; the offending line and any block nested
+      under it are skipped and parsing resumes with the next sibling entry.
+    - Top-level module keys (state:, actions:, ...) outside a `simulation:` block
+      are collected into an implicit module named `module_name`.
+    - shared_leaves=True builds null, boolean and small integer literals from a
+      LeafPool, so identical leaves are one shared (position-less) instance.
+    - literal_state=True reads indented `state:` blocks into DataNodes instead of
+      literal nodes (see parse_state_value).
+    """
+
+    def __init__(self, tokens: Iterable[Token] | TokenBuffer | TokenSlice, module_name: str = "main", max_errors: int = 100,
+                 shared_leaves: bool = False, literal_state: bool = True):
+        if isinstance(tokens, (TokenBuffer, TokenSlice)):
+            tokens = tokens.cursor()
+        self.tokens: Iterator[Token] = iter(tokens)
+        self.lookahead: deque[Token] = deque()
+        self.module_name = module_name
+        self.max_errors = max_errors
+        self.leaves = LeafPool() if shared_leaves else None
+        self.literal_state = literal_state
+        self.strings: dict[str, str] = {}
+        self.errors: list[ParseError] = []
+        self.tracer = Tracer("Parser")
+        self.tok: Token | None = None
+        self.prev_line = 1
+        self.consumed = 0
+        self.advance()
+
+    @classmethod
+    def from_source(cls, source: str, module_name: str = "main") -> "Parser":
+        return cls(Tokenizer(source), module_name=module_name)
+
+    @classmethod
+    def from_path(cls, path: str | os.PathLike, use_mmap: bool = False) -> "Parser":
+        module_name = os.path.splitext(os.path.basename(path))[0]
+        return cls(Tokenizer.from_path(path, use_mmap=use_mmap), module_name=module_name)
+
+    # Token stream
+
+    def _pull(self) -> Token | None:
+        try:
+            return next(self.tokens)
+        except StopIteration:
+            return None
+        except SyntaxError as e:
+            # Raised by the tokenizer; it cannot resume, so treat it as end of input
+            self.tokens = iter(())
+            self.errors.append(ParseError(str(e), self.prev_line))
+            return None
+
+    def advance(self) -> Token | None:
+        previous = self.tok
+        if previous is not None:
+            if previous.type is not TokenType.INDENT and previous.type is not TokenType.DEDENT:
+                # DEDENTs carry the line of the next line; only real tokens move prev_line
+                self.prev_line = previous.line
+            self.consumed += 1
+        self.tok = self.lookahead.popleft() if self.lookahead else self._pull()
+        return previous
+
+    def peek(self, offset: int = 1) -> Token | None:
+        while len(self.lookahead) < offset:
+            token = self._pull()
+            if token is None:
+                return None
+            self.lookahead.append(token)
+        return self.lookahead[offset - 1]
+
+    def check(self, *types: TokenType) -> bool:
+        return self.tok is not None and self.tok.type in types
+
+    def check_word(self, word: str) -> bool:
+        return self.tok is not None and self.tok.type in WORD_TYPES and self.tok.value == word
+
+    def on_line(self, line: int) -> bool:
+        tok = self.tok
+        return tok is not None and tok.line == line and tok.type not in (TokenType.INDENT, TokenType.DEDENT)
+
+    def block_follows(self, owner_indent: int) -> bool:
+        return self.check(TokenType.INDENT) and self.tok.indent > owner_indent
+
+    def error(self, message: str, line: int | None = None) -> ParseError:
+        if line is None:
+            line = self.tok.line if self.tok is not None else self.prev_line
+        return ParseError(message, line)
+
+    def found(self, line: int) -> str:
+        return describe(self.tok) if self.on_line(line) else "end of line"
+
+    def expect(self, token_type: TokenType, what: str, line: int) -> Token:
+        if not self.on_line(line) or self.tok.type is not token_type:
+            raise self.error(f"Expected {what} but found {self.found(line)}", line)
+        return self.advance()
+
+    def expect_word(self, line: int, what: str = "a name") -> str:
+        if not self.on_line(line) or self.tok.type not in WORD_TYPES:
+            raise self.error(f"Expected {what} but found {self.found(line)}", line)
+        return self.advance().value
+
+    def end_line(self, line: int):
+        if self.on_line(line):
+            raise self.error(f"Unexpected {describe(self.tok)}", line)
+
+    def mark_end(self, node: ASTNode) -> ASTNode:
+        """
+        Record the last line of a list item in meta["end_line"], for incremental re-parsing.
+        """
+        node.meta["end_line"] = self.prev_line
+        return node
+
+    # Error recovery
+
+    def record(self, error: ParseError):
+        self.errors.append(error)
+        self.tracer.failure("%s", error)
+        if len(self.errors) >= self.max_errors:
+            self.errors.append(ParseError("Too many errors, giving up", error.line))
+            self.tokens = iter(())
+            self.lookahead.clear()
+            self.tok = None
+
+    def skip_block(self):
+        depth = 0
+        while self.tok is not None:
+            token = self.advance()
+            if token.type is TokenType.INDENT:
+                depth += 1
+            elif token.type is TokenType.DEDENT:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def synchronize(self, line: int):
+        """
+        Skip the rest of `line` and any block nested under it.
+        Always consumes at least one token unless the enclosing block is ending.
+        """
+        start = self.consumed
+        while self.on_line(line):
+            self.advance()
+        if self.check(TokenType.INDENT):
+            self.skip_block()
+        if self.consumed == start and self.tok is not None and not self.check(TokenType.DEDENT):
+            self.advance()
+
+    def guarded(self, parse_entry: Callable[[], None]):
+        start = self.tok.line
+        try:
+            parse_entry()
+        except ParseError as e:
+            self.record(e)
+            self.synchronize(max(start, e.line))
+
+    # Blocks and entries
+
+    def parse_block(self, parse_entry: Callable[[], None]):
+        """
+        Parse an INDENT ... DEDENT block, calling parse_entry once per entry.
+        """
+        self.advance() # INDENT
+        while self.tok is not None and not self.check(TokenType.DEDENT):
+            if self.check(TokenType.INDENT):
+                self.record(self.error("Unexpected indentation"))
+                self.skip_block()
+                continue
+            self.guarded(parse_entry)
+        if self.check(TokenType.DEDENT):
+            self.advance()
+
+    def key_length(self) -> int:
+        """
+        Number of words making up a `key:` at the current token, or 0 if the line does not start with a key.
+        """
+        tok = self.tok
+        if tok is None or tok.type not in WORD_TYPES:
+            return 0
+        for offset in range(1, MAX_KEY_WORDS + 1):
+            token = self.peek(offset)
+            if token is None or token.line != tok.line:
+                return 0
+            if token.type is TokenType.COLON:
+                return offset
+            if token.type not in WORD_TYPES:
+                return 0
+        return 0
+
+    def read_key(self) -> str:
+        length = self.key_length()
+        if not length:
+            raise self.error(f"Expected 'key:' but found {describe(self.tok)}")
+        words = [self.advance().value for _ in range(length)]
+        self.advance() # COLON
+        return " ".join(words)
+
+    def parse_entry_line(self, parse_entry: Callable[[str, Token, int], None], owner_indent: int):
+        key_token = self.tok
+        key = self.read_key()
+        parse_entry(key, key_token, owner_indent)
+        self.end_line(key_token.line)
+
+    def parse_entries(self, parse_entry: Callable[[str, Token, int], None]):
+        """
+        Parse an indented block of `key: value` lines.
+        parse_entry(key, key_token, owner_indent) is called with the token stream just past the colon.
+        """
+        self.parse_block(lambda: self.parse_entry_line(parse_entry, self.tok.indent))
+
+    def parse_item(self, parse_entry: Callable[[str, Token, int], None]) -> Token:
+        """
+        Parse a `- key: value` list item whose sibling keys follow in an indented block.
+        Returns the dash token.
+        """
+        dash = self.advance()
+        self.parse_entry_line(parse_entry, dash.indent + 2)
+        if self.check(TokenType.INDENT):
+            self.parse_entries(parse_entry)
+        return dash
+
+    def parse_list(self, owner_indent: int, parse_element: Callable[[], None], what: str):
+        """
+        Parse an indented block of `- ...` items.
+        """
+        if not self.block_follows(owner_indent):
+            return
+
+        def parse_dash_element():
+            if not self.check(TokenType.MINUS):
+                raise self.error(f"Expected '- {what}' but found {describe(self.tok)}")
+            parse_element()
+
+        self.parse_block(parse_dash_element)
+
+    def read_rest(self, line: int, separator: str = "") -> str:
+        """
+        Join the raw values of the remaining tokens on `line`, e.g. for paths and triggers.
+        """
+        parts = []
+        while self.on_line(line):
+            parts.append(str(self.advance().value))
+        if not parts:
+            raise self.error("Expected a value", line)
+        return separator.join(parts)
+
+    def read_names(self, owner_indent: int, line: int) -> list[str]:
+        """
+        Read a list of names, either inline (`[a, b]` or `a, b`) or as a block of `- name` items.
+        """
+        names = []
+        if self.on_line(line):
+            bracketed = self.check(TokenType.LBRACKET)
+            if bracketed:
+                self.advance()
+            while self.on_line(line) and not self.check(TokenType.RBRACKET):
+                names.append(self.read_dotted(line))
+                if not self.check(TokenType.COMMA):
+                    break
+                self.advance()
+            if bracketed:
+                self.expect(TokenType.RBRACKET, "']'", line)
+            return names
+
+        def parse_name():
+            dash = self.advance()
+            names.append(self.read_dotted(dash.line))
+            self.end_line(dash.line)
+
+        self.parse_list(owner_indent, parse_name, "name")
+        return names
+
+    def read_dotted(self, line: int) -> str:
+        if self.on_line(line) and self.check(TokenType.STRING):
+            return self.advance().value
+        parts = [self.expect_word(line)]
+        while self.on_line(line) and self.check(TokenType.DOT):
+            self.advance()
+            parts.append(self.expect_word(line))
+        return ".".join(parts)
+
+    # Program structure
+
+    def parse(self) -> SimulationNode:
+        simulation = SimulationNode(line=1, indent=0)
+        implicit: list[ModuleNode] = []
+
+        def parse_top_level():
+            self.parse_entry_line(lambda key, token, indent: self.parse_top_level_entry(simulation, implicit, key, token, indent), 0)
+
+        while self.tok is not None:
+            if self.check(TokenType.INDENT, TokenType.DEDENT):
+                if self.tok.type is TokenType.INDENT:
+                    self.record(self.error("Unexpected indentation"))
+                self.advance()
+                continue
+            self.guarded(parse_top_level)
+
+        self.tracer.info("Parsed %d modules with %d errors", len(simulation.modules), len(self.errors))
+        return simulation
+
+    def implicit_module(self, simulation: SimulationNode, implicit: list[ModuleNode], token: Token) -> ModuleNode:
+        if not implicit:
+            implicit.append(ModuleNode(line=token.line, indent=0, name=self.module_name, state=[]))
+            simulation.modules.append(implicit[0])
+        return implicit[0]
+
+    def parse_top_level_entry(self, simulation: SimulationNode, implicit: list[ModuleNode], key: str, token: Token, indent: int):
+        match key:
+            case "simulation":
+                simulation.line = token.line
+                if self.block_follows(indent):
+                    self.parse_entries(lambda k, t, i: self.parse_simulation_entry(simulation, k, t, i))
+
+            case "config" | "agents" | "modules":
+                self.parse_simulation_entry(simulation, key, token, indent)
+
+            case "module":
+                simulation.modules.append(self.parse_module_value(token, indent))
+
+            case "export action" | "export template" | "export rule":
+                module = self.implicit_module(simulation, implicit, token)
+                kind = key.split()[1]
+                node = self.parse_export(kind, token, indent)
+                node.meta["export"] = True
+                getattr(module, f"{kind}s").append(node)
+
+            case _ if key in MODULE_KEYS:
+                module = self.implicit_module(simulation, implicit, token)
+                self.parse_module_entry(module, key, token, indent)
+
+            case _:
+                raise self.error(f"Unknown top-level key '{key}'", token.line)
+
+    def parse_simulation_entry(self, simulation: SimulationNode, key: str, token: Token, indent: int):
+        match key:
+            case "config":
+                config = self.parse_value(indent, token.line)
+                if not isinstance(config, DictLiteralNode):
+                    raise self.error("'config:' must be a mapping", token.line)
+                simulation.config = config
+
+            case "agents":
+                self.parse_list(indent, lambda: simulation.agents.append(self.parse_agent()), "agent: ...")
+
+            case "modules":
+                self.parse_list(indent, lambda: simulation.modules.append(self.parse_module_item()), "module: ...")
+
+            case _:
+                raise self.error(f"Unknown simulation key '{key}'", token.line)
+
+    def parse_module_item(self) -> ModuleNode:
+        dash = self.advance()
+        if self.key_length():
+            token = self.tok
+            key = self.read_key()
+            if key != "module":
+                raise self.error(f"Expected 'module:' but found '{key}:'", token.line)
+            module = self.parse_module_value(token, dash.indent + 2)
+            self.end_line(token.line)
+            return self.mark_end(module)
+
+        path = self.read_rest(dash.line)
+        return self.mark_end(ModuleNode(line=dash.line, indent=dash.indent, name=path, state=[], path=path))
+
+    def parse_module_value(self, token: Token, indent: int) -> ModuleNode:
+        if self.on_line(token.line):
+            path = self.read_rest(token.line)
+            return ModuleNode(line=token.line, indent=indent, name=path, state=[], path=path)
+
+        module = ModuleNode(line=token.line, indent=indent, name="", state=[])
+        if self.block_follows(indent):
+            self.parse_entries(lambda k, t, i: self.parse_module_entry(module, k, t, i))
+        if not module.name:
+            raise self.error("Module is missing an 'id:'", token.line)
+
+        self.tracer.info("Parsed module %s", module.name)
+        return module
+
+    def parse_module_entry(self, module: ModuleNode, key: str, token: Token, indent: int):
+        line = token.line
+        match key:
+            case "id" | "name":
+                module.name = self.read_dotted(line)
+
+            case "import":
+                module.imports.extend(self.read_paths(indent, line))
+
+            case "state":
+                self.parse_state(module, indent, line)
+
+            case "actions":
+                self.parse_list(indent, lambda: module.actions.append(self.parse_action()), "action: ...")
+
+            case "rules":
+                self.parse_list(indent, lambda: module.rules.append(self.parse_rule()), "trigger: ...")
+
+            case "templates":
+                self.parse_list(indent, lambda: module.templates.append(self.parse_template()), "template: ...")
+
+            case _:
+                raise self.error(f"Unknown module key '{key}'", line)
+
+    def read_paths(self, indent: int, line: int) -> list[str]:
+        paths = []
+        if self.on_line(line):
+            paths.append(self.read_rest(line))
+            return paths
+
+        def parse_path():
+            dash = self.advance()
+            paths.append(self.read_rest(dash.line))
+
+        self.parse_list(indent, parse_path, "path")
+        return paths
+
+    def parse_state(self, module: ModuleNode, indent: int, line: int):
+        if self.on_line(line):
+            raise self.error("'state:' must be followed by an indented block", line)
+        if not self.block_follows(indent):
+            return
+
+        def add_var(key: str, token: Token, owner_indent: int):
+            value = self.parse_state_value(owner_indent, token.line)
+            module.state.append(StateVarNode(line=token.line, indent=token.indent, name=key, value=value))
+
+        def parse_var():
+            if self.check(TokenType.MINUS):
+                dash = self.advance()
+                self.parse_entry_line(add_var, dash.indent + 2)
+            else:
+                self.parse_entry_line(add_var, self.tok.indent)
+
+        self.parse_block(parse_var)
+
+    def parse_agent(self) -> AgentNode:
+        fields = {"name": None, "iterator_var": None, "iterable": None, "llm_config": None, "context": None, "can_call": []}
+
+        def parse_entry(key: str, token: Token, indent: int):
+            line = token.line
+            match key:
+                case "agent" | "name":
+                    fields["name"] = self.read_dotted(line)
+                case "for each":
+                    fields["iterator_var"] = self.expect_word(line, "a loop variable")
+                    if not self.check_word("in"):
+                        raise self.error("Expected 'in'", line)
+                    self.advance()
+                    fields["iterable"] = self.read_rest(line)
+                case "llm" | "context":
+                    value = self.parse_value(indent, line)
+                    if not isinstance(value, DictLiteralNode):
+                        raise self.error(f"'{key}:' must be a mapping", line)
+                    fields["llm_config" if key == "llm" else "context"] = value
+                case "can_call":
+                    fields["can_call"] = self.read_names(indent, line)
+                case _:
+                    raise self.error(f"Unknown agent key '{key}'", line)
+
+        dash = self.parse_item(parse_entry)
+        if fields["name"] is None:
+            raise self.error("Agent is missing a name", dash.line)
+
+        return self.mark_end(AgentNode(line=dash.line, indent=dash.indent, **fields))
+
+    def parse_action_entries(self, fields: dict) -> Callable[[str, Token, int], None]:
+        def parse_entry(key: str, token: Token, indent: int):
+            line = token.line
+            match key:
+                case "action" | "name":
+                    fields["name"] = self.read_dotted(line)
+                case "with":
+                    fields["params"] = self.read_names(indent, line)
+                case "do":
+                    fields["body"] = self.parse_statements(indent, line)
+                case _:
+                    raise self.error(f"Unknown action key '{key}'", line)
+        return parse_entry
+
+    def parse_rule_entries(self, fields: dict) -> Callable[[str, Token, int], None]:
+        def parse_entry(key: str, token: Token, indent: int):
+            line = token.line
+            match key:
+                case "trigger":
+                    fields["trigger"] = self.read_rest(line, " ")
+                case "do":
+                    fields["body"] = self.parse_statements(indent, line)
+                case _:
+                    raise self.error(f"Unknown rule key '{key}'", line)
+        return parse_entry
+
+    def parse_template_entries(self, fields: dict) -> Callable[[str, Token, int], None]:
+        def parse_entry(key: str, token: Token, indent: int):
+            if key in ("template", "name"):
+                fields["name"] = self.read_dotted(token.line)
+            else:
+                fields["entries"].append(DictEntry(key, self.parse_value(indent, token.line)))
+        return parse_entry
+
+    def parse_action(self) -> ActionNode:
+        fields = {"name": None, "params": [], "body": []}
+        dash = self.parse_item(self.parse_action_entries(fields))
+        return self.mark_end(self.build_action(fields, dash))
+
+    def parse_rule(self) -> RuleNode:
+        fields = {"trigger": None, "body": []}
+        dash = self.parse_item(self.parse_rule_entries(fields))
+        return self.mark_end(self.build_rule(fields, dash))
+
+    def parse_template(self) -> TemplateNode:
+        fields = {"name": None, "entries": []}
+        dash = self.parse_item(self.parse_template_entries(fields))
+        return self.mark_end(self.build_template(fields, dash))
+
+    def build_action(self, fields: dict, token: Token) -> ActionNode:
+        if fields["name"] is None:
+            raise self.error("Action is missing a name", token.line)
+        return ActionNode(line=token.line, indent=token.indent, **fields)
+
+    def build_rule(self, fields: dict, token: Token) -> RuleNode:
+        if fields["trigger"] is None:
+            raise self.error("Rule is missing a 'trigger:'", token.line)
+        return RuleNode(line=token.line, indent=token.indent, **fields)
+
+    def build_template(self, fields: dict, token: Token) -> TemplateNode:
+        if fields["name"] is None:
+            raise self.error("Template is missing a name", token.line)
+        schema = DictLiteralNode(line=token.line, indent=token.indent, entries=fields["entries"])
+        return TemplateNode(line=token.line, indent=token.indent, name=fields["name"], scema=schema)
+
+    def parse_export(self, kind: str, token: Token, indent: int) -> ASTNode:
+        """
+        Parse `export action:` / `export template:` / `export rule:` blocks from shared files.
+        """
+        if not self.block_follows(indent):
+            raise self.error(f"'export {kind}:' must be followed by an indented block", token.line)
+
+        match kind:
+            case "action":
+                fields = {"name": None, "params": [], "body": []}
+                self.parse_entries(self.parse_action_entries(fields))
+                return self.build_action(fields, token)
+            case "template":
+                fields = {"name": None, "entries": []}
+                self.parse_entries(self.parse_template_entries(fields))
+                return self.build_template(fields, token)
+            case _:
+                fields = {"trigger": None, "body": []}
+                self.parse_entries(self.parse_rule_entries(fields))
+                return self.build_rule(fields, token)
+
+    # Statements
+
+    def parse_statements(self, owner_indent: int, line: int) -> list[ASTNode]:
+        if self.on_line(line):
+            raise self.error("Expected an indented block of statements", line)
+        body: list[ASTNode] = []
+        self.parse_list(owner_indent, lambda: self.parse_statement(body), "statement")
+        return body
+
+    def parse_statement(self, body: list[ASTNode]):
+        dash = self.advance()
+        line = dash.line
+        tok = self.tok
+        if not self.on_line(line):
+            raise self.error("Expected a statement after '-'", line)
+
+        if self.check_word("if"):
+            self.advance()
+            condition = self.parse_expression(line)
+            self.expect(TokenType.COLON, "':'", line)
+            then_body = self.parse_statements(dash.indent, line)
+            body.append(IfNode(line=line, indent=dash.indent, condition=condition, then_body=then_body))
+            return
+
+        key = self.read_key() if self.key_length() else None
+        match key:
+            case "else":
+                if not body or not isinstance(body[-1], IfNode) or body[-1].else_body:
+                    raise self.error("'else:' without a matching 'if'", line)
+                body[-1].else_body = self.parse_statements(dash.indent, line)
+
+            case "for each":
+                var = self.expect_word(line, "a loop variable")
+                if not self.check_word("in"):
+                    raise self.error("Expected 'in'", line)
+                self.advance()
+                iterable = self.parse_expression(line)
+                if self.on_line(line) and self.check(TokenType.COLON):
+                    self.advance()
+                loop_body = self.parse_statements(dash.indent, line)
+                body.append(ForNode(line=line, indent=dash.indent, var=var, iterable=iterable, body=loop_body))
+
+            case "set":
+                target = self.read_dotted(line)
+                self.expect(TokenType.EQUALS, "'='", line)
+                value = self.parse_expression(line)
+                self.end_line(line)
+                body.append(AssignmentNode(line=line, indent=dash.indent, target=target, value=value))
+
+            case "call":
+                function = self.read_dotted(line)
+                args = self.parse_with_args(line)
+                body.append(CallNode(line=line, indent=dash.indent, function=function, args=args))
+
+            case "prompt agent":
+                agent = self.read_dotted(line)
+                args = [CallArg("agent", StringNode(line=line, indent=dash.indent, value=agent))]
+                args.extend(self.parse_with_args(line))
+                body.append(CallNode(line=line, indent=dash.indent, function="prompt_agent", args=args))
+
+            case None:
+                body.append(self.parse_expression(line))
+                self.end_line(line)
+
+            case _:
+                raise self.error(f"Unknown statement '{key}:'", tok.line)
+
+    def parse_with_args(self, line: int) -> list[CallArg]:
+        if not self.on_line(line):
+            return []
+        if not self.check_word("with") or self.key_length() != 1:
+            raise self.error(f"Expected 'with:' but found {self.found(line)}", line)
+        self.read_key()
+        args = self.parse_arguments(line, TokenType.COMMA)
+        self.end_line(line)
+        return args
+
+    # Expressions
+
+    def parse_arguments(self, line: int, separator: TokenType, closing: TokenType | None = None) -> list[CallArg]:
+        args = []
+        while self.on_line(line) and (closing is None or not self.check(closing)):
+            name = None
+            if self.check(*WORD_TYPES):
+                following = self.peek()
+                if following is not None and following.line == line and following.type is TokenType.EQUALS:
+                    name = self.advance().value
+                    self.advance()
+            args.append(CallArg(name, self.parse_expression(line)))
+            if not (self.on_line(line) and self.check(separator)):
+                break
+            self.advance()
+        return args
+
+    def parse_expression(self, line: int, min_precedence: int = 1, left: ASTNode | None = None) -> ASTNode:
+        """
+        Precedence-climbing expression parser bounded to a single line.
+        """
+        if left is None:
+            left = self.parse_unary(line)
+
+        while self.on_line(line):
+            tok = self.tok
+            precedence = BINARY_PRECEDENCE.get(tok.type)
+
+            if precedence is None:
+                # `a -1` lexes as IDENTIFIER NUMBER(-1): treat it as a subtraction
+                if tok.type is TokenType.NUMBER and tok.value < 0 and ADDITIVE_PRECEDENCE >= min_precedence:
+                    self.advance()
+                    operand = self.number_node(-tok.value, tok.line, tok.indent)
+                    right = self.parse_expression(line, ADDITIVE_PRECEDENCE + 1, operand)
+                    left = BinaryExprNode(line=tok.line, indent=tok.indent, left=left, operator="-", right=right)
+                    continue
+                break
+
+            if precedence < min_precedence:
+                break
+
+            self.advance()
+            # ** is right-associative, everything else left-associative
+            next_precedence = precedence if tok.type is TokenType.POWER else precedence + 1
+            right = self.parse_expression(line, next_precedence)
+            left = BinaryExprNode(line=tok.line, indent=tok.indent, left=left, operator=tok.value, right=right)
+
+        return left
+
+    def parse_unary(self, line: int) -> ASTNode:
+        tok = self.tok
+        if self.on_line(line) and self.check_word("not"):
+            self.advance()
+            operand = self.parse_expression(line, NOT_PRECEDENCE)
+            return NotNode(line=tok.line, indent=tok.indent, operand=operand)
+
+        if self.on_line(line) and self.check(TokenType.MINUS):
+            self.advance()
+            operand = self.parse_expression(line, BINARY_PRECEDENCE[TokenType.POWER])
+            if isinstance(operand, NumberNode):
+                return self.number_node(-operand.value, tok.line, tok.indent)
+            zero = NumberNode(line=tok.line, indent=tok.indent, value=0)
+            return BinaryExprNode(line=tok.line, indent=tok.indent, left=zero, operator="-", right=operand)
+
+        return self.parse_primary(line)
+
+    def parse_primary(self, line: int) -> ASTNode:
+        if not self.on_line(line):
+            raise self.error(f"Expected an expression but found {self.found(line)}", line)
+
+        tok = self.tok
+        match tok.type:
+            case TokenType.NUMBER:
+                self.advance()
+                return self.number_node(tok.value, tok.line, tok.indent)
+
+            case TokenType.STRING:
+                self.advance()
+                return StringNode(line=tok.line, indent=tok.indent, value=tok.value)
+
+            case TokenType.BOOLEAN:
+                self.advance()
+                if self.leaves is not None:
+                    return self.leaves.boolean(tok.value, tok.line, tok.indent)
+                return BooleanNode(line=tok.line, indent=tok.indent, value=tok.value)
+
+            case TokenType.NULL:
+                self.advance()
+                return self.null_node(tok.line, tok.indent)
+
+            case TokenType.LPAREN:
+                self.advance()
+                expression = self.parse_expression(line)
+                self.expect(TokenType.RPAREN, "')'", line)
+                return expression
+
+            case TokenType.LBRACKET:
+                self.advance()
+                elements = []
+                while self.on_line(line) and not self.check(TokenType.RBRACKET):
+                    elements.append(self.parse_expression(line))
+                    if not (self.on_line(line) and self.check(TokenType.COMMA)):
+                        break
+                    self.advance()
+                self.expect(TokenType.RBRACKET, "']'", line)
+                return ListLiteralNode(line=tok.line, indent=tok.indent, elements=elements)
+
+            case TokenType.IDENTIFIER | TokenType.KEYWORD:
+                name = self.read_dotted(line)
+                if not (self.on_line(line) and self.check(TokenType.LPAREN)):
+                    return IdentifierNode(line=tok.line, indent=tok.indent, name=name)
+
+                self.advance()
+                args = self.parse_arguments(line, TokenType.COMMA, TokenType.RPAREN)
+                self.expect(TokenType.RPAREN, "')'", line)
+                if name in GENERATOR_FUNCTIONS:
+                    return self.build_generate(name, args, tok)
+                return CallNode(line=tok.line, indent=tok.indent, function=name, args=args)
+
+            case _:
+                raise self.error(f"Unexpected {describe(tok)}", line)
+
+    def build_generate(self, name: str, args: list[CallArg], tok: Token) -> GenerateNode:
+        if not 1 <= len(args) <= 2 or not isinstance(args[0].value, (IdentifierNode, StringNode)):
+            raise self.error(f"{name}() expects (template, count)", tok.line)
+        template = args[0].value
+        template_name = template.name if isinstance(template, IdentifierNode) else template.value
+        multiplier = args[1].value if len(args) == 2 else None
+        return GenerateNode(line=tok.line, indent=tok.indent, template=template_name, multiplier=multiplier)
+
+    def number_node(self, value: int | float, line: int, indent: int) -> NumberNode:
+        if self.leaves is not None:
+            return self.leaves.number(value, line, indent)
+        return NumberNode(line=line, indent=indent, value=value)
+
+    def null_node(self, line: int, indent: int) -> NullNode:
+        if self.leaves is not None:
+            return self.leaves.null(line, indent)
+        return NullNode(line=line, indent=indent)
+
+    # Data values
+
+    def parse_value(self, owner_indent: int, line: int) -> ASTNode:
+        """
+        Parse the value after `key:`: an inline expression, an indented mapping or list, or null when empty.
+        """
+        if self.on_line(line):
+            return self.parse_expression(line)
+        if self.block_follows(owner_indent):
+            return self.parse_data_block()
+        return self.null_node(line, owner_indent)
+
+    def parse_data_block(self) -> ASTNode:
+        start = self.peek()
+        if start is not None and start.type is TokenType.MINUS:
+            node = ListLiteralNode(line=start.line, indent=start.indent)
+
+            def parse_element():
+                if not self.check(TokenType.MINUS):
+                    raise self.error(f"Expected '-' but found {describe(self.tok)}")
+                node.elements.append(self.parse_data_item())
+
+            self.parse_block(parse_element)
+            return node
+
+        line = start.line if start is not None else self.prev_line
+        node = DictLiteralNode(line=line, indent=self.tok.indent)
+        self.parse_entries(lambda key, token, indent: node.entries.append(DictEntry(key, self.parse_value(indent, token.line))))
+        return node
+
+    def parse_data_item(self) -> ASTNode:
+        dash = self.tok
+        following = self.peek()
+        if following is None or following.line != dash.line or following.type in (TokenType.INDENT, TokenType.DEDENT):
+            self.advance()
+            raise self.error("Expected a value after '-'", dash.line)
+
+        if following.type in WORD_TYPES:
+            self.advance()
+            is_mapping = self.key_length() > 0
+            if is_mapping:
+                node = DictLiteralNode(line=dash.line, indent=dash.indent + 2)
+                parse_entry = lambda key, token, indent: node.entries.append(DictEntry(key, self.parse_value(indent, token.line)))
+                self.parse_entry_line(parse_entry, dash.indent + 2)
+                if self.check(TokenType.INDENT):
+                    self.parse_entries(parse_entry)
+                return node
+        else:
+            self.advance()
+
+        value = self.parse_expression(dash.line)
+        self.end_line(dash.line)
+        return value
+
+    # State data
+
+    def parse_state_value(self, owner_indent: int, line: int) -> ASTNode:
+        """
+        parse_value for a `state:` variable. An indented block is read straight into lists, dicts and
+        scalars and kept as one DataNode, with no node per value. Expressions inside it are parsed as
+        usual and left as holes for the interpreter to fill in. The grammar and the error recovery are
+        those of parse_data_block().
+        """
+        if not self.literal_state or self.on_line(line) or not self.block_follows(owner_indent):
+            return self.parse_value(owner_indent, line)
+        start = self.tok
+        holes: list[tuple] = []
+        rows = array("I")
+        value = self.read_data_block((), holes, rows, start.line)
+        return DataNode(line=start.line, indent=start.indent, data=marshal.dumps(value), rows=rows, holes=holes)
+
+    def read_data_block(self, path: tuple, holes: list, rows: array | None = None, base: int = 0) -> list | dict:
+        """
+        Read an INDENT ... DEDENT data block at `path`. Top-level calls collect the line of each list item
+        or key into `rows`, as an offset from `base`.
+        """
+        start = self.peek()
+        if start is not None and start.type is TokenType.MINUS:
+            return self.read_data_list(path, holes, rows, base)
+        record = {}
+        self.read_data_entries(record, path, holes, rows, base)
+        return record
+
+    def read_data_list(self, path: tuple, holes: list, rows: array | None, base: int) -> list:
+        values = []
+        self.advance() # INDENT
+        tok = self.tok
+        while tok is not None and tok.type is not TokenType.DEDENT:
+            if tok.type is TokenType.INDENT:
+                self.record(self.error("Unexpected indentation"))
+                self.skip_block()
+            else:
+                mark = len(holes)
+                try:
+                    if tok.type is not TokenType.MINUS:
+                        raise self.error(f"Expected '-' but found {describe(tok)}")
+                    values.append(self.read_data_item(path, len(values), holes))
+                    if rows is not None:
+                        rows.append(tok.line - base)
+                except ParseError as e:
+                    del holes[mark:]
+                    self.record(e)
+                    self.synchronize(max(tok.line, e.line))
+            tok = self.tok
+        if tok is not None:
+            self.advance() # DEDENT
+        return values
+
+    def read_data_item(self, path: tuple, index: int, holes: list) -> Any:
+        dash = self.tok
+        following = self.peek()
+        if following is None or following.line != dash.line or following.type in (TokenType.INDENT, TokenType.DEDENT):
+            self.advance()
+            raise self.error("Expected a value after '-'", dash.line)
+
+        self.advance()
+        if following.type in WORD_TYPES and self.key_length() > 0:
+            record = {}
+            item_path = (*path, index)
+            self.read_data_entry(record, item_path, holes, dash.indent + 2)
+            if self.check(TokenType.INDENT):
+                self.read_data_entries(record, item_path, holes)
+            return record
+
+        value = self.read_data_scalar(dash.line, path, index, holes)
+        self.end_line(dash.line)
+        return value
+
+    def read_data_entries(self, record: dict, path: tuple, holes: list, rows: array | None = None, base: int = 0):
+        self.advance() # INDENT
+        tok = self.tok
+        while tok is not None and tok.type is not TokenType.DEDENT:
+            if tok.type is TokenType.INDENT:
+                self.record(self.error("Unexpected indentation"))
+                self.skip_block()
+            else:
+                try:
+                    self.read_data_entry(record, path, holes, tok.indent, rows, base)
+                except ParseError as e:
+                    self.record(e)
+                    self.synchronize(max(tok.line, e.line))
+            tok = self.tok
+        if tok is not None:
+            self.advance() # DEDENT
+
+    def read_data_entry(self, record: dict, path: tuple, holes: list, owner_indent: int, rows: array | None = None, base: int = 0):
+        key_token = self.tok
+        line = key_token.line
+        following = self.peek()
+        if key_token.type in WORD_TYPES and following is not None and following.type is TokenType.COLON and following.line == line:
+            self.advance()
+            self.advance()
+            key = key_token.value
+        else:
+            key = self.read_key()
+        key = self.strings.setdefault(key, key)
+
+        tok = self.tok
+        if tok is not None and tok.line == line and tok.type in LITERAL_TYPES and key not in record:
+            # The common `key: literal` line, read without the general path below
+            following = self.peek()
+            if following is None or following.line != line:
+                self.advance()
+                record[key] = self.strings.setdefault(tok.value, tok.value) if tok.type is TokenType.STRING else tok.value
+                if rows is not None:
+                    rows.append(line - base)
+                return
+
+        mark = len(holes)
+        try:
+            value = self.read_data_value(owner_indent, line, path, key, holes)
+        except ParseError:
+            del holes[mark:]
+            raise
+        if key in record:
+            # The later value wins; so must its holes
+            prefix = (*path, key)
+            holes[:mark] = [hole for hole in holes[:mark] if hole[0][:len(prefix)] != prefix]
+        elif rows is not None:
+            rows.append(line - base)
+        record[key] = value
+        self.end_line(line)
+
+    def read_data_value(self, owner_indent: int, line: int, path: tuple, key: str, holes: list) -> Any:
+        tok = self.tok
+        if tok is None:
+            return None
+        if tok.line == line and tok.type is not TokenType.INDENT and tok.type is not TokenType.DEDENT:
+            return self.read_data_scalar(line, path, key, holes)
+        if tok.type is TokenType.INDENT and tok.indent > owner_indent:
+            return self.read_data_block((*path, key), holes)
+        return None
+
+    def read_data_scalar(self, line: int, path: tuple, key: str | int, holes: list) -> Any:
+        """
+        Read the inline value at path + (key, ): a lone literal token is taken as is, anything else is
+        parsed as an expression and becomes a hole unless it is a literal list.
+        """
+        tok = self.tok
+        if tok.type in LITERAL_TYPES:
+            following = self.peek()
+            if following is None or following.line != line:
+                self.advance()
+                if tok.type is TokenType.STRING:
+                    return self.strings.setdefault(tok.value, tok.value)
+                return tok.value
+        elif tok.type is TokenType.LBRACKET:
+            value = self.read_literal_list(line)
+            if value is not NOT_LITERAL:
+                return value
+
+        node = self.parse_expression(line)
+        value = literal_value(node)
+        if value is NOT_LITERAL:
+            holes.append(((*path, key), node))
+            return None
+        return value
+
+    def read_literal_list(self, line: int) -> Any:
+        """
+        Consume a flat list of literals such as `[1, 2, 3]` that ends `line` and return its values. For
+        anything else, nothing is consumed and NOT_LITERAL is returned. The whole list is peeked at
+        before any of it is consumed, so the lookahead here grows with the list (up to one line).
+        """
+        values = []
+        offset = 1
+        token = self.peek(offset)
+        while token is not None and token.line == line and token.type in LITERAL_TYPES:
+            values.append(token.value)
+            token = self.peek(offset + 1)
+            if token is None or token.line != line or token.type is not TokenType.COMMA:
+                offset += 1
+                break
+            offset += 2
+            token = self.peek(offset)
+
+        if token is None or token.line != line or token.type is not TokenType.RBRACKET:
+            return NOT_LITERAL
+        following = self.peek(offset + 1)
+        if following is not None and following.line == line:
+            return NOT_LITERAL
+        for _ in range(offset + 1):
+            self.advance()
+        return values
+
+
+def literal_value(node: ASTNode) -> Any:
+    """
+    The Python value of a literal expression such as `[1, -2, "x"]`, or NOT_LITERAL.
+    """
+    match node:
+        case NumberNode() | StringNode() | BooleanNode():
+            return node.value
+        case NullNode():
+            return None
+        case ListLiteralNode():
+            values = [literal_value(element) for element in node.elements]
+            return NOT_LITERAL if any(value is NOT_LITERAL for value in values) else values
+    return NOT_LITERAL
+
+
+def parse_source(source: str, module_name: str = "main") -> tuple[SimulationNode, list[ParseError]]:
+    parser = Parser.from_source(source, module_name)
+    return parser.parse(), parser.errors
@@ -0,0 +1,164 @@
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+# ProfileEntry attributes `Profiler.report()` can sort by
+SORT_KEYS = ("own", "total", "calls", "visits", "allocated")
+
+
+@dataclass(slots=True)
+class ProfileEntry:
+    """
+    Totals for one rule, action, template, agent or runtime phase, identified by its source line.
+    - total: seconds from entering it to leaving it, counted once for recursive calls
+    - own: seconds not spent in the entries it called
+    - visits: loop iterations run by its own body (a vectorized loop counts every row)
+    - allocated: net bytes its own body allocated, with allocation tracing on
+    """
+    kind: str
+    name: str
+    module: str | None
+    line: int
+    calls: int = 0
+    total: float = 0.0
+    own: float = 0.0
+    visits: int = 0
+    allocated: int = 0
+    active: int = 0 # frames of it currently on the stack
+    label: str = field(init=False, default="") # its frame in collapsed stacks
+
+    def __post_init__(self):
+        if self.module and self.line:
+            self.label = f"{self.kind} {self.name} ({self.module}:{self.line})"
+        elif self.line:
+            self.label = f"{self.kind} {self.name} (line {self.line})"
+        else:
+            self.label = f"{self.kind} {self.name}"
+
+
+class Profiler:
+    """
+    Per-rule, per-action, per-template and per-agent profile of a simulation.
+    - The runtime wraps what it compiles in `wrap()` only when its Simulation has a profiler, and
+      the engines only count loop visits then; a run without one executes exactly as before.
+    - Time, visits and bytes are split between an entry and the entries it calls (an action called
+      from a rule is its own entry); own time is also summed per call stack for `collapsed()`.
+    - With allocations=True, allocations are traced with tracemalloc from `start()` to `stop()`. That
+      slows the whole run down, so times are best read from a run without it.
+    """
+
+    def __init__(self, allocations: bool = False):
+        self.allocations = allocations
+        self.entries: dict[tuple, ProfileEntry] = {}
+        self.stacks: dict[tuple[str, ...], float] = {}
+        # Open frames: [entry, stack, start, child seconds, visits at start, child visits, bytes at start, child bytes]
+        self.frames: list[list] = []
+        self.visits = 0
+        self.tracing = False
+        self.clock = time.perf_counter
+        self.memory: Callable[[], int] = self.traced_memory if allocations else (lambda: 0)
+        self.overhead = 0 # bytes a frame's own bookkeeping keeps allocated while it is open
+
+    def start(self):
+        if self.allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.tracing = True
+        if self.allocations:
+            probe = ProfileEntry("probe", "", None, 0)
+            for _ in range(8):
+                self.enter(probe)
+                self.leave()
+            self.overhead = probe.allocated // probe.calls
+            self.stacks.pop((probe.label, ), None)
+
+    def stop(self):
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+
+    @staticmethod
+    def traced_memory() -> int:
+        return tracemalloc.get_traced_memory()[0]
+
+    def entry(self, kind: str, name: str, line: int = 0, module: str | None = None) -> ProfileEntry:
+        key = (kind, name, module, line)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = ProfileEntry(kind, name, module, line)
+        return entry
+
+    def wrap(self, entry: ProfileEntry, function: Callable) -> Callable:
+        """
+        `function`, counted as a call of `entry` every time it runs.
+        """
+        enter, leave = self.enter, self.leave
+
+        def profiled(*args):
+            enter(entry)
+            try:
+                return function(*args)
+            finally:
+                leave()
+        return profiled
+
+    def call(self, entry: ProfileEntry, function: Callable, *args, count: bool = True) -> Any:
+        self.enter(entry, count)
+        try:
+            return function(*args)
+        finally:
+            self.leave()
+
+    def enter(self, entry: ProfileEntry, count: bool = True):
+        """
+        Open a frame for `entry`; with count=False the time is added to it without counting a call
+        (for work done on behalf of an earlier one).
+        """
+        frames = self.frames
+        stack = (*frames[-1][1], entry.label) if frames else (entry.label, )
+        if count:
+            entry.calls += 1
+        entry.active += 1
+        frame = [entry, stack, 0.0, 0.0, self.visits, 0, 0, 0]
+        frames.append(frame)
+        # Read last (and first in leave()), so the profiler's own work falls outside the frame
+        frame[6] = self.memory()
+        frame[2] = self.clock()
+
+    def leave(self):
+        memory = self.memory()
+        end = self.clock()
+        entry, stack, start, child_time, visits, child_visits, start_memory, child_memory = self.frames.pop()
+        elapsed = end - start
+        visited = self.visits - visits
+        allocated = memory - start_memory - self.overhead
+        entry.active -= 1
+        if not entry.active:
+            entry.total += elapsed
+        own = elapsed - child_time
+        entry.own += own
+        entry.visits += visited - child_visits
+        entry.allocated += allocated - child_memory
+        self.stacks[stack] = self.stacks.get(stack, 0.0) + own
+        if self.frames:
+            parent = self.frames[-1]
+            parent[3] += elapsed
+            parent[5] += visited
+            parent[7] += allocated
+
+    def report(self, sort: str = "own") -> list[ProfileEntry]:
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Cannot sort a profile by '{sort}' (expected one of: {', '.join(SORT_KEYS)})")
+        return sorted(self.entries.values(), key=lambda entry: getattr(entry, sort), reverse=True)
+
+    def collapsed(self) -> list[str]:
+        """
+        Own time per call stack in the folded format flamegraph.pl, speedscope and inferno read:
+        `frame;frame;frame microseconds`, one line per stack.
+        """
+        lines = []
+        for stack, seconds in sorted(self.stacks.items()):
+            microseconds = round(seconds * 1e6)
+            if microseconds > 0:
+                lines.append(f"{';'.join(stack)} {microseconds}")
+        return lines
@@ -0,0 +1,561 @@
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from siml.ast_nodes import (
+    ASTNode, SimulationNode, ModuleNode, AgentNode, ActionNode, RuleNode, TemplateNode,
+    IfNode, ForNode, AssignmentNode, GenerateNode, CallNode,
+)
+from siml.columnar import ColumnTable, VectorCompiler
+from siml.compiler import Compiler
+from siml.dependencies import DependencyAnalysis
+from siml.indexes import IndexRegistry, LoopPlan, plan_loops
+from siml.interpreter import Interpreter, SimulationError, PROMPT_AGENT, bind_arguments
+from siml.optimizer import optimize_module
+from siml.profiler import Profiler
+from siml.snapshot import CopyOnWrite, ModuleSnapshot, Snapshot
+from siml.synthesis import DEFAULT_CHUNK_SIZE, Synthesizer, SyntheticCollection
+from siml.tracer import Tracer, Level
+
+if TYPE_CHECKING:
+    from siml.agents import AgentRunner, DecisionCache
+    from siml.parallel import WorkerPool
+
+# Engine name -> class lowering RuleNode/ActionNode bodies to callables
+ENGINES = {
+    "compiled": Compiler,
+    "interpreted": Interpreter,
+    "vectorized": VectorCompiler,
+}
+
+# Errors a rule body can raise on bad data; reported as SimulationErrors with the rule's location
+RUNTIME_ERRORS = (TypeError, AttributeError, KeyError, ValueError, ZeroDivisionError)
+
+ON_START = "on start"
+ON_TICK = "on tick"
+TRIGGERS = (ON_START, ON_TICK)
+
+
+@dataclass(slots=True)
+class PromptRequest:
+    """
+    One `prompt agent:` statement executed during a tick.
+    """
+    agent: str
+    module: str
+    tick: int
+    args: list = field(default_factory=list)
+    kwargs: dict = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class ScheduledRule:
+    """
+    A compiled rule. `inputs` is the state it reads or writes, or None when it has to run every time
+    (`on start` rules, rules that prompt agents or synthesize, or with change tracking off);
+    `ran_at` is the module's change clock when it last ran.
+    """
+    node: RuleNode
+    run: Callable[[dict], None]
+    inputs: tuple[str, ...] | None = None
+    ran_at: int = -1
+
+
+def assigned_names(body: list[ASTNode], names: set[str]) -> set[str]:
+    """
+    Collect the root names a statement list assigns to (`set: x = ...`, `set: x.y = ...`) into `names`.
+    """
+    for node in body:
+        match node:
+            case AssignmentNode():
+                names.add(node.target.split(".", 1)[0])
+            case IfNode():
+                assigned_names(node.then_body, names)
+                assigned_names(node.else_body, names)
+            case ForNode():
+                assigned_names(node.body, names)
+    return names
+
+
+def module_state_names(node: ModuleNode) -> set[str]:
+    """
+    Every name a rule may read as state: the declared state variables plus any name some rule or
+    action assigns to.
+    """
+    names = {var.name for var in node.state}
+    for rule in node.rules:
+        assigned_names(rule.body, names)
+    for action in node.actions:
+        # Assigning to a parameter's fields never creates state
+        names |= assigned_names(action.body, set()) - set(action.params)
+    return names
+
+
+def agent_actions(tree: SimulationNode) -> set[str]:
+    """
+    Actions some agent may call, with arguments the program does not control.
+    """
+    return {name for agent in tree.agents for name in agent.can_call}
+
+
+def walk(body: list[ASTNode]):
+    """
+    Yield every node in a statement list, depth first.
+    """
+    pending = list(reversed(body))
+    while pending:
+        node = pending.pop()
+        yield node
+        pending.extend(reversed(node.get_children()))
+
+
+def fork_tables(state: dict) -> dict:
+    """
+    A fork of every ColumnTable in a module's state (tables shared by several names stay shared).
+    """
+    tables: dict[int, ColumnTable] = {}
+    forks = {}
+    for name, value in state.items():
+        if type(value) is ColumnTable:
+            if id(value) not in tables:
+                tables[id(value)] = value.fork()
+            forks[name] = tables[id(value)]
+    return forks
+
+
+class ModuleRuntime:
+    """
+    Live state and executable rules/actions for one module.
+    - state: name -> value; records are plain dicts and collections plain lists
+    - state_names: every name a rule may read as state, i.e. the declared state
+      variables plus any name some rule or action assigns to
+    - runners: action name -> callable(state, args) built by the engine
+    - cow: the copy-on-write barrier, once the state is shared with a snapshot (see snapshot.CopyOnWrite)
+    - loop_plans / indexes: which loops run as index scans (see indexes.plan_loops) and the indexes
+      they use, unless the simulation was built with indexes=False
+    - changes: state names the engines saw change since they were last recorded, when unchanged
+      rules are skipped; `changed_at` stamps each name with the `clock` value it last changed at
+    - profiler: the simulation's Profiler, if any; rules, actions and synthesize() calls are then
+      wrapped in its entries as they are compiled
+    - workers: the simulation's WorkerPool, if any; the vectorized engine splits large loops across it
+    - node: the module as compiled, which is the optimized copy of the program's ModuleNode (see
+      optimizer.Optimizer) once its state is initialized, unless the simulation was built with
+      optimize=False
+    """
+
+    def __init__(self, node: ModuleNode, simulation: "Simulation", engine: str = "compiled",
+                 snapshot: ModuleSnapshot | None = None):
+        if engine not in ENGINES:
+            raise SimulationError(f"Unknown engine '{engine}' (expected one of: {', '.join(ENGINES)})")
+
+        self.node = node
+        self.name = node.name
+        self.simulation = simulation
+        self.templates: dict[str, TemplateNode] = {template.name: template for template in node.templates}
+        self.template_values: dict[str, dict] = {}
+        self.action_nodes: dict[str, ActionNode] = {action.name: action for action in node.actions}
+
+        self.state_names = module_state_names(node)
+        self.dependencies = DependencyAnalysis(node, self.state_names, agent_actions(simulation.tree))
+        self.changes: set[str] | None = set() if simulation.skip_unchanged else None
+        self.changed_at: dict[str, int] = {}
+        self.clock = 0
+        self.evaluations = 0
+        self.skipped = 0
+
+        self.engine_name = engine
+        self.chunk_size = simulation.chunk_size
+        self.profiler: Profiler | None = simulation.profiler
+        self.workers: "WorkerPool | None" = simulation.workers
+        self.cow: CopyOnWrite | None = None
+        if snapshot is not None:
+            # Restored state starts out entirely shared with the snapshot
+            self.cow = CopyOnWrite()
+            self.synthesis_calls = dict(snapshot.synthesis_calls)
+            self.state = dict(snapshot.state)
+            self.state.update(fork_tables(self.state))
+        else:
+            self.synthesis_calls: dict[str, int] = {}
+            self.state: dict[str, Any] = {}
+            interpreter = Interpreter(self)
+            for var in node.state:
+                if isinstance(var.value, GenerateNode):
+                    # Left lazy so the engine can pick the storage before any record is built
+                    count = interpreter.evaluate(var.value.multiplier, {}, self.state) if var.value.multiplier is not None else 1
+                    self.state[var.name] = self.synthesize(var.value.template, count, var.value.line, lazy=True)
+                else:
+                    self.state[var.name] = interpreter.evaluate(var.value, {}, self.state)
+
+        if simulation.optimize:
+            self.optimize()
+        self.loop_plans: dict[int, LoopPlan] = plan_loops(self.node, self.dependencies)
+        self.indexes: IndexRegistry | None = None
+        if simulation.indexes:
+            self.indexes = IndexRegistry({plan.field for plan in self.loop_plans.values() if plan.kind is not None})
+        self.compile()
+        if self.profiler is not None:
+            self.profiler.call(self.profiler.entry("setup", "state", node.line, self.name), self.prepare_state)
+        else:
+            self.prepare_state()
+
+        self.prompted_agents = {
+            call.args[0].value.value for item in node.actions + node.rules for call in walk(item.body)
+            if isinstance(call, CallNode) and call.function == PROMPT_AGENT
+        }
+
+    def optimize(self):
+        """
+        Swap in the optimized module (its constants are read from the initialized state) and
+        analyze it again: hoisting adds locals, and dropped branches may have read or written state.
+        """
+        optimized = optimize_module(self.node, self.state, self.dependencies)
+        if optimized is self.node:
+            return
+        self.node = optimized
+        self.action_nodes = {action.name: action for action in optimized.actions}
+        self.dependencies = DependencyAnalysis(optimized, self.state_names, agent_actions(self.simulation.tree))
+
+    def prepare_state(self):
+        """
+        Let the engine pick its storage, then generate whatever synthesized state it left lazy.
+        """
+        self.engine.prepare_state(self.state)
+        profiler = self.profiler
+        lines = {var.name: var.value.line for var in self.node.state}
+        generated: dict[int, list] = {}
+        for name, value in self.state.items():
+            if type(value) is SyntheticCollection:
+                if id(value) not in generated:
+                    if profiler is not None:
+                        entry = profiler.entry("synthesize", value.synthesizer.template, lines.get(name, 0), self.name)
+                        generated[id(value)] = profiler.call(entry, value.to_list)
+                    else:
+                        generated[id(value)] = value.to_list()
+                self.state[name] = generated[id(value)]
+
+    def compile(self):
+        self.engine = ENGINES[self.engine_name](self)
+        profiler = self.profiler
+        self.runners: dict[str, Callable[[dict, list], None]] = {}
+        for action in self.node.actions:
+            run = self.engine.action(action)
+            if profiler is not None:
+                run = profiler.wrap(profiler.entry("action", action.name, action.line, self.name), run)
+            self.runners[action.name] = run
+
+        self.rules: dict[str, list[ScheduledRule]] = {trigger: [] for trigger in TRIGGERS}
+        tracing = self.simulation.tracer.is_enabled_for(Level.DEBUG)
+        for rule in self.node.rules:
+            if rule.trigger not in self.rules:
+                raise SimulationError(f"Unknown trigger '{rule.trigger}' (expected one of: {', '.join(TRIGGERS)})", rule.line)
+            effects = self.dependencies.rule(rule)
+            skippable = self.changes is not None and rule.trigger == ON_TICK and effects.pure
+            run = self.engine.rule(rule)
+            if profiler is not None:
+                run = profiler.wrap(profiler.entry("rule", rule.trigger, rule.line, self.name), run)
+            self.rules[rule.trigger].append(ScheduledRule(rule, run, effects.inputs if skippable else None))
+            if tracing:
+                self.simulation.tracer.debug("Rule '%s' on line %d of module '%s' reads %s and writes %s%s",
+                                             rule.trigger, rule.line, self.name, sorted(effects.reads) or "nothing",
+                                             sorted(effects.writes) or "nothing", "" if effects.pure else " (always runs)")
+
+    def snapshot(self) -> ModuleSnapshot:
+        """
+        Freeze the current state. From here on this module and the snapshot share every container,
+        and this module copies one before writing to it (rules are recompiled with the barrier the
+        first time).
+        """
+        if self.cow is None:
+            self.cow = CopyOnWrite()
+            self.compile()
+        else:
+            self.cow.owned.clear()
+        frozen = ModuleSnapshot(dict(self.state), dict(self.synthesis_calls))
+        self.state.update(fork_tables(self.state))
+        return frozen
+
+    def run_rules(self, trigger: str):
+        """
+        Run the trigger's rules in order. With change tracking on, a rule is skipped when nothing it
+        reads or writes has changed since it last ran (including by that run itself): running it
+        again would compute and write exactly the same values.
+        """
+        state = self.state
+        changes = self.changes
+        for rule in self.rules[trigger]:
+            if changes is not None:
+                if changes:
+                    self.record_changes()
+                if rule.inputs is not None:
+                    if rule.ran_at >= 0 and self.unchanged_since(rule.inputs, rule.ran_at):
+                        self.skipped += 1
+                        continue
+                    rule.ran_at = self.clock
+            self.evaluations += 1
+            try:
+                rule.run(state)
+            except SimulationError:
+                raise
+            except RUNTIME_ERRORS as e:
+                raise SimulationError(f"{e} in rule '{rule.node.trigger}' of module '{self.name}'", rule.node.line) from e
+
+    def record_changes(self):
+        self.clock += 1
+        clock = self.clock
+        changed_at = self.changed_at
+        for name in self.changes:
+            changed_at[name] = clock
+        self.changes.clear()
+
+    def unchanged_since(self, names: tuple[str, ...], clock: int) -> bool:
+        changed_at = self.changed_at
+        for name in names:
+            if changed_at.get(name, 0) > clock:
+                return False
+        return True
+
+    def call_action(self, name: str, args: list, kwargs: dict):
+        """
+        Run an action from outside a rule (e.g. one an agent chose).
+        """
+        action = self.action_nodes[name]
+        try:
+            self.runners[name](self.state, bind_arguments(action, args, kwargs, action.line))
+        except SimulationError:
+            raise
+        except RUNTIME_ERRORS as e:
+            raise SimulationError(f"{e} in action '{name}' of module '{self.name}'", action.line) from e
+
+    # Hooks used by the engines
+
+    def check_agent(self, agent: str, line: int):
+        if agent not in self.simulation.agents:
+            raise SimulationError(f"Unknown agent '{agent}'", line)
+
+    def prompt_agent(self, agent: str, args: list, kwargs: dict):
+        self.simulation.prompt_agent(PromptRequest(agent, self.name, self.simulation.tick, args, kwargs))
+
+    def template(self, name: str, line: int) -> dict:
+        values = self.template_values.get(name)
+        if values is None:
+            template = self.templates.get(name)
+            if template is None:
+                raise SimulationError(f"Unknown template '{name}'", line)
+            values = self.template_values[name] = Interpreter(self).evaluate(template.scema, {}, {})
+        return values
+
+    def synthesize(self, name: str, count: Any, line: int, lazy: bool = False) -> list[dict] | SyntheticCollection:
+        """
+        Generate `count` records from a template (see synthesis.Synthesizer). Each call gets its own
+        RNG stream, keyed by the simulation seed, this module, the template and how many times it has
+        been synthesized before. With lazy=True nothing is generated until the collection is consumed.
+        """
+        if type(count) is not int or count < 0:
+            raise SimulationError(f"synthesize() count must be a non-negative integer, got {count!r}", line)
+
+        call = self.synthesis_calls.get(name, 0)
+        self.synthesis_calls[name] = call + 1
+        synthesizer = Synthesizer(name, self.template(name, line), self.simulation.seed, self.name, call, line)
+        collection = SyntheticCollection(synthesizer, count)
+        if lazy:
+            return collection
+        if self.profiler is not None:
+            return self.profiler.call(self.profiler.entry("synthesize", name, line, self.name), collection.to_list)
+        return collection.to_list()
+
+
+class Simulation:
+    """
+    Runs a linked SimulationNode tick by tick.
+    - `on start` rules run once, before the first tick; `on tick` rules run every tick,
+      module by module in declaration order.
+    - `prompt agent:` statements become PromptRequests, passed to `prompt_handler`
+      when one is set and collected in `prompts` (the current tick's requests) otherwise.
+    - With a provider ("stub" or a provider object), agents run after each tick's rules
+      through an asyncio AgentScheduler (see agents.AgentRunner). Decisions are memoized in
+      `decision_cache` (in memory only unless one with a path is given).
+    - With an exporter (export.TraceExporter), each tick's events are streamed out as it ends.
+    - `snapshot()` freezes the run between ticks and `fork()` branches it; both share state
+      copy-on-write. `snapshot=` restores a run from a (possibly loaded) Snapshot.
+    - seed (default: config.seed, else 0) makes every synthesize() call reproducible.
+    - With skip_unchanged (the default), an `on tick` rule whose inputs have not changed since it
+      last ran is skipped (see ModuleRuntime.run_rules); `rule_evaluations` and `rules_skipped`
+      count both outcomes.
+    - With indexes (the default), loops whose body is `if record.field OP value:` visit only the
+      matching records, through secondary indexes the compiled engines keep current.
+    - With optimize (the default), each module's rules and actions are optimized once its state is
+      initialized (see optimizer.Optimizer): state nothing assigns is folded into constants, dead
+      branches are dropped and loop-invariant expressions are evaluated once per loop.
+    - With a profiler (profiler.Profiler), time, calls, loop visits and allocations are recorded per
+      rule, action, template and agent; without one nothing is instrumented.
+    - engine selects how rule bodies execute: "compiled" (closures built once, the default),
+      "vectorized" (compiled, with record collections stored as NumPy columns) or
+      "interpreted" (the reference tree-walker).
+    - With workers > 1 (vectorized engine only), vectorized loops over large tables are split by row
+      range across that many forked processes sharing the columns (see parallel.WorkerPool). State
+      ends up exactly as in a single-process run; `close()` stops the workers.
+    """
+
+    def __init__(self, tree: SimulationNode, engine: str = "compiled", seed: int | None = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, provider: Any = None, concurrency: int = 8,
+                 rate_limit: float | None = None, decision_cache: "DecisionCache | None" = None, exporter: Any = None,
+                 snapshot: Snapshot | None = None, skip_unchanged: bool = True, indexes: bool = True,
+                 profiler: Profiler | None = None, optimize: bool = True, workers: int = 1):
+        self.tree = tree
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.skip_unchanged = skip_unchanged
+        self.indexes = indexes
+        self.optimize = optimize
+        self.profiler = profiler
+        self.tracer = Tracer("Runtime")
+        self.tick = 0
+        self.started = False
+        self.prompts: list[PromptRequest] = []
+        self.prompt_count = 0
+        self.prompt_handler: Optional[Callable[[PromptRequest], None]] = None
+        self.exporter = exporter
+        self.events: list[tuple] = [] # this tick's export events (see export.LAYOUTS), when exporting
+
+        self.config: dict[str, Any] = {}
+        if tree.config is not None:
+            self.config = Interpreter(None).evaluate(tree.config, {}, {})
+        self.max_ticks = self.config.get("max_ticks", 1)
+        if not isinstance(self.max_ticks, int) or self.max_ticks < 0:
+            raise SimulationError(f"config.max_ticks must be a non-negative integer, got {self.max_ticks!r}")
+        if seed is None:
+            seed = snapshot.seed if snapshot is not None else self.config.get("seed", 0)
+        self.seed = seed
+        if type(self.seed) is not int or self.seed < 0:
+            raise SimulationError(f"config.seed must be a non-negative integer, got {self.seed!r}")
+
+        if snapshot is not None:
+            names = [module.name for module in tree.modules]
+            if sorted(names) != sorted(snapshot.modules):
+                raise SimulationError(f"Snapshot has modules {', '.join(sorted(snapshot.modules))}, "
+                                      f"the program has {', '.join(sorted(names))}")
+            self.tick = snapshot.tick
+            self.started = snapshot.started
+            self.prompt_count = snapshot.prompt_count
+
+        self.workers: Optional["WorkerPool"] = None
+        if workers > 1:
+            if engine != "vectorized":
+                raise SimulationError(f"workers > 1 needs the vectorized engine, not '{engine}'")
+            # Imported here: shared memory and process management are only needed with workers
+            from siml.parallel import WorkerPool
+            self.workers = WorkerPool(self, workers)
+
+        self.agents: dict[str, AgentNode] = {agent.name: agent for agent in tree.agents}
+        self.modules: list[ModuleRuntime] = []
+        for module in tree.modules:
+            if module.path is not None:
+                raise SimulationError(f"Module '{module.path}' was not loaded", module.line)
+            restored = snapshot.modules[module.name] if snapshot is not None else None
+            self.modules.append(ModuleRuntime(module, self, engine, restored))
+
+        self.agent_runner: Optional["AgentRunner"] = None
+        if provider is not None:
+            # Imported here: the agent runner (asyncio, provider clients) is only needed with a provider
+            from siml.agents import AgentRunner, AgentScheduler, DecisionCache, create_provider
+            if isinstance(provider, str):
+                provider = create_provider(provider, seed=self.seed) if provider == "stub" else create_provider(provider)
+            cache = decision_cache if decision_cache is not None else DecisionCache()
+            self.agent_runner = AgentRunner(self, AgentScheduler(provider, concurrency, rate_limit, cache))
+
+    def snapshot(self) -> Snapshot:
+        """
+        Freeze the simulation between ticks. Cost is independent of the state's size: containers
+        are shared with the snapshot and copied on write afterwards.
+        """
+        modules = {module.name: module.snapshot() for module in self.modules}
+        return Snapshot(self.tick, self.started, self.seed, self.engine, self.prompt_count, modules)
+
+    def fork(self, **options) -> "Simulation":
+        """
+        A new Simulation continuing from this one's current tick; it shares state with this run
+        copy-on-write. `options` are Simulation arguments (seed, provider, ...) for the fork.
+        """
+        options.setdefault("engine", self.engine)
+        options.setdefault("chunk_size", self.chunk_size)
+        options.setdefault("skip_unchanged", self.skip_unchanged)
+        options.setdefault("indexes", self.indexes)
+        options.setdefault("optimize", self.optimize)
+        options.setdefault("workers", self.workers.count if self.workers is not None else 1)
+        return Simulation(self.tree, snapshot=self.snapshot(), **options)
+
+    @property
+    def rule_evaluations(self) -> int:
+        return sum(module.evaluations for module in self.modules)
+
+    @property
+    def rules_skipped(self) -> int:
+        return sum(module.skipped for module in self.modules)
+
+    def module(self, name: str) -> ModuleRuntime:
+        for module in self.modules:
+            if module.name == name:
+                return module
+        raise KeyError(name)
+
+    def prompt_agent(self, request: PromptRequest):
+        if self.prompt_handler is not None:
+            self.prompt_handler(request)
+        else:
+            self.prompts.append(request)
+
+    def start(self):
+        if self.started:
+            return
+        self.started = True
+        self.prompts = []
+        for module in self.modules:
+            module.run_rules(ON_START)
+        self.run_agents(automatic=False)
+
+    def run_agents(self, automatic: bool = True):
+        """
+        End of a phase: the agents decide on this phase's prompts and their actions are applied.
+        `for each` agents are only prompted automatically at the end of a tick, not after `on start`.
+        """
+        self.prompt_count += len(self.prompts)
+        if self.agent_runner is not None:
+            self.agent_runner.run(self.prompts, automatic)
+
+    def step(self):
+        """
+        Run one tick: every module's `on tick` rules, then the agents.
+        """
+        self.start()
+        tracing = self.tracer.is_enabled_for(Level.INFO)
+        exporter = self.exporter
+        start = time.perf_counter() if tracing or exporter is not None else 0.0
+
+        self.prompts = []
+        for module in self.modules:
+            module.run_rules(ON_TICK)
+        self.run_agents()
+
+        if tracing:
+            self.tracer.info("Tick %d finished in %.3f ms", self.tick, (time.perf_counter() - start) * 1000)
+        if exporter is not None:
+            self.events.append(("tick", self.tick, len(self.prompts), (time.perf_counter() - start) * 1000))
+            exporter.emit(self.events)
+            self.events = []
+        self.tick += 1
+
+    def run(self, ticks: int | None = None):
+        """
+        Run `ticks` ticks, or until config.max_ticks when not given.
+        """
+        end = self.tick + ticks if ticks is not None else self.max_ticks
+        while self.tick < end:
+            self.step()
+
+    def close(self):
+        if self.workers is not None:
+            self.workers.close()
+        if self.agent_runner is not None:
+            self.agent_runner.scheduler.close()
+        if self.exporter is not None:
+            self.exporter.close()
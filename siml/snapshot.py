@@ -0,0 +1,138 @@
+import os
+import pickle
+import tempfile
+from dataclasses import dataclass, field
+from typing import Any
+
+from siml.ast_nodes import ASTNode, AssignmentNode, CallNode, ForNode, IdentifierNode
+from siml.interpreter import BUILTINS, SimulationError, get_field
+
+SNAPSHOT_FORMAT = 1 # bump when the pickled layout changes
+
+
+def writes_through(body: list[ASTNode], name: str) -> bool:
+    """
+    Whether running `body` may write into the container bound to local `name`: a `set: name.field`,
+    a loop over something under `name`, or any action call or agent prompt (which may be given it).
+    Used to decide which loops must take ownership of their records before running.
+    """
+    pending = list(body)
+    while pending:
+        node = pending.pop()
+        match node:
+            case AssignmentNode() if node.target.startswith(name + "."):
+                return True
+            case ForNode() if isinstance(node.iterable, IdentifierNode) and node.iterable.name.split(".", 1)[0] == name:
+                return True
+            case CallNode() if node.function not in BUILTINS:
+                return True
+        pending.extend(node.get_children())
+    return False
+
+
+class CopyOnWrite:
+    """
+    Write barrier for one module's state once it shares containers with a snapshot.
+    Every dict and list reachable from the state is treated as shared (read-only) unless this
+    module copied it itself since the last snapshot; the engines route writes through `child()`
+    and `item()`, which replace a shared container with a shallow copy in its (owned) parent
+    first. Only the path to what actually changes is copied, so a fork costs O(changed records),
+    plus one pointer copy of each collection whose records are written.
+    - ColumnTables copy their own columns on write (see ColumnTable.fork) and count as owned.
+    - Aliases between state variables are not preserved across a fork: writing through one
+      copies the container away from the other.
+    """
+
+    def __init__(self):
+        self.owned: set[int] = set()
+        self.copies = 0
+
+    def own(self, value: Any) -> Any:
+        """
+        Return `value` or, if it is a shared dict or list, a copy this module owns.
+        """
+        if (type(value) is not dict and type(value) is not list) or id(value) in self.owned:
+            return value
+        value = value.copy()
+        self.owned.add(id(value))
+        self.copies += 1
+        return value
+
+    def child(self, parent: Any, name: str) -> Any:
+        """
+        `parent.name`, made owned (and stored back) so it can be written; `parent` must be owned.
+        """
+        value = get_field(parent, name)
+        if value is None or id(value) in self.owned:
+            return value
+        owned = self.own(value)
+        if owned is not value:
+            parent[name] = owned
+        return owned
+
+    def path(self, root: Any, fields: list[str] | tuple[str, ...]) -> Any:
+        value = root
+        for name in fields:
+            value = self.child(value, name)
+        return value
+
+    def item(self, items: Any, index: int) -> Any:
+        """
+        `items[index]`, made owned (and stored back); `items` must be owned.
+        """
+        value = items[index]
+        if id(value) in self.owned:
+            return value
+        owned = self.own(value)
+        if owned is not value:
+            items[index] = owned
+        return owned
+
+
+@dataclass(slots=True)
+class ModuleSnapshot:
+    state: dict
+    synthesis_calls: dict[str, int] = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class Snapshot:
+    """
+    A simulation frozen between ticks. It shares its containers with the run it was taken from
+    (and with every fork restored from it), which copy them before writing, so taking one and
+    forking from it are cheap. `save()` pickles it so a run can resume from this tick later.
+    """
+    tick: int
+    started: bool
+    seed: int
+    engine: str
+    prompt_count: int
+    modules: dict[str, ModuleSnapshot]
+
+    def save(self, path: str | os.PathLike):
+        path = os.fspath(path)
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump((SNAPSHOT_FORMAT, self), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    @classmethod
+    def load(cls, path: str | os.PathLike) -> "Snapshot":
+        try:
+            with open(path, "rb") as f:
+                version, snapshot = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError) as e:
+            raise SimulationError(f"Cannot read snapshot '{os.fspath(path)}': {e}") from e
+        if version != SNAPSHOT_FORMAT or not isinstance(snapshot, cls):
+            raise SimulationError(f"Snapshot '{os.fspath(path)}' has an unsupported format")
+        return snapshot
+
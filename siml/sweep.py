@@ -0,0 +1,153 @@
+import gc
+import itertools
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+from siml.agents import create_provider, plain
+from siml.ast_nodes import SimulationNode
+from siml.interpreter import SimulationError
+from siml.parallel import available_cpus
+from siml.runtime import Simulation
+from siml.tracer import Tracer
+
+# The linked program, set once per worker process (inherited without pickling under fork)
+worker_tree: Optional[SimulationNode] = None
+
+
+@dataclass(slots=True)
+class SweepJob:
+    """
+    One run of a sweep: a seed plus the provider options (e.g. the stub's idle_rate) it runs with.
+    """
+    index: int
+    seed: int
+    provider_options: dict = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class SweepResult:
+    """
+    What a sweep run reports back: its scalar state values per module (`summary`), agent counters
+    and, when asked for, the whole final state. `error` is set instead when the run failed.
+    """
+    index: int
+    seed: int
+    provider_options: dict
+    ticks: int = 0
+    elapsed: float = 0.0
+    prompts: int = 0
+    decisions: int = 0
+    applied: int = 0
+    summary: dict = field(default_factory=dict)
+    state: Optional[dict] = None
+    error: Optional[str] = None
+
+
+@dataclass(slots=True)
+class SweepSettings:
+    engine: str = "compiled"
+    ticks: Optional[int] = None
+    provider: Optional[str] = None
+    concurrency: int = 8
+    include_state: bool = False
+
+
+def make_jobs(seeds: list[int], variations: dict[str, list[Any]] | None = None) -> list[SweepJob]:
+    """
+    The grid of every seed with every combination of provider option values.
+    """
+    variations = variations or {}
+    names = list(variations)
+    combinations = list(itertools.product(*variations.values())) if names else [()]
+    jobs = []
+    for seed in seeds:
+        for values in combinations:
+            jobs.append(SweepJob(len(jobs), seed, dict(zip(names, values))))
+    return jobs
+
+
+def scalar_state(simulation: Simulation) -> dict[str, dict[str, Any]]:
+    return {
+        module.name: {name: value for name, value in module.state.items()
+                      if value is None or isinstance(value, (bool, int, float, str))}
+        for module in simulation.modules
+    }
+
+
+def init_worker(tree: SimulationNode):
+    global worker_tree
+    worker_tree = tree
+
+
+def run_job(job: SweepJob, settings: SweepSettings) -> SweepResult:
+    result = SweepResult(job.index, job.seed, job.provider_options)
+    simulation = None
+    try:
+        provider = None
+        if settings.provider is not None:
+            options = {"seed": job.seed} if settings.provider == "stub" else {}
+            options.update(job.provider_options)
+            provider = create_provider(settings.provider, **options)
+        start = time.perf_counter()
+        simulation = Simulation(worker_tree, engine=settings.engine, seed=job.seed, provider=provider,
+                                concurrency=settings.concurrency)
+        simulation.run(settings.ticks)
+        result.elapsed = time.perf_counter() - start
+        result.ticks = simulation.tick
+        result.prompts = simulation.prompt_count
+        if simulation.agent_runner is not None:
+            result.decisions = simulation.agent_runner.decisions
+            result.applied = simulation.agent_runner.applied
+        result.summary = scalar_state(simulation)
+        if settings.include_state:
+            result.state = {module.name: plain(module.state) for module in simulation.modules}
+    except (SimulationError, TypeError, ValueError) as e:
+        result.error = str(e)
+    finally:
+        if simulation is not None:
+            simulation.close()
+    return result
+
+
+def pool_size(workers: int | None) -> int:
+    """
+    Worker processes for a sweep: `workers`, or one per CPU when None, but never more than the available CPUs.
+    """
+    cpus = available_cpus()
+    if workers is None:
+        return cpus
+    if workers > cpus:
+        Tracer("Sweep").warn("Reducing workers from %d to %d, the number of available CPUs", workers, cpus)
+    return max(1, min(workers, cpus))
+
+
+def run_sweep(tree: SimulationNode, jobs: list[SweepJob], settings: SweepSettings,
+              workers: int = 1, batch: int = 1) -> Iterator[SweepResult]:
+    """
+    Run every job, yielding results in job order as they are ready.
+    With workers > 1 the jobs run across a process pool. The program is parsed and linked once, here;
+    forked workers inherit it (and the frozen heap it lives in) instead of receiving a pickled copy
+    per run, so a run only pays for building its own state. `batch` jobs are sent per task.
+    The pool is limited to the available CPUs (see pool_size); with one, the jobs run in this process.
+    """
+    workers = pool_size(workers)
+    if workers <= 1 or len(jobs) <= 1:
+        init_worker(tree)
+        for job in jobs:
+            yield run_job(job, settings)
+        return
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    # Keep the tree out of the collector's way so forked children don't copy its pages on write
+    gc.collect()
+    gc.freeze()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=init_worker, initargs=(tree,)) as pool:
+            yield from pool.map(run_job, jobs, itertools.repeat(settings), chunksize=max(1, batch))
+    finally:
+        gc.unfreeze()
@@ -0,0 +1,221 @@
+import copy
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+try:
+    import numpy as np
+except ImportError:  # only needed once a program calls synthesize()
+    np = None
+
+from siml.interpreter import SimulationError
+from siml.tracer import Tracer
+
+# Rows drawn from one RNG stream. Streams are keyed by block index, so the records produced
+# never depend on the chunk size they are requested in, and blocks can be drawn in parallel.
+RNG_BLOCK = 1 << 16
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+
+def stable_key(text: str) -> int:
+    """
+    Process-independent 64-bit key for a name (str hashes are salted per process).
+    """
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+@dataclass(slots=True)
+class FieldPlan:
+    """
+    How one record field is generated, inferred from the template's examples:
+    - sequence: `id` fields, numbered from 1
+    - constant: every example agrees
+    - integers / uniform: ints or floats drawn between the smallest and largest example value
+    - choice: anything else, drawn from the example values
+    """
+    name: str
+    kind: str
+    low: Any = None
+    high: Any = None
+    values: list = field(default_factory=list)
+    copied: bool = False # values are dicts/lists that every record needs its own copy of
+
+
+def is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def plan_fields(template: str, values: dict, line: int = 0) -> list[FieldPlan]:
+    examples = values.get("examples")
+    if not examples:
+        examples = [{key: value for key, value in values.items() if key != "examples"}]
+    if not all(isinstance(example, dict) for example in examples):
+        raise SimulationError(f"Template '{template}' examples must be records", line)
+
+    names = list(dict.fromkeys(name for example in examples for name in example))
+    plans = []
+    for name in names:
+        column = [example.get(name) for example in examples]
+        copied = any(isinstance(value, (dict, list)) for value in column)
+        if name == "id" and all(type(value) is int for value in column):
+            plans.append(FieldPlan(name, "sequence"))
+        elif all(type(value) is type(column[0]) and value == column[0] for value in column):
+            plans.append(FieldPlan(name, "constant", values=[column[0]], copied=copied))
+        elif all(type(value) is int for value in column):
+            plans.append(FieldPlan(name, "integers", min(column), max(column)))
+        elif all(is_number(value) for value in column):
+            plans.append(FieldPlan(name, "uniform", float(min(column)), float(max(column))))
+        else:
+            plans.append(FieldPlan(name, "choice", values=column, copied=copied))
+    return plans
+
+
+class Synthesizer:
+    """
+    Vectorized, reproducible record generator for one template.
+    Values are drawn a column at a time with NumPy from RNG streams keyed by
+    (seed, module, template, call, block), so a program run with the same seed always
+    synthesizes the same records regardless of chunk size, engine or worker count.
+    `columns()` returns raw column arrays (choice fields as indices into `plan.values`);
+    `records()` turns them into dicts.
+    """
+
+    def __init__(self, template: str, values: dict, seed: int = 0, module: str = "main", call: int = 0, line: int = 0):
+        if np is None:
+            raise SimulationError("synthesize() requires numpy", line)
+        self.template = template
+        self.plans = plan_fields(template, values, line)
+        self.seed = seed
+        self.key = (stable_key(module), stable_key(template), call)
+        self.last_block: tuple[int, int, dict] | None = None # chunks smaller than a block reuse it
+
+    def rng(self, block: int):
+        return np.random.Generator(np.random.PCG64(np.random.SeedSequence(self.seed, spawn_key=(*self.key, block))))
+
+    def __getstate__(self):
+        return {"template": self.template, "plans": self.plans, "seed": self.seed, "key": self.key}
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.last_block = None
+
+    def block(self, index: int, count: int) -> dict[str, Any]:
+        if self.last_block is not None and self.last_block[:2] == (index, count):
+            return self.last_block[2]
+        start = index * RNG_BLOCK
+        size = min(RNG_BLOCK, count - start)
+        rng = self.rng(index)
+        columns = {}
+        for plan in self.plans:
+            match plan.kind:
+                case "sequence":
+                    columns[plan.name] = np.arange(start + 1, start + size + 1, dtype="int64")
+                case "constant":
+                    columns[plan.name] = np.zeros(size, dtype="int32")
+                case "integers":
+                    columns[plan.name] = rng.integers(plan.low, plan.high, size=size, endpoint=True, dtype="int64")
+                case "uniform":
+                    columns[plan.name] = rng.uniform(plan.low, plan.high, size=size)
+                case _:
+                    columns[plan.name] = rng.integers(0, len(plan.values), size=size, dtype="int32")
+        self.last_block = (index, count, columns)
+        return columns
+
+    def columns(self, start: int, stop: int, count: int) -> dict[str, Any]:
+        """
+        Raw columns for rows [start, stop) of a `count`-record synthesis; constant and choice
+        fields hold indices into their plan's values.
+        """
+        first, last = start // RNG_BLOCK, (stop - 1) // RNG_BLOCK
+        offset = start - first * RNG_BLOCK
+        if first == last:
+            block = self.block(first, count)
+            return {plan.name: block[plan.name][offset:offset + stop - start] for plan in self.plans}
+
+        blocks = [self.block(index, count) for index in range(first, last + 1)]
+        return {
+            plan.name: np.concatenate([block[plan.name] for block in blocks])[offset:offset + stop - start]
+            for plan in self.plans
+        }
+
+    def records(self, start: int, stop: int, count: int) -> list[dict]:
+        columns = self.columns(start, stop, count)
+        values = []
+        for plan in self.plans:
+            column = columns[plan.name]
+            if plan.kind in ("constant", "choice"):
+                choices = plan.values
+                if plan.copied:
+                    values.append([copy.deepcopy(choices[i]) for i in column.tolist()])
+                else:
+                    values.append([choices[i] for i in column.tolist()])
+            else:
+                values.append(column.tolist())
+        names = [plan.name for plan in self.plans]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+
+def chunk_ranges(count: int, chunk_size: int) -> list[tuple[int, int]]:
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    return [(start, min(start + chunk_size, count)) for start in range(0, count, chunk_size)]
+
+
+def records_worker(synthesizer: Synthesizer, start: int, stop: int, count: int) -> list[dict]:
+    return synthesizer.records(start, stop, count)
+
+
+class SyntheticCollection:
+    """
+    A `synthesize(template, count)` result that has not been generated yet.
+    Iterating `chunks()` keeps at most one chunk of records in memory; `to_list()` builds them all.
+    The runtime keeps synthesized state in this form until the engine decides on its storage, so
+    columnar state is filled straight from the generated columns without building any dicts.
+    """
+
+    def __init__(self, synthesizer: Synthesizer, count: int):
+        self.synthesizer = synthesizer
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE, workers: int = 1) -> Iterator[list[dict]]:
+        """
+        Yield the records in order, `chunk_size` at a time; with workers > 1 chunks are generated
+        across a process pool (at most `workers` chunks ahead of the consumer). `workers` is limited
+        to the available CPUs; with one, the chunks are generated in this process.
+        """
+        ranges = chunk_ranges(self.count, chunk_size)
+        if workers > 1:
+            # Imported here: synthesis is loaded with the runtime, before the worker machinery
+            from siml.parallel import available_cpus
+            cpus = available_cpus()
+            if workers > cpus:
+                Tracer("Synthesis").warn("Reducing workers from %d to %d, the number of available CPUs", workers, cpus)
+                workers = cpus
+        if workers <= 1 or len(ranges) <= 1:
+            for start, stop in ranges:
+                yield self.synthesizer.records(start, stop, self.count)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for start, stop in ranges:
+                pending.append(pool.submit(records_worker, self.synthesizer, start, stop, self.count))
+                if len(pending) > workers:
+                    yield pending.popleft().result()
+            for future in pending:
+                yield future.result()
+
+    def column_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[tuple[int, dict[str, Any]]]:
+        for start, stop in chunk_ranges(self.count, chunk_size):
+            yield start, self.synthesizer.columns(start, stop, self.count)
+
+    def to_list(self) -> list[dict]:
+        records = []
+        for chunk in self.chunks():
+            records.extend(chunk)
+        return records
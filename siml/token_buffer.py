@@ -0,0 +1,205 @@
+from array import array
+from typing import Any, Iterable, Iterator
+
+from siml.token import Token
+from siml.token_types import TokenType
+
+# TokenType.value -> TokenType, indexed by the type code stored in the buffer
+TOKEN_TYPES_BY_CODE: list[TokenType | None] = [None] * (max(t.value for t in TokenType) + 1)
+for _token_type in TokenType:
+    TOKEN_TYPES_BY_CODE[_token_type.value] = _token_type
+
+
+class TokenBuffer:
+    """
+    Struct-of-arrays token storage.
+    Each token is a row across four typed columns:
+    - types:   TokenType code (unsigned byte)
+    - lines:   source line (unsigned int)
+    - indents: raw indentation in spaces (unsigned short)
+    - values:  index into the interned `value_table`
+    Token objects are only built by `token()` / iteration, on request. The Parser reads a buffer
+    (or a TokenSlice of one) through a TokenCursor, so only the tokens in its lookahead exist at once.
+    """
+
+    def __init__(self):
+        self.types = array("B")
+        self.lines = array("I")
+        self.indents = array("H")
+        self.values = array("I")
+        self.value_table: list[Any] = [None]
+        self.value_index: dict[tuple[type, Any], int] = {(type(None), None): 0}
+
+    @classmethod
+    def from_tokens(cls, tokens: Iterable[Token]) -> "TokenBuffer":
+        buffer = cls()
+        append = buffer.append
+        for token in tokens:
+            append(token.type, token.value, token.line, token.indent)
+        return buffer
+
+    @classmethod
+    def from_tokenizer(cls, tokenizer) -> "TokenBuffer":
+        """
+        Drain a Tokenizer straight into the columns without building Token objects.
+        """
+        buffer = cls()
+        factory = tokenizer.token_factory
+        tokenizer.token_factory = buffer.append
+        try:
+            for _ in tokenizer:
+                pass
+        finally:
+            tokenizer.token_factory = factory
+        return buffer
+
+    def intern(self, value: Any) -> int:
+        # Keyed on type as well so that 1, 1.0 and True stay distinct
+        key = (type(value), value)
+        index = self.value_index.get(key)
+        if index is None:
+            index = len(self.value_table)
+            self.value_index[key] = index
+            self.value_table.append(value)
+        return index
+
+    def append(self, token_type: TokenType, value: Any, line: int, indent: int) -> int:
+        """
+        Append one token and return its row index.
+        Matches the Tokenizer.token_factory signature.
+        """
+        self.types.append(token_type.value)
+        self.lines.append(line)
+        self.indents.append(indent)
+        self.values.append(self.intern(value))
+        return len(self.types) - 1
+
+    def __len__(self):
+        return len(self.types)
+
+    def type(self, index: int) -> TokenType:
+        return TOKEN_TYPES_BY_CODE[self.types[index]]
+
+    def value(self, index: int) -> Any:
+        return self.value_table[self.values[index]]
+
+    def token(self, index: int) -> Token:
+        return Token(
+            TOKEN_TYPES_BY_CODE[self.types[index]],
+            self.value_table[self.values[index]],
+            self.lines[index],
+            self.indents[index],
+        )
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("TokenBuffer slices must be contiguous")
+            return TokenSlice(self, start, max(start, stop))
+        if index < 0:
+            index += len(self)
+        return self.token(index)
+
+    def __iter__(self) -> Iterator[Token]:
+        for index in range(len(self)):
+            yield self.token(index)
+
+    def cursor(self, start: int = 0, stop: int | None = None) -> "TokenCursor":
+        return TokenCursor(self, start, len(self) if stop is None else stop)
+
+    def nbytes(self) -> int:
+        """
+        Bytes held by the columns (the value table is not included).
+        """
+        return sum(column.itemsize * len(column) for column in (self.types, self.lines, self.indents, self.values))
+
+
+class TokenSlice:
+    """
+    Zero-copy view over a contiguous range of a TokenBuffer.
+    Shares the buffer's columns; nothing is copied until tokens are requested.
+    """
+
+    def __init__(self, buffer: TokenBuffer, start: int, stop: int):
+        self.buffer = buffer
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("TokenBuffer slices must be contiguous")
+            return TokenSlice(self.buffer, self.start + start, self.start + max(start, stop))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("TokenSlice index out of range")
+        return self.buffer.token(self.start + index)
+
+    def __iter__(self) -> Iterator[Token]:
+        token = self.buffer.token
+        for index in range(self.start, self.stop):
+            yield token(index)
+
+    def cursor(self) -> "TokenCursor":
+        return TokenCursor(self.buffer, self.start, self.stop)
+
+
+class TokenCursor:
+    """
+    Forward cursor for parsers.
+    Reads the current row's fields directly from the columns; `token()` builds
+    a Token only when one is actually needed (e.g. for an error message).
+    """
+
+    def __init__(self, buffer: TokenBuffer, start: int, stop: int):
+        self.buffer = buffer
+        self.pos = start
+        self.stop = stop
+
+    @property
+    def at_end(self) -> bool:
+        return self.pos >= self.stop
+
+    @property
+    def type(self) -> TokenType | None:
+        if self.pos >= self.stop:
+            return None
+        return TOKEN_TYPES_BY_CODE[self.buffer.types[self.pos]]
+
+    @property
+    def value(self) -> Any:
+        return self.buffer.value_table[self.buffer.values[self.pos]]
+
+    @property
+    def line(self) -> int:
+        return self.buffer.lines[self.pos]
+
+    @property
+    def indent(self) -> int:
+        return self.buffer.indents[self.pos]
+
+    def peek_type(self, offset: int = 1) -> TokenType | None:
+        index = self.pos + offset
+        if index >= self.stop:
+            return None
+        return TOKEN_TYPES_BY_CODE[self.buffer.types[index]]
+
+    def advance(self, count: int = 1):
+        self.pos = min(self.pos + count, self.stop)
+
+    def token(self) -> Token | None:
+        if self.pos >= self.stop:
+            return None
+        return self.buffer.token(self.pos)
+
+    def __iter__(self) -> Iterator[Token]:
+        while self.pos < self.stop:
+            token = self.buffer.token(self.pos)
+            self.pos += 1
+            yield token
@@ -34,15 +34,19 @@ class TokenType(Enum):
     AND = auto()
     OR = auto()
 
-TOKEN_REGEX = re.compile(r'''
-    (?P<COLON>:)
+# Every match consumes its own leading whitespace, so finditer never has to
+# search forward past spaces. Alternatives are ordered by how often they occur
+# in real programs, with longer operators ahead of their prefixes.
+TOKEN_REGEX = re.compile(r'''[ \t]*(?:
+    (?P<IDENTIFIER>[a-zA-Z_][a-zA-Z0-9_]*)
+    | (?P<COLON>:)
+    | (?P<STRING>"[^"]*"|'[^']*')
+    | (?P<NUMBER>-?(?:\d*\.\d+|\d+))
+    | (?P<COMMENT>\#.*)
     | (?P<EQUAL_EQUAL>==)
     | (?P<NOT_EQUAL>!=)
     | (?P<LESS_EQUAL><=)
-    | (?P<GREATER_EQUAL>>=)                
-    | (?P<NUMBER>-?(?:\d*\.\d+|\d+))
-    | (?P<IDENTIFIER>[a-zA-Z_][a-zA-Z0-9_]*)
-    | (?P<STRING>"[^"]*"|'[^']*')
+    | (?P<GREATER_EQUAL>>=)
     | (?P<LPAREN>\()
     | (?P<RPAREN>\))
     | (?P<LBRACKET>\[)
@@ -58,4 +62,17 @@ TOKEN_REGEX = re.compile(r'''
     | (?P<MODULO>%)
     | (?P<LESS_THAN><)
     | (?P<GREATER_THAN>>)
-''', re.VERBOSE)
+)''', re.VERBOSE)
+
+
+# Regex group index -> TokenType, so a match's `lastindex` resolves its type with one lookup.
+# COMMENT has no TokenType and maps to None; it ends the line.
+GROUP_TOKEN_TYPES = {
+    index: TokenType.__members__.get(name)
+    for name, index in TOKEN_REGEX.groupindex.items()
+}
+
+IDENTIFIER_GROUP = TOKEN_REGEX.groupindex["IDENTIFIER"]
+NUMBER_GROUP = TOKEN_REGEX.groupindex["NUMBER"]
+STRING_GROUP = TOKEN_REGEX.groupindex["STRING"]
+COMMENT_GROUP = TOKEN_REGEX.groupindex["COMMENT"]
@@ -1,7 +1,12 @@
-from siml.tracer import Tracer
+import mmap
+import os
+from siml.tracer import Tracer, Level
 from siml.token import Token
-from siml.token_types import TokenType, TOKEN_REGEX
-from typing import Any, Dict
+from siml.token_types import (
+    TokenType, TOKEN_REGEX, GROUP_TOKEN_TYPES,
+    IDENTIFIER_GROUP, NUMBER_GROUP, STRING_GROUP, COMMENT_GROUP,
+)
+from typing import Any, Callable, Dict, IO, Iterable, Iterator
 
 KEYWORDS = {
     "state",
@@ -10,24 +15,131 @@ KEYWORDS = {
     "rules",
     "agents",
     "templates",
-    "simulationd",
+    "simulation",
     "module",
     "import",
     "export"
     }
 
+
+def build_word_types(keywords: Iterable[str]) -> Dict[str, tuple[TokenType, Any]]:
+    """
+    Build the lookup table used to classify IDENTIFIER matches.
+    Maps a word to its (TokenType, value); words not in the table are plain identifiers.
+    """
+    word_types = {word: (TokenType.KEYWORD, word) for word in keywords}
+    word_types.update({
+        "true": (TokenType.BOOLEAN, True),
+        "false": (TokenType.BOOLEAN, False),
+        "and": (TokenType.AND, "and"),
+        "or": (TokenType.OR, "or"),
+        "null": (TokenType.NULL, None),
+    })
+    return word_types
+
+
+WORD_TYPES = build_word_types(KEYWORDS)
+
+def iter_stream_lines(stream: IO, encoding: str = "utf-8") -> Iterator[str]:
+    """
+    Yield the lines of an open text or binary file object one at a time,
+    without their line terminators.
+    """
+    for raw in stream:
+        if isinstance(raw, bytes):
+            raw = raw.decode(encoding)
+        yield raw.rstrip("\r\n")
+
+
+def iter_mmap_lines(path: str | os.PathLike, encoding: str = "utf-8") -> Iterator[str]:
+    """
+    Yield the lines of a file through a read-only memory map.
+    Only the current line is ever decoded; the mapping is closed when the
+    generator is exhausted or garbage collected.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for raw in iter(mm.readline, b""):
+                yield raw.decode(encoding).rstrip("\r\n")
+
+
+def iter_path_lines(path: str | os.PathLike, encoding: str = "utf-8") -> Iterator[str]:
+    with open(path, "r", encoding=encoding, newline="") as f:
+        yield from iter_stream_lines(f, encoding)
+
+
 class Tokenizer:
     def __init__(self, source: str):
         self.lines = source.splitlines()
+        self.line_source: Callable[[], Iterable[str]] = lambda: self.lines
         self.tracer = Tracer("Tokenizer")
         self.keywords = KEYWORDS
+        self.word_types = WORD_TYPES
+        self.token_factory: Callable[[TokenType, Any, int, int], Any] = Token
+        self.first_line = 1
+        self.initial_stack: tuple[int, ...] = (0,)
+        self.checkpoints: dict[int, tuple[int, ...]] | None = None
+        self.tracing = False
+
+    @classmethod
+    def from_lines(cls, lines: list[str], first_line: int = 1, indent_stack: tuple[int, ...] = (0,)) -> "Tokenizer":
+        """
+        Tokenize a slice of a larger document.
+        - first_line is the line number of lines[0]
+        - indent_stack is the checkpointed stack of indentation levels in effect for lines[0];
+          blocks opened inside the slice are closed again at its end
+        """
+        tokenizer = cls("")
+        tokenizer.lines = lines
+        tokenizer.first_line = first_line
+        tokenizer.initial_stack = tuple(indent_stack)
+        return tokenizer
+
+    @classmethod
+    def from_stream(cls, stream: IO, encoding: str = "utf-8") -> "Tokenizer":
+        """
+        Tokenize an open file object line by line.
+        The stream is consumed as it is read, so the tokenizer can only be
+        iterated once.
+        """
+        tokenizer = cls("")
+        tokenizer.lines = None
+        tokenizer.line_source = lambda: iter_stream_lines(stream, encoding)
+        return tokenizer
+
+    @classmethod
+    def from_path(cls, path: str | os.PathLike, encoding: str = "utf-8", use_mmap: bool = False) -> "Tokenizer":
+        """
+        Tokenize a file on disk line by line, holding only the current line in memory.
+        - use_mmap=True reads through a memory-mapped view of the file instead of buffered reads.
+        The file is reopened on every iteration.
+        """
+        tokenizer = cls("")
+        tokenizer.lines = None
+        if use_mmap:
+            tokenizer.line_source = lambda: iter_mmap_lines(path, encoding)
+        else:
+            tokenizer.line_source = lambda: iter_path_lines(path, encoding)
+        return tokenizer
 
     def __iter__(self):
         indent_width = 2    # Fixed indentation width of 2 spaces
-        indent_stack = [0]  # Stack to track indentation levels
+        indent_stack = list(self.initial_stack)  # Stack to track indentation levels
+        checkpoints = self.checkpoints
+        self.tracing = self.tracer.is_enabled_for(Level.INFO)
+        lex_line = self._lex_line
+        make_token = self.token_factory
+
+        line = self.first_line - 1
+        for line, text in enumerate(self.line_source(), start=self.first_line):
+            stripped = text.lstrip()
+            if not stripped or stripped[0] == "#":
+                # Blank and comment-only lines never open or close a block
+                continue
 
-        for line, text in enumerate(self.lines, start=1):
-            raw_indent = len(text) - len(text.lstrip())
+            raw_indent = len(text) - len(stripped)
             if raw_indent % indent_width != 0:
                 raise SyntaxError(f"Indentation error on line {line}: not a multiple of {indent_width} spaces")
 
@@ -36,34 +148,41 @@ class Tokenizer:
 
             if indent_level > current_level:
                 indent_stack.append(indent_level)
-                token = Token(TokenType.INDENT, None, line, raw_indent)
-                self.tracer.info(f"Tokenized: {token}")
+                token = make_token(TokenType.INDENT, None, line, raw_indent)
+                if self.tracing:
+                    self.tracer.info("Tokenized: %s", token)
                 yield token
 
             elif indent_level < current_level:
                 while indent_stack and indent_stack[-1] > indent_level:
                     indent_stack.pop()
-                    token = Token(TokenType.DEDENT, None, line, indent_stack[-1] * 2)
-                    self.tracer.info(f"Tokenized: {token}")
+                    token = make_token(TokenType.DEDENT, None, line, indent_stack[-1] * 2)
+                    if self.tracing:
+                        self.tracer.info("Tokenized: %s", token)
                     yield token
 
-            # Remove inline comments and strip whitespace
-            text = self.strip_inline_comment(text)
-            if not text:  # Skip empty lines after stripping comments
-                continue
+                # Dedenting to a column between two open blocks opens a new block there,
+                # so every INDENT is always matched by exactly one DEDENT
+                if indent_level > indent_stack[-1]:
+                    indent_stack.append(indent_level)
+                    token = make_token(TokenType.INDENT, None, line, raw_indent)
+                    if self.tracing:
+                        self.tracer.info("Tokenized: %s", token)
+                    yield token
 
-            stripped = text.strip()
-            if not stripped: # Skip empty lines
-                continue
-            
-            yield from self._lex_line(stripped, line, raw_indent)
+            if checkpoints is not None and stripped[0] == "-":
+                # List items are the block boundaries incremental re-parsing restarts from
+                checkpoints[line] = tuple(indent_stack)
+
+            yield from lex_line(stripped, line, raw_indent)
 
         # Handle any remaining dedents
-        final_line = len(self.lines) + 1
-        while len(indent_stack) > 1:
+        final_line = line + 1
+        while len(indent_stack) > len(self.initial_stack):
             indent_stack.pop()
-            token = Token(TokenType.DEDENT, None, final_line, indent_stack[-1] * 2)
-            self.tracer.info(f"Tokenized: {token}")
+            token = make_token(TokenType.DEDENT, None, final_line, indent_stack[-1] * 2)
+            if self.tracing:
+                self.tracer.info("Tokenized: %s", token)
             yield token
 
 
@@ -72,10 +191,8 @@ class Tokenizer:
         Parse the value of a token based on its type.
         Returns a tuple of (TokenType, value).
         - For NUMBER, it returns int or float based on the presence of a decimal point.
-        - For STRING, it strips quotes.
-        - For IDENTIFIER, it checks against keywords and returns appropriate TokenType.
-        - For BOOLEAN, it converts "true" or "false" to boolean values.
-        - For NULL, it returns None.
+        - For STRING, it strips the surrounding quotes.
+        - For IDENTIFIER, keywords, booleans, null, `and` and `or` are resolved through the word table.
         - For other types, it returns the original token type and value.
         """
         match token_type:
@@ -84,164 +201,55 @@ class Tokenizer:
                     return TokenType.NUMBER, float(value) if '.' in value else int(value)
                 except ValueError:
                     raise SyntaxError(f"Invalid number format on line {line}: {value}")
-                
+
             case TokenType.STRING:
-                return TokenType.STRING, value.strip('"').strip("'")
-            
+                return TokenType.STRING, value[1:-1]
+
             case TokenType.IDENTIFIER:
-                if self.is_keyword(value):
-                    return TokenType.KEYWORD, value
-                
-                elif value in ("true", "false"):
-                    return TokenType.BOOLEAN, value == "true"
-                
-                elif value == "and":
-                    return TokenType.AND, value
-                
-                elif value == "or":
-                    return TokenType.OR, value
-                
-                elif value == "null":
-                    return TokenType.NULL, None
-                
-                return TokenType.IDENTIFIER, value
-            
+                return self.word_types.get(value) or (TokenType.IDENTIFIER, value)
+
             case _:
                 return token_type, value
 
-    def _lex_line(self, text: str, line: int, indent: int = 0):
+    def _lex_line(self, text: str, line: int, indent: int = 0) -> list[Token]:
         """
-        Lex a single line of text into tokens.
-        This method uses a regular expression to find all tokens in the line.
-        It yields Token objects for each recognized token type.
-        Assumes TOKEN_REGEX has been ordered to prioritize longest / more specific matches first.
+        Lex a single line of text into tokens in one pass over TOKEN_REGEX.
+        Regex groups map straight onto TokenTypes through GROUP_TOKEN_TYPES; only
+        NUMBER, STRING and IDENTIFIER need their value converted. A COMMENT match
+        ends the line, and since strings are matched first a `#` inside quotes
+        never starts a comment.
         """
-        for match in TOKEN_REGEX.finditer(text):
-            kind = match.lastgroup
-            value = match.group() 
-            
-            match kind:
-                case "COLON":
-                    token = Token(TokenType.COLON, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
-
-                case "DASH":
-                    token = Token(TokenType.DASH, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
-
-                case "NUMBER":
-                    token_type, token_value = self._parse_token_value(value, TokenType.NUMBER, line)
-                    token = Token(token_type, token_value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
-
-                case "STRING":
-                    token_type, token_value = self._parse_token_value(value, TokenType.STRING, line)
-                    token = Token(token_type, token_value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
-
-                case "EQUAL_EQUAL":
-                    token = Token(TokenType.EQUAL_EQUAL, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
-                
-                case "NOT_EQUAL":
-                    token = Token(TokenType.NOT_EQUAL, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
-
-                case "LESS_EQUAL":
-                    token = Token(TokenType.LESS_EQUAL, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
-                
-                case "GREATER_EQUAL":
-                    token = Token(TokenType.GREATER_EQUAL, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
-
-                case "LPAREN":
-                    token = Token(TokenType.LPAREN, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
-
-                case "RPAREN":
-                    token = Token(TokenType.RPAREN, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
-
-                case "LBRACKET":
-                    token = Token(TokenType.LBRACKET, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
-
-                case "RBRACKET":
-                    token = Token(TokenType.RBRACKET, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token 
-
-                case "COMMA":
-                    token = Token(TokenType.COMMA, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
-
-                case "DOT": 
-                    token = Token(TokenType.DOT, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
-
-                case "EQUALS":
-                    token = Token(TokenType.EQUALS, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token 
-
-                case "PLUS":
-                    token = Token(TokenType.PLUS, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
-                case "MINUS":
-                    token = Token(TokenType.MINUS, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
+        tokens = []
+        append = tokens.append
+        group_types = GROUP_TOKEN_TYPES
+        make_token = self.token_factory
+        word_types = self.word_types
+        identifier = TokenType.IDENTIFIER
 
-                case "POWER":
-                    token = Token(TokenType.POWER, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
-
-                case "MULTIPLY": 
-                    token = Token(TokenType.MULTIPLY, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
-
-                case "DIVIDE":
-                    token = Token(TokenType.DIVIDE, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
-
-                case "MODULO":
-                    token = Token(TokenType.MODULO, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
-
-                case "LESS_THAN":
-                    token = Token(TokenType.LESS_THAN, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
+        for match in TOKEN_REGEX.finditer(text):
+            group = match.lastindex
+            value = match.group(group)
+
+            if group == IDENTIFIER_GROUP:
+                word = word_types.get(value)
+                if word is None:
+                    append(make_token(identifier, value, line, indent))
+                else:
+                    append(make_token(word[0], word[1], line, indent))
+            elif group == NUMBER_GROUP:
+                append(make_token(TokenType.NUMBER, float(value) if '.' in value else int(value), line, indent))
+            elif group == STRING_GROUP:
+                append(make_token(TokenType.STRING, value[1:-1], line, indent))
+            elif group == COMMENT_GROUP:
+                break
+            else:
+                append(make_token(group_types[group], value, line, indent))
 
-                case "GREATER_THAN":
-                    token = Token(TokenType.GREATER_THAN, value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
+        if self.tracing:
+            for token in tokens:
+                self.tracer.info("Tokenized: %s", token)
 
-                case "IDENTIFIER":
-                    token_type, token_value = self._parse_token_value(value, TokenType.IDENTIFIER, line)
-                    token = Token(token_type, token_value, line, indent)
-                    self.tracer.info(f"Tokenized: {token}")
-                    yield token
+        return tokens
 
     def is_keyword(self, value: str) -> bool:
         return value in self.keywords
@@ -252,22 +260,8 @@ class Tokenizer:
         Comments start with '#' and continue to the end of the line.
         Does not remove comments inside quotes.
         """
-        if not line:
-            return line
-        
-        stripped = []
-        quote_char = None # Track what type of quote is currently open (single or double)
-        for char in line:
-            if char in ('"', "'"):
-                if quote_char is None:
-                    quote_char = char # Open a quote if not already in one
-                elif quote_char == char:
-                    quote_char = None # Close the quote if it matches the current one
-
-            if char == '#' and quote_char is None:
-                # If we hit a comment and we're not inside quotes, stop processing
-                break
-
-            stripped.append(char)
+        for match in TOKEN_REGEX.finditer(line):
+            if match.lastindex == COMMENT_GROUP:
+                return line[:match.start(COMMENT_GROUP)].rstrip()
 
-        return ''.join(stripped).rstrip()  # Remove trailing whitespace after stripping comments
\ No newline at end of file
+        return line.rstrip()
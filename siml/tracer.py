@@ -1,65 +1,183 @@
-from colorama import Fore, Style, init
-init(autoreset=True)
+import time
+from enum import IntEnum
+from typing import TYPE_CHECKING
 
-from siml.ast_nodes import ASTNode
+if TYPE_CHECKING:
+    from siml.ast_nodes import ASTNode
 
-class Tracer: 
+
+class Level(IntEnum):
+    DEBUG = 10
+    INFO = 20
+    WARN = 30
+    FAILURE = 40
+
+
+# Level -> (colorama Fore color, label)
+LEVEL_STYLES = {
+    Level.DEBUG: ("YELLOW", "[DEBUG]"),
+    Level.INFO: ("CYAN", "[INFO]"),
+    Level.WARN: ("MAGENTA", "[WARNING]"),
+    Level.FAILURE: ("RED", "[FAILURE]"),
+}
+
+_colorama = None
+
+
+def colorama():
+    """
+    The colorama module, imported and initialized the first time something is printed: most runs
+    never print a trace, and importing it costs more than the rest of this module.
+    """
+    global _colorama
+    if _colorama is None:
+        import colorama as module
+        module.init(autoreset=True)
+        _colorama = module
+    return _colorama
+
+
+class RingBuffer:
+    """
+    Fixed-size event sink backed by a preallocated list.
+    Events are stored as plain tuples; once the buffer is full the oldest
+    events are overwritten and counted in `dropped`.
+    """
+
+    def __init__(self, capacity: int = 65536):
+        if capacity <= 0:
+            raise ValueError("RingBuffer capacity must be positive")
+        self.capacity = capacity
+        self.events = [None] * capacity
+        self.head = 0
+        self.count = 0
+        self.dropped = 0
+
+    def append(self, event: tuple):
+        self.events[self.head] = event
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        else:
+            self.dropped += 1
+
+    def clear(self):
+        self.events = [None] * self.capacity
+        self.head = 0
+        self.count = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        start = (self.head - self.count) % self.capacity
+        for i in range(self.count):
+            yield self.events[(start + i) % self.capacity]
+
+
+class Tracer:
+    """
+    Structured tracer.
+    - Messages are %-style templates; arguments are stored as-is and only
+      formatted when the trace is dumped.
+    - Each section can have its own minimum level (see `set_level`).
+    - Events go to a shared ring buffer as (time, level, section, message, args)
+      tuples instead of being printed one by one.
+    Hot loops should hoist `is_enabled_for(level)` out of the loop.
+    """
     enabled = False
+    level = Level.DEBUG
+    section_levels: dict[str, Level] = {}
+    sink = RingBuffer()
 
     def __init__(self, section: str | None = None):
         self.section = section
 
-    def info(self, message: str):
-        if not self.enabled:
-            return
-        
-        label = Fore.CYAN + "[INFO]" + Style.RESET_ALL
-        section = f"{Fore.WHITE}[{self.section}]{Style.RESET_ALL} " if self.section else ""
-        print(f"\n{label} {section} {message}")
+    @classmethod
+    def set_level(cls, level: Level, section: str | None = None):
+        if section is None:
+            cls.level = level
+        else:
+            cls.section_levels[section] = level
 
-    def debug(self, message: str):
-        if not self.enabled:
-            return
-        
-        label = Fore.YELLOW + "[DEBUG]" + Style.RESET_ALL
-        section = f"{Fore.WHITE}[{self.section}]{Style.RESET_ALL} " if self.section else ""
-        print(f"\n{label} {section} {message}")
+    @classmethod
+    def set_capacity(cls, capacity: int):
+        cls.sink = RingBuffer(capacity)
 
-    def warn(self, message: str):
+    def is_enabled_for(self, level: Level) -> bool:
         if not self.enabled:
-            return
-        
-        label = Fore.MAGENTA + "[WARNING]" + Style.RESET_ALL
-        section = f"{Fore.WHITE}[{self.section}]{Style.RESET_ALL} " if self.section else ""
-        print(f"\n{label} {section} {message}")
+            return False
+        return level >= self.section_levels.get(self.section, self.level)
 
-    def failure(self, message: str):
+    def log(self, level: Level, message: str, *args):
         if not self.enabled:
             return
-        
-        label = Fore.RED + "[FAILURE]" + Style.RESET_ALL
-        section = f"{Fore.WHITE}[{self.section}]{Style.RESET_ALL} " if self.section else ""
-        print(f"\n{label} {section} {message}")
+        if level < self.section_levels.get(self.section, self.level):
+            return
+        self.sink.append((time.perf_counter(), level, self.section, message, args))
+
+    def info(self, message: str, *args):
+        if self.enabled:
+            self.log(Level.INFO, message, *args)
+
+    def debug(self, message: str, *args):
+        if self.enabled:
+            self.log(Level.DEBUG, message, *args)
+
+    def warn(self, message: str, *args):
+        if self.enabled:
+            self.log(Level.WARN, message, *args)
+
+    def failure(self, message: str, *args):
+        if self.enabled:
+            self.log(Level.FAILURE, message, *args)
+
+    @staticmethod
+    def format_event(event: tuple) -> str:
+        _, level, section, message, args = event
+        if args:
+            try:
+                message = message % args
+            except (TypeError, ValueError):
+                message = f"{message} {args!r}"
 
-    def _render_ast(self, node: ASTNode, indent: str = "", is_last: bool = True) -> str:
+        fore, reset = colorama().Fore, colorama().Style.RESET_ALL
+        color, name = LEVEL_STYLES[level]
+        label = getattr(fore, color) + name + reset
+        section = f"{fore.WHITE}[{section}]{reset} " if section else ""
+        return f"\n{label} {section} {message}"
+
+    @classmethod
+    def dump(cls, file=None, clear: bool = True):
+        """
+        Pretty-print every buffered event, oldest first.
+        """
+        for event in cls.sink:
+            print(cls.format_event(event), file=file)
+
+        if cls.sink.dropped:
+            fore, reset = colorama().Fore, colorama().Style.RESET_ALL
+            print(f"\n{fore.RED}[TRACE]{reset} {cls.sink.dropped} older events were dropped", file=file)
+
+        if clear:
+            cls.sink.clear()
+
+    def _render_ast(self, node: "ASTNode", indent: str = "", is_last: bool = True) -> str:
         prefix = indent + ("└── " if is_last else "├── ")
         result = f"{prefix}{node.summary()}\n"
 
         children = node.get_children()
         for i, child in enumerate(children):
-            is_last_child = (i == len(children) - 1) 
+            is_last_child = (i == len(children) - 1)
             next_indent = indent + ("    " if is_last else "│   ")
             result += self._render_ast(child, next_indent, is_last_child)
 
         return result
-    
-    def debug_ast(self, node: ASTNode):
+
+    def debug_ast(self, node: "ASTNode"):
         if not self.enabled:
-            return 
+            return
         output = self._render_ast(node)
-        print(Fore.MAGENTA + "[DEBUG AST]" + Style.RESET_ALL)
+        print(colorama().Fore.MAGENTA + "[DEBUG AST]" + colorama().Style.RESET_ALL)
         print(output)
-
-
-    
-        
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from siml.agents import AgentDecision, AgentPrompt, AgentScheduler, RateLimiter, StubProvider, plain
+from siml.interpreter import SimulationError
+from siml.parser import parse_source
+from siml.runtime import Simulation
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), "..", "examples", "invoice_simulation.siml")
+
+
+def prompt(sequence: int, agent: str = "billing", context: dict | None = None) -> AgentPrompt:
+    return AgentPrompt(sequence, agent, "invoicing", 0, context if context is not None else {"id": sequence},
+                       ["approve", "reject"])
+
+
+class Recorder:
+    """
+    A provider that answers with the prompt's sequence number, finishing later batches first.
+    """
+
+    def __init__(self, max_batch_size: int = 2):
+        self.max_batch_size = max_batch_size
+        self.batches: list[list[int]] = []
+        self.in_flight = 0
+        self.most_in_flight = 0
+
+    async def complete(self, prompts: list[AgentPrompt]) -> list[AgentDecision]:
+        self.batches.append([prompt.sequence for prompt in prompts])
+        self.in_flight += 1
+        self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        await asyncio.sleep(0.001 * (10 - len(self.batches) % 10))
+        self.in_flight -= 1
+        return [AgentDecision(str(prompt.sequence)) for prompt in prompts]
+
+
+@pytest.fixture
+def scheduler():
+    schedulers = []
+
+    def make(provider, **options) -> AgentScheduler:
+        schedulers.append(AgentScheduler(provider, **options))
+        return schedulers[-1]
+
+    yield make
+    for made in schedulers:
+        made.close()
+
+
+def test_decisions_come_back_in_prompt_order(scheduler):
+    provider = Recorder()
+    prompts = [prompt(index, agent="a" if index % 3 else "b") for index in range(12)]
+    decisions = scheduler(provider).decide(prompts)
+    assert [decision.action for decision in decisions] == [str(index) for index in range(12)]
+
+
+def test_prompts_are_batched_per_agent(scheduler):
+    provider = Recorder(max_batch_size=2)
+    prompts = [prompt(index, agent="a" if index < 5 else "b") for index in range(8)]
+    made = scheduler(provider)
+    made.decide(prompts)
+    assert sorted(provider.batches) == [[0, 1], [2, 3], [4], [5, 6], [7]]
+    assert made.requests == 5 and made.prompts == 8
+
+
+def test_concurrency_limits_requests_in_flight(scheduler):
+    provider = Recorder(max_batch_size=1)
+    scheduler(provider, concurrency=3).decide([prompt(index) for index in range(12)])
+    assert provider.most_in_flight == 3
+
+
+def test_rate_limit_spaces_requests(scheduler):
+    provider = Recorder(max_batch_size=1)
+    start = time.perf_counter()
+    scheduler(provider, concurrency=1, rate_limit=100).decide([prompt(index) for index in range(6)])
+    # The first request goes at once; the other five wait 10 ms each
+    assert time.perf_counter() - start >= 0.045
+
+
+def test_rate_limiter_allows_a_burst():
+    limiter = RateLimiter(10, burst=3)
+    loop = asyncio.new_event_loop()
+    try:
+        start = time.perf_counter()
+        for _ in range(3):
+            loop.run_until_complete(limiter.acquire())
+        assert time.perf_counter() - start < 0.05
+    finally:
+        loop.close()
+    with pytest.raises(ValueError):
+        RateLimiter(0)
+
+
+def test_short_answers_are_an_error(scheduler):
+    class Short:
+        async def complete(self, prompts):
+            return []
+
+    with pytest.raises(SimulationError, match="0 decision"):
+        scheduler(Short()).decide([prompt(0)])
+
+
+def test_stub_is_deterministic():
+    prompts = [prompt(index) for index in range(200)]
+    first = [StubProvider(seed=3).decide(item) for item in prompts]
+    assert first == [StubProvider(seed=3).decide(item) for item in prompts]
+    assert first != [StubProvider(seed=4).decide(item) for item in prompts]
+    assert {decision.action for decision in first} == {None, "approve", "reject"}
+    assert all(StubProvider(idle_rate=1.0).decide(item).action is None for item in prompts)
+
+
+def test_run_does_not_depend_on_concurrency_or_latency():
+    with open(EXAMPLE) as f:
+        tree, errors = parse_source(f.read())
+    assert not errors
+
+    def final(concurrency: int, latency: float) -> str:
+        provider = StubProvider(max_batch_size=7, latency=latency, seed=5)
+        simulation = Simulation(tree, provider=provider, concurrency=concurrency)
+        simulation.run(3)
+        simulation.close()
+        assert simulation.agent_runner.decisions == 300
+        return json.dumps({module.name: plain(module.state) for module in simulation.modules}, sort_keys=True)
+
+    assert final(1, 0.0) == final(8, 0.001) == final(3, 0.0)
@@ -0,0 +1,57 @@
+import os
+import shutil
+
+from siml.cache import ModuleCache
+from siml.loader import load_program
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), "..", "examples", "invoice_simulation.siml")
+
+
+def test_roundtrip_and_miss(tmp_path):
+    cache = ModuleCache(tmp_path)
+    assert cache.get("tree", "ab" * 20) is None
+    cache.put("tree", "ab" * 20, {"x": [1, 2]})
+    assert cache.get("tree", "ab" * 20) == {"x": [1, 2]}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_unwritable_root_is_a_miss(tmp_path):
+    # A file where the cache directory should be makes every write fail, even as root
+    blocked = tmp_path / "blocked"
+    blocked.write_text("")
+    cache = ModuleCache(blocked / "cache")
+    cache.put("tree", "cd" * 20, [1])
+    assert cache.get("tree", "cd" * 20) is None
+    assert cache.known_size is None
+
+
+def test_load_program_skips_unwritable_cache(tmp_path):
+    blocked = tmp_path / "blocked"
+    blocked.write_text("")
+    loaded = load_program(EXAMPLE, cache_dir=blocked / "cache")
+    assert loaded is not None
+
+
+def test_overwrite_counts_the_entry_once(tmp_path):
+    cache = ModuleCache(tmp_path)
+    cache.put("tree", "ef" * 20, b"a" * 1000)
+    cache.put("tree", "01" * 20, b"b" * 1000)
+    cache.put("tree", "ef" * 20, b"c" * 500)
+    assert cache.known_size == cache.size()
+
+
+def test_overwrite_does_not_evict_early(tmp_path):
+    cache = ModuleCache(tmp_path)
+    cache.put("tree", "ef" * 20, b"a" * 1000)
+    cache.max_bytes = cache.size() + 100
+    for _ in range(5):
+        cache.put("tree", "ef" * 20, b"a" * 1000)
+    assert cache.evictions == 0
+    assert cache.get("tree", "ef" * 20) == b"a" * 1000
+
+
+def test_copy_of_example_caches_next_to_program(tmp_path):
+    program = tmp_path / "invoice_simulation.siml"
+    shutil.copy(EXAMPLE, program)
+    load_program(program)
+    assert ModuleCache(tmp_path / "__simlcache__").entries()
@@ -0,0 +1,84 @@
+import json
+
+import numpy as np
+import pytest
+
+from siml.agents import plain
+from siml.columnar import ColumnTable
+from siml.parser import parse_source
+from siml.runtime import Simulation, ENGINES
+
+# Writes that change a column's kind on only some rows, and int64 overflow
+PROGRAM = """simulation:
+  config:
+    max_ticks: 3
+  modules:
+    - module:
+        id: m
+        state:
+          - items:
+              - id: 1
+                amount: 10
+                fee: 0.5
+                big: 9000000000000000000
+                flag: true
+              - id: 2
+                amount: 7
+                fee: 1
+                big: 5
+                flag: false
+              - id: 3
+                amount: 12
+                fee: 2.5
+                big: -9000000000000000000
+                flag: true
+        rules:
+          - trigger: on tick
+            do:
+              - for each: it in items
+                  - if it.amount > 8:
+                      - set: it.amount = it.amount / 2
+                  - set: it.big = it.big * 3
+                  - set: it.fee = it.fee + 1
+                  - set: it.count = it.flag + it.flag
+                  - set: it.ratio = it.big / 7
+"""
+
+
+def final_json(source: str, engine: str) -> str:
+    tree, errors = parse_source(source)
+    assert not errors
+    simulation = Simulation(tree, engine=engine)
+    simulation.run()
+    return json.dumps({module.name: plain(module.state) for module in simulation.modules}, sort_keys=True)
+
+
+@pytest.mark.parametrize("engine", [engine for engine in ENGINES if engine != "interpreted"])
+def test_engines_match_interpreter_exactly(engine):
+    assert final_json(PROGRAM, engine) == final_json(PROGRAM, "interpreted")
+
+
+def test_vectorized_loop_runs_on_table():
+    tree, _ = parse_source(PROGRAM)
+    simulation = Simulation(tree, engine="vectorized")
+    assert type(simulation.modules[0].state["items"]) is ColumnTable
+
+
+def test_partial_write_keeps_other_rows_exact():
+    table = ColumnTable.from_records([{"amount": 10}, {"amount": 7}])
+    table.write("amount", np.array([0]), 5.0)
+    assert table.to_records() == [{"amount": 5.0}, {"amount": 7}]
+    assert [type(record["amount"]) for record in table.to_records()] == [float, int]
+
+
+def test_full_write_takes_the_new_kind():
+    table = ColumnTable.from_records([{"amount": 10}, {"amount": 7}])
+    table.write("amount", None, table.read("amount", None) / 2)
+    assert table.kinds["amount"] == "float"
+    assert table.to_records() == [{"amount": 5.0}, {"amount": 3.5}]
+
+
+def test_mixed_int_and_float_records_stay_exact():
+    table = ColumnTable.from_records([{"x": 1}, {"x": 2.5}])
+    assert table.kinds["x"] == "object"
+    assert json.dumps(table.to_records()) == '[{"x": 1}, {"x": 2.5}]'
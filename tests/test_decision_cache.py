@@ -0,0 +1,90 @@
+import pytest
+
+from siml.agents import AgentDecision, AgentPrompt, AgentScheduler, DecisionCache, StubProvider
+
+
+def prompt(sequence: int, context: dict, llm: dict | None = None, can_call: list | None = None) -> AgentPrompt:
+    return AgentPrompt(sequence, "billing", "invoicing", 0, context, can_call or ["approve", "reject"], llm or {})
+
+
+class Counting(StubProvider):
+    def __init__(self):
+        super().__init__(max_batch_size=1, idle_rate=0.0)
+        self.seen = 0
+
+    async def complete(self, prompts):
+        self.seen += len(prompts)
+        return await super().complete(prompts)
+
+
+@pytest.fixture
+def decide():
+    schedulers = []
+
+    def run(cache: DecisionCache, prompts: list[AgentPrompt], provider=None):
+        provider = provider or Counting()
+        scheduler = AgentScheduler(provider, cache=cache)
+        schedulers.append(scheduler)
+        return scheduler.decide(prompts), provider
+
+    yield run
+    for scheduler in schedulers:
+        scheduler.close()
+
+
+def test_key_is_stable_and_covers_the_prompt():
+    cache = DecisionCache()
+    base = cache.key("stub", prompt(0, {"a": 1, "b": 2}))
+    assert cache.key("stub", prompt(5, {"b": 2, "a": 1})) == base
+    assert cache.key("stub", prompt(0, {"a": 1, "b": 2}, can_call=["reject", "approve"])) == base
+    assert cache.key("stub", prompt(0, {"a": 1, "b": 3})) != base
+    assert cache.key("stub", prompt(0, {"a": 1, "b": 2}, llm={"model": "x"})) != base
+    assert cache.key("stub", prompt(0, {"a": 1, "b": 2}, can_call=["approve"])) != base
+    assert cache.key("other", prompt(0, {"a": 1, "b": 2})) != base
+
+
+def test_lru_evicts_the_least_recently_used():
+    cache = DecisionCache(max_entries=2)
+    cache.put("a", AgentDecision("x"))
+    cache.put("b", AgentDecision("y"))
+    assert cache.get("a") == AgentDecision("x")
+    cache.put("c", AgentDecision("z"))
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses, cache.hit_rate) == (1, 1, 0.5)
+    with pytest.raises(ValueError):
+        DecisionCache(max_entries=0)
+
+
+def test_repeated_prompts_are_asked_once(decide):
+    cache = DecisionCache()
+    prompts = [prompt(index, {"id": index % 3}) for index in range(9)]
+    first, provider = decide(cache, prompts)
+    assert provider.seen == 3
+    again, provider = decide(cache, prompts)
+    assert provider.seen == 0
+    assert again == first
+    assert cache.hits == 9 and cache.misses == 3
+
+
+def test_disk_tier_is_reused_across_caches(decide, tmp_path):
+    prompts = [prompt(index, {"id": index}) for index in range(4)]
+    first, _ = decide(DecisionCache(path=tmp_path), prompts)
+
+    cache = DecisionCache(path=tmp_path)
+    again, provider = decide(cache, prompts)
+    assert provider.seen == 0
+    assert again == first
+    assert cache.disk_hits == 4
+    # Disk hits are promoted to the memory tier
+    decide(cache, prompts)
+    assert cache.disk_hits == 4 and cache.hits == 8
+
+
+def test_bypass_asks_the_provider_for_every_prompt(decide):
+    cache = DecisionCache(bypass=True)
+    prompts = [prompt(index, {"id": 1}) for index in range(5)]
+    decisions, provider = decide(cache, prompts)
+    assert provider.seen == 5
+    assert len(set(decision.action for decision in decisions)) == 1
+    assert (cache.hits, cache.misses, len(cache.entries)) == (0, 0, 0)
@@ -0,0 +1,57 @@
+import itertools
+import json
+import os
+
+import pytest
+
+from siml.agents import plain
+from siml.parser import parse_source
+from siml.runtime import Simulation, ENGINES
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), "programs")
+EXAMPLES = os.path.join(os.path.dirname(__file__), "..", "examples")
+
+SOURCES = {
+    "support": os.path.join(PROGRAMS, "support.siml"),
+    "invariants": os.path.join(PROGRAMS, "invariants.siml"),
+    "invoices": os.path.join(PROGRAMS, "invoices.siml"),
+    "fees": os.path.join(PROGRAMS, "fees.siml"),
+    "example": os.path.join(EXAMPLES, "invoice_simulation.siml"),
+}
+
+# skip_unchanged, indexes, optimize
+SWITCHES = list(itertools.product((True, False), repeat=3))
+
+
+def parse(name: str):
+    with open(SOURCES[name]) as f:
+        tree, errors = parse_source(f.read())
+    assert not errors
+    return tree
+
+
+def final_json(tree, engine: str, skip_unchanged: bool, indexes: bool, optimize: bool) -> str:
+    simulation = Simulation(tree, engine=engine, seed=7, provider="stub", skip_unchanged=skip_unchanged,
+                            indexes=indexes, optimize=optimize)
+    simulation.run()
+    return json.dumps({module.name: plain(module.state) for module in simulation.modules}, sort_keys=True)
+
+
+@pytest.mark.parametrize("name", SOURCES)
+def test_every_engine_and_switch_matches_the_plain_interpreter(name):
+    tree = parse(name)
+    expected = final_json(tree, "interpreted", False, False, False)
+    for engine in ENGINES:
+        for skip_unchanged, indexes, optimize in SWITCHES:
+            assert final_json(tree, engine, skip_unchanged, indexes, optimize) == expected, \
+                (engine, skip_unchanged, indexes, optimize)
+
+
+def test_skip_unchanged_skips_rules():
+    tree = parse("support")
+    skipping = Simulation(tree, skip_unchanged=True)
+    skipping.run()
+    evaluating = Simulation(tree, skip_unchanged=False)
+    evaluating.run()
+    assert evaluating.rules_skipped == 0
+    assert skipping.rule_evaluations < evaluating.rule_evaluations
@@ -0,0 +1,128 @@
+import bz2
+import gzip
+import json
+import lzma
+import math
+import os
+
+import numpy as np
+import pytest
+
+from siml.export import COLUMNS, TraceExporter
+from siml.interpreter import SimulationError
+from siml.parser import parse_source
+from siml.runtime import Simulation
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), "..", "examples", "invoice_simulation.siml")
+OPENERS = {None: open, "gzip": gzip.open, "bz2": bz2.open, "xz": lzma.open}
+
+EVENTS = [
+    ("tick", 0, 2, 1.5),
+    ("prompt", 0, "invoicing", "billing_agent", {"invoice": {"id": 1, "amount": 4200}}, "approve_invoice", True, 1),
+    ("prompt", 0, "invoicing", "billing_agent", {"invoice": {"id": 2}}, None, False),
+    {"event": "custom", "tick": 0, "note": "ready-made"},
+]
+RECORDS = [
+    {"event": "tick", "tick": 0, "prompts": 2, "elapsed_ms": 1.5},
+    {"event": "prompt", "tick": 0, "module": "invoicing", "agent": "billing_agent",
+     "context": {"invoice": {"id": 1, "amount": 4200}}, "action": "approve_invoice", "applied": True, "reward": 1},
+    {"event": "prompt", "tick": 0, "module": "invoicing", "agent": "billing_agent",
+     "context": {"invoice": {"id": 2}}, "action": None, "applied": False},
+    {"event": "custom", "tick": 0, "note": "ready-made"},
+]
+
+
+def read_jsonl(paths: list[str], compression: str | None) -> list[dict]:
+    records = []
+    for path in paths:
+        with OPENERS[compression](path, "rt", encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f)
+    return records
+
+
+def read_columnar(paths: list[str]) -> dict[str, list]:
+    columns = {name: [] for name in COLUMNS}
+    for path in paths:
+        with np.load(path) as part:
+            for name in COLUMNS:
+                columns[name].extend(part[name].tolist())
+    return columns
+
+
+@pytest.mark.parametrize("compression", [None, "gzip", "bz2", "xz"])
+def test_jsonl_round_trip(tmp_path, compression):
+    exporter = TraceExporter(str(tmp_path / "run"), compression=compression)
+    exporter.emit(EVENTS[:2])
+    exporter.emit(EVENTS[2:])
+    exporter.close()
+    suffix = {None: "", "gzip": ".gz", "bz2": ".bz2", "xz": ".xz"}[compression]
+    assert exporter.paths == [str(tmp_path / f"run-00000.jsonl{suffix}")]
+    assert read_jsonl(exporter.paths, compression) == RECORDS
+    assert exporter.events == 4
+
+
+def test_jsonl_rotates_parts(tmp_path):
+    exporter = TraceExporter(str(tmp_path / "run"), max_bytes=200)
+    for tick in range(20):
+        exporter.emit([("tick", tick, 0, 0.5)])
+    exporter.close()
+    assert len(exporter.paths) > 1
+    assert all(os.path.getsize(path) < 200 + 100 for path in exporter.paths)
+    assert [record["tick"] for record in read_jsonl(exporter.paths, None)] == list(range(20))
+    assert exporter.bytes == sum(os.path.getsize(path) for path in exporter.paths)
+
+
+@pytest.mark.parametrize("compression", [None, "gzip"])
+def test_columnar_round_trip(tmp_path, compression):
+    exporter = TraceExporter(str(tmp_path / "run"), format="columnar", compression=compression)
+    exporter.emit(EVENTS[:3])
+    exporter.close()
+    columns = read_columnar(exporter.paths)
+    assert columns["event"] == ["tick", "prompt", "prompt"]
+    assert columns["tick"] == [0, 0, 0]
+    assert columns["prompts"] == [2, -1, -1]
+    assert columns["action"] == ["", "approve_invoice", ""]
+    assert columns["applied"] == [False, True, False]
+    assert columns["reward"][1] == 1.0 and math.isnan(columns["reward"][0]) and math.isnan(columns["reward"][2])
+    assert [json.loads(value) if value else None for value in columns["context"]] == \
+        [None, RECORDS[1]["context"], RECORDS[2]["context"]]
+
+
+def test_columnar_rotates_parts(tmp_path):
+    exporter = TraceExporter(str(tmp_path / "run"), format="columnar", max_bytes=2_000)
+    for tick in range(200):
+        exporter.emit([("tick", tick, 0, 0.5)])
+    exporter.close()
+    assert len(exporter.paths) > 1
+    assert read_columnar(exporter.paths)["tick"] == list(range(200))
+
+
+def test_bad_options_and_writer_errors(tmp_path):
+    with pytest.raises(SimulationError, match="format"):
+        TraceExporter(str(tmp_path / "run"), format="parquet")
+    with pytest.raises(SimulationError, match="compression"):
+        TraceExporter(str(tmp_path / "run"), compression="zstd")
+
+    with pytest.raises(ValueError):
+        TraceExporter(str(tmp_path / "run"), max_bytes=0)
+
+    # The writer thread fails on an event it has no layout for; close() reports it
+    exporter = TraceExporter(str(tmp_path / "run"))
+    exporter.emit([("unknown", 0)])
+    with pytest.raises(SimulationError, match="Export failed"):
+        exporter.close()
+
+
+def test_simulation_exports_ticks_and_prompts(tmp_path):
+    with open(EXAMPLE) as f:
+        tree, _ = parse_source(f.read())
+    exporter = TraceExporter(str(tmp_path / "run"))
+    simulation = Simulation(tree, provider="stub", exporter=exporter)
+    simulation.run(3)
+    simulation.close()
+    records = read_jsonl(exporter.paths, None)
+    ticks = [record for record in records if record["event"] == "tick"]
+    prompts = [record for record in records if record["event"] == "prompt"]
+    assert [record["tick"] for record in ticks] == [0, 1, 2]
+    assert len(prompts) == sum(record["prompts"] for record in ticks) > 0
+    assert all(record["module"] and record["agent"] and "applied" in record for record in prompts)
@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+from siml.incremental import IncrementalDocument, changed_range
+from siml.parser import parse_source
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), "programs")
+
+
+@pytest.fixture
+def source():
+    with open(os.path.join(PROGRAMS, "support.siml")) as f:
+        return f.read()
+
+
+def positions(root) -> list[tuple]:
+    found = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        found.append((type(node).__name__, node.line, node.get_meta("end_line")))
+        stack.extend(reversed(node.get_children()))
+    return found
+
+
+def assert_matches_full_parse(document: IncrementalDocument, source: str):
+    tree, errors = parse_source(source)
+    assert document.tree == tree
+    assert positions(document.tree) == positions(tree)
+    assert [(error.line, error.message) for error in document.errors] == [(error.line, error.message) for error in errors]
+
+
+def test_changed_range():
+    assert changed_range(["a", "b", "c"], ["a", "b", "c"]) is None
+    assert changed_range(["a", "b", "c"], ["a", "x", "c"]) == (2, 2, 2)
+    assert changed_range(["a", "c"], ["a", "b", "c"]) == (2, 1, 2)
+    assert changed_range(["a", "b", "c"], ["a", "c"]) == (2, 2, 1)
+
+
+def test_edit_inside_a_rule_reparses_the_rule(source):
+    document = IncrementalDocument(source)
+    edited = source.replace("set: urgent = urgent + 1", "set: urgent = urgent + 2")
+    result = document.set_source(edited)
+    assert result.incremental and result.kind == "rule"
+    assert_matches_full_parse(document, edited)
+
+
+def test_inserted_lines_shift_the_rest_of_the_tree(source):
+    document = IncrementalDocument(source)
+    edited = source.replace("                      - set: urgent = urgent + 1\n",
+                            "                      - set: urgent = urgent + 1\n"
+                            "                      - set: handled = handled + 0\n")
+    result = document.set_source(edited)
+    assert result.incremental
+    assert_matches_full_parse(document, edited)
+
+    reverted = document.set_source(source)
+    assert reverted.incremental
+    assert_matches_full_parse(document, source)
+
+
+def test_errors_outside_the_edit_move_with_it(source):
+    document = IncrementalDocument(source)
+    broken = source.replace("              - set: tick = tick + 1\n", "              - set: tick = \n")
+    document.set_source(broken)
+    assert_matches_full_parse(document, broken)
+
+    edited = broken.replace("              - set: ticket.status = \"closed\"\n",
+                            "              - set: ticket.status = \"closed\"\n"
+                            "              - set: ticket.status = \n")
+    result = document.set_source(edited)
+    assert result.incremental and result.kind == "action"
+    assert document.errors[-1].line == edited.splitlines().index("              - set: tick = ") + 1
+    assert_matches_full_parse(document, edited)
+
+
+def test_growing_the_last_rule_moves_its_module_end(source):
+    document = IncrementalDocument(source)
+    edited = source.replace("                  - set: level = limit * 2\n",
+                            "                  - set: urgent = urgent + 0\n"
+                            "                  - set: level = limit * 2\n")
+    assert edited.endswith("level = limit * 2\n")
+    result = document.set_source(edited)
+    assert result.incremental and result.kind == "rule"
+    assert document.tree.modules[0].get_meta("end_line") == len(edited.splitlines())
+    assert_matches_full_parse(document, edited)
+
+    # The next edit of that rule starts from the module's moved span
+    edited = edited.replace("set: urgent = urgent + 0", "set: urgent = urgent + 3")
+    assert document.set_source(edited).incremental
+    assert_matches_full_parse(document, edited)
+
+
+def test_edit_across_items_falls_back_to_a_full_parse(source):
+    document = IncrementalDocument(source)
+    edited = source.replace("max_ticks: 5", "max_ticks: 7")
+    result = document.set_source(edited)
+    assert not result.incremental
+    assert_matches_full_parse(document, edited)
+
+
+def test_series_of_edits_matches_a_full_parse(source):
+    document = IncrementalDocument(source)
+    edits = [
+        ("ticket.work = 1 + ticket.id % 4", "ticket.work = 2 + ticket.id % 5"),
+        ("set: handled = handled + 1", "set: handled = handled + 1\n              - set: urgent = urgent"),
+        ("- template: ticket_template", "- template: ticket_template\n            examples:\n"),
+        ("if limit > 2", "if limit > 1"),
+    ]
+    current = source
+    for old, new in edits:
+        current = current.replace(old, new, 1)
+        document.set_source(current)
+        assert_matches_full_parse(document, current)
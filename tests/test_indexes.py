@@ -0,0 +1,154 @@
+import json
+import os
+
+import pytest
+
+from siml.agents import plain
+from siml.dependencies import DependencyAnalysis
+from siml.indexes import MAX_REBUILDS, HashIndex, IndexRegistry, SortedIndex, plan_loops
+from siml.parser import parse_source
+from siml.runtime import Simulation, agent_actions, module_state_names
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), "programs")
+
+SCANS = """
+simulation:
+  modules:
+    - module:
+        id: m
+        state:
+          - rows: []
+          - others: []
+          - cutoff: 50
+        rules:
+          - trigger: on tick
+            do:
+              - for each: row in rows
+                  - if row.score > cutoff:
+                      - set: cutoff = cutoff + 1
+              - for each: row in rows
+                  - if row.kind == "a":
+                      - set: row.score = 1
+                  - else:
+                      - set: row.score = 2
+              - for each: row in rows
+                  - set: row.score = 0
+                  - if row.kind == "a":
+                      - set: row.score = 1
+              - for each: row in rows
+                  - if row.kind == "b":
+                      - for each: other in others
+                          - set: other.kind = "b"
+              - for each: row in rows
+                  - if row.score + 1 > cutoff:
+                      - set: row.score = 0
+              - for each: row in rows
+                  - if cutoff <= row.score and row.kind == "a":
+                      - set: row.kind = "b"
+"""
+
+
+def plans(source: str) -> list[str]:
+    tree, errors = parse_source(source)
+    assert not errors
+    module = tree.modules[0]
+    analysis = DependencyAnalysis(module, module_state_names(module), agent_actions(tree))
+    return [plan.describe() for plan in sorted(plan_loops(module, analysis).values(), key=lambda plan: plan.line)]
+
+
+def support() -> str:
+    with open(os.path.join(PROGRAMS, "support.siml")) as f:
+        return f.read()
+
+
+def records(count: int) -> list[dict]:
+    return [{"id": index, "score": index % 10, "kind": "a" if index % 2 else "b"} for index in range(count)]
+
+
+def test_loops_are_planned_per_predicate():
+    assert plans(support()) == [
+        "hash index on ticket.due (==)",
+        "hash index on ticket.status (==)",
+        "sorted index on ticket.priority (>)",
+    ]
+
+
+def test_loops_that_scan_say_why():
+    assert plans(SCANS) == [
+        "scan (the body may change 'cutoff')",
+        "scan (the `if` has an `else`)",
+        "scan (body is not a single `if`)",
+        "scan ('kind' is assigned other than through 'row')",
+        "scan (body is not a single `if`)", # the inner loop over `others`
+        "scan (condition does not compare a field of 'row' with a literal or a path)",
+        "sorted index on row.score (>=)",
+    ]
+
+
+def test_hash_index_follows_updates():
+    items = records(100)
+    index = HashIndex(items, "score")
+    assert index.select("==", 3) == [3, 13, 23, 33, 43, 53, 63, 73, 83, 93]
+    assert index.select("==", 3.0) == index.select("==", 3)
+    index.update(items[4], 4, 3)
+    items[4]["score"] = 3
+    assert index.select("==", 3)[:2] == [3, 4]
+    assert 4 not in index.select("==", 4)
+    assert index.select("==", 42) == []
+    assert index.select("==", float("nan")) is None
+
+
+def test_sorted_index_follows_updates():
+    items = records(100)
+    index = SortedIndex(items, "score")
+    assert index.select(">", 8) == list(range(9, 100, 10))
+    assert index.select("<", 1) == list(range(0, 100, 10))
+    index.update(items[5], 5, 9)
+    items[5]["score"] = 9
+    assert index.select(">=", 9) == [5, *range(9, 100, 10)]
+    # Too unselective to beat a scan
+    assert index.select("<", 5) is None
+
+
+def test_unindexable_collections_scan():
+    assert not HashIndex(records(10) + [{"score": [1]}], "score").valid
+    assert not SortedIndex(records(10) + [{"score": None}], "score").valid
+    shared = records(10)
+    assert not HashIndex(shared + shared[:1], "score").valid
+
+    registry = IndexRegistry({"score"})
+    assert registry.select("rows", "score", "sorted", records(10) + [{"score": "x"}], ">", 8) is None
+    assert (registry.builds, registry.scans, registry.lookups) == (1, 1, 0)
+
+
+def test_registry_rebuilds_replaced_collections():
+    registry = IndexRegistry({"score"})
+    items = records(100)
+    assert registry.select("rows", "score", "hash", items, "==", 1) is not None
+    assert registry.select("rows", "score", "hash", items, "==", 2) is not None
+    assert registry.builds == 1 and registry.by_field["score"][0].items is items
+
+    # A collection replaced before its index is queried twice counts towards giving up on it
+    for _ in range(MAX_REBUILDS + 1):
+        registry.select("rows", "score", "hash", records(100), "==", 1)
+    assert registry.builds == 1 + MAX_REBUILDS
+    assert registry.scans == 1
+    assert len(registry.by_field["score"]) == 1
+
+
+@pytest.mark.parametrize("engine", ["compiled", "vectorized"])
+def test_indexes_are_kept_current_through_a_run(engine):
+    tree, _ = parse_source(support())
+
+    def run(indexes: bool) -> tuple[str, IndexRegistry | None]:
+        simulation = Simulation(tree, engine=engine, indexes=indexes)
+        simulation.run()
+        return (json.dumps({module.name: plain(module.state) for module in simulation.modules}, sort_keys=True),
+                simulation.modules[0].indexes)
+
+    indexed, registry = run(True)
+    scanned, none = run(False)
+    assert indexed == scanned
+    assert none is None
+    # Built once, then updated in place by every write to `due` and `status`
+    assert (registry.builds, registry.lookups, registry.scans) == (3, 15, 0)
@@ -0,0 +1,118 @@
+from siml import parallel
+from siml.cache import ModuleCache, content_key
+from siml.loader import ModuleLoader, program_loader
+from siml.runtime import Simulation
+
+MAIN = """simulation:
+  config:
+    max_ticks: 2
+  modules:
+    - module: "./modules/counter.siml"
+"""
+
+COUNTER = """module:
+  id: counter
+  state:
+    - count: 0
+  rules:
+    - trigger: on tick
+      do:
+        - set: count = count + {step}
+"""
+
+
+def write_program(root, step: int = 1):
+    (root / "modules").mkdir(exist_ok=True)
+    (root / "main.siml").write_text(MAIN)
+    (root / "modules" / "counter.siml").write_text(COUNTER.format(step=step))
+    return root / "main.siml"
+
+
+def load(path, cache: ModuleCache) -> tuple[dict, ModuleLoader]:
+    loader = ModuleLoader(cache)
+    loaded = loader.load(path)
+    assert not loaded.diagnostics
+    simulation = Simulation(loaded.tree)
+    simulation.run()
+    return simulation.modules[0].state, loader
+
+
+def test_content_key_covers_every_part():
+    assert content_key("a", "b") == content_key(b"a", b"b")
+    assert content_key("a", "b") != content_key("b", "a")
+    # Parts are length-prefixed, so moving a boundary changes the key
+    assert content_key("ab", "c") != content_key("a", "bc")
+
+
+def test_unchanged_program_loads_from_the_cache(tmp_path):
+    main = write_program(tmp_path)
+    cache = ModuleCache(tmp_path / "cache")
+    assert load(main, cache)[0] == {"count": 2}
+
+    hits = cache.hits
+    state, loader = load(main, cache)
+    assert state == {"count": 2}
+    assert cache.hits > hits
+    assert loader.timings == {}
+
+
+def test_editing_a_dependency_invalidates_its_importer(tmp_path):
+    main = write_program(tmp_path)
+    cache = ModuleCache(tmp_path / "cache")
+    load(main, cache)
+    keys = ModuleLoader(cache)
+    keys.load(main)
+
+    write_program(tmp_path, step=5)
+    state, loader = load(main, cache)
+    assert state == {"count": 10}
+    # main.siml is unchanged, but its key covers the dependency's
+    assert loader.own_keys[str(main)] == keys.own_keys[str(main)]
+    assert loader.keys[str(main)] != keys.keys[str(main)]
+    assert set(loader.timings) == {str(main), str(tmp_path / "modules" / "counter.siml")}
+
+
+def test_reverting_an_edit_hits_the_old_entries(tmp_path):
+    main = write_program(tmp_path)
+    cache = ModuleCache(tmp_path / "cache")
+    load(main, cache)
+    write_program(tmp_path, step=5)
+    load(main, cache)
+
+    write_program(tmp_path)
+    state, loader = load(main, cache)
+    assert state == {"count": 2}
+    assert loader.timings == {}
+
+
+def write_modules(root, count: int):
+    (root / "modules").mkdir(exist_ok=True)
+    entries = []
+    for index in range(count):
+        source = COUNTER.format(step=index + 1).replace("id: counter", f"id: counter{index}")
+        (root / "modules" / f"counter{index}.siml").write_text(source)
+        entries.append(f'    - module: "./modules/counter{index}.siml"\n')
+    (root / "main.siml").write_text(MAIN.replace('    - module: "./modules/counter.siml"\n', "".join(entries)))
+    return root / "main.siml"
+
+
+def test_parallel_load_matches_a_serial_load(tmp_path, monkeypatch):
+    main = write_modules(tmp_path, 6)
+    serial = ModuleLoader(None, workers=1).load(main)
+
+    monkeypatch.setattr(parallel, "available_cpus", lambda: 3)
+    loader = ModuleLoader(None, workers=3)
+    loaded = loader.load(main)
+    assert loader.workers == 3
+    assert loaded.tree == serial.tree
+    assert [module.name for module in loaded.tree.modules] == [f"counter{index}" for index in range(6)]
+    assert len(loader.timings) == 7
+    assert "with 3 worker(s)" in loader.format_timings()
+
+
+def test_loader_workers_are_limited_to_the_available_cpus(tmp_path, monkeypatch):
+    main = write_modules(tmp_path, 2)
+    monkeypatch.setattr(parallel, "available_cpus", lambda: 1)
+    loader = program_loader(main, use_cache=False, workers=8)
+    assert loader.workers == 1
+    assert not loader.load(main).diagnostics
@@ -0,0 +1,58 @@
+import json
+import multiprocessing
+import os
+
+import pytest
+
+from siml import parallel
+from siml.agents import plain
+from siml.parser import parse_source
+from siml.runtime import Simulation
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), "programs")
+
+pytestmark = pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="workers need fork")
+
+
+@pytest.fixture(scope="module")
+def tree():
+    with open(os.path.join(PROGRAMS, "fees.siml")) as f:
+        tree, errors = parse_source(f.read())
+    assert not errors
+    return tree
+
+
+def final_json(simulation: Simulation) -> str:
+    simulation.run()
+    simulation.close()
+    return json.dumps({module.name: plain(module.state) for module in simulation.modules}, sort_keys=True)
+
+
+def test_workers_are_limited_to_the_available_cpus(tree, monkeypatch):
+    monkeypatch.setattr(parallel, "available_cpus", lambda: 2)
+    simulation = Simulation(tree, engine="vectorized", workers=8)
+    assert simulation.workers.count == 2
+    assert simulation.fork().workers.count == 2
+
+
+def test_one_cpu_never_splits(tree, monkeypatch):
+    monkeypatch.setattr(parallel, "available_cpus", lambda: 1)
+    monkeypatch.setattr(parallel, "MIN_PARALLEL_ROWS", 1)
+    simulation = Simulation(tree, engine="vectorized", workers=4)
+    assert simulation.workers.count == 1
+    final_json(simulation)
+    assert simulation.workers.processes == []
+    assert simulation.workers.splits == 0
+
+
+def test_split_loops_match_one_process(tree, monkeypatch):
+    monkeypatch.setattr(parallel, "available_cpus", lambda: 2)
+    monkeypatch.setattr(parallel, "MIN_PARALLEL_ROWS", 1)
+    simulation = Simulation(tree, engine="vectorized", workers=2)
+    assert final_json(simulation) == final_json(Simulation(tree, engine="vectorized"))
+    assert simulation.workers.splits > 0
+
+
+def test_workers_need_the_vectorized_engine(tree):
+    with pytest.raises(Exception, match="vectorized"):
+        Simulation(tree, engine="compiled", workers=2)
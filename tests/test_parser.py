@@ -0,0 +1,74 @@
+import os
+
+from siml.parser import MAX_KEY_WORDS, Parser, parse_source
+from siml.tokenizer import Tokenizer
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), "programs")
+
+
+def read(name: str) -> str:
+    with open(os.path.join(PROGRAMS, name)) as f:
+        return f.read()
+
+
+def test_clean_program_has_no_errors():
+    tree, errors = parse_source(read("invariants.siml"))
+    assert errors == []
+    assert [module.name for module in tree.modules] == ["m"]
+    assert [action.name for action in tree.modules[0].actions] == ["bump"]
+
+
+def test_errors_in_separate_items_are_all_reported():
+    source = read("invariants.siml")
+    broken = source.replace("            with: [item]\n", "            with: [item\n", 1)
+    broken = broken.replace("                  - set: total = total + 1\n", "                  - set: = 1\n", 1)
+    tree, errors = parse_source(broken)
+    assert len(errors) >= 2
+    lines = [error.line for error in errors]
+    assert lines == sorted(lines)
+    assert lines[0] == broken.splitlines().index("            with: [item") + 1
+    assert broken.splitlines().index("                  - set: = 1") + 1 in lines
+
+
+def test_parsing_continues_past_a_broken_rule():
+    source = read("support.siml")
+    broken = source.replace("              - set: tick = tick + 1\n", "              - set: tick = \n", 1)
+    tree, errors = parse_source(broken)
+    clean, _ = parse_source(source)
+    assert [error.line for error in errors] == [broken.splitlines().index("              - set: tick = ") + 1]
+    module, expected = tree.modules[0], clean.modules[0]
+    assert [action.name for action in module.actions] == [action.name for action in expected.actions]
+    assert len(module.rules) == len(expected.rules)
+    # The rules after the broken one parse exactly as they do without the error
+    assert module.rules[-1] == expected.rules[-1]
+    assert module.templates == expected.templates
+
+
+def test_error_messages_name_the_line():
+    _, errors = parse_source("simulation:\n  config:\n    max_ticks: [\n")
+    assert errors
+    assert all(f"line {error.line}" in str(error) for error in errors)
+
+
+class Peeking(Parser):
+    def __init__(self, tokens):
+        super().__init__(tokens)
+        self.deepest = 0
+
+    def peek(self, offset: int = 1):
+        self.deepest = max(self.deepest, offset)
+        return super().peek(offset)
+
+
+def test_lookahead_is_bounded_outside_inline_lists():
+    for name in ("invariants.siml", "support.siml", "fees.siml"):
+        parser = Peeking(Tokenizer(read(name)))
+        parser.parse()
+        assert parser.deepest <= MAX_KEY_WORDS + 1, name
+
+    # A flat literal list is read ahead whole: its values, commas and closing bracket
+    source = "state:\n  - settings:\n      ids: [" + ", ".join(map(str, range(50))) + "]\n"
+    parser = Peeking(Tokenizer(source))
+    tree = parser.parse()
+    assert parser.deepest == 2 * 50 + 1
+    assert tree == parse_source(source)[0]
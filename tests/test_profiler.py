@@ -0,0 +1,121 @@
+import os
+
+import pytest
+
+from cli.main import main
+from siml.parser import parse_source
+from siml.profiler import Profiler, ProfileEntry
+from siml.runtime import Simulation
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), "programs")
+SUPPORT = os.path.join(PROGRAMS, "support.siml")
+
+
+class Clock:
+    """
+    A clock that moves one second every time it is read.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        self.now += 1.0
+        return self.now
+
+
+def profile(engine: str, **options) -> Profiler:
+    with open(SUPPORT) as f:
+        tree, _ = parse_source(f.read())
+    profiler = Profiler()
+    profiler.start()
+    simulation = Simulation(tree, engine=engine, profiler=profiler, **options)
+    simulation.run()
+    simulation.close()
+    profiler.stop()
+    return profiler
+
+
+def test_time_is_split_between_callers_and_callees():
+    profiler = Profiler()
+    profiler.clock = Clock()
+    rule, action = ProfileEntry("rule", "on tick", "m", 3), ProfileEntry("action", "close", "m", 9)
+    profiler.enter(rule)      # 1
+    profiler.enter(action)    # 2
+    profiler.enter(action)    # 3, recursive
+    profiler.leave()          # 4
+    profiler.leave()          # 5
+    profiler.leave()          # 6
+    assert (rule.calls, rule.total, rule.own) == (1, 5.0, 2.0)
+    # A recursive call is counted, but its time only once in total
+    assert (action.calls, action.total, action.own) == (2, 3.0, 3.0)
+    assert profiler.stacks == {
+        ("rule on tick (m:3)", ): 2.0,
+        ("rule on tick (m:3)", "action close (m:9)"): 2.0,
+        ("rule on tick (m:3)", "action close (m:9)", "action close (m:9)"): 1.0,
+    }
+    assert profiler.collapsed() == [
+        "rule on tick (m:3) 2000000",
+        "rule on tick (m:3);action close (m:9) 2000000",
+        "rule on tick (m:3);action close (m:9);action close (m:9) 1000000",
+    ]
+
+
+def test_labels_and_report_order():
+    assert ProfileEntry("rule", "on tick", "m", 3).label == "rule on tick (m:3)"
+    assert ProfileEntry("agent", "billing", None, 7).label == "agent billing (line 7)"
+    assert ProfileEntry("phase", "agents", None, 0).label == "phase agents"
+
+    profiler = Profiler()
+    profiler.entry("rule", "a", 1, "m").calls = 3
+    profiler.entry("rule", "b", 2, "m").calls = 5
+    assert profiler.entry("rule", "a", 1, "m").calls == 3
+    assert [entry.name for entry in profiler.report("calls")] == ["b", "a"]
+    with pytest.raises(ValueError, match="sort"):
+        profiler.report("name")
+
+
+@pytest.mark.parametrize("engine", ["interpreted", "compiled", "vectorized"])
+def test_run_is_attributed_to_source_lines(engine):
+    profiler = profile(engine)
+    calls = {(entry.kind, entry.name, entry.line): entry.calls for entry in profiler.entries.values()}
+    assert calls[("rule", "on tick", 35)] == 5
+    assert calls[("rule", "on tick", 53)] == 5
+    assert calls[("action", "close", 28)] >= 1
+    assert calls[("synthesize", "ticket_template", 8)] == 1
+    assert calls[("setup", "state", 5)] == 1
+    # Every stack starts at a rule or setup entry and names its lines
+    assert all(line.split(" (support:", 1)[0] in ("rule on tick", "setup state") for line in profiler.collapsed())
+    assert any(";action close (support:28) " in line for line in profiler.collapsed())
+
+
+def test_visits_count_loop_iterations():
+    scanned = profile("interpreted")
+    assert all(entry.visits == 5 * 300 for entry in scanned.entries.values() if entry.line in (35, 41, 48))
+    indexed = profile("compiled")
+    assert all(0 < entry.visits < 300 for entry in indexed.entries.values() if entry.line in (35, 41, 48))
+    unindexed = profile("compiled", indexes=False)
+    assert all(entry.visits == 5 * 300 for entry in unindexed.entries.values() if entry.line in (35, 41, 48))
+
+
+def test_allocations_are_traced_per_entry():
+    with open(SUPPORT) as f:
+        tree, _ = parse_source(f.read())
+    profiler = Profiler(allocations=True)
+    profiler.start()
+    try:
+        Simulation(tree, profiler=profiler).run()
+    finally:
+        profiler.stop()
+    synthesize = next(entry for entry in profiler.entries.values() if entry.kind == "synthesize")
+    assert synthesize.allocated > 300 * 100
+
+
+def test_profile_command_writes_collapsed_stacks(tmp_path, capsys):
+    out = tmp_path / "stacks.txt"
+    assert main(["profile", SUPPORT, "--no-cache", "--collapsed", str(out), "--sort", "calls", "--limit", "3"]) == 0
+    printed = capsys.readouterr().out
+    assert printed.startswith("Profiled 5 tick(s)")
+    assert len(printed.splitlines()) == 1 + 1 + 3 + 1
+    lines = out.read_text().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
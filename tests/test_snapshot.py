@@ -0,0 +1,71 @@
+import json
+import os
+
+import pytest
+
+from siml.agents import plain
+from siml.parser import parse_source
+from siml.runtime import Simulation, ENGINES
+from siml.snapshot import Snapshot
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), "programs")
+
+
+@pytest.fixture(scope="module")
+def tree():
+    with open(os.path.join(PROGRAMS, "support.siml")) as f:
+        tree, errors = parse_source(f.read())
+    assert not errors
+    return tree
+
+
+def state_json(simulation: Simulation) -> str:
+    return json.dumps({module.name: plain(module.state) for module in simulation.modules}, sort_keys=True)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_fork_and_parent_do_not_see_each_others_writes(tree, engine):
+    parent = Simulation(tree, engine=engine)
+    parent.run(2)
+    at_fork = state_json(parent)
+
+    fork = parent.fork()
+    fork.run(3)
+    assert state_json(parent) == at_fork
+
+    parent.run(1)
+    after_parent = state_json(parent)
+    straight = Simulation(tree, engine=engine)
+    straight.run(5)
+    assert state_json(fork) == state_json(straight)
+
+    fork.run(1)
+    assert state_json(parent) == after_parent
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_snapshot_is_frozen(tree, engine):
+    simulation = Simulation(tree, engine=engine)
+    simulation.run(2)
+    snapshot = simulation.snapshot()
+    expected = state_json(simulation)
+
+    simulation.run(3)
+    first = Simulation(tree, engine=engine, snapshot=snapshot)
+    first.run(3)
+    second = Simulation(tree, engine=engine, snapshot=snapshot)
+    assert state_json(second) == expected
+    assert second.tick == 2
+    second.run(3)
+    assert state_json(first) == state_json(second) == state_json(simulation)
+
+
+def test_saved_snapshot_resumes(tree, tmp_path):
+    simulation = Simulation(tree)
+    simulation.run(2)
+    simulation.snapshot().save(tmp_path / "run.snapshot")
+    simulation.run(3)
+
+    resumed = Simulation(tree, snapshot=Snapshot.load(tmp_path / "run.snapshot"))
+    resumed.run(3)
+    assert state_json(resumed) == state_json(simulation)
@@ -0,0 +1,55 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+EXAMPLE = os.path.join(ROOT, "examples", "invoice_simulation.siml")
+
+# Modules `siml --version` and a cached `siml check` must not import (see benchmarks/bench_startup.py)
+HEAVY = ("colorama", "numpy", "asyncio", "siml.runtime", "siml.agents", "siml.compiler", "siml.tokenizer")
+
+# Runs the CLI in a fresh interpreter and prints which of HEAVY it imported
+PROBE = """
+import json, sys
+from cli.main import main
+try:
+    status = main(sys.argv[1:])
+except SystemExit as exit:  # --version
+    status = exit.code
+heavy = sorted(name for name in sys.modules if name in {heavy!r} or name.split(".")[0] in {heavy!r})
+print(json.dumps([status, heavy]))
+""".format(heavy=HEAVY)
+
+
+def imports(*argv: str) -> tuple[int, list[str]]:
+    result = subprocess.run([sys.executable, "-c", PROBE, *argv], cwd=ROOT, capture_output=True, text=True, check=True)
+    return tuple(json.loads(result.stdout.splitlines()[-1]))
+
+
+@pytest.fixture
+def program(tmp_path):
+    # A copy, so its parse cache starts empty and is written next to it
+    path = tmp_path / "invoices.siml"
+    shutil.copy(EXAMPLE, path)
+    return str(path)
+
+
+def test_version_imports_nothing_heavy():
+    assert imports("--version") == (0, [])
+
+
+def test_cached_check_imports_nothing_heavy(program):
+    status, heavy = imports("check", program)
+    assert status == 0 and "siml.runtime" not in heavy
+    # Once the tree is cached, not even the tokenizer is loaded
+    assert imports("check", program) == (0, [])
+
+
+def test_run_still_loads_what_it_needs(program):
+    status, heavy = imports("run", program, "--ticks", "1")
+    assert status == 0
+    assert {"siml.runtime", "siml.compiler"} <= set(heavy)
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from siml import sweep
+from siml.parser import parse_source
+from siml.sweep import SweepSettings, make_jobs, pool_size, run_sweep
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), "..", "examples", "invoice_simulation.siml")
+
+
+@pytest.fixture(scope="module")
+def tree():
+    with open(EXAMPLE) as f:
+        tree, errors = parse_source(f.read())
+    assert not errors
+    return tree
+
+
+def test_pool_size_is_limited_to_the_available_cpus(monkeypatch):
+    monkeypatch.setattr(sweep, "available_cpus", lambda: 4)
+    assert pool_size(None) == 4
+    assert pool_size(2) == 2
+    assert pool_size(16) == 4
+    assert pool_size(0) == 1
+
+
+def test_one_cpu_runs_in_process(tree, monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("a one-CPU sweep started a process pool")
+
+    monkeypatch.setattr(sweep, "available_cpus", lambda: 1)
+    monkeypatch.setattr(sweep, "ProcessPoolExecutor", no_pool)
+    jobs = make_jobs([1, 2, 3])
+    results = list(run_sweep(tree, jobs, SweepSettings(ticks=2, provider="stub"), workers=8))
+    assert [result.seed for result in results] == [1, 2, 3]
+    assert all(result.error is None and result.ticks == 2 for result in results)
+
+
+def test_pool_matches_in_process(tree, monkeypatch):
+    jobs = make_jobs([1, 2, 3, 4])
+    settings = SweepSettings(ticks=2, provider="stub")
+    monkeypatch.setattr(sweep, "available_cpus", lambda: 1)
+    expected = [(result.seed, result.summary, result.applied) for result in run_sweep(tree, jobs, settings)]
+    monkeypatch.setattr(sweep, "available_cpus", lambda: 2)
+    pooled = [(result.seed, result.summary, result.applied) for result in run_sweep(tree, jobs, settings, workers=2)]
+    assert pooled == expected
@@ -0,0 +1,78 @@
+import pytest
+
+from siml import parallel, synthesis
+from siml.synthesis import RNG_BLOCK, Synthesizer, SyntheticCollection, plan_fields
+
+TEMPLATE = {
+    "examples": [
+        {"id": 1, "amount": 4200, "fee": 0.5, "status": "pending", "region": "eu", "tags": []},
+        {"id": 2, "amount": 7300, "fee": 2.0, "status": "approved", "region": "eu", "tags": []},
+        {"id": 3, "amount": 150, "fee": 1.25, "status": "disputed", "region": "eu", "tags": []},
+    ]
+}
+COUNT = RNG_BLOCK + 4_000
+
+
+def collection(seed: int = 7, count: int = COUNT, call: int = 0) -> SyntheticCollection:
+    return SyntheticCollection(Synthesizer("invoice", TEMPLATE, seed, "billing", call), count)
+
+
+@pytest.fixture(scope="module")
+def records():
+    return collection().to_list()
+
+
+def test_plans_follow_the_examples():
+    kinds = {plan.name: plan.kind for plan in plan_fields("invoice", TEMPLATE)}
+    assert kinds == {"id": "sequence", "amount": "integers", "fee": "uniform", "status": "choice",
+                     "region": "constant", "tags": "constant"}
+
+
+def test_records_respect_the_plans(records):
+    assert len(records) == COUNT
+    assert [record["id"] for record in records] == list(range(1, COUNT + 1))
+    assert all(150 <= record["amount"] <= 7300 and type(record["amount"]) is int for record in records)
+    assert all(0.5 <= record["fee"] <= 2.0 for record in records)
+    assert {record["status"] for record in records} == {"pending", "approved", "disputed"}
+    assert {record["region"] for record in records} == {"eu"}
+    # Copied values are never shared between records
+    assert records[0]["tags"] is not records[1]["tags"]
+
+
+def test_same_seed_same_records(records):
+    assert collection().to_list() == records
+    assert collection(seed=8).to_list() != records
+    assert collection(call=1).to_list() != records
+
+
+@pytest.mark.parametrize("chunk_size", [1_000, 4_096, RNG_BLOCK, RNG_BLOCK + 1, COUNT * 2])
+def test_chunk_size_does_not_change_the_records(records, chunk_size):
+    chunks = list(collection().chunks(chunk_size))
+    assert [len(chunk) for chunk in chunks[:-1]] == [chunk_size] * (len(chunks) - 1)
+    assert [record for chunk in chunks for record in chunk] == records
+
+
+def test_columns_match_the_records(records):
+    synthesizer = collection().synthesizer
+    plans = {plan.name: plan for plan in synthesizer.plans}
+    start, columns = next(collection().column_chunks(1_000))
+    assert start == 0
+    assert columns["amount"].tolist() == [record["amount"] for record in records[:1_000]]
+    assert [plans["status"].values[index] for index in columns["status"].tolist()] == \
+        [record["status"] for record in records[:1_000]]
+
+
+def test_workers_produce_the_same_records(records, monkeypatch):
+    monkeypatch.setattr(parallel, "available_cpus", lambda: 2)
+    chunks = list(collection().chunks(10_000, workers=2))
+    assert [record for chunk in chunks for record in chunk] == records
+
+
+def test_one_cpu_generates_in_process(records, monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("a one-CPU synthesis started a process pool")
+
+    monkeypatch.setattr(parallel, "available_cpus", lambda: 1)
+    monkeypatch.setattr(synthesis, "ProcessPoolExecutor", no_pool)
+    chunks = list(collection().chunks(10_000, workers=8))
+    assert [record for chunk in chunks for record in chunk] == records
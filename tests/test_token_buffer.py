@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from siml.parser import Parser, parse_source
+from siml.token import Token
+from siml.token_buffer import TokenBuffer, TokenCursor, TokenSlice
+from siml.token_types import TokenType
+from siml.tokenizer import Tokenizer
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), "programs")
+
+
+@pytest.fixture(scope="module")
+def source():
+    with open(os.path.join(PROGRAMS, "support.siml")) as f:
+        return f.read()
+
+
+def test_buffer_holds_the_tokenizer_output(source):
+    buffer = TokenBuffer.from_tokenizer(Tokenizer(source))
+    assert list(buffer) == list(Tokenizer(source))
+    assert buffer[-1] == list(Tokenizer(source))[-1]
+    assert buffer.nbytes() == 11 * len(buffer)
+
+
+def test_values_are_interned_by_type():
+    buffer = TokenBuffer.from_tokens([Token(TokenType.NUMBER, 1, 1, 0), Token(TokenType.NUMBER, 1.0, 1, 0),
+                                      Token(TokenType.BOOLEAN, True, 1, 0), Token(TokenType.NUMBER, 1, 2, 0)])
+    assert [type(buffer.value(index)) for index in range(4)] == [int, float, bool, int]
+    assert len(buffer.value_table) == 4
+
+
+def test_slices_share_the_columns(source):
+    buffer = TokenBuffer.from_tokenizer(Tokenizer(source))
+    tokens = list(buffer)
+    view = buffer[10:50]
+    assert type(view) is TokenSlice and view.buffer is buffer
+    assert list(view) == tokens[10:50]
+    inner = view[5:-5]
+    assert (inner.start, inner.stop) == (15, 45)
+    assert list(inner) == tokens[15:45]
+    assert view[-1] == tokens[49]
+    with pytest.raises(IndexError):
+        view[40]
+    with pytest.raises(ValueError):
+        buffer[::2]
+
+
+def test_cursor_reads_fields_without_tokens(source):
+    buffer = TokenBuffer.from_tokenizer(Tokenizer(source))
+    tokens = list(buffer)
+    cursor = buffer[3:6].cursor()
+    assert type(cursor) is TokenCursor
+    seen = []
+    while not cursor.at_end:
+        seen.append((cursor.type, cursor.value, cursor.line, cursor.indent))
+        cursor.advance()
+    assert seen == [(token.type, token.value, token.line, token.indent) for token in tokens[3:6]]
+    assert cursor.type is None and cursor.token() is None
+    assert buffer.cursor().peek_type(2) is tokens[2].type
+
+
+def test_parser_reads_a_buffer_directly(source):
+    expected, errors = parse_source(source)
+    buffer = TokenBuffer.from_tokenizer(Tokenizer(source))
+    parser = Parser(buffer)
+    assert parser.parse() == expected
+    assert parser.errors == errors == []
+    assert Parser(buffer[:]).parse() == expected
@@ -0,0 +1,109 @@
+import io
+import os
+
+import pytest
+
+from siml.parser import Parser, parse_source
+from siml.token_types import TokenType
+from siml.tokenizer import Tokenizer
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), "programs")
+
+
+@pytest.fixture(scope="module")
+def path():
+    return os.path.join(PROGRAMS, "support.siml")
+
+
+@pytest.fixture(scope="module")
+def source(path):
+    with open(path) as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_path_matches_source(path, source, use_mmap):
+    tokenizer = Tokenizer.from_path(path, use_mmap=use_mmap)
+    assert tokenizer.lines is None
+    assert list(tokenizer) == list(Tokenizer(source))
+    # The file is reopened on every iteration
+    assert list(tokenizer) == list(Tokenizer(source))
+
+
+def test_streams_match_source(source):
+    expected = list(Tokenizer(source))
+    assert list(Tokenizer.from_stream(io.StringIO(source))) == expected
+    assert list(Tokenizer.from_stream(io.BytesIO(source.encode()))) == expected
+
+
+def test_final_dedents_follow_the_last_line(tmp_path):
+    source = "a:\n  b:\n    c: 1\n\n# trailing comment\n"
+    (tmp_path / "p.siml").write_text(source)
+    for tokenizer in (Tokenizer(source), Tokenizer.from_path(tmp_path / "p.siml"),
+                      Tokenizer.from_path(tmp_path / "p.siml", use_mmap=True),
+                      Tokenizer.from_stream(io.StringIO(source))):
+        dedents = [token for token in tokenizer if token.type is TokenType.DEDENT]
+        assert [(token.line, token.indent) for token in dedents] == [(6, 2), (6, 0)]
+
+
+def test_crlf_and_empty_files(tmp_path):
+    (tmp_path / "crlf.siml").write_bytes(b"a:\r\n  b: 1\r\n")
+    assert list(Tokenizer.from_path(tmp_path / "crlf.siml")) == list(Tokenizer("a:\n  b: 1\n"))
+    (tmp_path / "empty.siml").write_bytes(b"")
+    assert list(Tokenizer.from_path(tmp_path / "empty.siml", use_mmap=True)) == []
+    assert list(Tokenizer.from_path(tmp_path / "empty.siml")) == []
+
+
+def test_parser_from_path(path, source):
+    parser = Parser.from_path(path, use_mmap=True)
+    assert parser.parse() == parse_source(source, module_name="support")[0]
+    assert parser.errors == []
+
+
+def test_indentation_errors_carry_the_line(tmp_path):
+    (tmp_path / "bad.siml").write_text("a:\n   b: 1\n")
+    with pytest.raises(SyntaxError, match="line 2"):
+        list(Tokenizer.from_path(tmp_path / "bad.siml"))
+
+
+def lex(text: str) -> list[tuple[TokenType, object]]:
+    return [(token.type, token.value) for token in Tokenizer(text)]
+
+
+def test_words_are_classified_by_one_table():
+    assert lex("state true false null and or other") == [
+        (TokenType.KEYWORD, "state"), (TokenType.BOOLEAN, True), (TokenType.BOOLEAN, False),
+        (TokenType.NULL, None), (TokenType.AND, "and"), (TokenType.OR, "or"), (TokenType.IDENTIFIER, "other"),
+    ]
+
+
+def test_numbers_and_strings_are_converted():
+    assert lex("1 -2 3.5 .5 \"a b\" 'c'") == [
+        (TokenType.NUMBER, 1), (TokenType.NUMBER, -2), (TokenType.NUMBER, 3.5), (TokenType.NUMBER, 0.5),
+        (TokenType.STRING, "a b"), (TokenType.STRING, "c"),
+    ]
+    assert [type(value) for _, value in lex("1 1.0")] == [int, float]
+
+
+def test_longer_operators_win():
+    assert [token_type for token_type, _ in lex("== != <= >= ** = < > * - + / % ( ) [ ] , . :")] == [
+        TokenType.EQUAL_EQUAL, TokenType.NOT_EQUAL, TokenType.LESS_EQUAL, TokenType.GREATER_EQUAL, TokenType.POWER,
+        TokenType.EQUALS, TokenType.LESS_THAN, TokenType.GREATER_THAN, TokenType.MULTIPLY, TokenType.MINUS,
+        TokenType.PLUS, TokenType.DIVIDE, TokenType.MODULO, TokenType.LPAREN, TokenType.RPAREN,
+        TokenType.LBRACKET, TokenType.RBRACKET, TokenType.COMMA, TokenType.DOT, TokenType.COLON,
+    ]
+
+
+def test_comments_end_the_line_outside_strings():
+    assert lex("a: 1 # note: 2") == [(TokenType.IDENTIFIER, "a"), (TokenType.COLON, ":"), (TokenType.NUMBER, 1)]
+    assert lex("a: \"x # y\" # z") == [(TokenType.IDENTIFIER, "a"), (TokenType.COLON, ":"), (TokenType.STRING, "x # y")]
+    assert lex("# only a comment\na: 1") == lex("a: 1")
+    tokenizer = Tokenizer("")
+    assert tokenizer.strip_inline_comment("a: 'b#c' # d  ") == "a: 'b#c'"
+    assert tokenizer.strip_inline_comment("a: 1   ") == "a: 1"
+
+
+def test_tokens_keep_line_and_indent():
+    tokens = [token for token in Tokenizer("a:\n  b: 1\n") if token.type is not TokenType.INDENT]
+    assert [(token.line, token.indent) for token in tokens[2:5]] == [(2, 2), (2, 2), (2, 2)]
+
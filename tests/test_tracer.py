@@ -0,0 +1,93 @@
+import io
+
+import pytest
+
+from siml.tracer import Level, RingBuffer, Tracer
+
+
+@pytest.fixture
+def tracing(monkeypatch):
+    # Tracer state is class-wide; give each test its own
+    monkeypatch.setattr(Tracer, "enabled", True)
+    monkeypatch.setattr(Tracer, "level", Level.DEBUG)
+    monkeypatch.setattr(Tracer, "section_levels", {})
+    monkeypatch.setattr(Tracer, "sink", RingBuffer(16))
+    return Tracer
+
+
+class Loud:
+    formatted = 0
+
+    def __repr__(self):
+        Loud.formatted += 1
+        return "loud"
+
+
+def test_ring_buffer_keeps_the_newest_events():
+    buffer = RingBuffer(3)
+    for index in range(5):
+        buffer.append((index,))
+    assert list(buffer) == [(2,), (3,), (4,)]
+    assert (len(buffer), buffer.dropped) == (3, 2)
+    buffer.clear()
+    assert list(buffer) == [] and buffer.dropped == 0
+    with pytest.raises(ValueError):
+        RingBuffer(0)
+
+
+def test_disabled_tracing_records_nothing(monkeypatch):
+    monkeypatch.setattr(Tracer, "enabled", False)
+    monkeypatch.setattr(Tracer, "sink", RingBuffer(4))
+    tracer = Tracer("Parser")
+    tracer.info("token %r", Loud())
+    assert not tracer.is_enabled_for(Level.FAILURE)
+    assert len(Tracer.sink) == 0
+
+
+def test_events_are_tuples_formatted_only_on_dump(tracing):
+    Loud.formatted = 0
+    tracer = Tracer("Tokenizer")
+    tracer.info("Tokenized: %r at %d", Loud(), 3)
+    [(stamp, level, section, message, args)] = list(Tracer.sink)
+    assert (level, section, message) == (Level.INFO, "Tokenizer", "Tokenized: %r at %d")
+    assert Loud.formatted == 0
+
+    output = io.StringIO()
+    Tracer.dump(output)
+    assert "Tokenized: loud at 3" in output.getvalue()
+    assert "[Tokenizer]" in output.getvalue()
+    assert Loud.formatted == 1
+    assert len(Tracer.sink) == 0
+
+
+def test_section_levels_filter_per_section(tracing):
+    Tracer.set_level(Level.WARN, "Tokenizer")
+    tokenizer, parser = Tracer("Tokenizer"), Tracer("Parser")
+    assert not tokenizer.is_enabled_for(Level.INFO)
+    assert tokenizer.is_enabled_for(Level.WARN)
+    assert parser.is_enabled_for(Level.DEBUG)
+    tokenizer.debug("hidden")
+    tokenizer.failure("shown")
+    parser.debug("shown too")
+    assert [event[3] for event in Tracer.sink] == ["shown", "shown too"]
+
+    Tracer.set_level(Level.FAILURE)
+    assert not parser.is_enabled_for(Level.WARN)
+
+
+def test_dump_reports_dropped_events(tracing):
+    tracer = Tracer("Runtime")
+    for index in range(20):
+        tracer.debug("event %d", index)
+    output = io.StringIO()
+    Tracer.dump(output)
+    text = output.getvalue()
+    assert "event 4" in text and "event 3" not in text
+    assert "4 older events were dropped" in text
+
+
+def test_bad_arguments_still_dump(tracing):
+    Tracer("Runtime").warn("%d items", "many")
+    output = io.StringIO()
+    Tracer.dump(output)
+    assert "%d items ('many',)" in output.getvalue()